@@ -6,12 +6,18 @@
 # Python:       2.7
 #--------------------------------
 
+import argparse
 import datetime as dt
 import logging
+import multiprocessing
 import os
-import re
 import sys
 
+## The remap parsing is shared with the parameter scripts
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, 'scripts'))
+import remap_functions as remap
+
 ################################################################################
 
 def prms_remap_modify(remap_folder):
@@ -22,80 +28,151 @@ def prms_remap_modify(remap_folder):
     Returns:
         None
     """
+    logging.info('\nPRMS Remap Modify')
+    convert_remap_tree(
+        os.path.join(remap_folder, 'arc10p1'),
+        os.path.join(remap_folder, 'arc10p2'))
 
-    try:
-        logging.info('\nPRMS Remap Modify')
-
-        ## Build output folder if necessary
-        input_ws = os.path.join(remap_folder, 'arc10p1')    
-        output_ws = os.path.join(remap_folder, 'arc10p2')    
-        if not os.path.isdir(output_ws):
-            os.mkdir(output_ws)
-
-        ## Remove comments from ASCII remap files
-        for remap_name in os.listdir(input_ws):
-            remap_input_path = os.path.join(input_ws, remap_name)
-            remap_output_path = os.path.join(output_ws, remap_name)
-            if not os.path.isfile(remap_input_path):
+
+def convert_remap_tree(input_ws, output_ws, processes=None):
+    """Convert all ASCII remap files in a folder tree to the ArcGIS 10.2 format
+
+    The input folder structure is mirrored in the output folder.
+    Files are converted in parallel and a file is only written if it
+    passes validation.
+
+    Args:
+        input_ws (str): input remap folder
+        output_ws (str): output remap folder
+        processes (int): number of worker processes (default is CPU count)
+    Returns:
+        list of (remap path, error list) for the remaps that failed
+    """
+    ## Build the list of remap files
+    remap_path_list = []
+    for root, dirs, files in os.walk(input_ws):
+        for remap_name in sorted(files):
+            if not remap_name.lower().endswith('.rmp'):
                 continue
-            if not remap_input_path.lower().endswith('.rmp'):
-                continue           
-            logging.debug('  Modifying: {0}'.format(remap_name))
-            with open(remap_input_path, 'r') as remap_f:
-                input_lines = remap_f.readlines()
-
-            ## Separate remap values and comments
-            remap_lines, comment_lines = [], []
-            for i, line in enumerate(input_lines):
-                ## Remove newline characters and extra leading/trailing whitespace
-                line_split = [x.strip() for x in line.strip().split('/*')]
-                ## Comments will result in line_split have two items
-                if len(line_split) == 2:
-                    comment_lines.append('# {0} - {1}'.format(
-                        line_split[0].split(':')[0].strip(), line_split[1]))
-                if line_split:
-                    remap_lines.append(' : '.join([x.strip() for x in line_split[0].split(':')]))
-
-            ## First write the remap values,
-            ## Then write the comments (if there are any)
-            with open(remap_output_path, 'w') as remap_f:
-                for i, line in enumerate(remap_lines):
-                    remap_f.write(line)     
-                    ## Don't write newline character on last line
-                    ## This causes an error in ArcGIS 10.2.2
-                    if (i+1) == len(remap_lines) and not comment_lines:
-                        break
-                    remap_f.write('\n')
-
-                for i, line in enumerate(comment_lines):
-                    ## Replace California with abbreviation
-                    ## Limit comments to 80 characters
-                    remap_f.write(line.replace('California', 'CA')[:79])
-                    ## Don't write newline character on last line
-                    ## This causes an error in ArcGIS 10.2.2
-                    if (i+1) == len(comment_lines):
-                        break
-                    remap_f.write('\n')
-
-    except:
-        logging.exception('Unhandled Exception Error\n\n')
-        raw_input('ENTER')
+            remap_input_path = os.path.join(root, remap_name)
+            remap_output_path = os.path.join(
+                output_ws, os.path.relpath(remap_input_path, input_ws))
+            remap_path_list.append((remap_input_path, remap_output_path))
+    logging.info('  Remap files: {0}'.format(len(remap_path_list)))
+    if not remap_path_list:
+        return []
+
+    ## Build output folders if necessary
+    for output_dir in set([os.path.dirname(p[1]) for p in remap_path_list]):
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+
+    if processes == 1 or len(remap_path_list) == 1:
+        results = map(convert_remap_file, remap_path_list)
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(convert_remap_file, remap_path_list)
+        finally:
+            pool.close()
+            pool.join()
+
+    failed_list = []
+    for (remap_input_path, remap_output_path), errors in zip(
+            remap_path_list, results):
+        if errors:
+            logging.error('  Not converted: {0}'.format(remap_input_path))
+            for error in errors:
+                logging.error('    {0}'.format(error))
+            failed_list.append((remap_input_path, errors))
+        else:
+            logging.debug('  Modified: {0}'.format(remap_output_path))
+    logging.info('  Converted: {0}  Failed: {1}'.format(
+        len(remap_path_list) - len(failed_list), len(failed_list)))
+    return failed_list
+
+
+def convert_remap_file(remap_paths):
+    """Convert a single ASCII remap file
+
+    Args:
+        remap_paths (tuple): input and output remap file paths
+    Returns:
+        list of error strings (empty if the file was written)
+    """
+    remap_input_path, remap_output_path = remap_paths
+    try:
+        remap_text, remap_entries, comment_lines, invalid_lines = \
+            remap.read_remap(remap_input_path)
+    except IOError as e:
+        return [str(e)]
+
+    ## Don't write a broken file if any lines can't be parsed
+    ## or the keys are out of order or overlap
+    errors = [
+        'line {0} could not be parsed: {1}'.format(line_i, line)
+        for line_i, line in invalid_lines]
+    errors.extend(remap.validate_remap(remap_entries))
+    if errors:
+        return errors
+
+    atomic_write(
+        remap_output_path,
+        remap.format_remap_arc10p2(remap_entries, comment_lines))
+    return []
+
+
+def atomic_write(output_path, output_text):
+    """Write a file so that it is never left partially written"""
+    temp_path = output_path + '.tmp'
+    with open(temp_path, 'w') as output_f:
+        output_f.write(output_text)
+        output_f.flush()
+        os.fsync(output_f.fileno())
+    ## Windows can't rename over an existing file
+    if os.name == 'nt' and os.path.isfile(output_path):
+        os.remove(output_path)
+    os.rename(temp_path, output_path)
+
+
+def arg_parse():
+    """"""
+    parser = argparse.ArgumentParser(
+        description='Convert ASCII remap files to the ArcGIS 10.2 format',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument(
+        '-i', '--input', default=os.path.join(os.getcwd(), 'arc10p1'),
+        help='Input remap folder', metavar='FOLDER')
+    parser.add_argument(
+        '-o', '--output', default=os.path.join(os.getcwd(), 'arc10p2'),
+        help='Output remap folder', metavar='FOLDER')
+    parser.add_argument(
+        '-mp', '--multiprocessing', default=None, type=int,
+        help='Number of processes (default is the CPU count)', metavar='N')
+    parser.add_argument(
+        '-d', '--debug', default=logging.INFO, const=logging.DEBUG,
+        help='Debug level logging', action="store_const", dest="loglevel")
+    args = parser.parse_args()
+    args.input = os.path.abspath(args.input)
+    args.output = os.path.abspath(args.output)
+    return args
 
 ################################################################################
 
 if __name__ == '__main__':
-    workspace = os.getcwd()
+    args = arg_parse()
 
     ## Create Basic Logger
-    logging.basicConfig(level=logging.DEBUG, format='%(message)s')
+    logging.basicConfig(level=args.loglevel, format='%(message)s')
 
     ## Run Information
     logging.info('\n{0}'.format('#'*80))
     log_f = '{0:<20s} {1}'
     logging.info(log_f.format(
         'Run Time Stamp:', dt.datetime.now().isoformat(' ')))
-    logging.info(log_f.format('Current Directory:', workspace))
+    logging.info(log_f.format('Current Directory:', os.getcwd()))
     logging.info(log_f.format('Script:', os.path.basename(sys.argv[0])))
 
     ## Calculate PRMS Remap Modify
-    prms_remap_modify(workspace)
+    logging.info('\nPRMS Remap Modify')
+    convert_remap_tree(args.input, args.output, args.multiprocessing)
@@ -0,0 +1,807 @@
+#--------------------------------
+# Name:         backend_functions.py
+# Purpose:      arcpy and NumPy geoprocessing backends
+# Notes:        ArcGIS 10.2 Version
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+import abc
+from collections import namedtuple, OrderedDict
+from itertools import izip
+import math
+import os
+
+import numpy as np
+
+import column_functions as column
+import dbf_functions as dbf
+import polygon_functions as polygon
+import projection_functions as proj
+import remap_functions as remap
+import report_functions as report
+import terrain_functions as terrain
+import zonal_functions as zonal
+
+# The arcpy backend needs ArcGIS, the NumPy backend does not
+try:
+    import arcpy
+    import support_functions as support
+except ImportError:
+    arcpy = None
+    support = None
+
+
+# Raster grid (upper left corner, cellsize, and shape)
+Grid = namedtuple('Grid', ['x_min', 'y_max', 'cs', 'rows', 'cols'])
+
+# Rows of cells read at a time for zonal statistics and projecting
+block_rows = 1024
+
+# NumPy backend raster nodata value
+flt_nodata = -9999
+
+# Environment variable with the default backend name
+backend_env = 'GSFLOW_BACKEND'
+
+
+def grid_extent(grid):
+    """Return the extent (x_min, y_min, x_max, y_max) of a grid"""
+    return (
+        grid.x_min, grid.y_max - grid.rows * grid.cs,
+        grid.x_min + grid.cols * grid.cs, grid.y_max)
+
+
+def grid_centers(grid):
+    """Return the cell center x (by column) and y (by row) arrays"""
+    return (
+        grid.x_min + (np.arange(grid.cols) + 0.5) * grid.cs,
+        grid.y_max - (np.arange(grid.rows) + 0.5) * grid.cs)
+
+
+def snap_window(raster_grid, extent, pad=0):
+    """Return the window of a raster that covers an extent
+
+    The window is snapped to the raster cells and clipped to the raster.
+
+    Args:
+        raster_grid (Grid): raster grid
+        extent (tuple): x_min, y_min, x_max, y_max
+        pad (int): extra cells added on each side (i.e. for bilinear)
+
+    Returns:
+        Grid (rows and columns are 0 if the extent is outside the raster)
+    """
+    x_min, y_min, x_max, y_max = extent
+    cs = raster_grid.cs
+    col_start = max(
+        int(math.floor((x_min - raster_grid.x_min) / cs)) - pad, 0)
+    col_end = min(
+        int(math.ceil((x_max - raster_grid.x_min) / cs)) + pad,
+        raster_grid.cols)
+    row_start = max(
+        int(math.floor((raster_grid.y_max - y_max) / cs)) - pad, 0)
+    row_end = min(
+        int(math.ceil((raster_grid.y_max - y_min) / cs)) + pad,
+        raster_grid.rows)
+    return Grid(
+        raster_grid.x_min + col_start * cs,
+        raster_grid.y_max - row_start * cs, cs,
+        max(row_end - row_start, 0), max(col_end - col_start, 0))
+
+
+def sample_array(data_array, data_grid, x, y, method='NEAREST'):
+    """Sample a raster array at points
+
+    Args:
+        data_array (np.array): raster values (NaN for nodata)
+        data_grid (Grid): raster array grid
+        x (np.array): point x coordinates
+        y (np.array): point y coordinates (x and y are broadcast, so the
+            cell centers of a grid can be passed as a row and a column)
+        method (str): 'NEAREST' or 'BILINEAR'
+
+    Returns:
+        np.array of float64 values (NaN outside the raster)
+    """
+    x, y = np.broadcast_arrays(
+        np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+    output_array = np.full(x.shape, np.nan)
+    if not data_array.size:
+        return output_array
+    rows, cols = data_array.shape
+    row_f = (data_grid.y_max - y) / data_grid.cs
+    col_f = (x - data_grid.x_min) / data_grid.cs
+    inside_mask = (
+        (row_f >= 0) & (row_f < rows) & (col_f >= 0) & (col_f < cols))
+    if method.upper() == 'NEAREST':
+        row_i = row_f[inside_mask].astype(np.int64)
+        col_i = col_f[inside_mask].astype(np.int64)
+        output_array[inside_mask] = data_array[row_i, col_i]
+    elif method.upper() == 'BILINEAR':
+        # Interpolate between cell centers (edge cells are repeated)
+        row_f = row_f[inside_mask] - 0.5
+        col_f = col_f[inside_mask] - 0.5
+        row_i, col_i = np.floor(row_f), np.floor(col_f)
+        row_w, col_w = row_f - row_i, col_f - col_i
+        row_a = np.clip(row_i, 0, rows - 1).astype(np.int64)
+        row_b = np.clip(row_i + 1, 0, rows - 1).astype(np.int64)
+        col_a = np.clip(col_i, 0, cols - 1).astype(np.int64)
+        col_b = np.clip(col_i + 1, 0, cols - 1).astype(np.int64)
+        output_array[inside_mask] = (
+            (1 - row_w) * (1 - col_w) * data_array[row_a, col_a] +
+            (1 - row_w) * col_w * data_array[row_a, col_b] +
+            row_w * (1 - col_w) * data_array[row_b, col_a] +
+            row_w * col_w * data_array[row_b, col_b])
+    else:
+        raise ValueError('unsupported resampling method: {}'.format(method))
+    return output_array
+
+
+class Backend(object):
+    """Geoprocessing operations used by the parameter scripts
+
+    Rasters are exchanged as float64 arrays with nodata as NaN on a Grid.
+    Tables are exchanged as dictionaries of column arrays in OID order.
+    Spatial references are ESRI well known text (the arcpy backend also
+        accepts arcpy.SpatialReference objects).
+
+    The operations that can be built from raster windows are implemented
+        here with NumPy so both backends give the same results.  The rest
+        are abstract, so a backend that doesn't implement all of them can't
+        be created.
+    """
+    __metaclass__ = abc.ABCMeta
+    name = None
+
+    # Extension of the rasters the backend writes
+    raster_ext = '.img'
+
+    # Rasters
+    @abc.abstractmethod
+    def raster_grid(self, raster_path):
+        """Return the Grid of a raster"""
+
+    @abc.abstractmethod
+    def raster_sr(self, raster_path):
+        """Return the spatial reference well known text of a raster"""
+
+    @abc.abstractmethod
+    def read_window(self, raster_path, window_grid):
+        """Read a window of a raster that is snapped to the raster cells
+
+        Args:
+            raster_path (str): raster path
+            window_grid (Grid): window (see snap_window())
+
+        Returns:
+            np.array of float64 values with nodata set to NaN
+        """
+
+    @abc.abstractmethod
+    def write_raster(self, input_array, raster_path, grid, sr=None):
+        """Write an array (NaN for nodata) as a raster"""
+
+    def read_raster(self, raster_path, grid, method='NEAREST'):
+        """Read a raster on a grid
+
+        The raster values are sampled at the grid cell centers, so the grid
+            can have a different cellsize and snap point than the raster.
+
+        Args:
+            raster_path (str): raster path
+            grid (Grid): output grid
+            method (str): 'NEAREST' or 'BILINEAR'
+
+        Returns:
+            np.array of float64 values with nodata set to NaN
+        """
+        window_grid = snap_window(
+            self.raster_grid(raster_path), grid_extent(grid),
+            0 if method.upper() == 'NEAREST' else 1)
+        x, y = grid_centers(grid)
+        return sample_array(
+            self.read_window(raster_path, window_grid), window_grid,
+            x[np.newaxis, :], y[:, np.newaxis], method)
+
+    def clip_raster(self, input_path, output_path, grid):
+        """Clip a raster to a grid (nearest neighbor)"""
+        with report.stage('clip') as stage:
+            self.write_raster(
+                self.read_raster(input_path, grid), output_path, grid,
+                self.raster_sr(input_path))
+            stage.add_file(output_path)
+
+    def resample_raster(self, input_path, output_path, grid,
+                        method='NEAREST'):
+        """Resample a raster to a grid"""
+        with report.stage('resample') as stage:
+            self.write_raster(
+                self.read_raster(input_path, grid, method), output_path,
+                grid, self.raster_sr(input_path))
+            stage.add_file(output_path)
+
+    def project_raster(self, input_path, output_path, output_sr, grid,
+                       method='NEAREST', input_sr=None, transform=None):
+        """Project a raster to a grid
+
+        The grid cell centers are projected to the input spatial reference
+            and the input raster is sampled at those points.
+
+        Args:
+            input_path (str): input raster path
+            output_path (str): output raster path
+            output_sr: output (grid) spatial reference
+            grid (Grid): output grid
+            method (str): resampling method
+            input_sr: input spatial reference (default is the raster's)
+            transform (str): datum transformation name
+                (see projection_functions.datum_transforms)
+
+        Returns:
+            None
+        """
+        if input_sr is None:
+            input_sr = self.raster_sr(input_path)
+        input_params = proj.wkt_params(self._sr_wkt(input_sr))
+        output_params = proj.wkt_params(self._sr_wkt(output_sr))
+        if input_params is None or output_params is None:
+            raise ValueError('unsupported spatial reference')
+        raster_grid = self.raster_grid(input_path)
+        pad = 0 if method.upper() == 'NEAREST' else 1
+        output_array = np.full((grid.rows, grid.cols), np.nan)
+        x, y = grid_centers(grid)
+        with report.stage('project') as stage:
+            for row_i in xrange(0, grid.rows, block_rows):
+                block_y = y[row_i:row_i + block_rows]
+                input_x, input_y = proj.transform_points(
+                    np.tile(x, len(block_y)), np.repeat(block_y, len(x)),
+                    output_params, input_params, transform)
+                window_grid = snap_window(raster_grid, (
+                    input_x.min(), input_y.min(),
+                    input_x.max(), input_y.max()), pad)
+                output_array[row_i:row_i + len(block_y)] = sample_array(
+                    self.read_window(input_path, window_grid), window_grid,
+                    input_x, input_y, method).reshape(len(block_y), len(x))
+            self.write_raster(output_array, output_path, grid, output_sr)
+            stage.add_file(output_path)
+
+    def reclass_raster(self, input_path, output_path, remap_path,
+                       missing_values='DATA'):
+        """Reclassify a raster with an ASCII remap file"""
+        grid = self.raster_grid(input_path)
+        with report.stage('reclass') as stage:
+            self.write_raster(
+                remap.remap_array(
+                    self.read_raster(input_path, grid), remap_path,
+                    missing_values=missing_values),
+                output_path, grid, self.raster_sr(input_path))
+            stage.add_file(output_path)
+
+    def _terrain_raster(self, stage_name, terrain_func, input_path,
+                        output_path):
+        """Apply a terrain function to a full raster"""
+        grid = self.raster_grid(input_path)
+        with report.stage(stage_name, grid.rows * grid.cols) as stage:
+            self.write_raster(
+                terrain_func(self.read_raster(input_path, grid)),
+                output_path, grid, self.raster_sr(input_path))
+            stage.add_file(output_path)
+
+    def fill(self, input_path, output_path):
+        """Fill the depressions of a DEM"""
+        self._terrain_raster(
+            'fill', terrain.fill_depressions, input_path, output_path)
+
+    def flow_direction(self, input_path, output_path):
+        """Compute the D8 flow direction (edge cells flow outward)"""
+        self._terrain_raster(
+            'flow_dir', terrain.flow_direction, input_path, output_path)
+
+    def flow_accumulation(self, input_path, output_path):
+        """Accumulate the flow of a D8 flow direction raster"""
+        self._terrain_raster(
+            'flow_acc', terrain.flow_accumulation, input_path, output_path)
+
+    def zonal_stats(self, raster_path, grid, stat='MEAN'):
+        """Compute a zonal statistic of a raster for each grid cell (HRU)
+
+        The raster is read at its own cellsize on windows that share the
+            grid upper left corner and each raster cell is assigned to the
+            grid cell containing its center.
+
+        Args:
+            raster_path (str): raster path
+            grid (Grid): zone (HRU) grid
+            stat (str): statistic (see zonal_functions.ZonalStats)
+
+        Returns:
+            np.array of the statistic by cell index (row * cols + col)
+        """
+        cs = self.raster_grid(raster_path).cs
+        rows = int(math.ceil(grid.rows * grid.cs / cs))
+        cols = int(math.ceil(grid.cols * grid.cs / cs))
+        zs_obj = zonal.ZonalStats(grid.rows * grid.cols, stat)
+        with report.stage('zonal', grid.rows * grid.cols):
+            for row_i in xrange(0, rows, block_rows):
+                block_count = min(block_rows, rows - row_i)
+                zs_obj.update(
+                    zonal.cell_zone_array(
+                        row_i, block_count, cols, cs, grid.cs,
+                        grid.rows, grid.cols),
+                    self.read_raster(raster_path, Grid(
+                        grid.x_min, grid.y_max - row_i * cs, cs,
+                        block_count, cols)))
+        return zs_obj.result()
+
+    # Tables
+    @abc.abstractmethod
+    def list_fields(self, table_path):
+        """Return the field names of a table"""
+
+    @abc.abstractmethod
+    def add_fields(self, table_path, field_list):
+        """Add the missing (field name, field type) to a table
+
+        Returns:
+            list of the (field name, field type) that were added
+        """
+
+    @abc.abstractmethod
+    def read_table(self, table_path, field_names):
+        """Read fields of a table
+
+        Args:
+            table_path (str): table or feature class path
+            field_names (list): field names ('OID@' for the object ID)
+
+        Returns:
+            OrderedDict of the value arrays (in OID order) keyed by field name
+        """
+
+    @abc.abstractmethod
+    def write_table(self, table_path, values):
+        """Write value arrays (in OID order) to existing fields of a table"""
+
+    # Vectors
+    @abc.abstractmethod
+    def read_polygons(self, polygon_path, sr=None):
+        """Read the rings of each polygon
+
+        Args:
+            polygon_path (str): polygon feature class path
+            sr: spatial reference of the rings (default is the polygons')
+
+        Returns:
+            tuple of the OID array and the list of rings of each polygon
+                (polygons without a shape are skipped)
+        """
+
+    def zone_overlap(self, zone_path, grid, sr=None):
+        """Compute the area of each zone polygon in each grid cell
+
+        Args:
+            zone_path (str): zone polygon feature class path
+            grid (Grid): zone (HRU) grid
+            sr: grid spatial reference (default is the zones')
+
+        Returns:
+            tuple of the cell index (row * cols + col), zone OID,
+                and overlap area (in grid units squared) arrays
+        """
+        with report.stage('intersect'):
+            oid_array, rings_list = self.read_polygons(zone_path, sr)
+            cell_array, zone_i_array, area_array = polygon.zone_cell_overlap(
+                rings_list, grid.x_min, grid.y_max, grid.cs,
+                grid.rows, grid.cols)
+        return cell_array, oid_array[zone_i_array], area_array
+
+    def _sr_wkt(self, sr):
+        """"""
+        return sr
+
+
+class ArcpyBackend(Backend):
+    """ArcGIS backend
+
+    Fill, flow direction, flow accumulation, reclassify, and project use
+        the Spatial Analyst and Data Management tools (the Spatial Analyst
+        extension must already be checked out).
+    """
+    name = 'arcpy'
+
+    def __init__(self):
+        """"""
+        if arcpy is None:
+            raise ImportError('the arcpy backend needs ArcGIS')
+
+    def _sr(self, sr):
+        """Return an arcpy.SpatialReference for well known text"""
+        if isinstance(sr, basestring):
+            sr_obj = arcpy.SpatialReference()
+            sr_obj.loadFromString(sr)
+            return sr_obj
+        return sr
+
+    def _sr_wkt(self, sr):
+        """"""
+        if isinstance(sr, basestring):
+            return sr
+        return sr.exportToString()
+
+    def raster_grid(self, raster_path):
+        """"""
+        raster_obj = arcpy.sa.Raster(raster_path)
+        return Grid(
+            raster_obj.extent.XMin, raster_obj.extent.YMax,
+            raster_obj.meanCellWidth, raster_obj.height, raster_obj.width)
+
+    def raster_sr(self, raster_path):
+        """"""
+        return arcpy.Describe(raster_path).spatialReference.exportToString()
+
+    def read_window(self, raster_path, window_grid):
+        """"""
+        if not window_grid.rows or not window_grid.cols:
+            return np.empty((window_grid.rows, window_grid.cols))
+        return support.raster_window_to_array(
+            raster_path, window_grid.x_min, window_grid.y_max,
+            window_grid.cs, window_grid.rows, window_grid.cols)
+
+    def write_raster(self, input_array, raster_path, grid, sr=None):
+        """"""
+        input_array = np.asarray(input_array)
+        # Only float and boolean arrays have a nodata value
+        if input_array.dtype.kind in 'iu':
+            input_array = input_array.astype(np.float64)
+        support.array_to_raster(
+            input_array, raster_path,
+            arcpy.Point(grid.x_min, grid.y_max - grid.rows * grid.cs),
+            grid.cs)
+        if sr is not None:
+            arcpy.DefineProjection_management(raster_path, self._sr(sr))
+
+    def project_raster(self, input_path, output_path, output_sr, grid,
+                       method='NEAREST', input_sr=None, transform=None):
+        """"""
+        input_obj = arcpy.sa.Raster(input_path)
+        output_sr = self._sr(output_sr)
+        if input_sr is None:
+            input_sr = input_obj.spatialReference
+        else:
+            input_sr = self._sr(input_sr)
+        if transform is None:
+            transform = support.transform_func(output_sr, input_sr)
+        proj_extent = support.project_hru_extent_func(
+            arcpy.Extent(*grid_extent(grid)), grid.cs, output_sr,
+            input_obj.extent, input_obj.meanCellWidth, input_sr)
+        support.project_clipped_raster_func(
+            input_path, output_path, output_sr, method, grid.cs, transform,
+            '{} {}'.format(grid.x_min, grid.y_max), input_sr, proj_extent)
+
+    def reclass_raster(self, input_path, output_path, remap_path,
+                       missing_values='DATA'):
+        """"""
+        with report.stage('reclass') as stage:
+            arcpy.sa.ReclassByASCIIFile(
+                input_path, remap_path, missing_values.upper()).save(
+                    output_path)
+            stage.add_file(output_path)
+
+    def fill(self, input_path, output_path):
+        """"""
+        with report.stage('fill') as stage:
+            arcpy.sa.Fill(input_path).save(output_path)
+            stage.add_file(output_path)
+
+    def flow_direction(self, input_path, output_path):
+        """"""
+        with report.stage('flow_dir') as stage:
+            arcpy.sa.FlowDirection(input_path, True).save(output_path)
+            stage.add_file(output_path)
+
+    def flow_accumulation(self, input_path, output_path):
+        """"""
+        with report.stage('flow_acc') as stage:
+            arcpy.sa.FlowAccumulation(input_path).save(output_path)
+            stage.add_file(output_path)
+
+    def list_fields(self, table_path):
+        """"""
+        return [f.name for f in arcpy.ListFields(table_path)]
+
+    def add_fields(self, table_path, field_list):
+        """"""
+        return support.add_fields_func(table_path, field_list)
+
+    def read_table(self, table_path, field_names):
+        """"""
+        with report.stage('cursor_read') as stage:
+            table_array = arcpy.da.TableToNumPyArray(table_path, field_names)
+            stage.add_rows(len(table_array))
+        return OrderedDict([(f, table_array[f]) for f in field_names])
+
+    def write_table(self, table_path, values):
+        """"""
+        field_names = list(values.keys())
+        value_rows = izip(*[
+            np.asarray(values[f]).tolist() for f in field_names])
+        row_count = 0
+        with report.stage('cursor_write') as stage:
+            with arcpy.da.UpdateCursor(table_path, field_names) as u_cursor:
+                for row, value_row in izip(u_cursor, value_rows):
+                    u_cursor.updateRow(list(value_row))
+                    row_count += 1
+            stage.add_rows(row_count)
+
+    def read_polygons(self, polygon_path, sr=None):
+        """"""
+        oid_list, rings_list = [], []
+        with arcpy.da.SearchCursor(
+                polygon_path, ['OID@', 'SHAPE@'], '',
+                self._sr(sr) if sr is not None else None) as s_cursor:
+            for oid, geom in s_cursor:
+                if geom is None:
+                    continue
+                oid_list.append(oid)
+                rings_list.append(support.polygon_rings(geom))
+        return np.array(oid_list, dtype=np.int64), rings_list
+
+
+class NumpyBackend(Backend):
+    """NumPy backend that doesn't need ArcGIS
+
+    Rasters are ESRI floating point grids (a little endian float32 .flt file
+        with an ASCII .hdr header and an optional .prj file), which are read
+        with memory maps.  Tables and polygons are shapefiles and only the
+        .dbf and .shp files are read (the object ID is the FID).
+    """
+    name = 'numpy'
+    raster_ext = '.flt'
+
+    def _flt_header(self, raster_path):
+        """Return the Grid and nodata value of a floating point grid"""
+        header = {}
+        with open(os.path.splitext(raster_path)[0] + '.hdr') as hdr_f:
+            for line in hdr_f:
+                if line.strip():
+                    key, value = line.split()[:2]
+                    header[key.lower()] = value
+        rows, cols = int(header['nrows']), int(header['ncols'])
+        cs = float(header['cellsize'])
+        if 'xllcenter' in header:
+            x_min = float(header['xllcenter']) - 0.5 * cs
+            y_min = float(header['yllcenter']) - 0.5 * cs
+        else:
+            x_min = float(header['xllcorner'])
+            y_min = float(header['yllcorner'])
+        if header.get('byteorder', 'LSBFIRST').upper() == 'MSBFIRST':
+            dtype = '>f4'
+        else:
+            dtype = '<f4'
+        return (
+            Grid(x_min, y_min + rows * cs, cs, rows, cols),
+            float(header.get('nodata_value', flt_nodata)), dtype)
+
+    def raster_grid(self, raster_path):
+        """"""
+        return self._flt_header(raster_path)[0]
+
+    def _prj_wkt(self, data_path):
+        """Return the well known text of the .prj file (or None)"""
+        prj_path = os.path.splitext(data_path)[0] + '.prj'
+        if not os.path.isfile(prj_path):
+            return None
+        with open(prj_path) as prj_f:
+            return prj_f.read().strip()
+
+    def raster_sr(self, raster_path):
+        """"""
+        return self._prj_wkt(raster_path)
+
+    def read_window(self, raster_path, window_grid):
+        """"""
+        raster_grid, nodata, dtype = self._flt_header(raster_path)
+        if not window_grid.rows or not window_grid.cols:
+            return np.empty((window_grid.rows, window_grid.cols))
+        row_i = int(round(
+            (raster_grid.y_max - window_grid.y_max) / raster_grid.cs))
+        col_i = int(round(
+            (window_grid.x_min - raster_grid.x_min) / raster_grid.cs))
+        raster_array = np.memmap(
+            os.path.splitext(raster_path)[0] + '.flt', dtype=dtype, mode='r',
+            shape=(raster_grid.rows, raster_grid.cols))
+        output_array = raster_array[
+            row_i:row_i + window_grid.rows,
+            col_i:col_i + window_grid.cols].astype(np.float64)
+        del raster_array
+        output_array[output_array == nodata] = np.nan
+        return output_array
+
+    def write_raster(self, input_array, raster_path, grid, sr=None):
+        """"""
+        base_path = os.path.splitext(raster_path)[0]
+        output_array = np.asarray(input_array, dtype=np.float32)
+        if output_array.shape != (grid.rows, grid.cols):
+            raise ValueError('array shape does not match the grid')
+        output_array = np.where(
+            np.isnan(output_array), np.float32(flt_nodata), output_array)
+        output_array.astype('<f4').tofile(base_path + '.flt')
+        with open(base_path + '.hdr', 'w') as hdr_f:
+            hdr_f.write(
+                'ncols         {}\n'.format(grid.cols) +
+                'nrows         {}\n'.format(grid.rows) +
+                'xllcorner     {!r}\n'.format(float(grid.x_min)) +
+                'yllcorner     {!r}\n'.format(
+                    float(grid.y_max - grid.rows * grid.cs)) +
+                'cellsize      {!r}\n'.format(float(grid.cs)) +
+                'NODATA_value  {}\n'.format(flt_nodata) +
+                'byteorder     LSBFIRST\n')
+        if sr is not None:
+            with open(base_path + '.prj', 'w') as prj_f:
+                prj_f.write(sr)
+
+    def _dbf_path(self, table_path):
+        """"""
+        return os.path.splitext(table_path)[0] + '.dbf'
+
+    def list_fields(self, table_path):
+        """"""
+        with open(self._dbf_path(table_path), 'rb') as dbf_f:
+            dbf_fields = dbf.read_dbf_header(dbf_f)[3]
+        return ['FID'] + [f.name for f in dbf_fields]
+
+    def add_fields(self, table_path, field_list):
+        """"""
+        field_names = set(f.upper() for f in self.list_fields(table_path))
+        add_list = [
+            (name, field_type) for name, field_type in field_list
+            if name.upper() not in field_names]
+        if add_list:
+            with report.stage('add_fields') as stage:
+                dbf.add_dbf_fields(self._dbf_path(table_path), add_list)
+                stage.add_file(self._dbf_path(table_path))
+        return add_list
+
+    def read_table(self, table_path, field_names):
+        """"""
+        dbf_path = self._dbf_path(table_path)
+        with report.stage('cursor_read') as stage:
+            with open(dbf_path, 'rb') as dbf_f:
+                record_count = dbf.read_dbf_header(dbf_f)[0]
+            oid_names = [
+                f for f in field_names if f.upper() in ['OID@', 'FID']]
+            dbf_values = dbf.read_dbf_columns(dbf_path, [
+                f for f in field_names if f not in oid_names])
+            stage.add_rows(record_count)
+        dbf_values.update([
+            (f, np.arange(record_count, dtype=np.int64)) for f in oid_names])
+        return OrderedDict([(f, dbf_values[f]) for f in field_names])
+
+    def write_table(self, table_path, values):
+        """"""
+        with report.stage('cursor_write') as stage:
+            dbf.write_dbf_columns(self._dbf_path(table_path), values)
+            stage.add_rows(len(next(iter(values.values()))) if values else 0)
+
+    def read_polygons(self, polygon_path, sr=None):
+        """"""
+        rings_list = polygon.read_shapefile_rings(polygon_path)
+        oid_array = np.array(
+            [oid for oid, rings in enumerate(rings_list) if rings],
+            dtype=np.int64)
+        rings_list = [rings for rings in rings_list if rings]
+        polygon_sr = self._prj_wkt(polygon_path)
+        if sr is None or polygon_sr is None or sr == polygon_sr:
+            return oid_array, rings_list
+        input_params = proj.wkt_params(polygon_sr)
+        output_params = proj.wkt_params(sr)
+        if input_params is None or output_params is None:
+            raise ValueError('unsupported spatial reference')
+        output_list = []
+        for rings in rings_list:
+            output_rings = []
+            for ring in rings:
+                x, y = proj.transform_points(
+                    ring[:, 0], ring[:, 1], input_params, output_params)
+                output_rings.append(np.column_stack([x, y]))
+            output_list.append(output_rings)
+        return oid_array, output_list
+
+
+class ColumnBackend(NumpyBackend):
+    """NumPy backend with the HRU attributes in a column table
+
+    Tables that are column table folders (see column_functions.py) are read
+        and written one field file at a time, other tables and all of the
+        rasters are handled the same as the NumPy backend.  The column table
+        polygons are the fishnet cells.
+    """
+    name = 'columns'
+
+    def list_fields(self, table_path):
+        """"""
+        if not column.is_column_table(table_path):
+            return NumpyBackend.list_fields(self, table_path)
+        return ['FID'] + column.ColumnTable(table_path).field_names
+
+    def add_fields(self, table_path, field_list):
+        """"""
+        if not column.is_column_table(table_path):
+            return NumpyBackend.add_fields(self, table_path, field_list)
+        with report.stage('add_fields'):
+            return column.ColumnTable(table_path).add_fields(field_list)
+
+    def read_table(self, table_path, field_names):
+        """"""
+        if not column.is_column_table(table_path):
+            return NumpyBackend.read_table(self, table_path, field_names)
+        with report.stage('cursor_read') as stage:
+            table = column.ColumnTable(table_path)
+            values = table.read_columns(field_names)
+            stage.add_rows(table.count)
+        return values
+
+    def write_table(self, table_path, values):
+        """"""
+        if not column.is_column_table(table_path):
+            return NumpyBackend.write_table(self, table_path, values)
+        with report.stage('cursor_write') as stage:
+            table = column.ColumnTable(table_path)
+            table.write_columns(values)
+            stage.add_rows(table.count)
+
+    def read_polygons(self, polygon_path, sr=None):
+        """"""
+        if not column.is_column_table(polygon_path):
+            return NumpyBackend.read_polygons(self, polygon_path, sr)
+        table = column.ColumnTable(polygon_path)
+        if sr is not None and table.sr_wkt and sr != table.sr_wkt:
+            raise ValueError(
+                'column table polygons can not be projected')
+        x, y = grid_centers(Grid(
+            table.x_min, table.y_max, table.cs, table.rows, table.cols))
+        x, y = np.meshgrid(x, y)
+        half_cs = 0.5 * table.cs
+        # Rings are clockwise from the upper left corner
+        rings_list = [
+            [np.array([
+                [cell_x - half_cs, cell_y + half_cs],
+                [cell_x + half_cs, cell_y + half_cs],
+                [cell_x + half_cs, cell_y - half_cs],
+                [cell_x - half_cs, cell_y - half_cs],
+                [cell_x - half_cs, cell_y + half_cs]])]
+            for cell_x, cell_y in izip(x.ravel(), y.ravel())]
+        return np.arange(table.count, dtype=np.int64), rings_list
+
+
+backend_classes = OrderedDict([
+    ('arcpy', ArcpyBackend), ('numpy', NumpyBackend),
+    ('columns', ColumnBackend)])
+
+
+def get_backend(name=None):
+    """Return a backend by name
+
+    Args:
+        name (str): 'arcpy', 'numpy', or 'columns', default is the
+            GSFLOW_BACKEND environment variable (or 'arcpy' if it isn't set)
+
+    Returns:
+        Backend
+
+    Notes:
+        The backend only covers the fill, flow direction, flow accumulation,
+            zonal statistics, and table steps.  The parameter scripts still
+            call arcpy directly for everything else (in dem_parameters the
+            flow_acc filter, integer DEM, slope, aspect, reclass, and
+            Jensen-Haise steps), so ArcGIS is needed for any backend.
+    """
+    if name is None:
+        name = os.environ.get(backend_env, 'arcpy')
+    try:
+        return backend_classes[name.lower()]()
+    except KeyError:
+        raise ValueError('unsupported backend: {} (use {})'.format(
+            name, ', '.join(backend_classes.keys())))
@@ -0,0 +1,900 @@
+#--------------------------------
+# Name:         benchmark_stages.py
+# Purpose:      Benchmark the NumPy parameter stages on synthetic fishnets
+# Notes:        ArcGIS 10.2 Version
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+import argparse
+from collections import namedtuple
+import datetime as dt
+import json
+import logging
+import math
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import backend_functions as backend
+import column_functions as column
+import dbf_functions as dbf
+import fishnet_functions as fishnet
+import network_functions as network
+import polygon_functions as polygon
+import projection_functions as proj
+import remap_functions as remap
+import report_functions as report
+import terrain_functions as terrain
+import zonal_functions as zonal
+
+# The support functions need ArcGIS, those stages are skipped without it
+try:
+    import support_functions as support
+except ImportError:
+    support = None
+
+
+# Benchmark stage
+#   setup: function(hru_count, seed, temp_ws) that builds the stage inputs
+#   run: function(inputs) that is timed
+#   exponent: expected scaling exponent of the run time with the HRU count
+#   max_size: largest HRU count to run (None for no limit)
+#   support_flag: stage needs support_functions (and ArcGIS)
+BenchmarkStage = namedtuple(
+    'BenchmarkStage',
+    ['name', 'setup', 'run', 'exponent', 'max_size', 'support_flag'])
+
+# Synthetic fishnet origin and cellsize (UTM zone 11N, meters)
+hru_x_min = 400000.0
+hru_y_max = 4500000.0
+hru_cs = 100.0
+
+# DEM and LANDFIRE cells per HRU cell side
+raster_factor = 2
+
+# Rows of raster cells per zonal statistics block
+block_rows = 1024
+
+utm11_params = {
+    'projection': 'Transverse_Mercator', 'a': 6378137.0,
+    'f': 1 / 298.257222101, 'datum': 'D_North_American_1983',
+    'meters_per_unit': 1.0, 'false_easting': 500000.0,
+    'false_northing': 0.0, 'central_meridian': -117.0,
+    'scale_factor': 0.9996, 'latitude_of_origin': 0.0,
+    'standard_parallel_1': 0.0, 'standard_parallel_2': 0.0}
+geographic_params = {
+    'projection': 'GEOGRAPHIC', 'a': 6378137.0, 'f': 1 / 298.257222101,
+    'datum': 'D_North_American_1983'}
+
+
+def synthetic_grid(hru_count):
+    """Square(ish) synthetic fishnet with at least hru_count cells
+
+    Returns:
+        dict with the keys x_min, y_max, cs, rows, and cols
+    """
+    cols = int(math.ceil(math.sqrt(hru_count)))
+    rows = int(math.ceil(float(hru_count) / cols))
+    return {
+        'x_min': hru_x_min, 'y_max': hru_y_max, 'cs': hru_cs,
+        'rows': rows, 'cols': cols}
+
+
+def synthetic_dem(rows, cols, seed=0):
+    """Synthetic DEM that slopes down to the south with ridges and noise
+
+    Returns:
+        np.array of float32 elevations (meters)
+    """
+    rng = np.random.RandomState(seed)
+    row_f = np.linspace(0, 1, rows).astype(np.float32)[:, np.newaxis]
+    col_f = np.linspace(0, 1, cols).astype(np.float32)[np.newaxis, :]
+    dem_array = np.empty((rows, cols), dtype=np.float32)
+    # Fill in blocks so the float64 noise is never built for the full array
+    for row_i in xrange(0, rows, block_rows):
+        row_j = min(row_i + block_rows, rows)
+        dem_array[row_i:row_j] = (
+            3000 - 1500 * row_f[row_i:row_j] +
+            200 * np.sin(6 * np.pi * col_f) *
+            np.cos(4 * np.pi * row_f[row_i:row_j]) +
+            rng.normal(0, 5, (row_j - row_i, cols)))
+    return dem_array
+
+
+def synthetic_landfire(dem_array, code_count=150, nodata_pct=1, seed=0):
+    """Synthetic LANDFIRE-like categorical raster
+
+    Vegetation codes follow elevation bands (so neighboring cells are
+        usually the same type) with random noise and nodata cells.
+
+    Returns:
+        tuple of the int16 code array (nodata is -9999) and the code list
+    """
+    rng = np.random.RandomState(seed)
+    codes = np.sort(rng.choice(
+        np.arange(3001, 3999), code_count, replace=False)).astype(np.int16)
+    landfire_array = np.empty(dem_array.shape, dtype=np.int16)
+    for row_i in xrange(0, dem_array.shape[0], block_rows):
+        dem_block = dem_array[row_i:row_i + block_rows]
+        code_i = (
+            (dem_block // 25).astype(np.int64) +
+            rng.randint(0, 3, dem_block.shape)) % code_count
+        code_block = codes[code_i]
+        code_block[rng.random_sample(dem_block.shape) < 0.01 * nodata_pct] = -9999
+        landfire_array[row_i:row_i + block_rows] = code_block
+    return landfire_array, codes
+
+
+def synthetic_polygons(grid, count, min_radius, max_radius, seed=0,
+                       vertices=32):
+    """Random non-overlapping-ish star shaped polygons in the fishnet
+
+    Args:
+        grid (dict): synthetic_grid()
+        count (int): number of polygons
+        min_radius (float): minimum radius in HRU cells
+        max_radius (float): maximum radius in HRU cells
+        seed (int): random seed
+        vertices (int): vertices per polygon
+
+    Returns:
+        list of rings (a list with one closed ring array) for each polygon
+    """
+    rng = np.random.RandomState(seed)
+    width = grid['cols'] * grid['cs']
+    height = grid['rows'] * grid['cs']
+    polygon_list = []
+    for polygon_i in xrange(count):
+        radius = rng.uniform(min_radius, max_radius) * grid['cs']
+        cx = grid['x_min'] + rng.uniform(0, width)
+        cy = grid['y_max'] - rng.uniform(0, height)
+        # Jittered angles keep the polygon from self intersecting
+        angles = (
+            np.linspace(0, 2 * np.pi, vertices, endpoint=False) +
+            rng.uniform(0, 0.5, vertices) * 2 * np.pi / vertices)
+        # Clockwise outer ring (the same as shapefiles)
+        angles = angles[::-1]
+        r = radius * rng.uniform(0.7, 1.0, vertices)
+        ring = np.column_stack([cx + r * np.cos(angles), cy + r * np.sin(angles)])
+        polygon_list.append([np.vstack([ring, ring[:1]])])
+    return polygon_list
+
+
+def synthetic_streams(grid, seed=0, spacing=10, step=0.7):
+    """Random meandering streams that flow south across the fishnet
+
+    There is one stream for every "spacing" columns, so the total stream
+        length scales with the HRU count.  Each stream is split into two
+        parts (the same as multipart NHD flowlines).
+
+    Args:
+        grid (dict): synthetic_grid()
+        seed (int): random seed
+        spacing (int): number of HRU columns per stream
+        step (float): vertex spacing in HRU cells
+
+    Returns:
+        list of parts (arrays of vertices) for each stream
+    """
+    rng = np.random.RandomState(seed)
+    height = grid['rows'] * grid['cs']
+    vertices = int(math.ceil(grid['rows'] / step)) + 1
+    stream_list = []
+    for stream_i in xrange(max(grid['cols'] // spacing, 1)):
+        angles = np.cumsum(rng.normal(0, 0.3, vertices - 1))
+        # Keep the stream heading south
+        angles = -0.5 * np.pi + 1.2 * np.tanh(angles)
+        xy = np.empty((vertices, 2))
+        xy[0] = [grid['x_min'] + rng.uniform(0, grid['cols'] * grid['cs']),
+                 grid['y_max']]
+        xy[1:] = xy[0] + np.cumsum(step * grid['cs'] * np.column_stack(
+            [np.cos(angles), np.sin(angles)]), axis=0)
+        xy = xy[xy[:, 1] >= grid['y_max'] - height]
+        split_i = rng.randint(1, max(len(xy) - 1, 2))
+        stream_list.append([xy[:split_i + 1], xy[split_i:]])
+    return stream_list
+
+
+def synthetic_network(grid, seed=0, threshold=20, lake_pct=5, gauge_pct=5):
+    """Stream and lake cells of the synthetic DEM flow network
+
+    Stream cells have a flow accumulation of at least "threshold" cells and
+        the segments are broken at the confluences.  Some of the segments are
+        changed to lakes.  Subbasins drain to gauges at the top of some of
+        the segments and at the stream outlets.
+
+    Args:
+        grid (dict): synthetic_grid()
+        seed (int): random seed
+        threshold (int): stream cell flow accumulation
+        lake_pct (float): percent of the segments that are lakes
+        gauge_pct (float): percent of the segments with a gauge
+
+    Returns:
+        dict of the HRU arrays (in HRU ID order) with the keys col, row,
+            flow_dir, seg, subbasin, and cell_mask
+    """
+    rows, cols = grid['rows'], grid['cols']
+    flow_dir_array = terrain.flow_direction(terrain.fill_depressions(
+        synthetic_dem(rows, cols, seed)))
+    stream_mask = (
+        terrain.flow_accumulation(flow_dir_array) >= threshold).ravel()
+    flow_code = flow_dir_array.ravel().astype(np.int64)
+    cell_i = np.arange(rows * cols, dtype=np.int64)
+    row_array = cell_i // cols + 1
+    col_array = cell_i % cols + 1
+
+    # Downstream stream cell (-1 if the cell doesn't flow into a stream)
+    down_i = np.full(rows * cols, -1, dtype=np.int64)
+    for code, (dr, dc) in zip(terrain.d8_codes, terrain.d8_offsets):
+        code_i = np.flatnonzero((flow_code == code) & stream_mask)
+        down_row = row_array[code_i] - 1 + dr
+        down_col = col_array[code_i] - 1 + dc
+        valid_mask = (
+            (down_row >= 0) & (down_row < rows) &
+            (down_col >= 0) & (down_col < cols))
+        down_i[code_i[valid_mask]] = (
+            down_row[valid_mask] * cols + down_col[valid_mask])
+    down_i[down_i >= 0] = np.where(
+        stream_mask[down_i[down_i >= 0]], down_i[down_i >= 0], -1)
+
+    # Segments start at the stream heads and below the confluences,
+    #   the other cells continue the segment of their one upstream cell
+    up_count = np.bincount(down_i[down_i >= 0], minlength=rows * cols)
+    start_mask = stream_mask & (up_count != 1)
+    label_i = cell_i.copy()
+    continue_i = np.flatnonzero(down_i >= 0)
+    continue_i = continue_i[~start_mask[down_i[continue_i]]]
+    label_i[down_i[continue_i]] = continue_i
+    while True:
+        next_i = label_i[label_i]
+        if np.array_equal(next_i, label_i):
+            break
+        label_i = next_i
+    seg_array = np.zeros(rows * cols, dtype=np.int64)
+    seg_array[stream_mask] = np.unique(
+        label_i[stream_mask], return_inverse=True)[1] + 1
+    rng = np.random.RandomState(seed)
+    lake_ids = np.flatnonzero(rng.rand(seg_array.max()) < 0.01 * lake_pct) + 1
+    seg_array[np.in1d(seg_array, lake_ids)] *= -1
+
+    # Each stream cell is in the subbasin of the first gauge downstream
+    gauge_mask = stream_mask & ((down_i < 0) | (
+        start_mask & (rng.rand(rows * cols) < 0.01 * gauge_pct)))
+    label_i = np.where(gauge_mask | (down_i < 0), cell_i, down_i)
+    while True:
+        next_i = label_i[label_i]
+        if np.array_equal(next_i, label_i):
+            break
+        label_i = next_i
+    subbasin_array = np.zeros(rows * cols, dtype=np.int64)
+    subbasin_array[stream_mask] = np.unique(
+        label_i[stream_mask], return_inverse=True)[1] + 1
+    return {
+        'col': col_array, 'row': row_array, 'flow_dir': flow_code,
+        'seg': seg_array, 'subbasin': subbasin_array,
+        'cell_mask': stream_mask}
+
+
+def _setup_grid(hru_count, seed, temp_ws):
+    """"""
+    return synthetic_grid(hru_count)
+
+
+def _run_fishnet_attributes(inputs):
+    """"""
+    fishnet.fishnet_attributes(
+        inputs['x_min'], inputs['y_max'], inputs['cs'],
+        inputs['rows'], inputs['cols'])
+
+
+fishnet_field_list = [
+    ('ORIG_FID', 'LONG'), ('ROW', 'LONG'), ('COL', 'LONG'),
+    ('HRU_ID', 'LONG'), ('HRU_X', 'DOUBLE'), ('HRU_Y', 'DOUBLE')]
+
+
+def _fishnet_values(attr):
+    """"""
+    return {
+        'ORIG_FID': attr['FID'], 'ROW': attr['ROW'], 'COL': attr['COL'],
+        'HRU_ID': attr['ID'], 'HRU_X': attr['X'], 'HRU_Y': attr['Y']}
+
+
+def _write_fishnet(inputs):
+    """"""
+    fishnet.write_fishnet_shapefiles(
+        inputs['polygon_path'], inputs['point_path'],
+        inputs['x_min'], inputs['y_max'], inputs['cs'],
+        inputs['rows'], inputs['cols'],
+        fishnet_field_list, fishnet_field_list[:1], '',
+        value_func=_fishnet_values)
+
+
+def _setup_fishnet(hru_count, seed, temp_ws):
+    """"""
+    inputs = synthetic_grid(hru_count)
+    inputs['polygon_path'] = os.path.join(temp_ws, 'fishnet.shp')
+    inputs['point_path'] = os.path.join(temp_ws, 'fishnet_label.shp')
+    return inputs
+
+
+def _setup_dbf_fields(hru_count, seed, temp_ws):
+    """"""
+    inputs = _setup_fishnet(hru_count, seed, temp_ws)
+    _write_fishnet(inputs)
+    inputs['dbf_path'] = inputs['polygon_path'].replace('.shp', '.dbf')
+    inputs['field_list'] = [
+        ('FIELD_{:02d}'.format(i), 'DOUBLE') for i in xrange(20)]
+    return inputs
+
+
+def _run_dbf_fields(inputs):
+    """"""
+    dbf.add_dbf_fields(inputs['dbf_path'], inputs['field_list'])
+
+
+def _setup_dbf_columns(hru_count, seed, temp_ws):
+    """Write a fishnet table with 20 more fields"""
+    inputs = _setup_dbf_fields(hru_count, seed, temp_ws)
+    _run_dbf_fields(inputs)
+    return inputs
+
+
+def _run_dbf_columns(inputs):
+    """Read 3 fields and write 1 field of the memory mapped table"""
+    with dbf.DBFTable(inputs['dbf_path'], 'r+') as dbf_table:
+        values = [
+            dbf_table.read(field_name)
+            for field_name, field_type in inputs['field_list'][:3]]
+        dbf_table.write(
+            inputs['field_list'][3][0], values[0] + values[1] + values[2])
+
+
+def _setup_lat_lon(hru_count, seed, temp_ws):
+    """"""
+    grid = synthetic_grid(hru_count)
+    attr = fishnet.fishnet_attributes(
+        grid['x_min'], grid['y_max'], grid['cs'], grid['rows'], grid['cols'])
+    return {'x': attr['X'], 'y': attr['Y']}
+
+
+def _run_lat_lon(inputs):
+    """"""
+    proj.transform_points(
+        inputs['x'], inputs['y'], utm11_params, geographic_params)
+
+
+def _setup_dem(hru_count, seed, temp_ws):
+    """"""
+    inputs = synthetic_grid(hru_count)
+    inputs['dem_array'] = synthetic_dem(
+        inputs['rows'] * raster_factor, inputs['cols'] * raster_factor, seed)
+    return inputs
+
+
+def _zonal_blocks(inputs, value_array):
+    """Yield the zone and value arrays of each block of raster rows"""
+    raster_rows, raster_cols = value_array.shape
+    for row_i in xrange(0, raster_rows, block_rows):
+        block_array = value_array[row_i:row_i + block_rows]
+        yield zonal.cell_zone_array(
+            row_i, block_array.shape[0], raster_cols,
+            inputs['cs'] / raster_factor, inputs['cs'],
+            inputs['rows'], inputs['cols']), block_array
+
+
+def _run_dem_zonal(inputs):
+    """"""
+    zs_obj = zonal.ZonalStats(inputs['rows'] * inputs['cols'], 'MEAN')
+    for zone_array, value_array in _zonal_blocks(inputs, inputs['dem_array']):
+        zs_obj.update(zone_array, value_array)
+    zs_obj.result()
+
+
+def _setup_veg(hru_count, seed, temp_ws):
+    """"""
+    inputs = _setup_dem(hru_count, seed, temp_ws)
+    inputs['landfire_array'], codes = synthetic_landfire(
+        inputs.pop('dem_array'), seed=seed)
+    rng = np.random.RandomState(seed)
+    remap_lines = [
+        '{} : {}'.format(code, value)
+        for code, value in zip(codes, rng.randint(0, 5, len(codes)))]
+    inputs['remap_table'] = remap.RemapTable(
+        remap.parse_remap_lines(remap_lines)[0])
+    return inputs
+
+
+def _run_veg_majority(inputs):
+    """"""
+    zs_obj = zonal.ZonalStats(inputs['rows'] * inputs['cols'], 'MAJORITY')
+    for zone_array, value_array in _zonal_blocks(
+            inputs, inputs['landfire_array']):
+        zs_obj.update(zone_array, inputs['remap_table'].apply(
+            value_array, nodata_value=-9999, missing_values='NODATA'))
+    zs_obj.result()
+
+
+def _setup_centroid_zones(hru_count, seed, temp_ws):
+    """"""
+    grid = synthetic_grid(hru_count)
+    attr = fishnet.fishnet_attributes(
+        grid['x_min'], grid['y_max'], grid['cs'], grid['rows'], grid['cols'])
+    # PRISM-like zones of roughly 1000 HRUs each
+    polygon_list = synthetic_polygons(
+        grid, max(1, hru_count // 1000), 10, 25, seed)
+    return {
+        'x': attr['X'], 'y': attr['Y'],
+        'zone_list': [(rings, i + 1) for i, rings in enumerate(polygon_list)]}
+
+
+def _run_centroid_zones(inputs):
+    """"""
+    polygon.zone_by_point(inputs['x'], inputs['y'], inputs['zone_list'])
+
+
+def _setup_lake_overlap(hru_count, seed, temp_ws):
+    """"""
+    inputs = synthetic_grid(hru_count)
+    # Small lakes, one for every 2000 HRUs
+    inputs['zone_rings_list'] = synthetic_polygons(
+        inputs, max(1, hru_count // 2000), 1, 5, seed)
+    return inputs
+
+
+def _run_lake_overlap(inputs):
+    """"""
+    polygon.zone_cell_overlap(
+        inputs['zone_rings_list'], inputs['x_min'], inputs['y_max'],
+        inputs['cs'], inputs['rows'], inputs['cols'])
+
+
+def _setup_stream_length(hru_count, seed, temp_ws):
+    """"""
+    inputs = synthetic_grid(hru_count)
+    inputs['streams'] = synthetic_streams(inputs, seed)
+    return inputs
+
+
+def _run_stream_length(inputs):
+    """"""
+    polygon.line_cell_length(
+        inputs['streams'], inputs['x_min'], inputs['y_max'], inputs['cs'],
+        inputs['rows'], inputs['cols'])
+
+
+def _setup_stream_network(hru_count, seed, temp_ws):
+    """"""
+    return synthetic_network(synthetic_grid(hru_count), seed)
+
+
+def _run_stream_network(inputs):
+    """Build the network and the segment and subbasin parameters"""
+    stream_network = network.StreamNetwork.from_cells(
+        inputs['col'], inputs['row'], inputs['flow_dir'], inputs['seg'],
+        inputs['subbasin'], inputs['cell_mask'])
+    seg_graph = stream_network.seg_graph
+    stream_network.hru_values(stream_network.outseg())
+    stream_network.hru_values(stream_network.reach)
+    seg_graph.lookup(stream_network.lake_upsegs(), inputs['seg'])
+    seg_graph.lookup(seg_graph.pour_ids(), inputs['seg'])
+    stream_network.subbasin_graph.lookup(
+        stream_network.subbasin_graph.down_ids,
+        np.unique(inputs['subbasin']))
+
+
+def _setup_duplicate_check(hru_count, seed, temp_ws):
+    """"""
+    fid_array = np.arange(hru_count, dtype=np.int64)
+    np.random.RandomState(seed).shuffle(fid_array)
+    return {'fid_list': fid_array.tolist()}
+
+
+def _run_duplicate_check(inputs):
+    """"""
+    fid_list = inputs['fid_list']
+    duplicate_check = support.DuplicateCheck(len(fid_list))
+    for i in xrange(0, len(fid_list), 500000):
+        duplicate_check.update(fid_list[i:i + 500000])
+
+
+def _setup_fill(hru_count, seed, temp_ws):
+    """"""
+    grid = synthetic_grid(hru_count)
+    return {'dem_array': synthetic_dem(grid['rows'], grid['cols'], seed)}
+
+
+def _run_flood_fill(inputs):
+    """"""
+    support.flood_fill(inputs['dem_array'])
+
+
+def _run_terrain_fill(inputs):
+    """"""
+    terrain.fill_depressions(inputs['dem_array'])
+
+
+def _setup_flow_dir(hru_count, seed, temp_ws):
+    """"""
+    inputs = _setup_fill(hru_count, seed, temp_ws)
+    inputs['dem_array'] = terrain.fill_depressions(inputs['dem_array'])
+    return inputs
+
+
+def _run_flow_dir(inputs):
+    """"""
+    terrain.flow_direction(inputs['dem_array'])
+
+
+def _setup_flow_acc(hru_count, seed, temp_ws):
+    """"""
+    inputs = _setup_flow_dir(hru_count, seed, temp_ws)
+    return {'flow_dir_array': terrain.flow_direction(inputs['dem_array'])}
+
+
+def _run_flow_acc(inputs):
+    """"""
+    terrain.flow_accumulation(inputs['flow_dir_array'])
+
+
+def _setup_numpy_backend(hru_count, seed, temp_ws):
+    """Write a fishnet shapefile and a DEM floating point grid"""
+    inputs = _setup_fishnet(hru_count, seed, temp_ws)
+    _write_fishnet(inputs)
+    inputs['grid'] = backend.Grid(
+        inputs['x_min'], inputs['y_max'], inputs['cs'],
+        inputs['rows'], inputs['cols'])
+    inputs['dem_path'] = os.path.join(temp_ws, 'dem.flt')
+    inputs['temp_ws'] = temp_ws
+    dem_array = synthetic_dem(
+        inputs['rows'] * raster_factor, inputs['cols'] * raster_factor, seed)
+    backend.NumpyBackend().write_raster(
+        dem_array, inputs['dem_path'], backend.Grid(
+            inputs['x_min'], inputs['y_max'], inputs['cs'] / raster_factor,
+            dem_array.shape[0], dem_array.shape[1]))
+    return inputs
+
+
+def _run_numpy_backend(inputs):
+    """DEM parameter stages end to end without ArcGIS"""
+    numpy_backend = backend.NumpyBackend()
+    temp_ws = inputs['temp_ws']
+    fill_path = os.path.join(temp_ws, 'dem_fill.flt')
+    flow_dir_path = os.path.join(temp_ws, 'flow_dir.flt')
+    flow_acc_path = os.path.join(temp_ws, 'flow_acc.flt')
+    numpy_backend.fill(inputs['dem_path'], fill_path)
+    numpy_backend.flow_direction(fill_path, flow_dir_path)
+    numpy_backend.flow_accumulation(flow_dir_path, flow_acc_path)
+    values = {
+        'DEM_MEAN': numpy_backend.zonal_stats(
+            fill_path, inputs['grid'], 'MEAN'),
+        'DEM_FLOWAC': numpy_backend.zonal_stats(
+            flow_acc_path, inputs['grid'], 'MAXIMUM')}
+    numpy_backend.add_fields(
+        inputs['polygon_path'], [(f, 'DOUBLE') for f in values.keys()])
+    numpy_backend.write_table(inputs['polygon_path'], values)
+
+
+def _setup_column_table(hru_count, seed, temp_ws):
+    """Write a column table with 20 fields"""
+    inputs = synthetic_grid(hru_count)
+    table = column.ColumnTable.create(
+        os.path.join(temp_ws, 'hru_params'), inputs['x_min'],
+        inputs['y_max'], inputs['cs'], inputs['rows'], inputs['cols'])
+    table.add_fields([
+        ('FIELD_{:02d}'.format(i), 'DOUBLE') for i in xrange(20)])
+    inputs['table_ws'] = table.table_ws
+    inputs['values'] = np.random.RandomState(seed).rand(table.count)
+    return inputs
+
+
+def _run_column_table(inputs):
+    """Add, write, and read back a field of a column table"""
+    column_backend = backend.ColumnBackend()
+    column_backend.add_fields(inputs['table_ws'], [('DEM_MEAN', 'DOUBLE')])
+    column_backend.write_table(
+        inputs['table_ws'], {'DEM_MEAN': inputs['values']})
+    column_backend.read_table(inputs['table_ws'], ['DEM_MEAN'])[
+        'DEM_MEAN'].sum()
+    column.ColumnTable(inputs['table_ws']).delete_fields(['DEM_MEAN'])
+
+
+stage_list = [
+    BenchmarkStage(
+        'fishnet_attributes', _setup_grid, _run_fishnet_attributes,
+        1.0, None, False),
+    BenchmarkStage(
+        'fishnet_write', _setup_fishnet, _write_fishnet, 1.0, None, False),
+    BenchmarkStage(
+        'dbf_add_fields', _setup_dbf_fields, _run_dbf_fields,
+        1.0, None, False),
+    BenchmarkStage(
+        'dbf_columns', _setup_dbf_columns, _run_dbf_columns,
+        1.0, None, False),
+    BenchmarkStage(
+        'lat_lon', _setup_lat_lon, _run_lat_lon, 1.0, None, False),
+    BenchmarkStage(
+        'dem_zonal_mean', _setup_dem, _run_dem_zonal, 1.0, None, False),
+    BenchmarkStage(
+        'veg_remap_majority', _setup_veg, _run_veg_majority,
+        1.0, None, False),
+    BenchmarkStage(
+        'centroid_zones', _setup_centroid_zones, _run_centroid_zones,
+        1.0, None, False),
+    BenchmarkStage(
+        'lake_overlap', _setup_lake_overlap, _run_lake_overlap,
+        1.0, None, False),
+    BenchmarkStage(
+        'stream_length', _setup_stream_length, _run_stream_length,
+        1.0, None, False),
+    BenchmarkStage(
+        'stream_network', _setup_stream_network, _run_stream_network,
+        1.0, None, False),
+    BenchmarkStage(
+        'duplicate_check', _setup_duplicate_check, _run_duplicate_check,
+        1.0, None, True),
+    # The flood fill (and the binary erosion) loop over cells in Python
+    BenchmarkStage(
+        'flood_fill', _setup_fill, _run_flood_fill, 1.1, 10 ** 6, True),
+    # Depression cells are updated more than once
+    BenchmarkStage(
+        'terrain_fill', _setup_fill, _run_terrain_fill, 1.1, None, False),
+    BenchmarkStage(
+        'terrain_flow_dir', _setup_flow_dir, _run_flow_dir, 1.0, None, False),
+    BenchmarkStage(
+        'terrain_flow_acc', _setup_flow_acc, _run_flow_acc, 1.0, None, False),
+    BenchmarkStage(
+        'numpy_backend_dem', _setup_numpy_backend, _run_numpy_backend,
+        1.1, None, False),
+    BenchmarkStage(
+        'column_table', _setup_column_table, _run_column_table,
+        1.0, None, False),
+]
+stage_dict = dict((stage.name, stage) for stage in stage_list)
+
+
+def run_stage(stage_name, hru_count, seed=0, repeat=3):
+    """Set up and time one stage
+
+    The fastest of the repeated runs is reported since the slower runs
+        only measure other load on the machine.
+
+    Args:
+        stage_name (str): stage name (see stage_list)
+        hru_count (int): approximate number of HRUs
+        seed (int): random seed for the synthetic inputs
+        repeat (int): number of timed runs
+
+    Returns:
+        dict of the run time (seconds), CPU time (seconds),
+            peak memory (bytes), and the memory used by the run (bytes)
+    """
+    stage = stage_dict[stage_name]
+    temp_ws = tempfile.mkdtemp(prefix='gsflow_benchmark_')
+    try:
+        inputs = stage.setup(hru_count, seed, temp_ws)
+        setup_memory = report.peak_memory()
+        time_list, cpu_list = [], []
+        for repeat_i in xrange(repeat):
+            wall_start, cpu_start = time.time(), report.cpu_time()
+            stage.run(inputs)
+            time_list.append(time.time() - wall_start)
+            cpu_list.append(report.cpu_time() - cpu_start)
+        run_memory = report.peak_memory()
+    finally:
+        shutil.rmtree(temp_ws, ignore_errors=True)
+    result = {
+        'stage': stage_name, 'hru_count': hru_count,
+        'time': min(time_list), 'cpu_time': min(cpu_list),
+        'peak_memory': run_memory, 'stage_memory': None}
+    if run_memory is not None and setup_memory is not None:
+        result['stage_memory'] = run_memory - setup_memory
+    return result
+
+
+def _run_stage_process(stage_name, hru_count, seed, repeat, result_queue):
+    """"""
+    try:
+        result_queue.put(run_stage(stage_name, hru_count, seed, repeat))
+    except Exception as e:
+        result_queue.put({
+            'stage': stage_name, 'hru_count': hru_count,
+            'error': '{}: {}'.format(type(e).__name__, e)})
+
+
+def run_stage_isolated(stage_name, hru_count, seed=0, repeat=3):
+    """Run a stage in a new process so the peak memory is only its own"""
+    result_queue = mp.Queue()
+    stage_process = mp.Process(
+        target=_run_stage_process,
+        args=(stage_name, hru_count, seed, repeat, result_queue))
+    stage_process.start()
+    # Get the result before joining so a large result can't block the queue
+    try:
+        result = result_queue.get()
+    finally:
+        stage_process.join()
+    return result
+
+
+def scaling_exponent(hru_counts, values, min_value=0):
+    """Fit the exponent k of value = c * hru_count ** k
+
+    Args:
+        hru_counts (list): HRU counts
+        values (list): measured times or memory (None values are skipped)
+        min_value: values below this are too small to measure reliably
+
+    Returns:
+        float (or None if there are less than two usable measurements)
+    """
+    pairs = [
+        (n, v) for n, v in zip(hru_counts, values)
+        if v is not None and v > min_value]
+    if len(set(n for n, v in pairs)) < 2:
+        return None
+    n_array, v_array = np.array(pairs, dtype=np.float64).T
+    return float(np.polyfit(np.log(n_array), np.log(v_array), 1)[0])
+
+
+def benchmark_stages(stage_names, sizes, output_path, baseline_path=None,
+                     tolerance=0.25, repeat=3, seed=0, min_time=0.01):
+    """Benchmark the stages and check their scaling exponents
+
+    Args:
+        stage_names (list): stages to run (all stages if empty)
+        sizes (list): HRU counts
+        output_path (str): JSON results file path
+        baseline_path (str): JSON results of a previous run to compare to
+        tolerance (float): allowed increase of the scaling exponent over
+            the expected (or baseline) exponent
+        repeat (int): number of timed runs of each stage and size
+        seed (int): random seed for the synthetic inputs
+        min_time (float): times shorter than this (seconds) are not used
+            to fit the exponents
+
+    Returns:
+        bool: True if no stage regressed
+    """
+    if not stage_names:
+        stage_names = [stage.name for stage in stage_list]
+    baseline = {}
+    if baseline_path:
+        with open(baseline_path, 'r') as baseline_f:
+            baseline = json.load(baseline_f)['exponents']
+
+    result_list = []
+    exponent_dict = {}
+    check_flag = True
+    log_f = '  {:<20s} {:>10s} {:>10s} {:>10s} {:>12s}'
+    logging.info(log_f.format('Stage', 'HRUs', 'Time (s)', 'CPU (s)', 'Memory (MB)'))
+    for stage_name in stage_names:
+        stage = stage_dict[stage_name]
+        if stage.support_flag and support is None:
+            logging.info('  {:<20s} skipped (ArcGIS is not available)'.format(
+                stage_name))
+            continue
+        stage_results = []
+        for hru_count in sizes:
+            if stage.max_size is not None and hru_count > stage.max_size:
+                continue
+            result = run_stage_isolated(stage_name, hru_count, seed, repeat)
+            result_list.append(result)
+            if 'error' in result:
+                logging.error('  {:<20s} {:>10d} ERROR: {}'.format(
+                    stage_name, hru_count, result['error']))
+                check_flag = False
+                continue
+            stage_results.append(result)
+            logging.info(log_f.format(
+                stage_name, str(hru_count), '{:.3f}'.format(result['time']),
+                '{:.3f}'.format(result['cpu_time']),
+                '{:.1f}'.format(result['stage_memory'] / 2.0 ** 20)
+                if result['stage_memory'] is not None else '-'))
+
+        hru_counts = [r['hru_count'] for r in stage_results]
+        time_exponent = scaling_exponent(
+            hru_counts, [r['time'] for r in stage_results], min_time)
+        # Memory growth below 1 MB is mostly allocator noise
+        memory_exponent = scaling_exponent(
+            hru_counts, [r['stage_memory'] for r in stage_results], 2 ** 20)
+        exponent_limit = stage.exponent + tolerance
+        if stage_name in baseline and baseline[stage_name]['time'] is not None:
+            exponent_limit = min(
+                exponent_limit, baseline[stage_name]['time'] + tolerance)
+        regress_flag = (
+            (time_exponent is not None and time_exponent > exponent_limit) or
+            (memory_exponent is not None and
+             memory_exponent > stage.exponent + tolerance))
+        exponent_dict[stage_name] = {
+            'time': time_exponent, 'memory': memory_exponent,
+            'expected': stage.exponent, 'limit': exponent_limit,
+            'regression': regress_flag}
+        if regress_flag:
+            check_flag = False
+
+    logging.info('\n  Scaling exponents (time ~ HRUs ** k)')
+    log_f = '  {:<20s} {:>8s} {:>8s} {:>8s}  {}'
+    logging.info(log_f.format('Stage', 'Time', 'Memory', 'Limit', ''))
+    for stage_name in stage_names:
+        try:
+            exponents = exponent_dict[stage_name]
+        except KeyError:
+            continue
+        logging.info(log_f.format(
+            stage_name,
+            *['{:.2f}'.format(exponents[k]) if exponents[k] is not None
+              else '-' for k in ['time', 'memory', 'limit']] +
+            ['REGRESSION' if exponents['regression'] else '']))
+
+    with open(output_path, 'w') as output_f:
+        json.dump(
+            {'date': dt.datetime.now().isoformat(' '), 'sizes': sizes,
+             'repeat': repeat, 'seed': seed, 'results': result_list,
+             'exponents': exponent_dict},
+            output_f, indent=2, sort_keys=True)
+    return check_flag
+
+
+def arg_parse():
+    """"""
+    parser = argparse.ArgumentParser(
+        description='Benchmark the NumPy parameter stages',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument(
+        '-s', '--stages', nargs='+', default=[], metavar='STAGE',
+        choices=[stage.name for stage in stage_list],
+        help='Stages to run (default is all stages)')
+    parser.add_argument(
+        '-n', '--sizes', nargs='+', type=int, metavar='N',
+        default=[10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7],
+        help='Synthetic fishnet sizes (number of HRUs)')
+    parser.add_argument(
+        '-o', '--output', default='benchmark_results.json',
+        help='JSON results file', metavar='PATH')
+    parser.add_argument(
+        '-b', '--baseline', default=None,
+        help='JSON results of a previous run to compare to', metavar='PATH')
+    parser.add_argument(
+        '-t', '--tolerance', default=0.25, type=float,
+        help='Allowed increase of the scaling exponents')
+    parser.add_argument(
+        '-r', '--repeat', default=3, type=int,
+        help='Number of timed runs of each stage and size')
+    parser.add_argument(
+        '--seed', default=0, type=int,
+        help='Random seed for the synthetic inputs')
+    parser.add_argument(
+        '-d', '--debug', default=logging.INFO, const=logging.DEBUG,
+        help='Debug level logging', action="store_const", dest="loglevel")
+    args = parser.parse_args()
+    if args.baseline and os.path.isfile(os.path.abspath(args.baseline)):
+        args.baseline = os.path.abspath(args.baseline)
+    return args
+
+
+if __name__ == '__main__':
+    args = arg_parse()
+
+    logging.basicConfig(level=args.loglevel, format='%(message)s')
+    logging.info('\n{}'.format('#' * 80))
+    log_f = '{:<20s} {}'
+    logging.info(log_f.format(
+        'Run Time Stamp:', dt.datetime.now().isoformat(' ')))
+    logging.info(log_f.format('Current Directory:', os.getcwd()))
+    logging.info(log_f.format('Script:', os.path.basename(sys.argv[0])))
+    logging.info('')
+
+    if not benchmark_stages(
+            stage_names=args.stages, sizes=sorted(args.sizes),
+            output_path=args.output, baseline_path=args.baseline,
+            tolerance=args.tolerance, repeat=args.repeat, seed=args.seed):
+        logging.error('\nERROR: Stage scaling regressed or a stage failed')
+        sys.exit(1)
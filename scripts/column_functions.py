@@ -0,0 +1,401 @@
+#--------------------------------
+# Name:         column_functions.py
+# Purpose:      Columnar HRU table storage
+# Notes:        ArcGIS 10.2 Version
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+from collections import OrderedDict
+import json
+import os
+
+import numpy as np
+
+import dbf_functions as dbf
+import fishnet_functions as fishnet
+
+
+# Column file dtypes for the ArcGIS field types
+#   (only the numeric types that can be written to the fishnet shapefile)
+column_dtypes = OrderedDict([
+    ('SHORT', '<i2'), ('LONG', '<i4'), ('FLOAT', '<f4'), ('DOUBLE', '<f8')])
+
+# Name of the schema manifest in the table folder
+manifest_name = 'manifest.json'
+
+# Manifest format version
+manifest_version = 1
+
+# Name of the column table copy of the HRU fishnet in the parameter folder
+hru_table_name = 'hru_columns'
+
+
+def is_column_table(table_path):
+    """Return True if the path is a column table folder"""
+    return os.path.isfile(os.path.join(table_path, manifest_name))
+
+
+def dbf_field_type(dbf_field):
+    """Return the ArcGIS field type of a numeric dBASE field (or None)"""
+    if dbf_field.type not in ['N', 'F']:
+        return None
+    elif dbf_field.decimals == 0 and dbf_field.type == 'N':
+        if dbf_field.width <= 4:
+            return 'SHORT'
+        elif dbf_field.width <= 9:
+            return 'LONG'
+        return 'DOUBLE'
+    elif dbf_field.width <= 13:
+        return 'FLOAT'
+    return 'DOUBLE'
+
+
+class ColumnTable(object):
+    """HRU attribute table stored as one memory-mapped file per field
+
+    The table is a folder with a JSON schema manifest (the fishnet grid,
+        spatial reference, and field definitions) and a NumPy .npy file for
+        each field.  Reading a field maps its file without parsing anything
+        and writing a field only rewrites that file.
+    Records are in HRU ID order (the top left cell first and then across
+        each row, the same as fishnet_generator), so the cell geometry is
+        derived from the grid and isn't stored.
+    A table can be a copy of the fields of an HRU fishnet shapefile
+        (the source), the manifest then also has the shapefile path and
+        its support_functions.file_key when the fields were last copied.
+    """
+
+    def __init__(self, table_ws):
+        """Open an existing column table
+
+        Args:
+            table_ws (str): column table folder
+        """
+        self.table_ws = table_ws
+        manifest_path = os.path.join(table_ws, manifest_name)
+        try:
+            with open(manifest_path, 'r') as manifest_f:
+                manifest = json.load(manifest_f)
+        except IOError:
+            raise ValueError('{} is not a column table'.format(table_ws))
+        if manifest.get('version') != manifest_version:
+            raise ValueError('unsupported column table version: {}'.format(
+                manifest.get('version')))
+        self.x_min = manifest['x_min']
+        self.y_max = manifest['y_max']
+        self.cs = manifest['cs']
+        self.rows = manifest['rows']
+        self.cols = manifest['cols']
+        # JSON strings are unicode, the dBASE field names must be str
+        self.sr_wkt = str(manifest['sr_wkt'])
+        self.meters_per_unit = manifest['meters_per_unit']
+        self.field_types = OrderedDict(
+            (str(f['name']), str(f['type'])) for f in manifest['fields'])
+        self.source_path = manifest.get('source_path')
+        self.source_key = manifest.get('source_key')
+
+    @classmethod
+    def create(cls, table_ws, x_min, y_max, cs, rows, cols, sr_wkt='',
+               meters_per_unit=1.0):
+        """Create an empty column table (without any fields)
+
+        Args:
+            table_ws (str): column table folder (can already exist)
+            x_min (float): fishnet extent XMin
+            y_max (float): fishnet extent YMax
+            cs (float): fishnet cellsize
+            rows (int): number of fishnet rows
+            cols (int): number of fishnet columns
+            sr_wkt (str): ESRI well known text of the spatial reference
+            meters_per_unit (float): fishnet linear unit conversion
+
+        Returns:
+            ColumnTable
+        """
+        if not os.path.isdir(table_ws):
+            os.makedirs(table_ws)
+        _write_manifest(table_ws, {
+            'version': manifest_version, 'x_min': float(x_min),
+            'y_max': float(y_max), 'cs': float(cs), 'rows': int(rows),
+            'cols': int(cols), 'sr_wkt': sr_wkt,
+            'meters_per_unit': float(meters_per_unit), 'fields': []})
+        return cls(table_ws)
+
+    @property
+    def count(self):
+        """Number of records (fishnet cells)"""
+        return self.rows * self.cols
+
+    @property
+    def field_names(self):
+        """"""
+        return self.field_types.keys()
+
+    def _column_path(self, field_name):
+        """"""
+        return os.path.join(self.table_ws, '{}.npy'.format(field_name))
+
+    def _field_name(self, field_name):
+        """Return the table field name (field names are case insensitive)"""
+        for name in self.field_types.keys():
+            if name.upper() == field_name.upper():
+                return name
+        raise ValueError('{} is not a field in {}'.format(
+            field_name, self.table_ws))
+
+    def _save_manifest(self):
+        """"""
+        _write_manifest(self.table_ws, {
+            'version': manifest_version, 'x_min': self.x_min,
+            'y_max': self.y_max, 'cs': self.cs, 'rows': self.rows,
+            'cols': self.cols, 'sr_wkt': self.sr_wkt,
+            'meters_per_unit': self.meters_per_unit,
+            'source_path': self.source_path, 'source_key': self.source_key,
+            'fields': [
+                {'name': name, 'type': field_type,
+                 'dtype': column_dtypes[field_type]}
+                for name, field_type in self.field_types.items()]})
+
+    def set_source(self, source_path, source_key):
+        """Set the shapefile the fields were copied from (and its file key)"""
+        self.source_path = source_path
+        # Keys are compared after a round trip through JSON (tuples -> lists)
+        self.source_key = json.loads(json.dumps(source_key))
+        self._save_manifest()
+
+    def source_current(self, source_key):
+        """Return True if the fields match the source with this file key"""
+        return (source_key is not None and
+                self.source_key == json.loads(json.dumps(source_key)))
+
+    def add_fields(self, field_list):
+        """Add the missing fields (set to 0)
+
+        Args:
+            field_list (list): (field name, ArcGIS field type)
+
+        Returns:
+            list of the (field name, field type) that were added
+        """
+        field_names = set(name.upper() for name in self.field_names)
+        add_list = []
+        for field_name, field_type in field_list:
+            if field_name.upper() in field_names:
+                continue
+            elif field_type.upper() not in column_dtypes.keys():
+                raise ValueError('unsupported field type: {}'.format(
+                    field_type))
+            # Shapefile field names are at most 10 characters
+            elif len(field_name) > 10:
+                raise ValueError('field name is too long: {}'.format(
+                    field_name))
+            column = np.lib.format.open_memmap(
+                self._column_path(field_name), mode='w+',
+                dtype=column_dtypes[field_type.upper()], shape=(self.count,))
+            del column
+            self.field_types[field_name] = field_type.upper()
+            field_names.add(field_name.upper())
+            add_list.append((field_name, field_type.upper()))
+        if add_list:
+            self._save_manifest()
+        return add_list
+
+    def delete_fields(self, field_names):
+        """Delete fields (and their column files)"""
+        for field_name in field_names:
+            field_name = self._field_name(field_name)
+            del self.field_types[field_name]
+            os.remove(self._column_path(field_name))
+        self._save_manifest()
+
+    def read_column(self, field_name, mode='r'):
+        """Map the values of a field
+
+        Args:
+            field_name (str): field name (case insensitive)
+            mode (str): 'r' for a read only array or 'r+' to modify the
+                values in place
+
+        Returns:
+            np.memmap of the values in record order
+        """
+        return np.load(
+            self._column_path(self._field_name(field_name)), mmap_mode=mode)
+
+    def read_columns(self, field_names=None):
+        """Map the values of fields
+
+        Args:
+            field_names (list): field names ('FID' or 'OID@' for the record
+                index), default is all the fields
+
+        Returns:
+            OrderedDict of the value arrays keyed by field name
+        """
+        if field_names is None:
+            field_names = self.field_names
+        values = OrderedDict()
+        for field_name in field_names:
+            if field_name.upper() in ['FID', 'OID@']:
+                values[field_name] = np.arange(self.count, dtype=np.int64)
+            else:
+                values[field_name] = self.read_column(field_name)
+        return values
+
+    def write_columns(self, values, record_i=None):
+        """Write value arrays (in record order) to existing fields
+
+        Only the files of the written fields are changed.  Values are cast
+            to the field type (integer fields are truncated).
+
+        Args:
+            values (dict): value arrays keyed by field name
+            record_i (np.array): indices of the records to write
+                (default is all the records)
+
+        Raises:
+            ValueError: if the values don't match the records or if NaN or
+                infinite values are written to a SHORT or LONG field
+                (nothing is written)
+        """
+        record_count = self.count if record_i is None else len(record_i)
+        for field_name, value_array in values.items():
+            value_array = np.asarray(value_array)
+            if value_array.shape != (record_count,):
+                raise ValueError(
+                    '{} values do not match the {} records'.format(
+                        field_name, record_count))
+            elif (self.field_types[self._field_name(field_name)] in
+                    ['SHORT', 'LONG'] and
+                    value_array.dtype.kind == 'f' and
+                    not np.all(np.isfinite(value_array))):
+                raise ValueError(
+                    '{} is an integer field and can not store NaN or '
+                    'infinite values'.format(field_name))
+        for field_name, value_array in values.items():
+            column = self.read_column(field_name, mode='r+')
+            if record_i is None:
+                column[:] = value_array
+            else:
+                column[record_i] = value_array
+            column.flush()
+            del column
+
+    def export_shapefile(self, polygon_path, point_path, field_names=None,
+                         point_field_list=None):
+        """Write the fishnet polygon and centroid shapefiles
+
+        Args:
+            polygon_path (str): fishnet polygon shapefile path
+            point_path (str): fishnet centroid shapefile path
+            field_names (list): polygon fields (default is all the fields)
+            point_field_list (list): centroid fields (default is none),
+                the fields must also be in the table
+
+        Returns:
+            None
+        """
+        if field_names is None:
+            field_names = self.field_names
+        field_list = [
+            (self._field_name(f), self.field_types[self._field_name(f)])
+            for f in field_names]
+        if point_field_list is None:
+            point_field_list = []
+        point_field_list = [
+            (self._field_name(f), self.field_types[self._field_name(f)])
+            for f in point_field_list]
+        if len(field_list) > dbf.dbf_max_fields:
+            raise ValueError(
+                'shapefiles can not have more than {} fields'.format(
+                    dbf.dbf_max_fields))
+        columns = self.read_columns(
+            [f for f, t in field_list] + [f for f, t in point_field_list])
+
+        def block_values(attr):
+            """Slice each column to the block of fishnet cells"""
+            block_slice = slice(attr['FID'][0], attr['FID'][-1] + 1)
+            return dict((f, c[block_slice]) for f, c in columns.items())
+
+        fishnet.write_fishnet_shapefiles(
+            polygon_path, point_path, self.x_min, self.y_max, self.cs,
+            self.rows, self.cols, field_list, point_field_list, self.sr_wkt,
+            block_values, self.meters_per_unit)
+
+    @classmethod
+    def from_shapefile(cls, table_ws, polygon_path, x_min, y_max, cs, rows,
+                       cols, row_field, col_field, field_names=None,
+                       sr_wkt=None, meters_per_unit=1.0):
+        """Build a column table from an HRU fishnet shapefile
+
+        The records are put in HRU ID order using the row and column fields
+            (the fishnet FIDs can start from the top or bottom row).
+
+        Args:
+            table_ws (str): column table folder
+            polygon_path (str): fishnet polygon shapefile path
+            x_min, y_max, cs, rows, cols: fishnet grid (see create())
+            row_field (str): 1's based fishnet row field
+            col_field (str): 1's based fishnet column field
+            field_names (list): fields to copy (default is all the numeric
+                fields, text fields can't be stored)
+            sr_wkt (str): spatial reference well known text
+                (default is the .prj file of the shapefile)
+            meters_per_unit (float): fishnet linear unit conversion
+
+        Returns:
+            ColumnTable
+        """
+        dbf_path = os.path.splitext(polygon_path)[0] + '.dbf'
+        with open(dbf_path, 'rb') as dbf_f:
+            dbf_fields = dbf.read_dbf_header(dbf_f)[3]
+        type_dict = dict(
+            (f.name.upper(), dbf_field_type(f)) for f in dbf_fields)
+        if field_names is None:
+            field_names = [f.name for f in dbf_fields if dbf_field_type(f)]
+        for field_name in field_names:
+            if type_dict.get(field_name.upper()) is None:
+                raise ValueError('{} is not a numeric field in {}'.format(
+                    field_name, dbf_path))
+        if sr_wkt is None:
+            prj_path = os.path.splitext(polygon_path)[0] + '.prj'
+            sr_wkt = ''
+            if os.path.isfile(prj_path):
+                with open(prj_path, 'r') as prj_f:
+                    sr_wkt = prj_f.read().strip()
+
+        values = dbf.read_dbf_columns(
+            dbf_path, list(field_names) + [row_field, col_field])
+        cell_array = (
+            (values[row_field].astype(np.int64) - 1) * cols +
+            values[col_field].astype(np.int64) - 1)
+        if (len(cell_array) != rows * cols or
+                np.any(np.bincount(cell_array, minlength=rows * cols) != 1)):
+            raise ValueError(
+                '{} does not have one record for each fishnet cell'.format(
+                    polygon_path))
+        order = np.argsort(cell_array)
+
+        table = cls.create(
+            table_ws, x_min, y_max, cs, rows, cols, sr_wkt, meters_per_unit)
+        table.add_fields([(f, type_dict[f.upper()]) for f in field_names])
+        table.write_columns(OrderedDict(
+            (f, values[f][order]) for f in field_names))
+        return table
+
+
+def _write_manifest(table_ws, manifest):
+    """Write the manifest to a temporary file and then replace the manifest
+
+    The manifest is never partially written if the write fails.
+    """
+    manifest_path = os.path.join(table_ws, manifest_name)
+    temp_path = manifest_path + '.tmp'
+    with open(temp_path, 'w') as manifest_f:
+        json.dump(manifest, manifest_f, indent=2)
+    # Windows can't rename over an existing file
+    if os.name == 'nt' and os.path.isfile(manifest_path):
+        os.remove(manifest_path)
+    os.rename(temp_path, manifest_path)
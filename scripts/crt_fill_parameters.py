@@ -21,6 +21,7 @@ import sys
 import arcpy
 from arcpy import env
 
+import report_functions as report
 import support_functions as support
 
 
@@ -37,7 +38,7 @@ def crt_fill_parameters(config_path, overwrite_flag=False, debug_flag=False):
     """
 
     # Initialize hru_parameters class
-    hru = support.HRUParameters(config_path)
+    hru = support.get_hru_parameters(config_path)
 
     # Open input parameter config file
     inputs_cfg = ConfigParser.ConfigParser()
@@ -56,6 +57,7 @@ def crt_fill_parameters(config_path, overwrite_flag=False, debug_flag=False):
     log_console.setLevel(logging.DEBUG)
     log_console.setFormatter(logging.Formatter('%(message)s'))
     logging.getLogger('').addHandler(log_console)
+    report.start_report(log_file_name.replace('_log.txt', ''), hru.log_ws)
     logging.info('\nGSFLOW CRT Fill Parameters')
 
     # Parameters
@@ -437,7 +439,8 @@ def crt_fill_parameters(config_path, overwrite_flag=False, debug_flag=False):
     # Run CRT
     logging.info('\nRunning CRT')
     os.chdir(fill_ws)
-    subprocess.check_call(crt_exe_name)
+    with report.stage('crt'):
+        subprocess.check_call(crt_exe_name)
     os.chdir(hru.param_ws)
 
     # Read in outputstat.txt and get filled DEM
@@ -543,3 +546,4 @@ if __name__ == '__main__':
     crt_fill_parameters(
         config_path=args.ini, overwrite_flag=args.overwrite,
         debug_flag=args.loglevel==logging.DEBUG)
+    report.finish_report()
@@ -0,0 +1,558 @@
+#--------------------------------
+# Name:         dbf_functions.py
+# Purpose:      Shapefile dBASE table functions
+# Notes:        ArcGIS 10.2 Version
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+from collections import namedtuple, OrderedDict
+import datetime as dt
+import os
+import struct
+
+import numpy as np
+
+
+# Shapefile dBASE field definitions for the ArcGIS field types
+#   (dBASE type, width, decimals)
+dbf_field_types = {
+    'SHORT': ('N', 4, 0),
+    'LONG': ('N', 9, 0),
+    'FLOAT': ('F', 13, 11),
+    'DOUBLE': ('F', 19, 11)}
+
+# ArcGIS doesn't support more than 255 fields in a shapefile
+dbf_max_fields = 255
+
+# dBASE field descriptor
+DBFField = namedtuple('DBFField', ['name', 'type', 'width', 'decimals'])
+
+
+def read_dbf_header(dbf_f):
+    """Read the dBASE file header and field descriptors
+
+    Args:
+        dbf_f (file): dBASE file opened in binary mode (at the start)
+
+    Returns:
+        tuple of the record count, header length, record length,
+            and the list of DBFField
+    """
+    record_count, header_length, record_length = struct.unpack(
+        '<4xIHH20x', dbf_f.read(32))
+    dbf_fields = []
+    for field_i in xrange((header_length - 33) // 32):
+        name, dbf_type, width, decimals = struct.unpack(
+            '<11sc4xBB14x', dbf_f.read(32))
+        dbf_fields.append(DBFField(
+            name.split(b'\x00')[0], dbf_type, width, decimals))
+    return record_count, header_length, record_length, dbf_fields
+
+
+def dbf_header(dbf_fields, record_count):
+    """Build the dBASE file header and field descriptors
+
+    Args:
+        dbf_fields (list): DBFField
+        record_count (int): number of records
+
+    Returns:
+        str
+    """
+    today = dt.date.today()
+    header = struct.pack(
+        '<4BIHH20x', 3, today.year - 1900, today.month, today.day,
+        record_count, 32 + 32 * len(dbf_fields) + 1,
+        1 + sum(f.width for f in dbf_fields))
+    return header + b''.join(map(field_descriptor, dbf_fields)) + b'\x0D'
+
+
+def field_descriptor(dbf_field):
+    """Build the 32 byte dBASE field descriptor
+
+    Field names are written in upper case (the same as the ArcGIS tools).
+    """
+    return struct.pack(
+        '<11sc4xBB14x', dbf_field.name.upper()[:10], dbf_field.type,
+        dbf_field.width, dbf_field.decimals)
+
+
+def dbf_field(field_name, field_type):
+    """Build the dBASE field descriptor for an ArcGIS field type"""
+    return DBFField(field_name, *dbf_field_types[field_type.upper()])
+
+
+def dbf_format(value_array, dbf_type, width, decimals):
+    """Format numeric values as right justified fixed width strings
+
+    NaN, infinite, and masked values are written as blanks (which are read
+        as NaN, see dbf_parse).
+
+    Args:
+        value_array (np.array): values
+        dbf_type (str): dBASE field type ('N' or 'F')
+        width (int): field width
+        decimals (int): number of decimals
+
+    Returns:
+        np.array of strings
+
+    Raises:
+        ValueError: if a value doesn't fit in the field width
+    """
+    blank_mask = np.array(np.ma.getmaskarray(value_array))
+    value_array = np.asarray(np.ma.getdata(value_array))
+    if value_array.dtype.kind == 'f':
+        blank_mask |= ~np.isfinite(value_array)
+    if np.any(blank_mask):
+        value_array = np.where(blank_mask, 0, value_array)
+    if dbf_type == 'N' and decimals == 0:
+        # Values are truncated to integers
+        string_array = np.char.mod(
+            '%{}d'.format(width), value_array.astype(np.int64))
+    else:
+        # Use fewer decimals if necessary so the largest value fits
+        if value_array.size:
+            max_value = float(np.max(np.abs(value_array)))
+        else:
+            max_value = 0
+        int_digits = len('{:.0f}'.format(max_value)) + 1
+        decimals = min(decimals, width - int_digits - 1)
+        if decimals >= 0:
+            string_array = np.char.mod(
+                '%{}.{}f'.format(width, decimals), value_array)
+        else:
+            string_array = np.char.mod(
+                '%{}.{}e'.format(width, max(width - 8, 1)), value_array)
+    # Values are padded to the width, so wider strings didn't fit
+    if string_array.dtype.itemsize > width:
+        overflow_i = np.flatnonzero(np.char.str_len(string_array) > width)[0]
+        raise ValueError('{} does not fit in a field {} wide'.format(
+            value_array[overflow_i], width))
+    if np.any(blank_mask):
+        string_array[blank_mask] = b' ' * width
+    return string_array
+
+
+def dbf_record_dtype(dbf_fields, record_length=None):
+    """Build the structured dtype of a dBASE record
+
+    Each field is a fixed width string after the 1 byte deletion flag.
+
+    Args:
+        dbf_fields (list): DBFField
+        record_length (int): record length from the header
+            (default is the sum of the field widths)
+
+    Returns:
+        np.dtype
+    """
+    names, formats, offsets = ['deleted'], ['S1'], [0]
+    offset = 1
+    for f in dbf_fields:
+        names.append(f.name)
+        formats.append('S{}'.format(f.width))
+        offsets.append(offset)
+        offset += f.width
+    if record_length is None:
+        record_length = offset
+    return np.dtype({
+        'names': names, 'formats': formats, 'offsets': offsets,
+        'itemsize': record_length})
+
+
+def dbf_parse(string_array, dbf_field):
+    """Parse fixed width dBASE strings
+
+    Numbers are converted in bulk without stripping the padding.
+    Blank and unreadable numbers (i.e. "*****" for values that didn't fit)
+        are returned as NaN.
+
+    Args:
+        string_array (np.array): field strings
+        dbf_field (DBFField): field descriptor
+
+    Returns:
+        np.array of int64 (integer fields without any NaN), float64,
+            or stripped strings
+    """
+    if dbf_field.type not in ['N', 'F']:
+        return np.char.strip(string_array)
+    # Always copy, the blank values are replaced
+    string_array = np.array(string_array)
+    blank_mask = _blank_mask(string_array)
+    string_array[blank_mask] = b'nan'
+    try:
+        value_array = string_array.astype(np.float64)
+    except ValueError:
+        value_array = np.array(
+            [_parse_number(s) for s in string_array], dtype=np.float64)
+    if (dbf_field.type == 'N' and dbf_field.decimals == 0 and
+            not np.any(np.isnan(value_array))):
+        return value_array.astype(np.int64)
+    return value_array
+
+
+def _blank_mask(string_array):
+    """Find the values that are only spaces (or null bytes)
+
+    Numbers are right justified, so only the values that end with a space
+        have to be checked.
+    """
+    chars = string_array.view(np.uint8).reshape(
+        len(string_array), string_array.dtype.itemsize)
+    blank_mask = (chars[:, -1] == 32) | (chars[:, -1] == 0)
+    check_i = np.flatnonzero(blank_mask)
+    if len(check_i):
+        check_chars = chars[check_i]
+        blank_mask[check_i] = np.all(
+            (check_chars == 32) | (check_chars == 0), axis=1)
+    return blank_mask
+
+
+def _parse_number(value_str):
+    """"""
+    try:
+        return float(value_str)
+    except ValueError:
+        return np.nan
+
+
+class DBFTable(object):
+    """Memory mapped dBASE table
+
+    The records are mapped with the structured dtype built from the header
+        (see dbf_record_dtype), so each field is a NumPy view of its fixed
+        width strings in the file.  Fields are parsed and formatted in bulk
+        and written values go straight to the mapped file, nothing else in
+        the table is read or rewritten.
+    The table should be closed (or used as a context manager) so the file
+        isn't left open (Windows locks mapped files).
+    """
+
+    def __init__(self, dbf_path, mode='r'):
+        """Map the records of a dBASE table
+
+        Args:
+            dbf_path (str): dBASE file path
+            mode (str): 'r' to read or 'r+' to also write the values
+        """
+        if mode not in ['r', 'r+']:
+            raise ValueError('unsupported mode: {}'.format(mode))
+        self.dbf_path = dbf_path
+        self.mode = mode
+        with open(dbf_path, 'rb') as dbf_f:
+            self.count, self.header_length, self.record_length, \
+                self.fields = read_dbf_header(dbf_f)
+        dtype = dbf_record_dtype(self.fields, self.record_length)
+        if self.count:
+            self.records = np.memmap(
+                dbf_path, dtype, mode, self.header_length, (self.count,))
+        else:
+            # Empty files can't be mapped
+            self.records = np.zeros(0, dtype)
+        self._field_dict = dict((f.name.upper(), f) for f in self.fields)
+
+    def __enter__(self):
+        """"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """"""
+        self.close()
+
+    @property
+    def field_names(self):
+        """"""
+        return [f.name for f in self.fields]
+
+    def field(self, field_name):
+        """Return the DBFField of a field (field names are case insensitive)"""
+        try:
+            return self._field_dict[field_name.upper()]
+        except KeyError:
+            raise ValueError('{} is not a field in {}'.format(
+                field_name, self.dbf_path))
+
+    def view(self, field_name):
+        """Return the view of the fixed width strings of a field"""
+        return self.records[self.field(field_name).name]
+
+    def read(self, field_name):
+        """Parse the values of a field (see dbf_parse)"""
+        return dbf_parse(self.view(field_name), self.field(field_name))
+
+    def write(self, field_name, value_array, record_i=None):
+        """Format and write the values of a field
+
+        Args:
+            field_name (str): field name (case insensitive)
+            value_array (np.array): values in record order
+            record_i (np.array): indices of the records to write
+                (default is all the records)
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: if a value doesn't fit in the field (nothing is
+                written to the field)
+        """
+        if self.mode != 'r+':
+            raise ValueError('{} is not open for writing'.format(
+                self.dbf_path))
+        f = self.field(field_name)
+        # Keep the mask of masked arrays (masked values are written as blanks)
+        value_array = np.asanyarray(value_array)
+        record_count = self.count if record_i is None else len(record_i)
+        if len(value_array) != record_count:
+            raise ValueError(
+                '{} values do not match the {} records'.format(
+                    field_name, record_count))
+        if f.type in ['N', 'F']:
+            try:
+                string_array = dbf_format(
+                    value_array, f.type, f.width, f.decimals)
+            except ValueError as e:
+                raise ValueError('{}: {}'.format(f.name, e))
+        else:
+            string_array = np.char.ljust(value_array.astype('S'), f.width)
+        if record_i is None:
+            self.records[f.name] = string_array
+        else:
+            field_view = self.records[f.name]
+            field_view[record_i] = string_array
+
+    def close(self):
+        """Flush the written values and release the mapping"""
+        if self.records is None:
+            return
+        if isinstance(self.records, np.memmap) and self.mode == 'r+':
+            self.records.flush()
+        self.records = None
+
+
+def read_dbf_columns(dbf_path, field_names=None):
+    """Read fields of a dBASE table as arrays
+
+    The records are memory mapped and each field is parsed in bulk.
+
+    Args:
+        dbf_path (str): dBASE file path
+        field_names (list): field names (case insensitive),
+            default is all the fields
+
+    Returns:
+        OrderedDict of the value arrays (in record order) keyed by field name
+    """
+    with DBFTable(dbf_path) as dbf_table:
+        if field_names is None:
+            field_names = dbf_table.field_names
+        values = OrderedDict()
+        for field_name in field_names:
+            values[field_name] = dbf_table.read(field_name)
+    return values
+
+
+def write_dbf_columns(dbf_path, values):
+    """Write value arrays to existing fields of a dBASE table
+
+    The records are memory mapped and each field is formatted in bulk and
+        written in place (the header and the other fields are not changed).
+
+    Args:
+        dbf_path (str): dBASE file path
+        values (dict): value arrays (in record order) keyed by field name
+            (case insensitive)
+
+    Returns:
+        None
+    """
+    with DBFTable(dbf_path, 'r+') as dbf_table:
+        # Check all the fields before anything is written
+        for field_name in values.keys():
+            dbf_table.field(field_name)
+        for field_name, value_array in values.items():
+            dbf_table.write(field_name, value_array)
+
+
+def read_dbf_records(dbf_path):
+    """Read all the records of a dBASE table as fixed width strings
+
+    Returns:
+        tuple of the list of DBFField and the np.array of records
+    """
+    with open(dbf_path, 'rb') as dbf_f:
+        record_count, header_length, record_length, dbf_fields = \
+            read_dbf_header(dbf_f)
+        dbf_f.seek(header_length)
+        records = np.fromfile(
+            dbf_f, dbf_record_dtype(dbf_fields, record_length), record_count)
+    return dbf_fields, records
+
+
+def changed_dbf_fields(dbf_path, base_path):
+    """Return the fields of a dBASE table that were added or changed
+
+    The fields are compared to a copy of the table made before it was
+        modified.  The fixed width strings are compared, so nothing is parsed.
+
+    Args:
+        dbf_path (str): dBASE file path
+        base_path (str): dBASE file path of the unmodified copy
+
+    Returns:
+        list of DBFField
+    """
+    dbf_fields, records = read_dbf_records(dbf_path)
+    base_fields, base_records = read_dbf_records(base_path)
+    if len(records) != len(base_records):
+        raise ValueError('{} and {} have a different number of records'.format(
+            dbf_path, base_path))
+    base_dict = dict((f.name.upper(), f) for f in base_fields)
+    changed_list = []
+    for f in dbf_fields:
+        base_f = base_dict.get(f.name.upper())
+        if (base_f is None or base_f[1:] != f[1:] or
+                np.any(records[f.name] != base_records[base_f.name])):
+            changed_list.append(f)
+    return changed_list
+
+
+def copy_dbf_fields(input_path, output_path, field_names):
+    """Copy fields between dBASE tables with the same records
+
+    Fields that are missing from the output table are added with the input
+        field definitions.  Fields with the same definition are copied as
+        fixed width strings, other fields are parsed and formatted.
+
+    Args:
+        input_path (str): dBASE file path to copy from
+        output_path (str): dBASE file path to copy to
+        field_names (list): field names (case insensitive)
+
+    Returns:
+        None
+    """
+    input_fields, input_records = read_dbf_records(input_path)
+    input_dict = dict((f.name.upper(), f) for f in input_fields)
+    try:
+        copy_fields = [input_dict[name.upper()] for name in field_names]
+    except KeyError as e:
+        raise ValueError('{} is not a field in {}'.format(
+            e.args[0], input_path))
+    with open(output_path, 'rb') as dbf_f:
+        output_fields = read_dbf_header(dbf_f)[3]
+    output_names = set(f.name.upper() for f in output_fields)
+    new_fields = [f for f in copy_fields if f.name.upper() not in output_names]
+    if new_fields:
+        add_dbf_fields(output_path, new_fields)
+
+    with DBFTable(output_path, 'r+') as output_table:
+        if output_table.count != len(input_records):
+            raise ValueError(
+                '{} and {} have a different number of records'.format(
+                    input_path, output_path))
+        for input_f in copy_fields:
+            output_f = output_table.field(input_f.name)
+            if input_f[1:] == output_f[1:]:
+                output_table.records[output_f.name] = \
+                    input_records[input_f.name]
+            else:
+                output_table.write(output_f.name, dbf_parse(
+                    input_records[input_f.name], input_f))
+
+
+def dbf_records(dbf_fields, values, record_count):
+    """Build a block of fixed width dBASE records
+
+    Args:
+        dbf_fields (list): DBFField
+        values (dict): value arrays keyed by field name
+            (numeric fields without values are written as 0)
+        record_count (int): number of records
+
+    Returns:
+        np.array of records
+    """
+    records = np.empty(record_count, dbf_record_dtype(dbf_fields))
+    records['deleted'] = b' '
+    for f in dbf_fields:
+        try:
+            value_array = values[f.name]
+        except KeyError:
+            if f.type in ['N', 'F']:
+                records[f.name] = dbf_format(
+                    np.zeros(1), f.type, f.width, f.decimals)[0]
+            else:
+                records[f.name] = b' ' * f.width
+            continue
+        try:
+            records[f.name] = dbf_format(
+                value_array, f.type, f.width, f.decimals)
+        except ValueError as e:
+            raise ValueError('{}: {}'.format(f.name, e))
+    return records
+
+
+def add_dbf_fields(dbf_path, field_list, block_size=2 ** 16):
+    """Add fields to a dBASE table in one rewrite
+
+    New fields are set to 0 (the same as AddField for shapefiles).
+    The table is copied block by block to a temporary file which then
+        replaces the original table.
+
+    Args:
+        dbf_path (str): dBASE file path
+        field_list (list): new (field name, ArcGIS field type) or DBFField
+        block_size (int): number of records per block
+
+    Returns:
+        None
+    """
+    new_fields = [
+        f if isinstance(f, DBFField) else dbf_field(*f) for f in field_list]
+    # Skip the deletion flag of the new field values
+    new_record = np.fromstring(
+        dbf_records(new_fields, {}, 1).tostring()[1:], dtype=np.uint8)
+    temp_path = dbf_path + '.tmp'
+    with open(dbf_path, 'rb') as input_f:
+        record_count, header_length, record_length, dbf_fields = \
+            read_dbf_header(input_f)
+        if len(dbf_fields) + len(new_fields) > dbf_max_fields:
+            raise ValueError(
+                'shapefiles can not have more than {} fields'.format(
+                    dbf_max_fields))
+        # Keep the original header bytes (i.e. the language driver)
+        input_f.seek(0)
+        header = input_f.read(32 + 32 * len(dbf_fields))
+        input_f.seek(header_length)
+        today = dt.date.today()
+        with open(temp_path, 'wb', 2 ** 20) as output_f:
+            output_f.write(
+                header[:1] +
+                struct.pack(
+                    '<3BIHH', today.year - 1900, today.month, today.day,
+                    record_count,
+                    32 + 32 * (len(dbf_fields) + len(new_fields)) + 1,
+                    record_length + len(new_record)) +
+                header[12:] +
+                b''.join(map(field_descriptor, new_fields)) + b'\x0D')
+            for record_i in xrange(0, record_count, block_size):
+                block_count = min(block_size, record_count - record_i)
+                block = np.empty(
+                    (block_count, record_length + len(new_record)),
+                    dtype=np.uint8)
+                block[:, :record_length] = np.fromstring(
+                    input_f.read(block_count * record_length),
+                    dtype=np.uint8).reshape(block_count, record_length)
+                block[:, record_length:] = new_record
+                output_f.write(block.tostring())
+            output_f.write(b'\x1A')
+
+    # Windows can't rename over an existing file
+    if os.name == 'nt':
+        os.remove(dbf_path)
+    os.rename(temp_path, dbf_path)
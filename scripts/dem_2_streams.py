@@ -21,6 +21,7 @@ from arcpy import env
 
 import numpy as np
 
+import report_functions as report
 import support_functions as support
 
 
@@ -39,7 +40,7 @@ def flow_parameters(config_path, overwrite_flag=False, debug_flag=False):
     logging.info('\nGSFLOW Flow Parameters')
 
     # Initialize hru_parameters class
-    hru = support.HRUParameters(config_path)
+    hru = support.get_hru_parameters(config_path)
 
     # Open input parameter config file
     inputs_cfg = ConfigParser.ConfigParser()
@@ -59,6 +60,7 @@ def flow_parameters(config_path, overwrite_flag=False, debug_flag=False):
     log_console.setLevel(logging.DEBUG)
     log_console.setFormatter(logging.Formatter('%(message)s'))
     logging.getLogger('').addHandler(log_console)
+    report.start_report(log_file_name.replace('_log.txt', ''), hru.log_ws)
     logging.info('\nGSFLOW DEM To Streams')
 
     # Check whether lake parameters should be calculated
@@ -292,15 +294,17 @@ def flow_parameters(config_path, overwrite_flag=False, debug_flag=False):
 
     # Flow Direction
     logging.info('\nCalculating flow direction')
-    flow_dir_obj = arcpy.sa.FlowDirection(dem_adj_obj, False)
-    # flow_dir_obj = FlowDirection(dem_adj_obj, True)
-    flow_dir_obj.save(flow_dir_path)
+    with report.stage('flow_dir'):
+        flow_dir_obj = arcpy.sa.FlowDirection(dem_adj_obj, False)
+        # flow_dir_obj = FlowDirection(dem_adj_obj, True)
+        flow_dir_obj.save(flow_dir_path)
 
 
     # Fill DEM_ADJ raster
     logging.info('Filling DEM_ADJ (8-way)')
-    dem_fill_obj = arcpy.sa.Fill(dem_adj_obj)
-    dem_fill_obj.save(dem_fill_path)
+    with report.stage('fill'):
+        dem_fill_obj = arcpy.sa.Fill(dem_adj_obj)
+        dem_fill_obj.save(dem_fill_path)
 
     # Need to determine if cells were filled so that flow direction
     #   can be be recomputed
@@ -346,8 +350,9 @@ def flow_parameters(config_path, overwrite_flag=False, debug_flag=False):
     # Recaculate Flow Direction
     if fill_flag:
         logging.info('Re-calculating flow direction')
-        flow_dir_obj = arcpy.sa.FlowDirection(dem_fill_obj, True)
-        flow_dir_obj.save(flow_dir_path)
+        with report.stage('flow_dir'):
+            flow_dir_obj = arcpy.sa.FlowDirection(dem_fill_obj, True)
+            flow_dir_obj.save(flow_dir_path)
 
     # Save flow direction as points
     if calc_flow_dir_points_flag:
@@ -531,11 +536,13 @@ def flow_parameters(config_path, overwrite_flag=False, debug_flag=False):
 
     # Flow Accumulation
     logging.info('\nCalculating initial flow accumulation')
-    flow_acc_full_obj = arcpy.sa.FlowAccumulation(flow_dir_obj)
-    logging.info('  Only keeping flow_acc >= {}'.format(flow_acc_threshold))
-    flow_acc_full_obj = arcpy.sa.Con(
-        flow_acc_full_obj >= flow_acc_threshold, flow_acc_full_obj)
-    flow_acc_full_obj.save(flow_acc_full_path)
+    with report.stage('flow_acc'):
+        flow_acc_full_obj = arcpy.sa.FlowAccumulation(flow_dir_obj)
+        logging.info('  Only keeping flow_acc >= {}'.format(
+            flow_acc_threshold))
+        flow_acc_full_obj = arcpy.sa.Con(
+            flow_acc_full_obj >= flow_acc_threshold, flow_acc_full_obj)
+        flow_acc_full_obj.save(flow_acc_full_path)
     # logging.info('  Only keeping active cells for subset')
     # flow_acc_sub_obj = Con(
     #    ((hru_type_in_obj == 1) | (hru_type_in_obj == 2)), flow_acc_full_obj)
@@ -835,3 +842,4 @@ if __name__ == '__main__':
     flow_parameters(
         config_path=args.ini, overwrite_flag=args.overwrite,
         debug_flag=args.loglevel==logging.DEBUG)
+    report.finish_report()
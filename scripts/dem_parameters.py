@@ -11,12 +11,16 @@ import argparse
 import ConfigParser
 import datetime as dt
 import logging
+import math
 import os
 import sys
 
 import arcpy
 from arcpy import env
+import numpy as np
 
+import backend_functions as backend
+import report_functions as report
 import support_functions as support
 
 
@@ -33,7 +37,7 @@ def dem_parameters(config_path, overwrite_flag=False, debug_flag=False):
     """
 
     # Initialize hru parameters class
-    hru = support.HRUParameters(config_path)
+    hru = support.get_hru_parameters(config_path)
 
     # Open input parameter config file
     inputs_cfg = ConfigParser.ConfigParser()
@@ -53,6 +57,7 @@ def dem_parameters(config_path, overwrite_flag=False, debug_flag=False):
     log_console.setLevel(logging.DEBUG)
     log_console.setFormatter(logging.Formatter('%(message)s'))
     logging.getLogger('').addHandler(log_console)
+    report.start_report(log_file_name.replace('_log.txt', ''), hru.log_ws)
     logging.info('\nGSFLOW DEM Parameters')
 
     #
@@ -110,6 +115,22 @@ def dem_parameters(config_path, overwrite_flag=False, debug_flag=False):
         calc_flow_acc_flag = False
         calc_flow_dir_flag = False
 
+    # Backend for the fill, flow, zonal statistics, and HRU table steps
+    # 'arcpy', 'numpy', or 'columns' (default is the GSFLOW_BACKEND
+    #   environment variable or 'arcpy')
+    # The other raster steps (filter, Int, slope, aspect, reclass, JH)
+    #   still use arcpy.sa whatever the backend is
+    try:
+        backend_name = inputs_cfg.get('INPUTS', 'backend')
+    except:
+        backend_name = None
+    try:
+        gp = backend.get_backend(backend_name)
+    except (ImportError, ValueError) as e:
+        logging.error('\nERROR: {}\n'.format(e))
+        sys.exit()
+    logging.debug('  Backend: {}'.format(gp.name))
+
     # Remap
     remap_ws = inputs_cfg.get('INPUTS', 'remap_folder')
     aspect_remap_name = inputs_cfg.get('INPUTS', 'aspect_remap')
@@ -183,9 +204,9 @@ def dem_parameters(config_path, overwrite_flag=False, debug_flag=False):
 
     # Output paths
     dem_path = os.path.join(dem_temp_ws, 'dem.img')
-    dem_fill_path = os.path.join(dem_temp_ws, 'dem_fill.img')
-    flow_dir_path = os.path.join(dem_temp_ws, 'flow_dir.img')
-    flow_acc_path = os.path.join(dem_temp_ws, 'flow_acc.img')
+    dem_fill_path = os.path.join(dem_temp_ws, 'dem_fill' + gp.raster_ext)
+    flow_dir_path = os.path.join(dem_temp_ws, 'flow_dir' + gp.raster_ext)
+    flow_acc_path = os.path.join(dem_temp_ws, 'flow_acc' + gp.raster_ext)
     flow_acc_dem_path = os.path.join(dem_temp_ws, 'flow_acc_x_dem.img')
     flow_acc_filter_path = os.path.join(dem_temp_ws, 'flow_acc_filter.img')
     dem_integer_path = os.path.join(dem_temp_ws, 'dem_integer.img')
@@ -206,32 +227,37 @@ def dem_parameters(config_path, overwrite_flag=False, debug_flag=False):
 
     # Check DEM field
     logging.info('\nAdding DEM fields if necessary')
-    support.add_field_func(hru.polygon_path, hru.dem_mean_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_median_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_max_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_min_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_adj_field, 'DOUBLE')
+    field_list = [
+        (hru.dem_mean_field, 'DOUBLE'),
+        (hru.dem_median_field, 'DOUBLE'),
+        (hru.dem_max_field, 'DOUBLE'),
+        (hru.dem_min_field, 'DOUBLE'),
+        (hru.dem_adj_field, 'DOUBLE')]
     if calc_flow_acc_dem_flag:
-        support.add_field_func(hru.polygon_path, hru.dem_flowacc_field, 'DOUBLE')
-        support.add_field_func(hru.polygon_path, hru.dem_sum_field, 'DOUBLE')
-        support.add_field_func(hru.polygon_path, hru.dem_count_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_sink8_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_sink4_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_aspect_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.dem_slope_deg_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_slope_rad_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_slope_pct_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_feet_field, 'DOUBLE')
-    # add_field_func(hru.polygon_path, hru.deplcrv_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.jh_tmin_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.jh_tmax_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.jh_coef_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.snarea_thresh_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.tmax_adj_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.tmin_adj_field, 'DOUBLE')
+        field_list.extend([
+            (hru.dem_flowacc_field, 'DOUBLE'),
+            (hru.dem_sum_field, 'DOUBLE'),
+            (hru.dem_count_field, 'DOUBLE')])
+    field_list.extend([
+        (hru.dem_sink8_field, 'DOUBLE'),
+        (hru.dem_sink4_field, 'DOUBLE'),
+        (hru.dem_aspect_field, 'LONG'),
+        (hru.dem_slope_deg_field, 'DOUBLE'),
+        (hru.dem_slope_rad_field, 'DOUBLE'),
+        (hru.dem_slope_pct_field, 'DOUBLE'),
+        (hru.dem_feet_field, 'DOUBLE'),
+        # (hru.deplcrv_field, 'DOUBLE'),
+        (hru.jh_tmin_field, 'DOUBLE'),
+        (hru.jh_tmax_field, 'DOUBLE'),
+        (hru.jh_coef_field, 'DOUBLE'),
+        (hru.snarea_thresh_field, 'DOUBLE'),
+        (hru.tmax_adj_field, 'DOUBLE'),
+        (hru.tmin_adj_field, 'DOUBLE')])
+    gp.add_fields(hru.polygon_path, field_list)
 
     # Check that dem_adj_copy_field exists
-    if len(arcpy.ListFields(hru.polygon_path, dem_adj_copy_field)) == 0:
+    if dem_adj_copy_field.upper() not in [
+            f.upper() for f in gp.list_fields(hru.polygon_path)]:
         logging.error('\nERROR: dem_adj_copy_field {} does not exist\n'.format(
             dem_adj_copy_field))
         sys.exit()
@@ -287,23 +313,30 @@ def dem_parameters(config_path, overwrite_flag=False, debug_flag=False):
         sys.exit()
     del dem_obj
 
+    # The NumPy backends only read floating point grids, so the rasters
+    #   built with the Spatial Analyst tools are copied before they are used
+    arcpy_gp = backend.ArcpyBackend()
+
+    def backend_raster(raster_path):
+        """Return a copy of a raster that the backend can read"""
+        if gp.name == 'arcpy':
+            return raster_path
+        gp_raster_path = os.path.splitext(raster_path)[0] + gp.raster_ext
+        raster_grid = arcpy_gp.raster_grid(raster_path)
+        gp.write_raster(
+            arcpy_gp.read_window(raster_path, raster_grid), gp_raster_path,
+            raster_grid, arcpy_gp.raster_sr(raster_path))
+        return gp_raster_path
+
     # Calculate filled DEM, flow_dir, & flow_acc
     logging.info('\nCalculating filled DEM raster')
-    dem_fill_obj = arcpy.sa.Fill(dem_path)
-    dem_fill_obj.save(dem_fill_path)
-    del dem_fill_obj
+    gp.fill(backend_raster(dem_path), dem_fill_path)
     if calc_flow_dir_flag:
         logging.info('Calculating flow direction raster')
-        dem_fill_obj = arcpy.sa.Raster(dem_fill_path)
-        flow_dir_obj = arcpy.sa.FlowDirection(dem_fill_obj, True)
-        flow_dir_obj.save(flow_dir_path)
-        del flow_dir_obj, dem_fill_obj
+        gp.flow_direction(dem_fill_path, flow_dir_path)
     if calc_flow_acc_flag:
         logging.info('Calculating flow accumulation raster')
-        flow_dir_obj = arcpy.sa.Raster(flow_dir_path)
-        flow_acc_obj = arcpy.sa.FlowAccumulation(flow_dir_obj)
-        flow_acc_obj.save(flow_acc_path)
-        del flow_acc_obj, flow_dir_obj
+        gp.flow_accumulation(flow_dir_path, flow_acc_path)
     if calc_flow_acc_dem_flag:
         # flow_acc_dem_obj = dem_fill_obj * flow_acc_obj
         # Low pass filter of flow_acc then take log10
@@ -322,42 +355,46 @@ def dem_parameters(config_path, overwrite_flag=False, debug_flag=False):
 
     # Calculate slope
     logging.info('Calculating slope raster')
-    dem_slope_obj = arcpy.sa.Slope(dem_fill_path, 'DEGREE')
-    # Setting small slopes to zero
-    logging.info('  Setting slopes <= 0.01 to 0')
-    dem_slope_obj = arcpy.sa.Con(dem_slope_obj <= 0.01, 0, dem_slope_obj)
-    dem_slope_obj.save(dem_slope_path)
-    del dem_slope_obj
+    with report.stage('slope'):
+        dem_slope_obj = arcpy.sa.Slope(dem_fill_path, 'DEGREE')
+        # Setting small slopes to zero
+        logging.info('  Setting slopes <= 0.01 to 0')
+        dem_slope_obj = arcpy.sa.Con(dem_slope_obj <= 0.01, 0, dem_slope_obj)
+        dem_slope_obj.save(dem_slope_path)
+        del dem_slope_obj
 
     # Calculate aspect
     logging.info('Calculating aspect raster')
-    dem_aspect_obj = arcpy.sa.Aspect(dem_fill_path)
-    # Set small slopes to -1 aspect
-    logging.debug('  Setting aspect for slopes <= 0.01 to -1')
-    dem_aspect_obj = arcpy.sa.Con(
-        arcpy.sa.Raster(dem_slope_path) > 0.01, dem_aspect_obj, -1)
-    dem_aspect_obj.save(dem_aspect_path)
-    del dem_aspect_obj
+    with report.stage('aspect'):
+        dem_aspect_obj = arcpy.sa.Aspect(dem_fill_path)
+        # Set small slopes to -1 aspect
+        logging.debug('  Setting aspect for slopes <= 0.01 to -1')
+        dem_aspect_obj = arcpy.sa.Con(
+            arcpy.sa.Raster(dem_slope_path) > 0.01, dem_aspect_obj, -1)
+        dem_aspect_obj.save(dem_aspect_path)
+        del dem_aspect_obj
 
     # Reclassify aspect
     logging.debug('  Reclassifying: {}'.format(aspect_remap_path))
-    dem_aspect_reclass_obj = arcpy.sa.ReclassByASCIIFile(
-        dem_aspect_path, aspect_remap_path)
-    dem_aspect_reclass_obj.save(dem_aspect_reclass_path)
-    del dem_aspect_reclass_obj
+    with report.stage('reclass'):
+        dem_aspect_reclass_obj = arcpy.sa.ReclassByASCIIFile(
+            dem_aspect_path, aspect_remap_path)
+        dem_aspect_reclass_obj.save(dem_aspect_reclass_path)
+        del dem_aspect_reclass_obj
 
     # Temperature Aspect Adjustment
     logging.info('Calculating temperature aspect adjustment raster')
-    temp_adj_obj = arcpy.sa.Float(arcpy.sa.ReclassByASCIIFile(
-        dem_aspect_reclass_path, temp_adj_remap_path))
-    # Since reclass can't remap to floats directly
-    # Values are scaled by 10 and stored as integers
-    temp_adj_obj *= 0.1
-    # This is a function in the
-    # temp_adj_obj = reclass_ascii_float_func(
-    #    dem_aspect_reclass_path, temp_adj_remap_path)
-    temp_adj_obj.save(temp_adj_path)
-    del temp_adj_obj
+    with report.stage('reclass'):
+        temp_adj_obj = arcpy.sa.Float(arcpy.sa.ReclassByASCIIFile(
+            dem_aspect_reclass_path, temp_adj_remap_path))
+        # Since reclass can't remap to floats directly
+        # Values are scaled by 10 and stored as integers
+        temp_adj_obj *= 0.1
+        # This is a function in the
+        # temp_adj_obj = reclass_ascii_float_func(
+        #    dem_aspect_reclass_path, temp_adj_remap_path)
+        temp_adj_obj.save(temp_adj_path)
+        del temp_adj_obj
 
 
     # List of rasters, fields, and stats for zonal statistics
@@ -377,9 +414,26 @@ def dem_parameters(config_path, overwrite_flag=False, debug_flag=False):
 
 
     # Calculate DEM zonal statistics
+    # Zonal statistics are computed on the HRU grid and then mapped to the
+    #   HRU polygons using the row/col fields
     logging.info('\nCalculating DEM zonal statistics')
-    support.zonal_stats_func(
-        zs_dem_dict, hru.polygon_path, hru.point_path, hru)
+    hru_rows, hru_cols = support.hru_grid_shape(hru)
+    hru_grid = backend.Grid(
+        hru.extent.XMin, hru.extent.YMax, hru.cs, hru_rows, hru_cols)
+    hru_values = gp.read_table(
+        hru.polygon_path, [hru.row_field, hru.col_field])
+    zone_i = (
+        (hru_values[hru.row_field].astype(np.int64) - 1) * hru_cols +
+        hru_values[hru.col_field].astype(np.int64) - 1)
+    zs_raster_dict = dict()
+    zs_values = dict()
+    for zs_field, (raster_path, zs_stat) in sorted(zs_dem_dict.items()):
+        logging.info('  {}: {}'.format(zs_field, zs_stat))
+        if raster_path not in zs_raster_dict:
+            zs_raster_dict[raster_path] = backend_raster(raster_path)
+        zs_values[zs_field] = gp.zonal_stats(
+            zs_raster_dict[raster_path], hru_grid, zs_stat)[zone_i]
+    gp.write_table(hru.polygon_path, zs_values)
 
     # Reset DEM_MEDIAN
     # logging.info('\nCalculating {}'.format(hru.dem_median_field))
@@ -391,56 +445,44 @@ def dem_parameters(config_path, overwrite_flag=False, debug_flag=False):
     # Calculate HRU_ELEV (HRU elevation in feet)
     logging.info('\nCalculating initial {} from {}'.format(
         hru.dem_feet_field, hru.dem_adj_field))
+    hru_values = gp.read_table(hru.polygon_path, [hru.dem_adj_field])
     if linear_unit in ['METERS']:
         logging.info('  Converting from meters to feet')
-        arcpy.CalculateField_management(
-            hru.polygon_path, hru.dem_feet_field,
-            '!{}! * 3.28084'.format(hru.dem_adj_field), 'PYTHON')
+        gp.write_table(hru.polygon_path, {
+            hru.dem_feet_field: hru_values[hru.dem_adj_field] * 3.28084})
     elif linear_unit in ['FOOT_US', 'FOOT']:
-        arcpy.CalculateField_management(
-            hru.polygon_path, hru.dem_feet_field,
-            '!{}!'.format(hru.dem_adj_field), 'PYTHON')
+        gp.write_table(hru.polygon_path, {
+            hru.dem_feet_field: hru_values[hru.dem_adj_field]})
 
 
     # Flow accumulation weighted elevation
     if calc_flow_acc_dem_flag:
         logging.info('Calculating {}'.format(hru.dem_flowacc_field))
-        hru_polygon_layer = 'hru_polygon_layer'
-        arcpy.MakeFeatureLayer_management(
-            hru.polygon_path, hru_polygon_layer)
-        arcpy.SelectLayerByAttribute_management(
-            hru_polygon_layer, "NEW_SELECTION",
-            '"{}" > 0'.format(hru.dem_count_field))
-        arcpy.CalculateField_management(
-            hru_polygon_layer, hru.dem_flowacc_field,
-            'float(!{}!) / !{}!'.format(
-                hru.dem_sum_field, hru.dem_count_field),
-            'PYTHON')
+        hru_values = gp.read_table(
+            hru.polygon_path,
+            [hru.dem_flowacc_field, hru.dem_sum_field, hru.dem_count_field])
+        flowacc_array = hru_values[hru.dem_flowacc_field].astype(np.float64)
+        sum_array = hru_values[hru.dem_sum_field].astype(np.float64)
+        count_array = hru_values[hru.dem_count_field].astype(np.float64)
+        count_mask = count_array > 0
+        flowacc_array[count_mask] = (
+            sum_array[count_mask] / count_array[count_mask])
         # Clear dem_flowacc for any cells that have zero sum or count
-        arcpy.SelectLayerByAttribute_management(
-            hru_polygon_layer, "NEW_SELECTION",
-            '("{}" = 0) OR ("{}" = 0)'.format(
-                hru.dem_count_field, hru.dem_sum_field))
-        arcpy.CalculateField_management(
-            hru_polygon_layer, hru.dem_flowacc_field, 0, 'PYTHON')
-        arcpy.Delete_management(hru_polygon_layer)
-        # arcpy.DeleteField_management(hru.polygon_path, hru.dem_sum_field)
-        # arcpy.DeleteField_management(hru.polygon_path, hru.dem_count_field)
+        flowacc_array[(count_array == 0) | (sum_array == 0)] = 0
+        gp.write_table(
+            hru.polygon_path, {hru.dem_flowacc_field: flowacc_array})
+        del hru_values, flowacc_array, sum_array, count_array, count_mask
 
     # Fill DEM_ADJ if it is not set
-    if all([row[0] == 0 for row in arcpy.da.SearchCursor(
-            hru.polygon_path, [hru.dem_adj_field])]):
-        logging.info('Filling {} from {}'.format(
-            hru.dem_adj_field, dem_adj_copy_field))
-        arcpy.CalculateField_management(
-            hru.polygon_path, hru.dem_adj_field,
-            'float(!{}!)'.format(dem_adj_copy_field), 'PYTHON')
-    elif reset_dem_adj_flag:
+    hru_values = gp.read_table(
+        hru.polygon_path, [hru.dem_adj_field, dem_adj_copy_field])
+    if (np.all(hru_values[hru.dem_adj_field] == 0) or
+            reset_dem_adj_flag):
         logging.info('Filling {} from {}'.format(
             hru.dem_adj_field, dem_adj_copy_field))
-        arcpy.CalculateField_management(
-            hru.polygon_path, hru.dem_adj_field,
-            'float(!{}!)'.format(dem_adj_copy_field), 'PYTHON')
+        gp.write_table(hru.polygon_path, {
+            hru.dem_adj_field:
+                hru_values[dem_adj_copy_field].astype(np.float64)})
     else:
         logging.info(
             ('{} appears to already have been set and ' +
@@ -449,15 +491,17 @@ def dem_parameters(config_path, overwrite_flag=False, debug_flag=False):
     # HRU_SLOPE in radians
     logging.info('Calculating {} (Slope in Radians)'.format(
         hru.dem_slope_rad_field))
-    arcpy.CalculateField_management(
-        hru.polygon_path, hru.dem_slope_rad_field,
-        'math.pi * !{}! / 180'.format(hru.dem_slope_deg_field), 'PYTHON')
+    hru_values = gp.read_table(hru.polygon_path, [hru.dem_slope_deg_field])
+    slope_rad_array = (
+        math.pi * hru_values[hru.dem_slope_deg_field].astype(np.float64) /
+        180)
     # HRU_SLOPE in percent
     logging.info('Calculating {} (Percent Slope)'.format(
         hru.dem_slope_pct_field))
-    arcpy.CalculateField_management(
-        hru.polygon_path, hru.dem_slope_pct_field,
-        'math.tan(!{}!)'.format(hru.dem_slope_rad_field), 'PYTHON')
+    gp.write_table(hru.polygon_path, {
+        hru.dem_slope_rad_field: slope_rad_array,
+        hru.dem_slope_pct_field: np.tan(slope_rad_array)})
+    del slope_rad_array
 
     # HRU_DEPLCRV
     # deplcrv is set to 1 for all active cells when writing parameter file
@@ -510,45 +554,34 @@ def dem_parameters(config_path, overwrite_flag=False, debug_flag=False):
     # Also clear for ocean cells (HRU_TYPE == 0 and DEM_ADJ == 0)
     if True:
         logging.info('\nClearing slope/aspect parameters for lake cells')
-        hru_polygon_layer = "hru_polygon_layer"
-        arcpy.MakeFeatureLayer_management(
-            hru.polygon_path, hru_polygon_layer)
-        arcpy.SelectLayerByAttribute_management(
-            hru_polygon_layer, "NEW_SELECTION",
-            '"{0}" = 2 OR ("{0}" = 0 AND "{1}" = 0)'.format(
-                hru.type_field, hru.dem_adj_field))
-        arcpy.CalculateField_management(
-            hru_polygon_layer, hru.dem_aspect_field, 0, 'PYTHON')
-        arcpy.CalculateField_management(
-            hru_polygon_layer, hru.dem_slope_deg_field, 0, 'PYTHON')
-        arcpy.CalculateField_management(
-            hru_polygon_layer, hru.dem_slope_rad_field, 0, 'PYTHON')
-        arcpy.CalculateField_management(
-            hru_polygon_layer, hru.dem_slope_pct_field, 0, 'PYTHON')
-        # arcpy.CalculateField_management(
-        #    hru_polygon_layer, hru.deplcrv_field, 0, 'PYTHON')
-        # arcpy.CalculateField_management(
-        #    hru_polygon_layer, hru.snarea_field, 0, 'PYTHON')
-        # arcpy.CalculateField_management(
-        #    hru_polygon_layer, hru.tmax_adj_field, 0, 'PYTHON')
-        # arcpy.CalculateField_management(
-        #    hru_polygon_layer, hru.tmin_adj_field, 0, 'PYTHON')
-
-        # Should JH coefficients be cleared for lakes?
-        # logging.info('\nClearing JH parameters for ocean cells')
-        arcpy.SelectLayerByAttribute_management(
-            hru_polygon_layer, "NEW_SELECTION",
-            '"{}" = 0 AND "{}" = 0'.format(
-                hru.type_field, hru.dem_adj_field))
-        arcpy.CalculateField_management(
-            hru_polygon_layer, hru.jh_coef_field, 0, 'PYTHON')
-        arcpy.CalculateField_management(
-            hru_polygon_layer, hru.jh_tmax_field, 0, 'PYTHON')
-        arcpy.CalculateField_management(
-            hru_polygon_layer, hru.jh_tmin_field, 0, 'PYTHON')
-
-        arcpy.Delete_management(hru_polygon_layer)
-        del hru_polygon_layer
+        hru_values = gp.read_table(
+            hru.polygon_path, [
+                hru.type_field, hru.dem_adj_field, hru.dem_aspect_field,
+                hru.dem_slope_deg_field, hru.dem_slope_rad_field,
+                hru.dem_slope_pct_field, hru.jh_coef_field,
+                hru.jh_tmax_field, hru.jh_tmin_field])
+        ocean_mask = (
+            (hru_values[hru.type_field] == 0) &
+            (hru_values[hru.dem_adj_field] == 0))
+        lake_mask = (hru_values[hru.type_field] == 2) | ocean_mask
+        clear_values = dict()
+        for clear_field, clear_mask in [
+                (hru.dem_aspect_field, lake_mask),
+                (hru.dem_slope_deg_field, lake_mask),
+                (hru.dem_slope_rad_field, lake_mask),
+                (hru.dem_slope_pct_field, lake_mask),
+                # (hru.deplcrv_field, lake_mask),
+                # (hru.snarea_field, lake_mask),
+                # (hru.tmax_adj_field, lake_mask),
+                # (hru.tmin_adj_field, lake_mask),
+                # Should JH coefficients be cleared for lakes?
+                (hru.jh_coef_field, ocean_mask),
+                (hru.jh_tmax_field, ocean_mask),
+                (hru.jh_tmin_field, ocean_mask)]:
+            clear_values[clear_field] = np.where(
+                clear_mask, 0, hru_values[clear_field])
+        gp.write_table(hru.polygon_path, clear_values)
+        del hru_values, clear_values, lake_mask, ocean_mask
 
 
 def arg_parse():
@@ -588,3 +621,4 @@ if __name__ == '__main__':
     dem_parameters(
         config_path=args.ini, overwrite_flag=args.overwrite,
         debug_flag=args.loglevel==logging.DEBUG)
+    report.finish_report()
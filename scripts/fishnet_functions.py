@@ -0,0 +1,226 @@
+#--------------------------------
+# Name:         fishnet_functions.py
+# Purpose:      NumPy HRU fishnet functions
+# Notes:        ArcGIS 10.2 Version
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+import os
+import struct
+
+import numpy as np
+
+import dbf_functions as dbf
+
+
+# Square meters per acre
+sq_meters_per_acre = 4046.8564224
+
+
+def fishnet_fid_order(first_y, y_max, y_min, cs):
+    """Determine which corner the fishnet FIDs start from
+
+    Fishnet cells are numbered by row, left to right, starting from either
+        the top or the bottom row.
+
+    Args:
+        first_y (float): centroid Y of the first cell (FID 0)
+        y_max (float): fishnet extent YMax
+        y_min (float): fishnet extent YMin
+        cs (float): fishnet cellsize
+
+    Returns:
+        str: 'TOP' or 'BOTTOM' (or None if the first cell is in neither row)
+    """
+    if abs(first_y - (y_max - 0.5 * cs)) < 0.01 * cs:
+        return 'TOP'
+    elif abs(first_y - (y_min + 0.5 * cs)) < 0.01 * cs:
+        return 'BOTTOM'
+    else:
+        return None
+
+
+def fishnet_row_col(fid_array, rows, cols, fid_order='TOP'):
+    """Compute the 0's based row/column (from the top left) of each cell
+
+    Args:
+        fid_array (np.array): cell FIDs
+        rows (int): number of fishnet rows
+        cols (int): number of fishnet columns
+        fid_order (str): 'TOP' or 'BOTTOM' (see fishnet_fid_order())
+
+    Returns:
+        tuple of the row and column arrays
+    """
+    fid_array = np.asarray(fid_array, dtype=np.int64)
+    row_array = fid_array // cols
+    col_array = fid_array % cols
+    if fid_order.upper() == 'BOTTOM':
+        row_array = (rows - 1) - row_array
+    return row_array, col_array
+
+
+def fishnet_attributes(x_min, y_max, cs, rows, cols, fid_order='TOP',
+                       meters_per_unit=1.0, fid_array=None):
+    """Compute the HRU fishnet cell attributes from the grid definition
+
+    Row/Col are 1's based and numbered from the top left corner.
+    The HRU ID starts at the top left corner and works down the rows.
+    X/Y are the cell centroids.
+
+    Args:
+        x_min (float): fishnet extent XMin
+        y_max (float): fishnet extent YMax
+        cs (float): fishnet cellsize
+        rows (int): number of fishnet rows
+        cols (int): number of fishnet columns
+        fid_order (str): 'TOP' or 'BOTTOM' (see fishnet_fid_order())
+        meters_per_unit (float): fishnet linear unit conversion
+        fid_array (np.array): cell FIDs (default is all cells in FID order)
+
+    Returns:
+        dict of arrays with the keys FID, ROW, COL, ID, X, Y, and AREA
+            (cell area in acres)
+    """
+    if fid_array is None:
+        fid_array = np.arange(rows * cols, dtype=np.int64)
+    row_array, col_array = fishnet_row_col(fid_array, rows, cols, fid_order)
+    return {
+        'FID': np.asarray(fid_array, dtype=np.int64),
+        'ROW': row_array + 1,
+        'COL': col_array + 1,
+        'ID': row_array * cols + col_array + 1,
+        'X': x_min + (col_array + 0.5) * cs,
+        'Y': y_max - (row_array + 0.5) * cs,
+        'AREA': np.full(
+            len(fid_array),
+            (cs * meters_per_unit) ** 2 / sq_meters_per_acre)}
+
+
+# Shapefile record dtypes (record headers are big endian, content is little)
+_polygon_record_dtype = np.dtype([
+    ('number', '>i4'), ('length', '>i4'), ('type', '<i4'),
+    ('bbox', '<f8', (4,)), ('parts', '<i4'), ('points', '<i4'),
+    ('part_index', '<i4'), ('xy', '<f8', (10,))])
+_point_record_dtype = np.dtype([
+    ('number', '>i4'), ('length', '>i4'), ('type', '<i4'),
+    ('xy', '<f8', (2,))])
+_index_record_dtype = np.dtype([('offset', '>i4'), ('length', '>i4')])
+
+
+def write_fishnet_shapefiles(polygon_path, point_path, x_min, y_max, cs,
+                             rows, cols, field_list, point_field_list,
+                             prj_wkt, value_func=None, meters_per_unit=1.0,
+                             block_rows=256):
+    """Write the HRU fishnet polygon and centroid shapefiles directly
+
+    Cells are written in HRU ID order (FID 0 is the top left cell) one
+        block of rows at a time, so the .shp, .shx, and .dbf files are each
+        written in a single sequential pass.
+
+    Args:
+        polygon_path (str): fishnet polygon shapefile path
+        point_path (str): fishnet centroid shapefile path
+        x_min (float): fishnet extent XMin
+        y_max (float): fishnet extent YMax
+        cs (float): fishnet cellsize
+        rows (int): number of fishnet rows
+        cols (int): number of fishnet columns
+        field_list (list): polygon (field name, field type)
+        point_field_list (list): centroid (field name, field type)
+        prj_wkt (str): ESRI well known text of the spatial reference
+        value_func (function): function that takes a block of fishnet
+            attributes (see fishnet_attributes()) and returns a dictionary
+            of field values for the polygons and centroids.
+            Fields that are not returned are set to 0.
+        meters_per_unit (float): fishnet linear unit conversion
+        block_rows (int): number of fishnet rows per block
+
+    Returns:
+        None
+    """
+    x_max, y_min = x_min + cols * cs, y_max - rows * cs
+    bbox = (x_min, y_min, x_max, y_max)
+    count = rows * cols
+    shp_list = [
+        (polygon_path, 5, _polygon_record_dtype,
+         [dbf.dbf_field(*f) for f in field_list]),
+        (point_path, 1, _point_record_dtype,
+         [dbf.dbf_field(*f) for f in point_field_list])]
+
+    output_files = []
+    try:
+        for shp_path, shape_type, record_dtype, dbf_fields in shp_list:
+            base_path = os.path.splitext(shp_path)[0]
+            with open(base_path + '.prj', 'w') as prj_f:
+                prj_f.write(prj_wkt)
+            shp_f = open(base_path + '.shp', 'wb', 2 ** 20)
+            shx_f = open(base_path + '.shx', 'wb', 2 ** 20)
+            dbf_f = open(base_path + '.dbf', 'wb', 2 ** 20)
+            output_files.extend([shp_f, shx_f, dbf_f])
+            record_size = record_dtype.itemsize
+            shp_f.write(_shp_header(
+                shape_type, 50 + count * record_size // 2, bbox))
+            shx_f.write(_shp_header(shape_type, 50 + count * 4, bbox))
+            dbf_f.write(dbf.dbf_header(dbf_fields, count))
+
+        for row_start in xrange(0, rows, block_rows):
+            block_count = min(block_rows, rows - row_start) * cols
+            fid_array = np.arange(
+                row_start * cols, row_start * cols + block_count,
+                dtype=np.int64)
+            attr = fishnet_attributes(
+                x_min, y_max, cs, rows, cols, 'TOP', meters_per_unit,
+                fid_array)
+            values = value_func(attr) if value_func is not None else {}
+
+            cell_x_min = attr['X'] - 0.5 * cs
+            cell_x_max = attr['X'] + 0.5 * cs
+            cell_y_min = attr['Y'] - 0.5 * cs
+            cell_y_max = attr['Y'] + 0.5 * cs
+
+            # Polygons are written clockwise from the upper left corner
+            polygon_records = np.zeros(block_count, _polygon_record_dtype)
+            polygon_records['number'] = fid_array + 1
+            polygon_records['length'] = (_polygon_record_dtype.itemsize - 8) // 2
+            polygon_records['type'] = 5
+            polygon_records['bbox'] = np.column_stack(
+                [cell_x_min, cell_y_min, cell_x_max, cell_y_max])
+            polygon_records['parts'] = 1
+            polygon_records['points'] = 5
+            polygon_records['xy'] = np.column_stack([
+                cell_x_min, cell_y_max, cell_x_max, cell_y_max,
+                cell_x_max, cell_y_min, cell_x_min, cell_y_min,
+                cell_x_min, cell_y_max])
+
+            point_records = np.zeros(block_count, _point_record_dtype)
+            point_records['number'] = fid_array + 1
+            point_records['length'] = (_point_record_dtype.itemsize - 8) // 2
+            point_records['type'] = 1
+            point_records['xy'] = np.column_stack([attr['X'], attr['Y']])
+
+            for shp_i, records in enumerate([polygon_records, point_records]):
+                shp_f, shx_f, dbf_f = output_files[shp_i * 3:shp_i * 3 + 3]
+                record_size = records.dtype.itemsize
+                index_records = np.zeros(block_count, _index_record_dtype)
+                index_records['offset'] = (100 + fid_array * record_size) // 2
+                index_records['length'] = (record_size - 8) // 2
+                shp_f.write(records.tostring())
+                shx_f.write(index_records.tostring())
+                dbf_f.write(dbf.dbf_records(
+                    shp_list[shp_i][3], values, block_count).tostring())
+        for dbf_f in output_files[2::3]:
+            dbf_f.write(b'\x1A')
+    finally:
+        for output_f in output_files:
+            output_f.close()
+
+
+def _shp_header(shape_type, file_length, bbox):
+    """Build the 100 byte .shp/.shx file header (file length in words)"""
+    return (
+        struct.pack('>7i', 9994, 0, 0, 0, 0, 0, file_length) +
+        struct.pack('<2i', 1000, shape_type) +
+        struct.pack('<8d', bbox[0], bbox[1], bbox[2], bbox[3], 0, 0, 0, 0))
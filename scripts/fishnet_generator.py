@@ -17,6 +17,9 @@ import sys
 import arcpy
 from arcpy import env
 
+import fishnet_functions as fishnet
+import projection_functions as proj
+import report_functions as report
 import support_functions as support
 
 
@@ -53,6 +56,7 @@ def fishnet_func(config_path, overwrite_flag=False, debug_flag=False):
     log_console.setLevel(logging.DEBUG)
     log_console.setFormatter(logging.Formatter('%(message)s'))
     logging.getLogger('').addHandler(log_console)
+    report.start_report(log_file_name.replace('_log.txt', ''), hru.log_ws)
     logging.info('\nGSFLOW Fishnet Generator')
 
     # Check input paths
@@ -148,8 +152,13 @@ def fishnet_func(config_path, overwrite_flag=False, debug_flag=False):
 
     # Build hru_param
     logging.info('\nBuilding HRU parameter fishnet')
-    build_fishnet_func(
-        hru.polygon_path, hru.point_path, hru.extent, hru.cs, hru.sr)
+    if support.get_param('direct_fishnet_flag', True, inputs_cfg):
+        write_fishnet_func(hru)
+        # Copy the initial fields to the column table (if it is kept)
+        support.update_column_table(hru)
+    else:
+        build_fishnet_func(
+            hru.polygon_path, hru.point_path, hru.extent, hru.cs, hru.sr)
 
     # Write initial parameters to hru_param (X/Y, ROW/COL, Unique ID)
     # set_hru_id_func(hru.polygon_path, hru.extent, hru.cs)
@@ -180,6 +189,62 @@ def build_fishnet_func(hru_polygon_path, hru_point_path, extent, cs, sr):
     arcpy.DefineProjection_management(hru_point_path, sr)
 
 
+def write_fishnet_func(hru):
+    """Write the fishnet polygons and labels with all HRU parameter fields
+
+    The geometry, field schema, and initial values (ORIG_FID, HRU_ID,
+        ROW/COL, X/Y, lat/lon, and area) are written in one pass.
+    All other fields are set to 0.
+
+    Args:
+        hru (support.HRUParameters): HRU parameters
+
+    Returns:
+        None
+    """
+    # Remove existing
+    if arcpy.Exists(hru.polygon_path):
+        arcpy.Delete_management(hru.polygon_path)
+    if arcpy.Exists(hru.point_path):
+        arcpy.Delete_management(hru.point_path)
+
+    hru_rows, hru_cols = support.hru_grid_shape(hru)
+    logging.debug('  Rows: {}  Cols: {}'.format(hru_rows, hru_cols))
+    field_list = support.hru_field_list(hru)
+    logging.debug('  Fields: {}'.format(len(field_list)))
+
+    # Lat/Lon are left as 0 if the projection is not supported
+    #   and will be set in hru_parameters
+    hru_params = support.spatial_reference_params(hru.sr)
+    if hru_params is not None:
+        gcs_params = {
+            'projection': 'GEOGRAPHIC', 'a': hru_params['a'],
+            'f': hru_params['f'], 'datum': hru_params['datum']}
+
+    def fishnet_values(attr):
+        """"""
+        values = {
+            hru.fid_field: attr['FID'], hru.id_field: attr['ID'],
+            hru.row_field: attr['ROW'], hru.col_field: attr['COL'],
+            hru.x_field: attr['X'], hru.y_field: attr['Y'],
+            hru.area_field: attr['AREA']}
+        if hru_params is not None:
+            values[hru.lon_field], values[hru.lat_field] = (
+                proj.transform_points(
+                    attr['X'], attr['Y'], hru_params, gcs_params))
+        return values
+
+    # exportToString() appends the XY/Z/M domains after the WKT
+    with report.stage('fishnet_write', hru_rows * hru_cols) as stage:
+        fishnet.write_fishnet_shapefiles(
+            hru.polygon_path, hru.point_path, hru.extent.XMin, hru.extent.YMax,
+            hru.cs, hru_rows, hru_cols, field_list, [(hru.fid_field, 'LONG')],
+            hru.sr.exportToString().split(';')[0], fishnet_values,
+            hru.sr.metersPerUnit)
+        stage.add_file(hru.polygon_path)
+        stage.add_file(hru.point_path)
+
+
 def arg_parse():
     """"""
     parser = argparse.ArgumentParser(
@@ -217,3 +282,4 @@ if __name__ == '__main__':
     fishnet_func(
         config_path=args.ini, overwrite_flag=args.overwrite,
         debug_flag=args.loglevel==logging.DEBUG)
+    report.finish_report()
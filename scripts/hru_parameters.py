@@ -8,6 +8,7 @@
 #--------------------------------
 
 import argparse
+from collections import OrderedDict
 import ConfigParser
 import datetime as dt
 import logging
@@ -17,6 +18,11 @@ import sys
 import arcpy
 from arcpy import env
 
+import numpy as np
+
+import fishnet_functions as fishnet
+import projection_functions as proj
+import report_functions as report
 import support_functions as support
 
 
@@ -33,7 +39,7 @@ def hru_parameters(config_path, overwrite_flag=False, debug_flag=False):
     """
 
     # Initialize hru parameters class
-    hru = support.HRUParameters(config_path)
+    hru = support.get_hru_parameters(config_path)
 
     # Open input parameter config file
     inputs_cfg = ConfigParser.ConfigParser()
@@ -53,6 +59,7 @@ def hru_parameters(config_path, overwrite_flag=False, debug_flag=False):
     log_console.setLevel(logging.DEBUG)
     log_console.setFormatter(logging.Formatter('%(message)s'))
     logging.getLogger('').addHandler(log_console)
+    report.start_report(log_file_name.replace('_log.txt', ''), hru.log_ws)
     logging.info('\nGSFLOW HRU Parameters')
 
     # Read parameters from config file
@@ -68,13 +75,10 @@ def hru_parameters(config_path, overwrite_flag=False, debug_flag=False):
         lake_area_pct = inputs_cfg.getfloat('INPUTS', 'lake_area_pct')
 
     # Control flags
-    calc_flow_acc_dem_flag = inputs_cfg.getboolean('INPUTS', 'calc_flow_acc_dem_flag')
-    calc_topo_index_flag = inputs_cfg.getboolean('INPUTS', 'calc_topo_index_flag')
+    # The flow accumulation, topographic index, and layer thickness flags
+    #   are read by HRUParameters and set the fields in hru_field_list
     clip_root_depth_flag = inputs_cfg.getboolean('INPUTS', 'clip_root_depth_flag')
     # set_ppt_zones_flag = inputs_cfg.getboolean('INPUTS', 'set_ppt_zones_flag')
-    # Calculate layer thickness and bottoms
-    calc_layer_thickness_flag = inputs_cfg.getboolean(
-        'INPUTS', 'calc_layer_thickness_flag')
 
 
     # Check input paths
@@ -188,174 +192,44 @@ def hru_parameters(config_path, overwrite_flag=False, debug_flag=False):
 
     # Add all output fields
     logging.info('\nAdding fields if necessary')
-    logging.info(
-        '  You may see duplicate field names when writing to a network drive')
-
-    # HRU/DEM Fields
-    support.add_field_func(hru.polygon_path, hru.fid_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.id_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.type_in_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.type_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.dem_mean_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_median_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_min_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_max_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_adj_field, 'DOUBLE')
-    if calc_flow_acc_dem_flag:
-        support.add_field_func(hru.polygon_path, hru.dem_flowacc_field, 'DOUBLE')
-        support.add_field_func(hru.polygon_path, hru.dem_sum_field, 'DOUBLE')
-        support.add_field_func(hru.polygon_path, hru.dem_count_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_sink8_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_sink4_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.crt_elev_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.crt_fill_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_aspect_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.dem_slope_deg_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_slope_rad_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_slope_pct_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.dem_feet_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.area_field, 'DOUBLE')
-    if calc_topo_index_flag:
-        support.add_field_func(hru.polygon_path, hru.topo_index_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.row_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.col_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.x_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.y_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.lat_field, 'DOUBLE')
-    support.add_field_func(hru.polygon_path, hru.lon_field, 'DOUBLE')
-
-    # Lake fields
-    support.add_field_func(hru.polygon_path, hru.lake_id_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.lake_area_field, 'DOUBLE')
-
-    # Stream fields
-    support.add_field_func(hru.polygon_path, hru.iseg_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.irunbound_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.flow_dir_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.krch_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.irch_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.jrch_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.iseg_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.reach_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.rchlen_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.maxreach_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.outseg_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.iupseg_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.subbasin_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.segbasin_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.outflow_field, 'LONG')
-    support.add_field_func(hru.polygon_path, hru.strm_top_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.strm_slope_field, 'FLOAT')
-
-    # PPT Zone fields
-    # if set_ppt_zones_flag:
-    support.add_field_func(hru.polygon_path, hru.ppt_zone_id_field, 'SHORT')
-
-    # DEM based
-    # add_field_func(hru.polygon_path, hru.deplcrv_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.jh_tmax_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.jh_tmin_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.jh_coef_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.snarea_thresh_field, 'FLOAT')
-
-    # Aspect based
-    support.add_field_func(hru.polygon_path, hru.tmax_adj_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.tmin_adj_field, 'FLOAT')
-
-    # Vegetation fields
-    support.add_field_func(hru.polygon_path, hru.cov_type_field, 'SHORT')
-    support.add_field_func(hru.polygon_path, hru.covden_sum_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.covden_win_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.rad_trncf_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.snow_intcp_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.srain_intcp_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.wrain_intcp_field, 'FLOAT')
-
-    # Soil fields
-    support.add_field_func(hru.polygon_path, hru.awc_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.clay_pct_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.sand_pct_field, 'FLOAT')
-    # add_field_func(hru.polygon_path, hru.silt_pct_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.ksat_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.soil_depth_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.root_depth_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.soil_type_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.moist_init_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.moist_max_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.rechr_init_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.rechr_max_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.ssr2gw_rate_field, 'FLOAT')
-    # add_field_func(hru.polygon_path, hru.pref_flow_den_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.slowcoef_lin_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.slowcoef_sq_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.fastcoef_lin_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.fastcoef_sq_field, 'FLOAT')
-
-    # Impervious fields
-    support.add_field_func(hru.polygon_path, hru.imperv_pct_field, 'FLOAT')
-    # add_field_func(hru.polygon_path, hru.carea_min_field, 'FLOAT')
-    support.add_field_func(hru.polygon_path, hru.carea_max_field, 'FLOAT')
-
-    # PRISM mean monthly fields
-    month_list = ['{:02d}'.format(m) for m in range(1, 13)]
-    month_list.extend(['14'])
-    for prism_data_name in ['PPT', 'TMAX', 'TMIN']:
-        for month in month_list:
-            support.add_field_func(
-                hru.polygon_path,
-                '{}_{}'.format(prism_data_name, month), 'FLOAT')
-    # PRISM mean monthly PPT ratio fields
-    for month in month_list:
-        if month == '14':
-            continue
-        support.add_field_func(
-            hru.polygon_path, 'PPT_RT_{}'.format(month), 'FLOAT')
-
-    # Layer thickness and bottom fields
-    if calc_layer_thickness_flag:
-        support.add_field_func(hru.polygon_path, hru.alluv_field, 'FLOAT')
-        support.add_field_func(hru.polygon_path, hru.alluv_thick_field, 'FLOAT')
-        support.add_field_func(hru.polygon_path, hru.lay1_thick_field, 'FLOAT')
-        support.add_field_func(hru.polygon_path, hru.lay2_thick_field, 'FLOAT')
-        support.add_field_func(hru.polygon_path, hru.lay3_thick_field, 'FLOAT')
-        support.add_field_func(hru.polygon_path, hru.lay4_thick_field, 'FLOAT')
-        support.add_field_func(hru.polygon_path, hru.lay1_bottom_field, 'FLOAT')
-        support.add_field_func(hru.polygon_path, hru.lay2_bottom_field, 'FLOAT')
-        support.add_field_func(hru.polygon_path, hru.lay3_bottom_field, 'FLOAT')
-        support.add_field_func(hru.polygon_path, hru.lay4_bottom_field, 'FLOAT')
-
+    support.add_fields_func(hru.polygon_path, support.hru_field_list(hru))
 
     # Id field is added by default to new fishnets
     if arcpy.ListFields(hru.polygon_path, 'Id'):
         arcpy.DeleteField_management(hru.polygon_path, 'Id')
 
     logging.info('\nCalculating parameters')
-    # Keep original FID for subsetting in zonal stats
-    logging.info('  Saving original HRU FID to {}'.format(
-        hru.fid_field))
-    arcpy.CalculateField_management(
-        hru.polygon_path, hru.fid_field, '!FID!', 'PYTHON')
-
-    # Cell X/Y
-    logging.info('  Calculating cell X/Y')
-    cell_xy_func(hru.polygon_path, hru.x_field, hru.y_field)
-
-    # Create unique ID, start at top left corner, work down rows
-    # Row/Col numbered from top left corner (1's based numbering)
-    logging.info('  Calculating cell ID/row/col')
-    cell_id_col_row_func(
-        hru.polygon_path, hru.id_field, hru.col_field, hru.row_field,
-        hru.extent, hru.cs)
-
-    # Cell Lat/Lon
-    logging.info('  Calculating cell lat/lon')
-    cell_lat_lon_func(
-        hru.polygon_path, hru.lat_field, hru.lon_field, hru.sr.GCS)
-
-    # Cell Area
-    logging.info('  Calculating cell area (acres)')
-    arcpy.CalculateField_management(
-        hru.polygon_path, hru.area_field, '!SHAPE.AREA@acres!', 'PYTHON')
+    # Compute the cell attributes from the fishnet grid definition
+    # Fall back on the geometry cursors if the fishnet isn't regular
+    logging.info('  Calculating cell FID/ID/row/col/X/Y/lat/lon/area')
+    if not fishnet_attributes_func(hru):
+        # Keep original FID for subsetting in zonal stats
+        logging.info('  Saving original HRU FID to {}'.format(
+            hru.fid_field))
+        arcpy.CalculateField_management(
+            hru.polygon_path, hru.fid_field, '!FID!', 'PYTHON')
+
+        # Cell X/Y
+        logging.info('  Calculating cell X/Y')
+        cell_xy_func(hru.polygon_path, hru.x_field, hru.y_field)
+
+        # Create unique ID, start at top left corner, work down rows
+        # Row/Col numbered from top left corner (1's based numbering)
+        logging.info('  Calculating cell ID/row/col')
+        cell_id_col_row_func(
+            hru.polygon_path, hru.id_field, hru.col_field, hru.row_field,
+            hru.extent, hru.cs)
+
+        # Cell Lat/Lon
+        logging.info('  Calculating cell lat/lon')
+        cell_lat_lon_func(
+            hru.polygon_path, hru.lat_field, hru.lon_field, hru.sr,
+            hru.x_field, hru.y_field)
+
+        # Cell Area
+        logging.info('  Calculating cell area (acres)')
+        arcpy.CalculateField_management(
+            hru.polygon_path, hru.area_field, '!SHAPE.AREA@acres!', 'PYTHON')
 
     # Reset HRUTYPE_IN / HRU_TYPE
     logging.info('\nResetting {} to 0'.format(hru.type_in_field))
@@ -440,18 +314,21 @@ def hru_parameters(config_path, overwrite_flag=False, debug_flag=False):
                 except:
                     pass
 
+        # Compute the lake/cell overlap once for both fields
+        lake_overlap = support.zone_overlap_func(lake_clip_path, hru)
         # Set lake HRU_TYPE
         logging.info('  Setting lake {}'.format(hru.type_in_field))
         support.zone_by_area_func(
             lake_clip_path, hru.type_in_field, 2,
             hru.polygon_path, hru, hru.area_field,
-            hru.lake_area_field, lake_area_pct)
+            hru.lake_area_field, lake_area_pct, lake_overlap)
         # Set lake ID
         logging.info('  Setting {}'.format(hru.lake_id_field))
         support.zone_by_area_func(
             lake_clip_path, hru.lake_id_field, lake_zone_field,
             hru.polygon_path, hru, hru.area_field,
-            hru.lake_area_field, lake_area_pct)
+            hru.lake_area_field, lake_area_pct, lake_overlap)
+        del lake_overlap
         # Cleanup
         del lake_layer, lake_desc, lake_sr
 
@@ -467,6 +344,90 @@ def hru_parameters(config_path, overwrite_flag=False, debug_flag=False):
     del study_area_desc, study_area_sr
 
 
+def fishnet_attributes_func(hru, sample_size=100):
+    """Compute and write the fishnet cell attributes in one pass
+
+    On a regular fishnet the ORIG_FID, X/Y, row/col, ID, lat/lon, and area
+        of each cell follow from the extent, cellsize, and FID order.
+    A random sample of cells is checked against the geometries before
+        any values are written.
+
+    Args:
+        hru (support.HRUParameters): HRU parameters
+        sample_size (int): number of cells to check against the geometries
+
+    Returns:
+        bool: False if the fishnet is not a regular, row ordered fishnet
+            (nothing is written)
+    """
+    hru_rows, hru_cols = support.hru_grid_shape(hru)
+    fid_array = arcpy.da.TableToNumPyArray(hru.polygon_path, ['OID@'])['OID@']
+    if (len(fid_array) != hru_rows * hru_cols or
+            not np.array_equal(fid_array, np.arange(len(fid_array)))):
+        logging.info(
+            '  Fishnet cells are not sequential, using the cell geometries')
+        return False
+
+    # The first cell sets the FID order
+    oid_field = arcpy.Describe(hru.polygon_path).OIDFieldName
+    oid_sql = '{} = 0'.format(
+        arcpy.AddFieldDelimiters(hru.polygon_path, oid_field))
+    with arcpy.da.SearchCursor(
+            hru.polygon_path, ['SHAPE@XY'], oid_sql) as s_cursor:
+        first_y = next(s_cursor)[0][1]
+    fid_order = fishnet.fishnet_fid_order(
+        first_y, hru.extent.YMax, hru.extent.YMin, hru.cs)
+    if fid_order is None:
+        logging.info(
+            '  Fishnet cell order is unknown, using the cell geometries')
+        return False
+    logging.debug('  Fishnet cells are numbered from the {} row'.format(
+        fid_order.lower()))
+
+    attr = fishnet.fishnet_attributes(
+        hru.extent.XMin, hru.extent.YMax, hru.cs, hru_rows, hru_cols,
+        fid_order, hru.sr.metersPerUnit)
+
+    # Check a random sample of cells against the geometries
+    sample_fid_list = sorted(np.random.choice(
+        fid_array, min(sample_size, len(fid_array)), replace=False))
+    sample_sql = '{} IN ({})'.format(
+        arcpy.AddFieldDelimiters(hru.polygon_path, oid_field),
+        ','.join(map(str, sample_fid_list)))
+    fields = ['OID@', 'SHAPE@XY', 'SHAPE@AREA']
+    area_factor = hru.sr.metersPerUnit ** 2 / fishnet.sq_meters_per_acre
+    with arcpy.da.SearchCursor(
+            hru.polygon_path, fields, sample_sql) as s_cursor:
+        for fid, (x, y), area in s_cursor:
+            if (abs(x - attr['X'][fid]) > 0.001 * hru.cs or
+                    abs(y - attr['Y'][fid]) > 0.001 * hru.cs or
+                    abs(area * area_factor - attr['AREA'][fid]) >
+                    0.001 * attr['AREA'][fid]):
+                logging.info(
+                    '  Cell {} does not match the fishnet grid, '
+                    'using the cell geometries'.format(fid))
+                return False
+
+    # Lat/Lon are computed with the cursor if the projection isn't supported
+    lon_lat = cell_lat_lon_arrays(attr['X'], attr['Y'], hru.sr)
+
+    # The cells are in FID order, so the arrays are written directly
+    values = OrderedDict([
+        (hru.fid_field, fid_array), (hru.x_field, attr['X']),
+        (hru.y_field, attr['Y']), (hru.col_field, attr['COL']),
+        (hru.row_field, attr['ROW']), (hru.id_field, attr['ID']),
+        (hru.area_field, attr['AREA'])])
+    if lon_lat is not None:
+        values[hru.lon_field] = lon_lat[0]
+        values[hru.lat_field] = lon_lat[1]
+    support.write_table_columns(hru.polygon_path, values)
+    if lon_lat is None:
+        cell_lat_lon_func(
+            hru.polygon_path, hru.lat_field, hru.lon_field, hru.sr,
+            hru.x_field, hru.y_field)
+    return True
+
+
 def cell_xy_func(hru_param_path, x_field, y_field):
     """"""
     fields = ('SHAPE@XY', x_field, y_field)
@@ -477,14 +438,59 @@ def cell_xy_func(hru_param_path, x_field, y_field):
             del row
 
 
-def cell_lat_lon_func(hru_param_path, lat_field, lon_field, gcs_sr):
-    """"""
-    fields = ('SHAPE@XY', lon_field, lat_field)
-    with arcpy.da.UpdateCursor(hru_param_path, fields, '', gcs_sr) as u_cursor:
-        for row in u_cursor:
-            row[1], row[2] = row[0]
-            u_cursor.updateRow(row)
-            del row
+def cell_lat_lon_func(hru_param_path, lat_field, lon_field, hru_sr,
+                      x_field, y_field):
+    """Compute the cell centroid lat/lon in the HRU geographic coordinates
+
+    The cell X/Y are converted in one NumPy call if the HRU projection is
+        supported, otherwise each centroid is projected by the cursor.
+
+    Args:
+        hru_param_path (str): HRU parameters feature class path
+        lat_field (str): latitude field name
+        lon_field (str): longitude field name
+        hru_sr (arcpy.SpatialReference): HRU spatial reference
+        x_field (str): cell centroid X field name
+        y_field (str): cell centroid Y field name
+
+    Returns:
+        None
+    """
+    xy_values = support.read_table_columns(
+        hru_param_path, [x_field, y_field])
+    lon_lat = cell_lat_lon_arrays(
+        xy_values[x_field], xy_values[y_field], hru_sr)
+    if lon_lat is None:
+        logging.debug(
+            '  {} is not supported, projecting with arcpy'.format(
+                hru_sr.projectionName))
+        fields = ('SHAPE@XY', lon_field, lat_field)
+        with arcpy.da.UpdateCursor(
+                hru_param_path, fields, '', hru_sr.GCS) as u_cursor:
+            for row in u_cursor:
+                row[1], row[2] = row[0]
+                u_cursor.updateRow(row)
+                del row
+        return
+    support.write_table_columns(
+        hru_param_path,
+        OrderedDict([(lon_field, lon_lat[0]), (lat_field, lon_lat[1])]))
+
+
+def cell_lat_lon_arrays(x_array, y_array, hru_sr):
+    """Convert cell X/Y arrays to lat/lon in the HRU geographic coordinates
+
+    Returns:
+        tuple of the lon and lat arrays,
+            or None if the HRU projection is not supported
+    """
+    hru_params = support.spatial_reference_params(hru_sr)
+    if hru_params is None:
+        return None
+    gcs_params = {
+        'projection': 'GEOGRAPHIC', 'a': hru_params['a'],
+        'f': hru_params['f'], 'datum': hru_params['datum']}
+    return proj.transform_points(x_array, y_array, hru_params, gcs_params)
 
 
 def cell_id_col_row_func(hru_param_path, id_field, col_field, row_field,
@@ -540,3 +546,4 @@ if __name__ == '__main__':
     hru_parameters(
         config_path=args.ini, overwrite_flag=args.overwrite,
         debug_flag=args.loglevel==logging.DEBUG)
+    report.finish_report()
@@ -0,0 +1,387 @@
+#--------------------------------
+# Name:         network_functions.py
+# Purpose:      Stream segment and subbasin routing graphs
+# Notes:        ArcGIS 10.2 Version
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+import numpy as np
+
+import terrain_functions as terrain
+
+
+# Segment/subbasin ID of flow leaving the network (the same as exit_seg)
+exit_id = 0
+
+# Name of the saved network in the parameter folder
+network_name = 'stream_network.npz'
+
+# Saved network format version
+network_version = 2
+
+# Arrays that are saved (the graphs are rebuilt from the IDs when loaded)
+network_arrays = [
+    'cell_i', 'col', 'row', 'flow_dir', 'down_i', 'seg', 'subbasin', 'reach',
+    'maxreach', 'seg_ids', 'seg_down_ids', 'subbasin_ids',
+    'subbasin_down_ids']
+
+
+class RoutingGraph(object):
+    """Routing graph where each node (segment or subbasin) has one downstream
+
+    Nodes are stored in ID order and referenced by their index.  The
+        downstream node of node i is down_i[i] (-1 if it flows out of the
+        network) and the upstream nodes are stored in compressed sparse row
+        (CSR) arrays, up_i[up_ptr[i]:up_ptr[i + 1]].
+    """
+
+    def __init__(self, ids, down_ids):
+        """Build the graph
+
+        Args:
+            ids (np.array): unique node IDs
+            down_ids (np.array): downstream node ID of each node (exit_id or
+                an ID that isn't a node flows out of the network)
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(ids, kind='mergesort')
+        self.ids = ids[order]
+        if np.any(self.ids[1:] == self.ids[:-1]):
+            raise ValueError('routing graph node IDs are not unique')
+        self.down_i = self.index(np.asarray(down_ids, dtype=np.int64)[order])
+        self.down_ids = np.where(
+            self.down_i >= 0, self.ids[np.maximum(self.down_i, 0)], exit_id)
+
+        up_i = np.flatnonzero(self.down_i >= 0)
+        self.up_i = up_i[np.argsort(self.down_i[up_i], kind='mergesort')]
+        self.up_ptr = np.zeros(len(self.ids) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(self.down_i[up_i], minlength=len(self.ids)),
+            out=self.up_ptr[1:])
+        self._order = None
+        self._pour_ids = None
+
+    @property
+    def count(self):
+        """Number of nodes"""
+        return len(self.ids)
+
+    def index(self, node_ids):
+        """Return the index of each node ID (-1 if it isn't a node)"""
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.full(node_ids.shape, -1, dtype=np.int64)
+        node_i = np.minimum(
+            np.searchsorted(self.ids, node_ids), len(self.ids) - 1)
+        return np.where(self.ids[node_i] == node_ids, node_i, -1)
+
+    def lookup(self, node_values, node_ids, default=0):
+        """Return the node values for an array of node IDs
+
+        Args:
+            node_values (np.array): value of each node (in node order)
+            node_ids (np.array): IDs to look up
+            default: value of the IDs that aren't nodes
+
+        Returns:
+            np.array
+        """
+        node_i = self.index(node_ids)
+        if not len(self.ids):
+            return np.full(node_i.shape, default)
+        return np.where(
+            node_i >= 0, np.asarray(node_values)[np.maximum(node_i, 0)],
+            default)
+
+    def _node_i(self, node_id):
+        """"""
+        node_i = int(self.index([node_id])[0])
+        if node_i < 0:
+            raise ValueError('{} is not in the routing graph'.format(node_id))
+        return node_i
+
+    def downstream_id(self, node_id):
+        """Return the ID of the downstream node (exit_id if it exits)"""
+        return int(self.down_ids[self._node_i(node_id)])
+
+    def upstream_ids(self, node_id):
+        """Return the IDs of the nodes that flow directly into a node"""
+        node_i = self._node_i(node_id)
+        return self.ids[self.up_i[self.up_ptr[node_i]:self.up_ptr[node_i + 1]]]
+
+    def topological_order(self):
+        """Return the node indices ordered so every node is before its
+            downstream node
+
+        Nodes are added one "generation" at a time, starting from the nodes
+            that nothing flows into (the same as flow_accumulation).
+
+        Returns:
+            np.array of node indices
+        """
+        if self._order is not None:
+            return self._order
+        up_count = np.diff(self.up_ptr)
+        order_list = []
+        node_i = np.flatnonzero(up_count == 0)
+        while len(node_i):
+            order_list.append(node_i)
+            down_i = self.down_i[node_i]
+            unique_i, count = np.unique(
+                down_i[down_i >= 0], return_counts=True)
+            up_count[unique_i] -= count
+            node_i = unique_i[up_count[unique_i] == 0]
+        if order_list:
+            order = np.concatenate(order_list)
+        else:
+            order = np.zeros(0, dtype=np.int64)
+        if len(order) != len(self.ids):
+            raise ValueError('routing loop through nodes {}'.format(
+                self.ids[up_count > 0][:10].tolist()))
+        self._order = order
+        return order
+
+    def pour_ids(self):
+        """Return the ID of the last node before the exit for every node
+
+        The pour points are found by pointer jumping, each pass doubles the
+            number of nodes that are skipped.
+        """
+        if self._pour_ids is not None:
+            return self._pour_ids
+        # A loop would never reach a pour point
+        self.topological_order()
+        pour_i = np.where(
+            self.down_i >= 0, self.down_i, np.arange(len(self.ids)))
+        while True:
+            next_i = pour_i[pour_i]
+            if np.array_equal(next_i, pour_i):
+                break
+            pour_i = next_i
+        self._pour_ids = self.ids[pour_i]
+        return self._pour_ids
+
+
+class StreamNetwork(object):
+    """Cell, segment, and subbasin routing of the stream and lake cells
+
+    Network cells are stored in HRU record order.  The downstream network
+        cell of cell i is down_i[i] (-1 if the cell flows out of the network)
+        and seg is the segment (IRUNBOUND) of each cell, lake segments are
+        negative.  The segment and subbasin graphs are RoutingGraphs.
+    """
+
+    def __init__(self, hru_count, **arrays):
+        """Build the graphs from the network arrays (see from_cells())"""
+        self.hru_count = int(hru_count)
+        for name in network_arrays:
+            setattr(self, name, np.asarray(arrays[name], dtype=np.int64))
+        self.seg_graph = RoutingGraph(self.seg_ids, self.seg_down_ids)
+        self.subbasin_graph = RoutingGraph(
+            self.subbasin_ids, self.subbasin_down_ids)
+
+    @classmethod
+    def from_cells(cls, col_array, row_array, flow_dir_array, seg_array,
+                   subbasin_array, cell_mask):
+        """Build the network from the HRU cell routing
+
+        Each stream segment must have one out cell (the cell that the last
+            reach flows into).  Lake segments can only have more than one out
+            cell if all of them are outside the network, the lake then flows
+            out of the network.
+
+        Args:
+            col_array (np.array): 1's based HRU column
+            row_array (np.array): 1's based HRU row
+            flow_dir_array (np.array): HRU D8 flow direction
+            seg_array (np.array): HRU segment (IRUNBOUND)
+            subbasin_array (np.array): HRU subbasin
+            cell_mask (np.array): HRUs in the network (stream and lake cells)
+
+        Returns:
+            StreamNetwork
+
+        Raises:
+            ValueError: if a segment doesn't have a valid out cell or stream
+                cells flow in a loop
+        """
+        cell_i = np.flatnonzero(cell_mask)
+        col = np.asarray(col_array, dtype=np.int64)[cell_i]
+        row = np.asarray(row_array, dtype=np.int64)[cell_i]
+        flow_dir = np.asarray(flow_dir_array, dtype=np.int64)[cell_i]
+        seg = np.asarray(seg_array, dtype=np.int64)[cell_i]
+        subbasin = np.asarray(subbasin_array, dtype=np.int64)[cell_i]
+        cell_count = len(cell_i)
+
+        # Downstream cell (cells without a D8 direction flow to themselves)
+        next_col, next_row = col.copy(), row.copy()
+        for code, (dr, dc) in zip(terrain.d8_codes, terrain.d8_offsets):
+            code_mask = flow_dir == code
+            next_row[code_mask] += dr
+            next_col[code_mask] += dc
+        # Cell keys are offset by one so the cells outside the grid are valid
+        key_cols = int(col.max()) + 3 if cell_count else 3
+        key = (row + 1) * key_cols + col + 1
+        next_key = (next_row + 1) * key_cols + next_col + 1
+        del next_col, next_row
+        down_i = np.full(cell_count, -1, dtype=np.int64)
+        if cell_count:
+            key_order = np.argsort(key)
+            key_pos = np.minimum(
+                np.searchsorted(key[key_order], next_key), cell_count - 1)
+            down_mask = key[key_order][key_pos] == next_key
+            down_i[down_mask] = key_order[key_pos][down_mask]
+            del key_order, key_pos, down_mask
+
+        # Out cells of each segment
+        down_seg = np.where(down_i >= 0, seg[np.maximum(down_i, 0)], exit_id)
+        out_mask = (down_i < 0) | (down_seg != seg)
+        seg_ids = np.unique(seg[seg != exit_id])
+        out_seg = seg[out_mask & (seg != exit_id)]
+        out_key = next_key[out_mask & (seg != exit_id)]
+        out_down_seg = down_seg[out_mask & (seg != exit_id)]
+        out_network = (down_i >= 0)[out_mask & (seg != exit_id)]
+        out_order = np.lexsort((out_key, out_seg))
+        out_seg = out_seg[out_order]
+        out_key = out_key[out_order]
+        out_down_seg = out_down_seg[out_order]
+        out_network = out_network[out_order]
+        unique_mask = np.ones(len(out_seg), dtype=np.bool)
+        unique_mask[1:] = (
+            (out_seg[1:] != out_seg[:-1]) | (out_key[1:] != out_key[:-1]))
+        out_seg = out_seg[unique_mask]
+        out_key = out_key[unique_mask]
+        out_down_seg = out_down_seg[unique_mask]
+        out_network = out_network[unique_mask]
+        del out_order, unique_mask
+
+        out_seg_i = np.searchsorted(seg_ids, out_seg)
+        out_count = np.bincount(out_seg_i, minlength=len(seg_ids))
+        # Number of out cells of each segment that are in the network
+        network_count = np.bincount(
+            out_seg_i[out_network], minlength=len(seg_ids))
+        bad_ids = seg_ids[
+            ((seg_ids > 0) & (out_count != 1)) |
+            ((seg_ids < 0) & (out_count > 1) & (network_count > 0))]
+        if len(bad_ids):
+            bad_key = out_key[out_seg == bad_ids[0]]
+            raise ValueError(
+                ('ISEG {} does not have one output cell' +
+                 '\n  Out cells: {}').format(bad_ids[0], zip(
+                     (bad_key % key_cols - 1).tolist(),
+                     (bad_key // key_cols - 1).tolist())))
+        seg_down_ids = np.full(len(seg_ids), exit_id, dtype=np.int64)
+        single_mask = out_count[out_seg_i] == 1
+        seg_down_ids[out_seg_i[single_mask]] = out_down_seg[single_mask]
+        del out_seg, out_key, out_down_seg, out_network, out_seg_i
+        del single_mask, network_count
+
+        # Reach number of the stream cells from the distance to the last
+        #   reach of the segment (by pointer jumping)
+        within_mask = (
+            ~out_mask & (seg > 0) & (down_i != np.arange(cell_count)))
+        next_i = np.where(within_mask, down_i, np.arange(cell_count))
+        distance = within_mask.astype(np.int64)
+        for _ in xrange(max(cell_count, 1).bit_length() + 1):
+            if np.array_equal(next_i[next_i], next_i):
+                break
+            distance += distance[next_i]
+            next_i = next_i[next_i]
+        if np.any(within_mask[next_i]):
+            raise ValueError('stream cells flow in a loop in ISEG {}'.format(
+                np.unique(seg[within_mask[next_i]])[:10].tolist()))
+        stream_mask = seg > 0
+        seg_i = np.searchsorted(seg_ids, seg[stream_mask])
+        maxreach = np.zeros(cell_count, dtype=np.int64)
+        maxreach[stream_mask] = np.bincount(
+            seg_i, minlength=len(seg_ids))[seg_i]
+        reach = np.where(stream_mask, maxreach - distance, 0)
+        del within_mask, next_i, distance, seg_i
+
+        # Subbasins flow into the subbasin of the first cell outside them,
+        #   a downstream subbasin is used before leaving the network
+        subbasin_ids = np.unique(subbasin[subbasin != exit_id])
+        down_subbasin = np.where(
+            down_i >= 0, subbasin[np.maximum(down_i, 0)], exit_id)
+        edge_mask = (subbasin != exit_id) & (down_subbasin != subbasin)
+        edge_sub = subbasin[edge_mask]
+        edge_down = down_subbasin[edge_mask]
+        edge_order = np.lexsort((edge_down, edge_down == exit_id, edge_sub))
+        edge_sub = edge_sub[edge_order]
+        edge_down = edge_down[edge_order]
+        first_mask = np.ones(len(edge_sub), dtype=np.bool)
+        first_mask[1:] = edge_sub[1:] != edge_sub[:-1]
+        subbasin_down_ids = np.full(
+            len(subbasin_ids), exit_id, dtype=np.int64)
+        subbasin_down_ids[np.searchsorted(
+            subbasin_ids, edge_sub[first_mask])] = edge_down[first_mask]
+
+        return cls(
+            len(cell_mask), cell_i=cell_i, col=col, row=row,
+            flow_dir=flow_dir, down_i=down_i, seg=seg, subbasin=subbasin,
+            reach=reach, maxreach=maxreach,
+            seg_ids=seg_ids, seg_down_ids=seg_down_ids,
+            subbasin_ids=subbasin_ids, subbasin_down_ids=subbasin_down_ids)
+
+    @classmethod
+    def load(cls, network_path):
+        """Load a saved network"""
+        network_npz = np.load(network_path)
+        try:
+            if int(network_npz['version']) != network_version:
+                raise ValueError(
+                    'unsupported stream network version: {}'.format(
+                        int(network_npz['version'])))
+            return cls(
+                int(network_npz['hru_count']),
+                **dict((name, network_npz[name]) for name in network_arrays))
+        finally:
+            network_npz.close()
+
+    def save(self, network_path):
+        """Save the network arrays to a .npz file"""
+        np.savez(
+            network_path, version=network_version, hru_count=self.hru_count,
+            **dict((name, getattr(self, name)) for name in network_arrays))
+
+    def is_current(self, col_array, row_array, flow_dir_array, seg_array,
+                   subbasin_array, cell_mask):
+        """Return True if the network was built from the same HRU values
+
+        The arguments are the same as from_cells().
+        """
+        cell_i = np.flatnonzero(cell_mask)
+        return (
+            len(cell_mask) == self.hru_count and
+            np.array_equal(cell_i, self.cell_i) and
+            np.array_equal(np.asarray(col_array)[cell_i], self.col) and
+            np.array_equal(np.asarray(row_array)[cell_i], self.row) and
+            np.array_equal(
+                np.asarray(flow_dir_array)[cell_i], self.flow_dir) and
+            np.array_equal(np.asarray(seg_array)[cell_i], self.seg) and
+            np.array_equal(np.asarray(subbasin_array)[cell_i], self.subbasin))
+
+    def hru_values(self, cell_values, default=0):
+        """Return an HRU array of network cell values (default elsewhere)"""
+        cell_values = np.asarray(cell_values)
+        hru_array = np.full(self.hru_count, default, dtype=cell_values.dtype)
+        hru_array[self.cell_i] = cell_values
+        return hru_array
+
+    def outseg(self):
+        """Return the OUTSEG of each network cell"""
+        return self.seg_graph.lookup(self.seg_graph.down_ids, self.seg)
+
+    def lake_upsegs(self):
+        """Return the lake segment (IUPSEG) that flows into each segment
+
+        Segments without an upstream lake are 0.  If more than one lake
+            flows into a segment, the lowest lake segment is used.
+        """
+        graph = self.seg_graph
+        upseg_ids = np.zeros(graph.count, dtype=np.int64)
+        lake_i = np.flatnonzero((graph.ids < 0) & (graph.down_i >= 0))
+        np.minimum.at(upseg_ids, graph.down_i[lake_i], graph.ids[lake_i])
+        return upseg_ids
@@ -0,0 +1,688 @@
+#--------------------------------
+# Name:         pipeline_runner.py
+# Purpose:      Run the GSFLOW parameter scripts as a dependency graph
+# Notes:        ArcGIS 10.2 Version
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+import argparse
+from collections import namedtuple, OrderedDict
+import ConfigParser
+import datetime as dt
+import importlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import dbf_functions as dbf
+import report_functions as report
+
+# Running the stages in process needs ArcGIS
+try:
+    import arcpy
+    import support_functions as support
+except ImportError:
+    arcpy, support = None, None
+
+
+# Pipeline stage
+#   name: script name (without .py)
+#   function: script function name (for running the stage in process)
+#   inputs: fields and rasters the stage reads
+#   outputs: fields and rasters the stage writes
+#   args: extra command line arguments
+#   kwargs: extra function keyword arguments (the same as args)
+#   in_place_flag: stage creates or changes the fishnet/centroid geometry,
+#       it runs by itself on the fishnet instead of a copy
+PipelineStage = namedtuple(
+    'PipelineStage',
+    ['name', 'function', 'inputs', 'outputs', 'args', 'kwargs',
+     'in_place_flag'])
+
+# Stages in the README execution order
+#   Field resources ("*_fields") are groups of fishnet columns,
+#   raster resources ("*_rasters") are folders in the parameter folder.
+# The PRISM stages also recalculate the JH_TMAX/JH_TMIN fields set by
+#   dem_parameters so they run after it.
+# soil_parameters also sets the ROOT_DEPTH field set by veg_parameters.
+stage_list = [
+    PipelineStage(
+        'fishnet_generator', 'fishnet_func', [], ['fishnet'], [], {}, True),
+    PipelineStage(
+        'hru_parameters', 'hru_parameters', ['fishnet'], ['hru_fields'],
+        [], {}, True),
+    PipelineStage(
+        'dem_parameters', 'dem_parameters', ['hru_fields'],
+        ['dem_fields', 'dem_rasters'], [], {}, False),
+    PipelineStage(
+        'veg_parameters', 'veg_parameters', ['hru_fields', 'dem_fields'],
+        ['veg_fields', 'veg_rasters'], [], {}, False),
+    PipelineStage(
+        'soil_raster_prep', 'soil_raster_prep', ['hru_fields'],
+        ['soil_rasters'], [], {}, False),
+    PipelineStage(
+        'soil_parameters', 'soil_parameters',
+        ['hru_fields', 'dem_rasters', 'veg_fields', 'veg_rasters',
+         'soil_rasters'],
+        ['soil_fields'], [], {}, False),
+    PipelineStage(
+        'impervious_parameters', 'impervious_parameters', ['hru_fields'],
+        ['impervious_fields', 'impervious_rasters'], [], {}, False),
+    PipelineStage(
+        'prism_4km_normals', 'prism_4km_parameters',
+        ['hru_fields', 'dem_fields'], ['climate_fields'],
+        ['-t', 'ALL'], {'data_name': 'ALL'}, False),
+    PipelineStage(
+        'prism_800m_normals', 'prism_800m_parameters',
+        ['hru_fields', 'dem_fields'], ['climate_fields'],
+        ['-t', 'ALL'], {'data_name': 'ALL'}, False),
+    PipelineStage(
+        'daymet_normals', 'daymet_parameters',
+        ['hru_fields', 'dem_fields'], ['climate_fields'],
+        ['-t', 'ALL'], {'data_name': 'ALL'}, False),
+    PipelineStage(
+        'ppt_ratio_parameters', 'ppt_ratio_parameters',
+        ['hru_fields', 'climate_fields'], ['ppt_ratio_fields'],
+        [], {}, False),
+    PipelineStage(
+        'dem_2_streams', 'flow_parameters',
+        ['hru_fields', 'dem_fields', 'dem_rasters'],
+        ['flow_fields', 'flow_rasters'], [], {}, False),
+    PipelineStage(
+        'crt_fill_parameters', 'crt_fill_parameters',
+        ['hru_fields', 'dem_fields', 'flow_fields'], ['crt_fields'],
+        [], {}, False),
+    # crt_fill_parameters sets the KRCH/IRCH/JRCH, OUTSEG/IREACH/MAXREACH,
+    #   and lake ISEG fields that stream_parameters sets again, so it runs
+    #   first (the README order)
+    PipelineStage(
+        'stream_parameters', 'stream_parameters',
+        ['hru_fields', 'dem_fields', 'flow_fields', 'flow_rasters',
+         'crt_fields'],
+        ['stream_fields', 'stream_rasters'], [], {}, False),
+    PipelineStage(
+        'thickness_parameters', 'thickness_parameters',
+        ['hru_fields', 'dem_fields'], ['thickness_fields'], [], {}, False),
+    PipelineStage(
+        'prms_template_fill', 'prms_template_fill',
+        ['hru_fields', 'dem_fields', 'veg_fields', 'soil_fields',
+         'impervious_fields', 'climate_fields', 'ppt_ratio_fields',
+         'flow_fields', 'stream_fields'],
+        ['prms_parameters'], [], {}, False),
+]
+
+# Stages that are run when none are selected
+#   (the PRISM 800m and DAYMET normals are alternatives to the PRISM 4km
+#    normals and the layer thickness is optional)
+default_stages = [
+    'fishnet_generator', 'hru_parameters', 'dem_parameters',
+    'veg_parameters', 'soil_raster_prep', 'soil_parameters',
+    'impervious_parameters', 'prism_4km_normals', 'ppt_ratio_parameters',
+    'dem_2_streams', 'crt_fill_parameters', 'stream_parameters',
+    'prms_template_fill']
+
+# Run report names of the scripts that don't match the script name
+report_names = {
+    'dem_2_streams': 'dem_2_stream',
+    'prms_template_fill': 'prms_template',
+    'soil_raster_prep': 'soil_prep'}
+
+# Seconds between checks of the running stages
+poll_interval = 1.0
+
+
+class PipelineError(Exception):
+    """"""
+    pass
+
+
+class StageError(PipelineError):
+    """A stage script exited before it finished"""
+
+    def __init__(self, stage_name, message):
+        """"""
+        PipelineError.__init__(self, '{}: {}'.format(stage_name, message))
+        self.stage_name = stage_name
+
+
+class _ErrorHandler(logging.Handler):
+    """Keep the error messages logged by a stage"""
+
+    def __init__(self):
+        """"""
+        logging.Handler.__init__(self, logging.ERROR)
+        self.messages = []
+
+    def emit(self, record):
+        """"""
+        message = record.getMessage().strip()
+        if message.startswith('ERROR:'):
+            message = message[6:].strip()
+        self.messages.append(message)
+
+
+def stage_graph(stages):
+    """Build the upstream stages of each stage
+
+    The input resources of a stage are produced by the closest stage before
+        it that outputs them.  Resources without a producer must already
+        exist (i.e. from a previous run).  Stages that output the same
+        resource are run in order, so the later stage overwrites it.
+
+    Args:
+        stages (list): PipelineStage (in execution order)
+
+    Returns:
+        OrderedDict of the upstream stage name sets keyed by stage name
+    """
+    graph = OrderedDict()
+    producers = {}
+    for stage in stages:
+        graph[stage.name] = set(
+            producers[r] for r in stage.inputs + stage.outputs
+            if r in producers)
+        for resource in stage.outputs:
+            producers[resource] = stage.name
+    return graph
+
+
+def critical_path(graph, wall_times):
+    """Return the longest chain of dependent stages
+
+    Args:
+        graph (dict): upstream stage name sets keyed by stage name
+        wall_times (dict): stage wall times keyed by stage name
+
+    Returns:
+        tuple of the chain wall time and the list of stage names
+    """
+    path_dict = {}
+    for name, upstream in graph.items():
+        time_sum, path = max(
+            [path_dict[n] for n in upstream] or [(0.0, [])])
+        path_dict[name] = (time_sum + wall_times.get(name, 0), path + [name])
+    return max(path_dict.values() or [(0.0, [])])
+
+
+def shapefile_files(shp_path):
+    """Return the paths of all the files of a shapefile"""
+    shp_ws, shp_name = os.path.split(os.path.abspath(shp_path))
+    base_name = os.path.splitext(shp_name)[0].lower() + '.'
+    return [
+        os.path.join(shp_ws, name) for name in sorted(os.listdir(shp_ws))
+        if name.lower().startswith(base_name) and
+        not name.lower().endswith('.lock')]
+
+
+def copy_shapefile(input_path, output_ws):
+    """Copy all the files of a shapefile to a folder
+
+    The modified times are kept, so the copy has the same file key and can
+        be read from the column table copy of the fishnet
+        (see support_functions.current_column_table).
+
+    Returns:
+        str: copied shapefile path
+    """
+    for file_path in shapefile_files(input_path):
+        shutil.copy2(
+            file_path, os.path.join(output_ws, os.path.basename(file_path)))
+    return os.path.join(output_ws, os.path.basename(input_path))
+
+
+class PipelineRun(object):
+    """One run of a stage in its own folder, fishnet copy, and process"""
+
+    def __init__(self, stage, inputs_cfg, pipeline_ws, log_ws,
+                 overwrite_flag=False, debug_flag=False):
+        """"""
+        self.stage = stage
+        self.log_ws = log_ws
+        self.polygon_path = inputs_cfg.get('INPUTS', 'hru_fishnet_path')
+        self.stage_ws = os.path.join(pipeline_ws, stage.name)
+        self.config_path = os.path.join(
+            self.stage_ws, '{}.ini'.format(stage.name))
+        self.output_path = os.path.join(
+            self.stage_ws, '{}_output.txt'.format(stage.name))
+        self.report_path = os.path.join(
+            log_ws, '{}_report.json'.format(
+                report_names.get(stage.name, stage.name)))
+        self.copy_path = None
+        self.base_path = None
+        self.merge_count = None
+        self.process = None
+        self.record = None
+
+        if os.path.isdir(self.stage_ws):
+            shutil.rmtree(self.stage_ws)
+        os.makedirs(self.stage_ws)
+
+        # Each stage gets its own scratch workspace
+        #   (in_memory is already separate for each process)
+        stage_cfg = ConfigParser.RawConfigParser()
+        for section in inputs_cfg.sections():
+            stage_cfg.add_section(section)
+            for key, value in inputs_cfg.items(section):
+                stage_cfg.set(section, key, value)
+        try:
+            scratch_name = inputs_cfg.get('INPUTS', 'scratch_name')
+        except ConfigParser.Error:
+            scratch_name = 'in_memory'
+        if scratch_name != 'in_memory':
+            stage_cfg.set(
+                'INPUTS', 'scratch_name', os.path.join(
+                    os.path.basename(pipeline_ws), stage.name, 'scratch'))
+        if not stage.in_place_flag:
+            self.copy_path = copy_shapefile(self.polygon_path, self.stage_ws)
+            self.base_path = os.path.join(self.stage_ws, 'base.dbf')
+            shutil.copyfile(
+                os.path.splitext(self.copy_path)[0] + '.dbf', self.base_path)
+            stage_cfg.set('INPUTS', 'hru_fishnet_path', self.copy_path)
+        with open(self.config_path, 'w') as config_f:
+            stage_cfg.write(config_f)
+
+        self.args = [
+            sys.executable,
+            os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         '{}.py'.format(stage.name)),
+            '-i', self.config_path] + list(stage.args)
+        if overwrite_flag:
+            self.args.append('-o')
+        if debug_flag:
+            self.args.append('-d')
+
+    def start(self, merge_count):
+        """Start the stage script in a new process
+
+        Args:
+            merge_count (int): number of merges into the fishnet so far
+        """
+        logging.info('  Starting {}'.format(self.stage.name))
+        logging.debug('    {}'.format(' '.join(self.args)))
+        # Remove the report of a previous run
+        if os.path.isfile(self.report_path):
+            os.remove(self.report_path)
+        self.merge_count = merge_count
+        self.record = report.StageRecord(self.stage.name)
+        with open(os.devnull, 'r') as null_f:
+            with open(self.output_path, 'w') as output_f:
+                self.process = subprocess.Popen(
+                    self.args, stdin=null_f, stdout=output_f,
+                    stderr=subprocess.STDOUT)
+
+    def poll(self):
+        """Return True if the stage process has finished"""
+        return self.process.poll() is not None
+
+    def finish(self):
+        """Finish the stage record from the stage run report
+
+        The scripts exit after logging an error without an exit code, so the
+            status is read from the stage run report.
+
+        Returns:
+            str: stage status
+        """
+        try:
+            with open(self.report_path, 'r') as report_f:
+                stage_report = json.load(report_f)
+        except (IOError, ValueError):
+            stage_report = {}
+        status = stage_report.get('status', 'error')
+        if self.process.returncode != 0:
+            status = 'error'
+        self.record.finish(status)
+        # The CPU time and memory are from the stage process
+        self.record.cpu_time = stage_report.get('cpu_time')
+        self.record.peak_memory = stage_report.get('peak_memory')
+        self.record.memory_increase = None
+        return status
+
+    def merge(self, field_merges, merge_count):
+        """Merge the added and changed fishnet fields into the fishnet
+
+        Args:
+            field_merges (dict): merge counts keyed by field name
+            merge_count (int): number of merges into the fishnet so far
+
+        Returns:
+            list of the merged field names
+        """
+        if self.copy_path is None:
+            return []
+        copy_dbf_path = os.path.splitext(self.copy_path)[0] + '.dbf'
+        field_names = [
+            f.name for f in dbf.changed_dbf_fields(
+                copy_dbf_path, self.base_path)]
+        # A field merged since the stage started was set by a stage that
+        #   ran at the same time (the stage graph should prevent this)
+        conflict_list = [
+            f for f in field_names
+            if field_merges.get(f.upper(), 0) > self.merge_count]
+        if conflict_list:
+            raise PipelineError(
+                '{} set fields that were also set by another stage: {}'.format(
+                    self.stage.name, ', '.join(conflict_list)))
+        if field_names:
+            dbf.copy_dbf_fields(
+                copy_dbf_path,
+                os.path.splitext(self.polygon_path)[0] + '.dbf', field_names)
+        for field_name in field_names:
+            field_merges[field_name.upper()] = merge_count
+        return field_names
+
+
+def run_in_process(config_path, stages, overwrite_flag=False,
+                   debug_flag=False):
+    """Run stages one after another in this process
+
+    The script functions are called directly, so arcpy is only imported and
+        the Spatial Analyst extension is only checked out once, and the
+        scripts share the HRUParameters (and the centroid checks).
+    The scripts exit after logging an error, the exit is raised as a
+        StageError with the logged error message instead.
+
+    Args:
+        config_path: Project config file path
+        stages (list): PipelineStage (in execution order)
+        ovewrite_flag (bool): if True, overwrite existing files
+        debug_flag (bool): if True, enable debug level logging
+
+    Returns:
+        OrderedDict of the stage wall times keyed by stage name
+
+    Raises:
+        StageError: if a stage script exits
+    """
+    if arcpy is None:
+        raise PipelineError('running the stages in process requires ArcGIS')
+    root_logger = logging.getLogger('')
+    arcpy.CheckOutExtension('Spatial')
+    support.share_hru_parameters()
+    wall_times = OrderedDict()
+    try:
+        for stage in stages:
+            logging.info('  Running {}'.format(stage.name))
+            stage_func = getattr(
+                importlib.import_module(stage.name), stage.function)
+            handler_list = list(root_logger.handlers)
+            error_handler = _ErrorHandler()
+            root_logger.addHandler(error_handler)
+            arcpy.ResetEnvironments()
+            start_time = time.time()
+            try:
+                stage_func(
+                    config_path=config_path, overwrite_flag=overwrite_flag,
+                    debug_flag=debug_flag, **stage.kwargs)
+            except SystemExit:
+                report.finish_report('exit')
+                raise StageError(
+                    stage.name, (error_handler.messages or ['exited'])[-1])
+            except Exception:
+                report.finish_report('error')
+                raise
+            else:
+                report.finish_report()
+            finally:
+                # Remove the log file handlers added by the script
+                for handler in root_logger.handlers[:]:
+                    if handler not in handler_list:
+                        root_logger.removeHandler(handler)
+                        handler.close()
+            wall_times[stage.name] = time.time() - start_time
+            logging.info('  Finished {} ({:.1f} s)'.format(
+                stage.name, wall_times[stage.name]))
+
+            # The fishnet geometry changed, describe it again
+            if stage.in_place_flag:
+                support.share_hru_parameters()
+
+            # Copy the fields the stage set with the ArcGIS tools
+            #   to the column table (if it is kept)
+            support.update_column_table(
+                support.get_hru_parameters(config_path))
+    finally:
+        support.share_hru_parameters(False)
+        arcpy.CheckInExtension('Spatial')
+    return wall_times
+
+
+def pipeline_runner(config_path, stage_names=None, workers=4,
+                    in_process_flag=False, overwrite_flag=False,
+                    debug_flag=False):
+    """Run the GSFLOW parameter scripts as a dependency graph
+
+    Stages that don't depend on each other run at the same time in separate
+        processes.  Each stage (other than the fishnet_generator and
+        hru_parameters, which change the fishnet geometry) works on its own
+        copy of the fishnet and scratch workspace.  When a stage finishes,
+        the fields it added or changed are merged into the fishnet.
+
+    Args:
+        config_path: Project config file path
+        stage_names (list): stages to run (default is default_stages)
+        workers (int): maximum number of stages running at the same time
+        in_process_flag (bool): if True, run the stages one after another
+            in this process (see run_in_process())
+        ovewrite_flag (bool): if True, overwrite existing files
+        debug_flag (bool): if True, enable debug level logging
+
+    Returns:
+        None
+    """
+    # Open input parameter config file
+    inputs_cfg = ConfigParser.RawConfigParser()
+    try:
+        inputs_cfg.readfp(open(config_path))
+    except IOError:
+        logging.error(('\nERROR: Config file does not exist\n' +
+                       '  {}\n').format(config_path))
+        sys.exit()
+    except ConfigParser.MissingSectionHeaderError:
+        logging.error(
+            '\nERROR: Config file is missing a section header\n' +
+            '    Please make sure the following line is at the ' +
+            'beginning of the file\n[INPUTS]\n')
+        sys.exit()
+
+    param_ws = inputs_cfg.get('INPUTS', 'parameter_folder')
+    log_ws = os.path.join(param_ws, 'logs')
+    if not os.path.isdir(log_ws):
+        os.makedirs(log_ws)
+    pipeline_ws = os.path.join(param_ws, 'pipeline_temp')
+    if not os.path.isdir(pipeline_ws):
+        os.makedirs(pipeline_ws)
+
+    log_console = logging.FileHandler(
+        filename=os.path.join(log_ws, 'pipeline_runner_log.txt'), mode='w')
+    log_console.setLevel(logging.DEBUG)
+    log_console.setFormatter(logging.Formatter('%(message)s'))
+    logging.getLogger('').addHandler(log_console)
+    logging.info('\nGSFLOW Pipeline Runner')
+
+    # Check stages
+    if not stage_names:
+        stage_names = default_stages
+    stage_dict = OrderedDict((stage.name, stage) for stage in stage_list)
+    for stage_name in stage_names:
+        if stage_name not in stage_dict.keys():
+            logging.error(
+                '\nERROR: Unknown pipeline stage: {}'.format(stage_name))
+            sys.exit()
+    if workers < 1:
+        logging.error('\nERROR: Workers must be greater than 0')
+        sys.exit()
+    stages = [
+        stage for stage in stage_list if stage.name in set(stage_names)]
+    graph = stage_graph(stages)
+    logging.info('\nStages')
+    for stage in stages:
+        logging.info('  {:<24s} {}'.format(
+            stage.name, ', '.join(sorted(graph[stage.name])) or '-'))
+
+    # Each script writes its own run report
+    if in_process_flag:
+        logging.info('\nRunning stages in process')
+        try:
+            wall_times = run_in_process(
+                config_path, stages, overwrite_flag, debug_flag)
+        except PipelineError as e:
+            logging.error('\nERROR: {}'.format(e))
+            sys.exit(1)
+        logging.info('\nStage time:    {:.1f} s'.format(
+            sum(wall_times.values())))
+        return
+
+    # The column table copy of the fishnet fields is updated after each
+    #   merge (see support_functions.update_column_table)
+    try:
+        column_table_flag = inputs_cfg.getboolean(
+            'INPUTS', 'column_table_flag')
+    except (ConfigParser.Error, ValueError):
+        column_table_flag = False
+    if column_table_flag and support is None:
+        logging.warning(
+            '\nWARNING: The column table can only be updated with ArcGIS')
+        column_table_flag = False
+    hru = None
+
+    run_report = report.start_report('pipeline_runner', log_ws)
+    # Run each stage once all of its upstream stages are done
+    logging.info('\nRunning stages ({} workers)'.format(workers))
+    pending_list = list(stages)
+    running_list = []
+    done_set = set()
+    wall_times = {}
+    field_merges = {}
+    merge_count = 0
+    failed_list = []
+    while pending_list or running_list:
+        # Don't start new stages after a stage fails
+        if failed_list:
+            pending_list = []
+        for stage in list(pending_list):
+            if len(running_list) >= workers:
+                break
+            if not graph[stage.name].issubset(done_set):
+                continue
+            if any(run.stage.in_place_flag for run in running_list):
+                break
+            if stage.in_place_flag and running_list:
+                break
+            run = PipelineRun(
+                stage, inputs_cfg, pipeline_ws, log_ws,
+                overwrite_flag, debug_flag)
+            run.start(merge_count)
+            pending_list.remove(stage)
+            running_list.append(run)
+        if not running_list:
+            if pending_list:
+                raise PipelineError('stage graph could not be completed')
+            break
+
+        time.sleep(poll_interval)
+        for run in [r for r in running_list if r.poll()]:
+            running_list.remove(run)
+            status = run.finish()
+            run_report.stage_list.append(run.record)
+            wall_times[run.stage.name] = run.record.wall_time
+            if status != 'complete':
+                logging.error(
+                    ('\nERROR: {} did not complete ({})\n' +
+                     '  See {}').format(
+                        run.stage.name, status, run.output_path))
+                failed_list.append(run.stage.name)
+                continue
+            if column_table_flag:
+                # Describe the fishnet again if the stage changed it
+                if hru is None or run.stage.in_place_flag:
+                    hru = support.HRUParameters(config_path)
+                column_flag = (
+                    support.current_column_table(hru.polygon_path) is not None)
+            # The running stages are left to finish after a merge fails
+            try:
+                with report.stage('merge') as merge_stage:
+                    merge_count += 1
+                    merged_fields = run.merge(field_merges, merge_count)
+                    merge_stage.add_rows(len(merged_fields))
+            except PipelineError as e:
+                logging.error('\nERROR: {}'.format(e))
+                failed_list.append(run.stage.name)
+                continue
+            if column_table_flag:
+                # Only the merged fields changed if the column table was
+                #   current, otherwise all the fields are copied again
+                support.update_column_table(
+                    hru, merged_fields if column_flag else None)
+            logging.info('  Finished {} ({:.1f} s, {} fields merged)'.format(
+                run.stage.name, run.record.wall_time, len(merged_fields)))
+            logging.debug('    {}'.format(', '.join(merged_fields)))
+            done_set.add(run.stage.name)
+
+    if failed_list:
+        logging.error('\nERROR: Pipeline stages failed: {}'.format(
+            ', '.join(failed_list)))
+        report.finish_report('error')
+        sys.exit(1)
+
+    path_time, path = critical_path(graph, wall_times)
+    logging.info('\nStage time:    {:.1f} s'.format(sum(wall_times.values())))
+    logging.info('Critical path: {:.1f} s ({})'.format(
+        path_time, ' > '.join(path)))
+
+
+def arg_parse():
+    """"""
+    parser = argparse.ArgumentParser(
+        description='Run the GSFLOW parameter scripts as a dependency graph',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument(
+        '-i', '--ini', required=True,
+        help='Project input file', metavar='PATH')
+    parser.add_argument(
+        '-s', '--stages', nargs='+', default=[], metavar='STAGE',
+        choices=[stage.name for stage in stage_list],
+        help='Stages to run (default is the README execution order)')
+    parser.add_argument(
+        '-w', '--workers', default=4, type=int,
+        help='Maximum number of stages running at the same time')
+    parser.add_argument(
+        '-p', '--in_process', default=False, action="store_true",
+        help='Run the stages one after another in this process')
+    parser.add_argument(
+        '-o', '--overwrite', default=False, action="store_true",
+        help='Force overwrite of existing files')
+    parser.add_argument(
+        '-d', '--debug', default=logging.INFO, const=logging.DEBUG,
+        help='Debug level logging', action="store_const", dest="loglevel")
+    args = parser.parse_args()
+
+    # Convert input file to an absolute path
+    if os.path.isfile(os.path.abspath(args.ini)):
+        args.ini = os.path.abspath(args.ini)
+    return args
+
+
+if __name__ == '__main__':
+    args = arg_parse()
+
+    logging.basicConfig(level=args.loglevel, format='%(message)s')
+    logging.info('\n{}'.format('#' * 80))
+    log_f = '{:<20s} {}'
+    logging.info(log_f.format(
+        'Run Time Stamp:', dt.datetime.now().isoformat(' ')))
+    logging.info(log_f.format('Current Directory:', os.getcwd()))
+    logging.info(log_f.format('Script:', os.path.basename(sys.argv[0])))
+
+    # Run the GSFLOW parameter scripts
+    pipeline_runner(
+        config_path=args.ini, stage_names=args.stages, workers=args.workers,
+        in_process_flag=args.in_process, overwrite_flag=args.overwrite,
+        debug_flag=args.loglevel==logging.DEBUG)
+    report.finish_report()
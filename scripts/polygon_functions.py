@@ -0,0 +1,371 @@
+#--------------------------------
+# Name:         polygon_functions.py
+# Purpose:      NumPy polygon zone functions
+# Notes:        ArcGIS 10.2 Version
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+import struct
+
+import numpy as np
+
+
+# Maximum number of point/edge pairs tested at once
+pip_block_size = 2 ** 22
+
+
+class PointIndex(object):
+    """Points sorted by X so the points in a bounding box can be found
+    with np.searchsorted instead of testing every point
+    """
+
+    def __init__(self, x, y):
+        """"""
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.sort_i = np.argsort(self.x, kind='mergesort')
+        self.x_sort = self.x[self.sort_i]
+
+    def query(self, x_min, y_min, x_max, y_max):
+        """Return the indices of the points inside a bounding box"""
+        start_i = np.searchsorted(self.x_sort, x_min, 'left')
+        end_i = np.searchsorted(self.x_sort, x_max, 'right')
+        point_i = self.sort_i[start_i:end_i]
+        y = self.y[point_i]
+        return point_i[(y >= y_min) & (y <= y_max)]
+
+
+def read_shapefile_rings(shp_path):
+    """Read the rings of each polygon in a shapefile
+
+    The rings are in the same format as support.polygon_rings() so the
+        zone functions can be used without ArcGIS.
+
+    Args:
+        shp_path (str): polygon shapefile path
+
+    Returns:
+        list of the rings of each polygon (in FID order),
+            null shapes are an empty list
+    """
+    with open(shp_path, 'rb') as shp_f:
+        shp_data = shp_f.read()
+    shape_type = struct.unpack('<i', shp_data[32:36])[0]
+    if shape_type not in [5, 15, 25]:
+        raise ValueError('{} is not a polygon shapefile'.format(shp_path))
+    rings_list = []
+    offset = 100
+    while offset + 8 <= len(shp_data):
+        content_length = 2 * struct.unpack(
+            '>i', shp_data[offset + 4:offset + 8])[0]
+        offset += 8
+        if struct.unpack('<i', shp_data[offset:offset + 4])[0] == 0:
+            rings_list.append([])
+        else:
+            parts, points = struct.unpack(
+                '<2i', shp_data[offset + 36:offset + 44])
+            part_index = np.frombuffer(
+                shp_data, '<i4', parts, offset + 44).tolist() + [points]
+            xy = np.frombuffer(
+                shp_data, '<f8', 2 * points,
+                offset + 44 + 4 * parts).reshape(points, 2)
+            rings_list.append([
+                xy[i:j] for i, j in zip(part_index[:-1], part_index[1:])])
+        offset += content_length
+    return rings_list
+
+
+def rings_bbox(rings):
+    """Return the bounding box (x_min, y_min, x_max, y_max) of a polygon"""
+    xy = np.vstack(rings)
+    return xy[:, 0].min(), xy[:, 1].min(), xy[:, 0].max(), xy[:, 1].max()
+
+
+def rings_edges(rings):
+    """Return the edges of all the rings of a polygon
+
+    Args:
+        rings (list): arrays of ring vertices (n x 2), each ring is closed
+            (or will be closed)
+
+    Returns:
+        tuple of the x1, y1, x2, y2 edge arrays
+    """
+    edge_list = []
+    for ring in rings:
+        ring = np.asarray(ring, dtype=np.float64)
+        if not np.array_equal(ring[0], ring[-1]):
+            ring = np.vstack([ring, ring[:1]])
+        edge_list.append(np.hstack([ring[:-1], ring[1:]]))
+    edges = np.vstack(edge_list)
+    return edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3]
+
+
+def points_in_rings(x, y, rings):
+    """Test if points are inside a polygon (even-odd rule)
+
+    Interior rings (holes) and multiple parts are handled since the ring
+        crossings are counted together.
+
+    Args:
+        x (np.array): point x coordinates
+        y (np.array): point y coordinates
+        rings (list): arrays of ring vertices (n x 2)
+
+    Returns:
+        np.array of bool
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    x1, y1, x2, y2 = rings_edges(rings)
+    # Horizontal edges are never crossed
+    edge_mask = y1 != y2
+    x1, y1, x2, y2 = x1[edge_mask], y1[edge_mask], x2[edge_mask], y2[edge_mask]
+    slope = (x2 - x1) / (y2 - y1)
+
+    inside = np.zeros(len(x), dtype=np.bool)
+    block_size = max(1, pip_block_size // max(len(x1), 1))
+    for i in xrange(0, len(x), block_size):
+        px = x[i:i + block_size, np.newaxis]
+        py = y[i:i + block_size, np.newaxis]
+        crossing = (
+            ((y1 > py) != (y2 > py)) & (px < x1 + (py - y1) * slope))
+        inside[i:i + block_size] = (np.sum(crossing, axis=1) % 2) == 1
+    return inside
+
+
+def zone_by_point(x, y, zone_list, point_index=None):
+    """Assign zone values to points by point in polygon
+
+    Zones are tested in order, so points in overlapping zones are assigned
+        to the last zone.
+
+    Args:
+        x (np.array): point x coordinates
+        y (np.array): point y coordinates
+        zone_list (list): (rings, zone value) for each zone polygon
+        point_index (PointIndex): prebuilt index of the points
+
+    Returns:
+        tuple of the zone value array and the mask of assigned points
+    """
+    if point_index is None:
+        point_index = PointIndex(x, y)
+    zone_array = np.zeros(len(point_index.x), dtype=np.float64)
+    zone_mask = np.zeros(len(point_index.x), dtype=np.bool)
+    for rings, zone_value in zone_list:
+        if not rings:
+            continue
+        point_i = point_index.query(*rings_bbox(rings))
+        if not len(point_i):
+            continue
+        point_i = point_i[points_in_rings(
+            point_index.x[point_i], point_index.y[point_i], rings)]
+        zone_array[point_i] = zone_value
+        zone_mask[point_i] = True
+    return zone_array, zone_mask
+
+
+def grid_pieces(gx1, gy1, gx2, gy2):
+    """Split line segments at every grid line they cross
+
+    This is the Amanatides-Woo grid traversal computed for all the segments
+        at once.  The segment parameters (0 to 1) of the vertical and
+        horizontal grid line crossings are generated directly and sorted, so
+        each piece between consecutive crossings is inside a single cell.
+
+    Args:
+        gx1, gy1, gx2, gy2 (np.array): segment end points in grid units
+            (columns and rows from the grid corner)
+
+    Returns:
+        tuple of the segment index and the start and end parameters
+            of each piece (in segment order)
+    """
+    t_list = [np.zeros(len(gx1)), np.ones(len(gx1))]
+    segment_list = [np.arange(len(gx1))] * 2
+    for g1, g2 in [(gx1, gx2), (gy1, gy2)]:
+        g_lo, g_hi = np.minimum(g1, g2), np.maximum(g1, g2)
+        count = np.maximum(
+            np.ceil(g_hi) - np.floor(g_lo) - 1, 0).astype(np.int64)
+        count[g_lo == g_hi] = 0
+        if not count.sum():
+            continue
+        segment_i = np.repeat(np.arange(len(g1)), count)
+        # Crossing number within each segment
+        cross_i = np.arange(count.sum()) - np.repeat(
+            np.cumsum(count) - count, count)
+        line = np.floor(g_lo[segment_i]) + 1 + cross_i
+        t_list.append(
+            (line - g1[segment_i]) / (g2[segment_i] - g1[segment_i]))
+        segment_list.append(segment_i)
+    t = np.concatenate(t_list)
+    segment_i = np.concatenate(segment_list)
+    sort_i = np.lexsort((t, segment_i))
+    t, segment_i = t[sort_i], segment_i[sort_i]
+
+    piece_mask = segment_i[1:] == segment_i[:-1]
+    return (
+        segment_i[:-1][piece_mask], t[:-1][piece_mask], t[1:][piece_mask])
+
+
+def polygon_cell_area(rings, x_min, y_max, cs, rows, cols):
+    """Compute the exact area of a polygon in each grid cell
+
+    Each ring edge is split at every grid line it crosses so each piece is
+        inside a single cell.  The area under each piece (down to the bottom
+        of its cell) is added to that cell and the full cell height is added
+        to all the cells below it in the same column.  Since the signed
+        contributions below the polygon cancel, only the cells in the polygon
+        bounding box are needed.  Holes are handled as long as they are
+        oriented opposite to the outer rings (the same as shapefiles).
+
+    Args:
+        rings (list): arrays of ring vertices (n x 2)
+        x_min (float): grid extent XMin
+        y_max (float): grid extent YMax
+        cs (float): grid cellsize
+        rows (int): number of grid rows
+        cols (int): number of grid columns
+
+    Returns:
+        tuple of the cell index (row * cols + col) and the overlap area
+            (in map units squared) for each cell with a non-zero overlap
+    """
+    x1, y1, x2, y2 = rings_edges(rings)
+    # Grid units (rows increase downward)
+    gx1, gx2 = (x1 - x_min) / cs, (x2 - x_min) / cs
+    gy1, gy2 = (y_max - y1) / cs, (y_max - y2) / cs
+    col_min = int(np.floor(min(gx1.min(), gx2.min())))
+    col_max = int(np.ceil(max(gx1.max(), gx2.max())))
+    row_min = int(np.floor(min(gy1.min(), gy2.min())))
+    row_max = int(np.ceil(max(gy1.max(), gy2.max())))
+
+    # Pieces between consecutive grid line crossings of each edge
+    e, ta, tb = grid_pieces(gx1, gy1, gx2, gy2)
+    pxa = gx1[e] + ta * (gx2[e] - gx1[e])
+    pxb = gx1[e] + tb * (gx2[e] - gx1[e])
+    pya = gy1[e] + ta * (gy2[e] - gy1[e])
+    pyb = gy1[e] + tb * (gy2[e] - gy1[e])
+    # Pieces on the bottom or right grid line of the bounding box are moved
+    #   into the cell above or left of it (which doesn't change the area)
+    piece_col = np.clip(
+        np.floor(0.5 * (pxa + pxb)), col_min, col_max - 1).astype(np.int64)
+    piece_row = np.clip(
+        np.floor(0.5 * (pya + pyb)), row_min, row_max - 1).astype(np.int64)
+    dx = pxb - pxa
+
+    # Area under each piece down to the bottom of its cell
+    partial = np.zeros((row_max - row_min, col_max - col_min))
+    np.add.at(
+        partial, (piece_row - row_min, piece_col - col_min),
+        dx * ((piece_row + 1 - pya) + (piece_row + 1 - pyb)) / 2)
+    # Full cell height for every cell below the piece
+    full = np.zeros((row_max - row_min + 1, col_max - col_min))
+    np.add.at(full, (piece_row - row_min + 1, piece_col - col_min), dx)
+    area = partial + np.cumsum(full, axis=0)[:-1]
+
+    # Sign depends on the ring orientation
+    if area.sum() < 0:
+        area = -area
+    area *= cs * cs
+
+    # Drop cells outside the grid or without any overlap
+    cell_row, cell_col = np.nonzero(area > 1E-9 * cs * cs)
+    cell_area = area[cell_row, cell_col]
+    cell_row += row_min
+    cell_col += col_min
+    grid_mask = (
+        (cell_row >= 0) & (cell_row < rows) &
+        (cell_col >= 0) & (cell_col < cols))
+    return (
+        (cell_row * cols + cell_col)[grid_mask], cell_area[grid_mask])
+
+
+def line_cell_length(lines_list, x_min, y_max, cs, rows, cols,
+                     block_size=2 ** 20):
+    """Compute the exact length of lines in each grid cell
+
+    Each segment is split at the grid lines it crosses (see grid_pieces)
+        and the length of each piece is added to the cell that contains it.
+        Pieces that run along a grid line are added to the cell right of or
+        below it.  The parts of multipart lines are not connected.
+
+    Args:
+        lines_list (list): parts (arrays of vertices, n x 2) of each line
+        x_min (float): grid extent XMin
+        y_max (float): grid extent YMax
+        cs (float): grid cellsize
+        rows (int): number of grid rows
+        cols (int): number of grid columns
+        block_size (int): maximum number of segments split at once
+
+    Returns:
+        np.array of the line length (in map units) in each cell
+            (indexed by row * cols + col)
+    """
+    cell_length = np.zeros(rows * cols, dtype=np.float64)
+    part_list = [
+        np.asarray(part, dtype=np.float64)
+        for parts in lines_list for part in parts if len(part) >= 2]
+    if not part_list:
+        return cell_length
+    x1 = np.concatenate([part[:-1, 0] for part in part_list])
+    y1 = np.concatenate([part[:-1, 1] for part in part_list])
+    x2 = np.concatenate([part[1:, 0] for part in part_list])
+    y2 = np.concatenate([part[1:, 1] for part in part_list])
+    del part_list
+
+    for i in xrange(0, len(x1), block_size):
+        # Grid units (rows increase downward)
+        gx1 = (x1[i:i + block_size] - x_min) / cs
+        gx2 = (x2[i:i + block_size] - x_min) / cs
+        gy1 = (y_max - y1[i:i + block_size]) / cs
+        gy2 = (y_max - y2[i:i + block_size]) / cs
+        s, ta, tb = grid_pieces(gx1, gy1, gx2, gy2)
+        piece_length = (tb - ta) * np.hypot(gx2 - gx1, gy2 - gy1)[s]
+        t_mid = 0.5 * (ta + tb)
+        piece_col = np.floor(gx1[s] + t_mid * (gx2[s] - gx1[s]))
+        piece_row = np.floor(gy1[s] + t_mid * (gy2[s] - gy1[s]))
+        grid_mask = (
+            (piece_length > 0) & (piece_row >= 0) & (piece_row < rows) &
+            (piece_col >= 0) & (piece_col < cols))
+        cell_length += np.bincount(
+            (piece_row[grid_mask] * cols +
+             piece_col[grid_mask]).astype(np.int64),
+            weights=piece_length[grid_mask], minlength=rows * cols)
+    return cell_length * cs
+
+
+def zone_cell_overlap(zone_rings_list, x_min, y_max, cs, rows, cols):
+    """Compute the overlap area of each zone polygon with each grid cell
+
+    Args:
+        zone_rings_list (list): rings of each zone polygon
+        x_min (float): grid extent XMin
+        y_max (float): grid extent YMax
+        cs (float): grid cellsize
+        rows (int): number of grid rows
+        cols (int): number of grid columns
+
+    Returns:
+        tuple of the cell index, zone index (into zone_rings_list),
+            and overlap area arrays (in zone order)
+    """
+    cell_list, zone_list, area_list = [], [], []
+    for zone_i, rings in enumerate(zone_rings_list):
+        if not rings:
+            continue
+        cell_i, area = polygon_cell_area(rings, x_min, y_max, cs, rows, cols)
+        cell_list.append(cell_i)
+        zone_list.append(np.full(len(cell_i), zone_i, dtype=np.int64))
+        area_list.append(area)
+    if not cell_list:
+        return (
+            np.array([], dtype=np.int64), np.array([], dtype=np.int64),
+            np.array([], dtype=np.float64))
+    return (
+        np.concatenate(cell_list), np.concatenate(zone_list),
+        np.concatenate(area_list))
@@ -8,7 +8,6 @@
 #--------------------------------
 
 import argparse
-from collections import defaultdict
 import ConfigParser
 import datetime as dt
 import logging
@@ -18,6 +17,9 @@ import sys
 import arcpy
 from arcpy import env
 
+import numpy as np
+
+import report_functions as report
 import support_functions as support
 
 
@@ -38,7 +40,7 @@ def ppt_ratio_parameters(config_path, overwrite_flag=False, debug_flag=False):
     ratio_field_format = 'PPT_RT_{:02d}'
 
     # Initialize hru_parameters class
-    hru = support.HRUParameters(config_path)
+    hru = support.get_hru_parameters(config_path)
 
     # Open input parameter config file
     inputs_cfg = ConfigParser.ConfigParser()
@@ -57,6 +59,7 @@ def ppt_ratio_parameters(config_path, overwrite_flag=False, debug_flag=False):
     log_console.setLevel(logging.DEBUG)
     log_console.setFormatter(logging.Formatter('%(message)s'))
     logging.getLogger('').addHandler(log_console)
+    report.start_report(log_file_name.replace('_log.txt', ''), hru.log_ws)
     logging.info('\nGSFLOW PPT Ratio Parameters')
 
     # Units
@@ -257,8 +260,8 @@ def ppt_ratio_parameters(config_path, overwrite_flag=False, debug_flag=False):
     support.add_field_func(
         hru.polygon_path, hru.ppt_zone_id_field, 'LONG')
     # PPT ratio fields
-    for ppt_field in ppt_field_list:
-        support.add_field_func(hru.polygon_path, ppt_field, 'DOUBLE')
+    for ratio_field in ratio_field_list:
+        support.add_field_func(hru.polygon_path, ratio_field, 'DOUBLE')
 
     # Calculate PPT zone ID
     if set_ppt_zones_flag:
@@ -316,123 +319,123 @@ def ppt_ratio_parameters(config_path, overwrite_flag=False, debug_flag=False):
 
     # Calculate PPT ratios
     logging.info('\nCalculating mean monthly PPT ratios')
+
+    # Read gridded PPT for all cells as a (nhru, 12) matrix
+    # OID is read so the write back below can be checked against the order
+    fields = ['OID@', hru.ppt_zone_id_field, hru.id_field] + ppt_field_list
+    hru_array = arcpy.da.TableToNumPyArray(hru.polygon_path, fields)
+    hru_oid_array = hru_array['OID@']
+    hru_zone_array = hru_array[hru.ppt_zone_id_field].astype(np.int64)
+    hru_id_array = hru_array[hru.id_field].astype(np.int64)
+    ppt_array = np.column_stack(
+        [hru_array[f] for f in ppt_field_list]).astype(np.float64)
+    del hru_array
+
     if set_ppt_zones_flag:
-        # Read mean monthly PPT values for each zone
-        ppt_obs_dict = dict()
+        # Read mean monthly PPT values for each zone as a (nzones, 12) table
         ppt_obs_field_list = [
             ppt_obs_field_format.format(m) for m in month_list]
         fields = [ppt_zone_field] + ppt_obs_field_list
+        if ppt_hru_id_field:
+            fields.append(ppt_hru_id_field)
         logging.debug('  Obs. Fields: {}'.format(', '.join(fields)))
-        with arcpy.da.SearchCursor(ppt_zone_path, fields) as s_cursor:
-            for row in s_cursor:
-                # Convert units while reading obs values
-                ppt_obs_dict[int(row[0])] = map(
-                    lambda x: float(x) * units_factor, row[1:13])
-                # ppt_obs_dict[row[0]] = map(float, row[1:13])
-        ppt_zone_list = sorted(ppt_obs_dict.keys())
-        logging.debug('  PPT Zones: {}'.format(ppt_zone_list))
-
-        # Default all zones to a PPT ratio of 1
-        ppt_ratio_dict = {z: [1] * 12 for z in ppt_zone_list}
-        ppt_ratio_dict[0] = 1
-
-        # Get PPT HRU ID for scaling ratios if necessary
-        # This could be read at the same time as the obs. values
+        zone_array = arcpy.da.TableToNumPyArray(ppt_zone_path, fields)
+        zone_id_array = zone_array[ppt_zone_field].astype(np.int64)
+        # Convert units while reading obs values
+        ppt_obs_array = units_factor * np.column_stack(
+            [zone_array[f] for f in ppt_obs_field_list]).astype(np.float64)
         if ppt_hru_id_field:
-            # Get list of HRU_IDs for each PPT Zone
-            fields = [hru.ppt_zone_id_field, hru.id_field]
-            zone_hru_id_dict = defaultdict(list)
-            with arcpy.da.SearchCursor(hru.polygon_path, fields) as s_cursor:
-                for row in s_cursor:
-                    zone_hru_id_dict[int(row[0])].append(int(row[1]))
-
-            # Check that PPT_HRU_IDs are in the correct zone
-            fields = [ppt_zone_field, ppt_hru_id_field]
-            logging.debug('  PPT HRU ID Fields: {}'.format(', '.join(fields)))
-            logging.debug('  PPT Zone HRU IDs')
-            ppt_hru_id_dict = dict()
-            with arcpy.da.SearchCursor(ppt_zone_path, fields) as s_cursor:
-                for row in s_cursor:
-                    ppt_zone = int(row[0])
-                    hru_id = int(row[1])
-                    if hru_id in zone_hru_id_dict[ppt_zone]:
-                        ppt_hru_id_dict[ppt_zone] = hru_id
-                        logging.debug('    {}: {}'.format(ppt_zone, hru_id))
-                    else:
-                        logging.error(
-                            '\nERROR: HRU_ID {} is not in PPT ZONE {}'.format(
-                                hru_id, ppt_hru_id_dict[ppt_zone]))
-                        sys.exit()
-
-            # Get gridded PPT values for each PPT_HRU_ID
-            fields = [hru.ppt_zone_id_field, hru.id_field] + ppt_field_list
-            ppt_ratio_dict = dict()
-            with arcpy.da.SearchCursor(hru.polygon_path, fields) as s_cursor:
-                for row in s_cursor:
-                    ppt_zone = int(row[0])
-                    hru_id = int(row[1])
-                    if hru_id in ppt_hru_id_dict.values():
-                        ppt_gridded_list = map(float, row[2:14])
-                        ppt_obs_list = ppt_obs_dict[ppt_zone]
-                        ppt_ratio_list = [
-                            float(o) / p if p > 0 else 0
-                            for o, p in zip(ppt_obs_list, ppt_gridded_list)]
-                        ppt_ratio_dict[ppt_zone] = ppt_ratio_list
-            del ppt_hru_id_dict, zone_hru_id_dict, fields
-
-        logging.debug('  PPT Ratios:')
-        for k, v in ppt_ratio_dict.items():
-            logging.debug('    {}: {}'.format(
-                k, ', '.join(['{:.3f}'.format(x) for x in v])))
-
-        # DEADBEEF - ZONE_VALUE is calculated in zone_by_centroid_func
-        # There is probably a cleaner way of linking these two
-        fields = [hru.ppt_zone_id_field] + ppt_field_list + ratio_field_list
-        with arcpy.da.UpdateCursor(hru.polygon_path, fields) as u_cursor:
-            for row in u_cursor:
-                ppt_zone = int(row[0])
-                for i, month in enumerate(month_list):
-                    ppt_i = fields.index(ppt_field_format.format(month))
-                    ratio_i = fields.index(ratio_field_format.format(month))
-                    row[ratio_i] = (
-                        ppt_ratio_dict[ppt_zone][i] * row[ppt_i] /
-                        ppt_obs_dict[ppt_zone][i])
-                u_cursor.updateRow(row)
-            del row
+            zone_hru_id_array = zone_array[ppt_hru_id_field].astype(np.int64)
+        del zone_array
+        logging.debug('  PPT Zones: {}'.format(
+            ', '.join(map(str, sorted(set(zone_id_array))))))
     else:
-        # Get gridded precip at PPT_HRU_ID
-        fields = [hru.id_field] + ppt_field_list
-        logging.debug('  Fields: {}'.format(', '.join(fields)))
-
-        # Scale all ratios so gridded PPT will match observed PPT at target cell
+        # Use single mean monthly PPT for all cells (all cells are in zone 1)
+        # Assume ppt_obs_list is in month order
+        zone_id_array = np.array([1], dtype=np.int64)
+        ppt_obs_array = np.array([ppt_obs_list], dtype=np.float64)
         if ppt_hru_id != 0:
-            ppt_gridded_list = map(float, arcpy.da.SearchCursor(
-                hru.polygon_path, fields,
-                '"{}" = {}'.format(hru.id_field, ppt_hru_id)).next()[1:])
-            logging.info('  Gridded PPT: {}'.format(
-                ', '.join(['{:.2f}'.format(p) for p in ppt_gridded_list])))
-            # Ratio of MEASURED or OBSERVED PPT to GRIDDED PPT
-            # This will be multiplied by GRIDDED/OBSERVED below
-            ppt_ratio_list = [
-                float(o) / p if p > 0 else 0
-                for o, p in zip(ppt_obs_list, ppt_gridded_list)]
-            logging.info('  Obs./Gridded: {}'.format(
-                ', '.join(['{:.3f}'.format(p) for p in ppt_ratio_list])))
+            zone_hru_id_array = np.array([ppt_hru_id], dtype=np.int64)
         else:
-            ppt_ratio_list = [1 for p in ppt_obs_list]
-
-        # Use single mean monthly PPT for all cells
-        # Assume ppt_obs_list is in month order
-        fields = ppt_field_list + ratio_field_list
+            zone_hru_id_array = None
+
+    # Row 0 of the obs/ratio tables is reserved for cells outside all zones
+    # Zone IDs are mapped to table rows with a lookup array
+    zone_count = len(zone_id_array)
+    zone_row_array = np.zeros(
+        max(zone_id_array.max(), hru_zone_array.max()) + 1, dtype=np.int64)
+    zone_row_array[zone_id_array] = np.arange(1, zone_count + 1)
+    obs_table = np.vstack([np.full((1, 12), np.nan), ppt_obs_array])
+
+    # Default all zones to a PPT ratio of 1
+    ratio_table = np.ones((zone_count + 1, 12), dtype=np.float64)
+    ratio_table[0, :] = 0
+
+    # Scale ratios so gridded PPT will match observed PPT at the target cells
+    if ((set_ppt_zones_flag and ppt_hru_id_field) or
+            (not set_ppt_zones_flag and zone_hru_id_array is not None)):
+        # Find the cell index of each PPT HRU_ID using the sorted HRU_IDs
+        hru_id_sort_i = np.argsort(hru_id_array)
+        hru_id_sorted = hru_id_array[hru_id_sort_i]
+        hru_i = np.searchsorted(hru_id_sorted, zone_hru_id_array)
+        hru_i[hru_i >= len(hru_id_sorted)] = 0
+        valid_mask = hru_id_sorted[hru_i] == zone_hru_id_array
+        hru_i = hru_id_sort_i[hru_i]
+
+        # Check that PPT_HRU_IDs are in the correct zone
+        valid_mask &= hru_zone_array[hru_i] == zone_id_array
+        if not np.all(valid_mask):
+            invalid_i = np.where(~valid_mask)[0][0]
+            logging.error(
+                '\nERROR: HRU_ID {} is not in PPT ZONE {}'.format(
+                    zone_hru_id_array[invalid_i], zone_id_array[invalid_i]))
+            sys.exit()
+        logging.debug('  PPT Zone HRU IDs')
+        for zone_id, hru_id in zip(zone_id_array, zone_hru_id_array):
+            logging.debug('    {}: {}'.format(zone_id, hru_id))
+
+        # Ratio of MEASURED or OBSERVED PPT to GRIDDED PPT
+        # This will be multiplied by GRIDDED/OBSERVED below
+        ppt_gridded_array = ppt_array[hru_i]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio_table[1:] = np.where(
+                ppt_gridded_array > 0, ppt_obs_array / ppt_gridded_array, 0)
+        del hru_id_sort_i, hru_id_sorted, hru_i, valid_mask
+
+    logging.debug('  PPT Ratios:')
+    for zone_id, ratio_row in zip(zone_id_array, ratio_table[1:]):
+        logging.debug('    {}: {}'.format(
+            zone_id, ', '.join(['{:.3f}'.format(x) for x in ratio_row])))
+
+    # Gather the zone rows for every cell and compute all months at once
+    # DEADBEEF - The cell zone IDs are set from ppt_zone_field
+    #   in zone_by_centroid_func
+    # There is probably a cleaner way of linking these two
+    hru_row_array = zone_row_array[hru_zone_array]
+    if np.any(hru_row_array == 0):
+        logging.warning(
+            '  {} cells are not in a PPT zone, setting PPT ratios to 0'.format(
+                np.count_nonzero(hru_row_array == 0)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ppt_ratio_array = (
+            ratio_table[hru_row_array] * ppt_array / obs_table[hru_row_array])
+    ppt_ratio_array[~np.isfinite(ppt_ratio_array)] = 0
+
+    # Write all ratio fields in a single pass
+    fields = ['OID@'] + ratio_field_list
+    with report.stage('cursor_write') as stage:
+        row_count = 0
         with arcpy.da.UpdateCursor(hru.polygon_path, fields) as u_cursor:
-            for row in u_cursor:
-                for i, month in enumerate(month_list):
-                    ppt_i = fields.index(ppt_field_format.format(month))
-                    ratio_i = fields.index(ratio_field_format.format(month))
-                    row[ratio_i] = (
-                        ppt_ratio_list[i] * row[ppt_i] / ppt_obs_list[i])
-                u_cursor.updateRow(row)
-            del row
+            for i, row in enumerate(u_cursor):
+                if row[0] != hru_oid_array[i]:
+                    logging.error(
+                        '\nERROR: Fishnet cursor order changed while writing ' +
+                        'PPT ratios\n')
+                    sys.exit()
+                u_cursor.updateRow([row[0]] + ppt_ratio_array[i].tolist())
+                row_count += 1
+        stage.add_rows(row_count)
+    del ppt_array, ppt_ratio_array, obs_table, ratio_table
 
 
 def arg_parse():
@@ -472,3 +475,4 @@ if __name__ == '__main__':
     ppt_ratio_parameters(
         config_path=args.ini, overwrite_flag=args.overwrite,
         debug_flag=args.loglevel==logging.DEBUG)
+    report.finish_report()
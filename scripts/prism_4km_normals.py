@@ -18,6 +18,7 @@ import sys
 import arcpy
 from arcpy import env
 
+import report_functions as report
 import support_functions as support
 
 
@@ -36,7 +37,7 @@ def prism_4km_parameters(config_path, data_name='ALL',
     """
 
     # Initialize hru_parameters class
-    hru = support.HRUParameters(config_path)
+    hru = support.get_hru_parameters(config_path)
 
     # Open input parameter config file
     inputs_cfg = ConfigParser.ConfigParser()
@@ -55,6 +56,7 @@ def prism_4km_parameters(config_path, data_name='ALL',
     log_console.setLevel(logging.DEBUG)
     log_console.setFormatter(logging.Formatter('%(message)s'))
     logging.getLogger('').addHandler(log_console)
+    report.start_report(log_file_name.replace('_log.txt', ''), hru.log_ws)
     logging.info('\nGSFLOW PRISM Parameters')
 
     # PRISM
@@ -269,3 +271,4 @@ if __name__ == '__main__':
         config_path=args.ini, data_name=args.type,
         overwrite_flag=args.overwrite,
         debug_flag=args.loglevel==logging.DEBUG)
+    report.finish_report()
@@ -11,6 +11,7 @@ import argparse
 from collections import defaultdict
 import ConfigParser
 import datetime as dt
+from itertools import izip
 import logging
 import operator
 import os
@@ -18,6 +19,10 @@ import sys
 
 import arcpy
 
+import numpy as np
+
+import network_functions as network
+import report_functions as report
 import support_functions as support
 
 
@@ -34,7 +39,7 @@ def prms_template_fill(config_path, overwrite_flag=False, debug_flag=False):
     """
 
     # Initialize hru_parameters class
-    hru = support.HRUParameters(config_path)
+    hru = support.get_hru_parameters(config_path)
 
     # Open input parameter config file
     config = ConfigParser.ConfigParser()
@@ -53,6 +58,7 @@ def prms_template_fill(config_path, overwrite_flag=False, debug_flag=False):
     log_console.setLevel(logging.DEBUG)
     log_console.setFormatter(logging.Formatter('%(message)s'))
     logging.getLogger('').addHandler(log_console)
+    report.start_report(log_file_name.replace('_log.txt', ''), hru.log_ws)
     logging.info('\nFilling PRMS Parameter File Template')
 
     # Read parameters from config file
@@ -173,40 +179,47 @@ def prms_template_fill(config_path, overwrite_flag=False, debug_flag=False):
     logging.info('\nCalculating number of lake cells')
     logging.info('  Lake cells are {} >= 0'.format(
         hru.lake_id_field))
-    value_fields = (hru.id_field, hru.lake_id_field)
-    with arcpy.da.SearchCursor(hru.polygon_path, value_fields) as s_cursor:
-        dimen_size_dict['nlake'] = len(list(
-            [int(row[1]) for row in s_cursor if int(row[1]) > 0]))
+    # Read the HRU values used for the dimensions and the calculated
+    #   parameters once (in FID order)
+    hru_values = support.read_table_columns(hru.polygon_path, [
+        hru.type_field, hru.lake_id_field, hru.krch_field, hru.iseg_field,
+        hru.irunbound_field, hru.subbasin_field, hru.flow_dir_field,
+        hru.col_field, hru.row_field, hru.id_field, hru.area_field])
+    hru_type_array = hru_values[hru.type_field].astype(np.int64)
+    lake_id_array = hru_values[hru.lake_id_field].astype(np.int64)
+    krch_array = hru_values[hru.krch_field].astype(np.int64)
+    iseg_array = hru_values[hru.iseg_field].astype(np.int64)
+    irunbound_array = hru_values[hru.irunbound_field].astype(np.int64)
+    subbasin_array = hru_values[hru.subbasin_field].astype(np.int64)
+    flow_dir_array = hru_values[hru.flow_dir_field].astype(np.int64)
+    col_array = hru_values[hru.col_field].astype(np.int64)
+    row_array = hru_values[hru.row_field].astype(np.int64)
+    hru_id_array = hru_values[hru.id_field]
+    area_array = hru_values[hru.area_field].astype(np.float64)
+    del hru_values
+    dimen_size_dict['nlake'] = int(np.count_nonzero(lake_id_array > 0))
     logging.info('  nlakes = {}'.format(dimen_size_dict['nlake']))
 
     # Getting number of stream cells
     logging.info('Calculating number of stream cells')
     logging.info('  Stream cells are {} >= 0'.format(
         hru.krch_field))
-    value_fields = (hru.id_field, hru.krch_field)
-    with arcpy.da.SearchCursor(hru.polygon_path, value_fields) as s_cursor:
-        dimen_size_dict['nreach'] = len(list(
-            [int(row[1]) for row in s_cursor if int(row[1]) > 0]))
+    dimen_size_dict['nreach'] = int(np.count_nonzero(krch_array > 0))
     logging.info('  nreach = {}'.format(dimen_size_dict['nreach']))
 
     # Getting number of stream segments
     logging.info('Calculating number of unique stream segments')
     logging.info('  Stream segments are {} >= 0'.format(
         hru.iseg_field))
-    value_fields = (hru.id_field, hru.iseg_field)
-    with arcpy.da.SearchCursor(hru.polygon_path, value_fields) as s_cursor:
-        dimen_size_dict['nsegment'] = len(list(set(
-            [int(row[1]) for row in s_cursor if int(row[1]) > 0])))
+    dimen_size_dict['nsegment'] = len(np.unique(iseg_array[iseg_array > 0]))
     logging.info('  nsegment = {}'.format(dimen_size_dict['nsegment']))
 
     # Getting number of subbasins
     logging.info('Calculating number of unique subbasins')
     logging.info('  Subbasins are {} >= 0'.format(
         hru.subbasin_field))
-    value_fields = (hru.id_field, hru.subbasin_field)
-    with arcpy.da.SearchCursor(hru.polygon_path, value_fields) as s_cursor:
-        dimen_size_dict['nsub'] = len(list(set(
-            [int(row[1]) for row in s_cursor if int(row[1]) > 0])))
+    dimen_size_dict['nsub'] = len(
+        np.unique(subbasin_array[subbasin_array > 0]))
     logging.info('  nsub = {}'.format(dimen_size_dict['nsub']))
 
     # Read in CRT dimensions
@@ -345,22 +358,24 @@ def prms_template_fill(config_path, overwrite_flag=False, debug_flag=False):
     param_field_dict = dict(
         [(k, v) for k, v in param_default_dict.items()
          if type(v) is str and v not in ['CALCULATED', 'CRT']])
-    value_fields = param_field_dict.values()
     # Use HRU_ID to uniquely identify each cell
-    if hru.id_field not in value_fields:
-        value_fields.append(hru.id_field)
-    hru_id_i = value_fields.index(hru.id_field)
+    # Each field is only read once, even if it is used for more than one
+    #   parameter
+    value_fields = sorted(set(param_field_dict.values() + [hru.id_field]))
     # Read in each cell parameter value
-    with arcpy.da.SearchCursor(hru.polygon_path, value_fields) as s_cursor:
-        for row in s_cursor:
-            for field_i, (param, field) in enumerate(param_field_dict.items()):
-                if param_type_dict[param] == 1:
-                    param_values_dict[param][row[hru_id_i]] = int(row[field_i])
-                elif param_type_dict[param] in [2, 3]:
-                    param_values_dict[param][row[hru_id_i]] = float(row[field_i])
-                elif param_type_dict[param] == 4:
-                    param_values_dict[param][row[hru_id_i]] = row[field_i]
-                # param_values_dict[param][row[hru_id_i]] = row[field_i]
+    field_values = support.read_table_columns(hru.polygon_path, value_fields)
+    hru_id_list = field_values[hru.id_field].tolist()
+    for param, field in param_field_dict.items():
+        if param_type_dict[param] == 1:
+            value_list = field_values[field].astype(np.int64).tolist()
+        elif param_type_dict[param] in [2, 3]:
+            value_list = field_values[field].astype(np.float64).tolist()
+        elif param_type_dict[param] == 4:
+            value_list = field_values[field].tolist()
+        else:
+            continue
+        param_values_dict[param].update(izip(hru_id_list, value_list))
+    del field_values, hru_id_list
 
     # The following will override the parameter CSV values
     # Calculate basin_area from active cells (land and lake)
@@ -371,10 +386,8 @@ def prms_template_fill(config_path, overwrite_flag=False, debug_flag=False):
     param_dimen_names_dict['basin_area'] = ['one']
     param_values_count_dict['basin_area'] = dimen_size_dict['one']
     param_type_dict['basin_area'] = 2
-    value_fields = (hru.id_field, hru.type_field, hru.area_field)
-    with arcpy.da.SearchCursor(hru.polygon_path, value_fields) as s_cursor:
-        param_values_dict['basin_area'][0] = sum(
-            [float(row[2]) for row in s_cursor if int(row[1]) >= 1])
+    param_values_dict['basin_area'][0] = float(
+        area_array[hru_type_array >= 1].sum())
     logging.info('  basin_area = {} acres'.format(
         param_values_dict['basin_area'][0]))
 
@@ -386,10 +399,7 @@ def prms_template_fill(config_path, overwrite_flag=False, debug_flag=False):
     param_dimen_names_dict['ncol'] = ['one']
     param_values_count_dict['ncol'] = dimen_size_dict['one']
     param_type_dict['ncol'] = 1
-    value_fields = (hru.id_field, hru.col_field)
-    with arcpy.da.SearchCursor(hru.polygon_path, value_fields) as s_cursor:
-        param_values_dict['ncol'][0] = len(
-            list(set([int(row[1]) for row in s_cursor])))
+    param_values_dict['ncol'][0] = len(np.unique(col_array))
     logging.info('  ncol = {}'.format(
         param_values_dict['ncol'][0]))
 
@@ -403,16 +413,15 @@ def prms_template_fill(config_path, overwrite_flag=False, debug_flag=False):
     param_values_count_dict['tmax_index'] = dimen_size_dict['nmonths']
     param_type_dict['tmax_index'] = 2
     tmax_field_list = ['TMAX_{:02d}'.format(m) for m in range(1, 13)]
+    tmax_values = support.read_table_columns(
+        hru.polygon_path, tmax_field_list)
     for i, tmax_field in enumerate(tmax_field_list):
-        tmax_values = [row[1] for row in arcpy.da.SearchCursor(
-            hru.polygon_path, (hru.type_field, tmax_field),
-            where_clause='"{}" >= 1'.format(hru.type_field))]
-        tmax_c = sum(tmax_values) / len(tmax_values)
+        tmax_c = float(np.mean(tmax_values[tmax_field][hru_type_array >= 1]))
         tmax_f = 1.8 * tmax_c + 32
         param_values_dict['tmax_index'][i] = tmax_f
         logging.info('  {} = {}'.format(
             tmax_field, param_values_dict['tmax_index'][i]))
-        del tmax_values
+    del tmax_values
 
     #
     logging.info('\nCalculating rain_adj/snow_adj')
@@ -429,15 +438,17 @@ def prms_template_fill(config_path, overwrite_flag=False, debug_flag=False):
     param_dimen_names_dict['snow_adj'] = ['nhru', 'nmonths']
     param_values_count_dict['snow_adj'] = 12 * fishnet_count
     param_type_dict['snow_adj'] = 2
-    ratio_values = []
-    for i, ratio_field in enumerate(ratio_field_list):
-        ratio_values.extend([
-            float(row[1]) for row in sorted(arcpy.da.SearchCursor(
-                hru.polygon_path, (hru.id_field, ratio_field)))])
+    # Values are sorted by HRU_ID for each month
+    ratio_values = support.read_table_columns(
+        hru.polygon_path, ratio_field_list)
+    hru_id_order = np.argsort(hru_id_array, kind='mergesort')
+    ratio_values = np.concatenate([
+        ratio_values[ratio_field][hru_id_order].astype(np.float64)
+        for ratio_field in ratio_field_list]).tolist()
     for i, value in enumerate(ratio_values):
         param_values_dict['rain_adj'][i] = value
         param_values_dict['snow_adj'][i] = value
-    del ratio_values
+    del ratio_values, hru_id_order
 
     #
     logging.info('\nCalculating subbasin_down')
@@ -447,51 +458,42 @@ def prms_template_fill(config_path, overwrite_flag=False, debug_flag=False):
     param_dimen_names_dict['subbasin_down'] = ['nsub']
     param_values_count_dict['subbasin_down'] = dimen_size_dict['nsub']
     param_type_dict['subbasin_down'] = 1
-    # Get list of subbasins and downstream cell for each stream/lake cell
-    # Downstream is calulated from flow direction
-    # logging.info("Cell out-flow dictionary")
-    cell_dict = dict()
-    fields = [
-        hru.type_field, hru.krch_field, hru.lake_id_field,
-        hru.subbasin_field, hru.flow_dir_field,
-        hru.col_field, hru.row_field, hru.id_field]
-    for row in arcpy.da.SearchCursor(hru.polygon_path, fields):
-        # Skip inactive cells
-        if int(row[0]) == 0:
-            continue
-        # Skip non-lake and non-stream cells
-        elif (int(row[1]) == 0 and int(row[2]) == 0):
-            continue
-        # Read in parameters
-        cell = (int(row[5]), int(row[6]))
-        # support.next_row_col(FLOW_DIR, CELL)
-        # HRU_ID, SUBBASIN, NEXT_CELL
-        cell_dict[cell] = [
-            int(row[7]), int(row[3]), support.next_row_col(int(row[4]), cell)]
-        del cell
-
-    # Get subset of cells if subbasin != next_subbasin
-    subbasin_list = []
-    # CELL, (HRU_ID, SUBBASIN, NEXT_CELL)
-    # for cell, row in cell_dict.items():
-    for cell, (hru_id, subbasin, next_cell) in cell_dict.items():
-        # Skip cells that are already subbasin 0 (inactive?)
-        # If next cell isn't in list, assume next cell is out of the model
-        #   and set exit gauge subbasin to 0
-        # If the subbasin of the current cell doesn't match the subbasin
-        #   of the next cell, save the down subbasin
-        if subbasin == 0:
-            continue
-        elif next_cell not in cell_dict.keys():
-            if [subbasin, 0] not in subbasin_list:
-                subbasin_list.append([subbasin, 0])
-        elif subbasin != cell_dict[next_cell][1]:
-            subbasin_list.append([subbasin, cell_dict[next_cell][1]])
-    for i, (subbasin, subbasin_down) in enumerate(sorted(subbasin_list)):
+    # Subbasins flow to the subbasin of the first stream/lake cell outside
+    #   of them (0 if they flow out of the model)
+    # The network is saved by stream_parameters and is only rebuilt from
+    #   the flow directions if the HRU values have changed
+    # Skip inactive cells and non-lake and non-stream cells
+    network_mask = (
+        (hru_type_array != 0) & ((krch_array != 0) | (lake_id_array != 0)))
+    network_path = os.path.join(hru.param_ws, network.network_name)
+    stream_network = None
+    if os.path.isfile(network_path):
+        try:
+            stream_network = network.StreamNetwork.load(network_path)
+        except ValueError as e:
+            logging.debug('  {}'.format(e))
+        if (stream_network is None or not stream_network.is_current(
+                col_array, row_array, flow_dir_array, irunbound_array,
+                subbasin_array, network_mask)):
+            logging.debug('  Stream network is out of date, rebuilding')
+            stream_network = None
+    if stream_network is None:
+        try:
+            stream_network = network.StreamNetwork.from_cells(
+                col_array, row_array, flow_dir_array, irunbound_array,
+                subbasin_array, network_mask)
+        except ValueError as e:
+            logging.error('\nERROR: {}\n'.format(e))
+            sys.exit()
+    subbasin_graph = stream_network.subbasin_graph
+    subbasin_down_array = subbasin_graph.lookup(
+        subbasin_graph.down_ids,
+        np.unique(subbasin_array[subbasin_array > 0]))
+    for i, subbasin_down in enumerate(subbasin_down_array.tolist()):
         param_values_dict['subbasin_down'][i] = subbasin_down
         logging.debug('  {}'.format(
             param_values_dict['subbasin_down'][i]))
-    del subbasin_list
+    del network_mask, stream_network, subbasin_graph, subbasin_down_array
 
 
     # # DEADBEEF - lake_hru is not used in PRMS 3.0.X or gsflow
@@ -814,3 +816,4 @@ if __name__ == '__main__':
     prms_template_fill(
         config_path=args.ini, overwrite_flag=args.overwrite,
         debug_flag=args.loglevel==logging.DEBUG)
+    report.finish_report()
@@ -0,0 +1,441 @@
+#--------------------------------
+# Name:         projection_functions.py
+# Purpose:      NumPy coordinate transform functions
+# Notes:        ArcGIS 10.2 Version
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+import csv
+import logging
+import math
+import os
+import re
+import sys
+
+import numpy as np
+
+
+# Supported projections (ArcGIS projection names)
+# Projection parameters are passed as a dictionary with the keys:
+#   projection, a, f, datum, meters_per_unit, false_easting, false_northing,
+#   central_meridian, scale_factor, latitude_of_origin,
+#   standard_parallel_1, standard_parallel_2
+# Angles are in decimal degrees
+projection_list = ['GEOGRAPHIC', 'Transverse_Mercator', 'Albers']
+
+# Datum transformations returned by support.transform_func()
+# Source datum, target datum, and coordinate frame rotation parameters
+#   (dx, dy, dz in meters, rx, ry, rz in arc-seconds, ds in ppm)
+datum_transforms = {
+    'NAD_1983_To_WGS_1984_5': (
+        'D_North_American_1983', 'D_WGS_1984',
+        (-0.991, 1.9072, 0.5129, -0.0257899075194932,
+         -0.0096500989602704, -0.0116599432323421, 0.0))}
+
+
+def transform_points(x, y, input_params, output_params, transform=None):
+    """Transform coordinate arrays between two spatial references
+
+    Args:
+        x (np.array): input x coordinates (or longitudes)
+        y (np.array): input y coordinates (or latitudes)
+        input_params (dict): input projection parameters
+        output_params (dict): output projection parameters
+        transform (str): datum transformation name (see datum_transforms)
+
+    Returns:
+        tuple of the output x and y arrays
+    """
+    lon, lat = to_geographic(x, y, input_params)
+    if transform:
+        lon, lat = datum_transform(
+            lon, lat, input_params, output_params, transform)
+    return from_geographic(lon, lat, output_params)
+
+
+def wkt_params(wkt):
+    """Get the projection parameters from ESRI well known text
+
+    This is the NumPy equivalent of support.spatial_reference_params() for
+        spatial references that are only available as text
+        (i.e. a shapefile or raster .prj file).
+
+    Args:
+        wkt (str): ESRI well known text
+
+    Returns:
+        dict of projection parameters, or None if the spatial reference
+            is not supported
+    """
+    number = r'([-+]?[0-9.]+(?:[eE][-+]?[0-9]+)?)'
+    datum_match = re.search(r'DATUM\["([^"]+)"', wkt)
+    spheroid_match = re.search(
+        r'SPHEROID\["[^"]*",\s*{0},\s*{0}'.format(number), wkt)
+    primem_match = re.search(r'PRIMEM\["([^"]+)",\s*{}'.format(number), wkt)
+    if not datum_match or not spheroid_match:
+        return None
+    elif primem_match and float(primem_match.group(2)) != 0:
+        return None
+    # The spheroid is defined by the inverse flattening (0 for a sphere)
+    inv_flattening = float(spheroid_match.group(2))
+    params = {
+        'a': float(spheroid_match.group(1)),
+        'f': 1.0 / inv_flattening if inv_flattening else 0.0,
+        'datum': datum_match.group(1)}
+    if not wkt.strip().upper().startswith('PROJCS'):
+        params['projection'] = 'GEOGRAPHIC'
+        return params
+
+    projection_match = re.search(r'PROJECTION\["([^"]+)"', wkt)
+    if (not projection_match or
+            projection_match.group(1) not in projection_list):
+        return None
+    params.update({
+        'projection': projection_match.group(1),
+        'false_easting': 0.0, 'false_northing': 0.0,
+        'central_meridian': 0.0, 'scale_factor': 1.0,
+        'latitude_of_origin': 0.0,
+        'standard_parallel_1': 0.0, 'standard_parallel_2': 0.0})
+    for name, value in re.findall(
+            r'PARAMETER\["([^"]+)",\s*{}'.format(number), wkt):
+        if name.lower() in params:
+            params[name.lower()] = float(value)
+    # The linear unit is the last unit (after the geographic angular unit)
+    unit_list = re.findall(r'UNIT\["[^"]*",\s*{}'.format(number), wkt)
+    params['meters_per_unit'] = float(unit_list[-1]) if unit_list else 1.0
+    return params
+
+
+def to_geographic(x, y, params):
+    """Convert projected coordinates to geographic (decimal degrees)"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if params['projection'] == 'GEOGRAPHIC':
+        return x, y
+    # Convert to meters
+    x = x * params['meters_per_unit'] - params['false_easting']
+    y = y * params['meters_per_unit'] - params['false_northing']
+    if params['projection'] == 'Transverse_Mercator':
+        lon, lat = tm_inverse(x, y, params)
+    elif params['projection'] == 'Albers':
+        lon, lat = albers_inverse(x, y, params)
+    else:
+        raise ValueError('unsupported projection: {}'.format(
+            params['projection']))
+    return np.degrees(lon), np.degrees(lat)
+
+
+def from_geographic(lon, lat, params):
+    """Convert geographic coordinates (decimal degrees) to projected"""
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    if params['projection'] == 'GEOGRAPHIC':
+        return lon, lat
+    if params['projection'] == 'Transverse_Mercator':
+        x, y = tm_forward(np.radians(lon), np.radians(lat), params)
+    elif params['projection'] == 'Albers':
+        x, y = albers_forward(np.radians(lon), np.radians(lat), params)
+    else:
+        raise ValueError('unsupported projection: {}'.format(
+            params['projection']))
+    return (
+        (x + params['false_easting']) / params['meters_per_unit'],
+        (y + params['false_northing']) / params['meters_per_unit'])
+
+
+def _meridian_distance(lat, a, e2):
+    """Distance along the meridian from the equator (Snyder 3-21)"""
+    return a * (
+        (1 - e2 / 4 - 3 * e2 ** 2 / 64 - 5 * e2 ** 3 / 256) * lat -
+        (3 * e2 / 8 + 3 * e2 ** 2 / 32 + 45 * e2 ** 3 / 1024) *
+        np.sin(2 * lat) +
+        (15 * e2 ** 2 / 256 + 45 * e2 ** 3 / 1024) * np.sin(4 * lat) -
+        (35 * e2 ** 3 / 3072) * np.sin(6 * lat))
+
+
+def tm_forward(lon, lat, params):
+    """Transverse Mercator forward projection (Snyder 8-9 to 8-10)
+
+    Args:
+        lon (np.array): longitude in radians
+        lat (np.array): latitude in radians
+        params (dict): projection parameters
+
+    Returns:
+        tuple of x and y in meters (without false easting/northing)
+    """
+    a = params['a']
+    e2 = 2 * params['f'] - params['f'] ** 2
+    ep2 = e2 / (1 - e2)
+    k0 = params['scale_factor']
+    lon0 = math.radians(params['central_meridian'])
+    lat0 = math.radians(params['latitude_of_origin'])
+
+    sin_lat, cos_lat, tan_lat = np.sin(lat), np.cos(lat), np.tan(lat)
+    n = a / np.sqrt(1 - e2 * sin_lat ** 2)
+    t = tan_lat ** 2
+    c = ep2 * cos_lat ** 2
+    aa = (lon - lon0) * cos_lat
+    m = _meridian_distance(lat, a, e2)
+    m0 = _meridian_distance(lat0, a, e2)
+    x = k0 * n * (
+        aa + (1 - t + c) * aa ** 3 / 6 +
+        (5 - 18 * t + t ** 2 + 72 * c - 58 * ep2) * aa ** 5 / 120)
+    y = k0 * (m - m0 + n * tan_lat * (
+        aa ** 2 / 2 + (5 - t + 9 * c + 4 * c ** 2) * aa ** 4 / 24 +
+        (61 - 58 * t + t ** 2 + 600 * c - 330 * ep2) * aa ** 6 / 720))
+    return x, y
+
+
+def tm_inverse(x, y, params):
+    """Transverse Mercator inverse projection (Snyder 8-12 to 8-25)
+
+    Args:
+        x (np.array): x in meters (without false easting)
+        y (np.array): y in meters (without false northing)
+        params (dict): projection parameters
+
+    Returns:
+        tuple of longitude and latitude in radians
+    """
+    a = params['a']
+    e2 = 2 * params['f'] - params['f'] ** 2
+    ep2 = e2 / (1 - e2)
+    k0 = params['scale_factor']
+    lon0 = math.radians(params['central_meridian'])
+    lat0 = math.radians(params['latitude_of_origin'])
+
+    m = _meridian_distance(lat0, a, e2) + y / k0
+    mu = m / (a * (1 - e2 / 4 - 3 * e2 ** 2 / 64 - 5 * e2 ** 3 / 256))
+    e1 = (1 - math.sqrt(1 - e2)) / (1 + math.sqrt(1 - e2))
+    lat1 = (
+        mu + (3 * e1 / 2 - 27 * e1 ** 3 / 32) * np.sin(2 * mu) +
+        (21 * e1 ** 2 / 16 - 55 * e1 ** 4 / 32) * np.sin(4 * mu) +
+        (151 * e1 ** 3 / 96) * np.sin(6 * mu) +
+        (1097 * e1 ** 4 / 512) * np.sin(8 * mu))
+
+    sin_lat1, cos_lat1, tan_lat1 = np.sin(lat1), np.cos(lat1), np.tan(lat1)
+    c1 = ep2 * cos_lat1 ** 2
+    t1 = tan_lat1 ** 2
+    n1 = a / np.sqrt(1 - e2 * sin_lat1 ** 2)
+    r1 = a * (1 - e2) / (1 - e2 * sin_lat1 ** 2) ** 1.5
+    d = x / (n1 * k0)
+    lat = lat1 - (n1 * tan_lat1 / r1) * (
+        d ** 2 / 2 -
+        (5 + 3 * t1 + 10 * c1 - 4 * c1 ** 2 - 9 * ep2) * d ** 4 / 24 +
+        (61 + 90 * t1 + 298 * c1 + 45 * t1 ** 2 - 252 * ep2 -
+         3 * c1 ** 2) * d ** 6 / 720)
+    lon = lon0 + (
+        d - (1 + 2 * t1 + c1) * d ** 3 / 6 +
+        (5 - 2 * c1 + 28 * t1 - 3 * c1 ** 2 + 8 * ep2 + 24 * t1 ** 2) *
+        d ** 5 / 120) / cos_lat1
+    return lon, lat
+
+
+def _albers_constants(params):
+    """Albers constants n, C, and rho0 (Snyder 14-3 to 14-15)"""
+    a = params['a']
+    e2 = 2 * params['f'] - params['f'] ** 2
+    lat0 = math.radians(params['latitude_of_origin'])
+    lat1 = math.radians(params['standard_parallel_1'])
+    lat2 = math.radians(params['standard_parallel_2'])
+    m1 = math.cos(lat1) / math.sqrt(1 - e2 * math.sin(lat1) ** 2)
+    m2 = math.cos(lat2) / math.sqrt(1 - e2 * math.sin(lat2) ** 2)
+    q0 = float(_albers_q(lat0, e2))
+    q1 = float(_albers_q(lat1, e2))
+    q2 = float(_albers_q(lat2, e2))
+    if lat1 == lat2:
+        n = math.sin(lat1)
+    else:
+        n = (m1 ** 2 - m2 ** 2) / (q2 - q1)
+    c = m1 ** 2 + n * q1
+    rho0 = a * math.sqrt(c - n * q0) / n
+    return a, e2, n, c, rho0
+
+
+def _albers_q(lat, e2):
+    """Albers q (Snyder 3-12)"""
+    e = math.sqrt(e2)
+    sin_lat = np.sin(lat)
+    return (1 - e2) * (
+        sin_lat / (1 - e2 * sin_lat ** 2) -
+        (1 / (2 * e)) * np.log((1 - e * sin_lat) / (1 + e * sin_lat)))
+
+
+def albers_forward(lon, lat, params):
+    """Albers equal area conic forward projection (Snyder 14-1 to 14-4)
+
+    Args:
+        lon (np.array): longitude in radians
+        lat (np.array): latitude in radians
+        params (dict): projection parameters
+
+    Returns:
+        tuple of x and y in meters (without false easting/northing)
+    """
+    a, e2, n, c, rho0 = _albers_constants(params)
+    lon0 = math.radians(params['central_meridian'])
+    rho = a * np.sqrt(c - n * _albers_q(lat, e2)) / n
+    theta = n * (lon - lon0)
+    return rho * np.sin(theta), rho0 - rho * np.cos(theta)
+
+
+def albers_inverse(x, y, params):
+    """Albers equal area conic inverse projection (Snyder 14-8 to 14-21)
+
+    Args:
+        x (np.array): x in meters (without false easting)
+        y (np.array): y in meters (without false northing)
+        params (dict): projection parameters
+
+    Returns:
+        tuple of longitude and latitude in radians
+    """
+    a, e2, n, c, rho0 = _albers_constants(params)
+    e = math.sqrt(e2)
+    lon0 = math.radians(params['central_meridian'])
+    rho = np.sqrt(x ** 2 + (rho0 - y) ** 2)
+    if n < 0:
+        rho, theta = -rho, np.arctan2(-x, -(rho0 - y))
+    else:
+        theta = np.arctan2(x, rho0 - y)
+    q = (c - (rho * n / a) ** 2) / n
+
+    # Iterate to solve for latitude
+    lat = np.arcsin(np.clip(q / 2, -1, 1))
+    for i in xrange(15):
+        sin_lat = np.sin(lat)
+        delta_lat = (
+            (1 - e2 * sin_lat ** 2) ** 2 / (2 * np.cos(lat)) * (
+                q / (1 - e2) - sin_lat / (1 - e2 * sin_lat ** 2) +
+                (1 / (2 * e)) * np.log((1 - e * sin_lat) / (1 + e * sin_lat))))
+        lat = lat + delta_lat
+        if np.all(np.abs(delta_lat) < 1E-12):
+            break
+    return lon0 + theta / n, lat
+
+
+def datum_transform(lon, lat, input_params, output_params, transform):
+    """Apply a coordinate frame rotation datum transformation
+
+    The transformation is applied in reverse if the input datum is the
+        transformation target datum.
+
+    Args:
+        lon (np.array): input longitude in decimal degrees
+        lat (np.array): input latitude in decimal degrees
+        input_params (dict): input spatial reference parameters
+        output_params (dict): output spatial reference parameters
+        transform (str): datum transformation name
+
+    Returns:
+        tuple of the output longitude and latitude in decimal degrees
+    """
+    try:
+        source_datum, target_datum, frame = datum_transforms[transform]
+    except KeyError:
+        raise ValueError('unsupported datum transformation: {}'.format(
+            transform))
+    dx, dy, dz, rx, ry, rz, ds = frame
+    if (input_params['datum'] == target_datum and
+            output_params['datum'] == source_datum):
+        dx, dy, dz, rx, ry, rz, ds = -dx, -dy, -dz, -rx, -ry, -rz, -ds
+    elif (input_params['datum'] != source_datum or
+          output_params['datum'] != target_datum):
+        raise ValueError(
+            'datum transformation {} does not apply to {} and {}'.format(
+                transform, input_params['datum'], output_params['datum']))
+    rx, ry, rz = [math.radians(r / 3600.0) for r in [rx, ry, rz]]
+    scale = 1 + ds * 1E-6
+
+    # Geographic to geocentric (ellipsoid height is assumed to be 0)
+    a, e2 = input_params['a'], 2 * input_params['f'] - input_params['f'] ** 2
+    lon_r, lat_r = np.radians(lon), np.radians(lat)
+    n = a / np.sqrt(1 - e2 * np.sin(lat_r) ** 2)
+    x = n * np.cos(lat_r) * np.cos(lon_r)
+    y = n * np.cos(lat_r) * np.sin(lon_r)
+    z = n * (1 - e2) * np.sin(lat_r)
+
+    # Coordinate frame rotation
+    x_out = dx + scale * (x + rz * y - ry * z)
+    y_out = dy + scale * (-rz * x + y + rx * z)
+    z_out = dz + scale * (ry * x - rx * y + z)
+
+    # Geocentric to geographic
+    a, e2 = output_params['a'], 2 * output_params['f'] - output_params['f'] ** 2
+    p = np.sqrt(x_out ** 2 + y_out ** 2)
+    lat_r = np.arctan2(z_out, p * (1 - e2))
+    for i in xrange(5):
+        n = a / np.sqrt(1 - e2 * np.sin(lat_r) ** 2)
+        lat_r = np.arctan2(z_out + e2 * n * np.sin(lat_r), p)
+    return np.degrees(np.arctan2(y_out, x_out)), np.degrees(lat_r)
+
+
+def check_reference_table(reference_path, tolerance=0.01):
+    """Check the transforms against a reference table of known coordinates
+
+    Each row has the projection parameters, an optional datum
+        transformation, projected x/y, and geographic lon/lat.
+    The lon/lat are in the transformation target datum (if set).
+
+    Args:
+        reference_path (str): reference CSV file path
+        tolerance (float): maximum allowed error in meters
+
+    Returns:
+        bool: True if all points are within the tolerance
+    """
+    float_fields = [
+        'a', 'f', 'meters_per_unit', 'false_easting', 'false_northing',
+        'central_meridian', 'scale_factor', 'latitude_of_origin',
+        'standard_parallel_1', 'standard_parallel_2', 'x', 'y', 'lon', 'lat']
+    with open(reference_path, 'rb') as reference_f:
+        reference_rows = list(csv.DictReader(reference_f))
+
+    check_flag = True
+    for case in sorted(set(row['case'] for row in reference_rows)):
+        case_rows = [row for row in reference_rows if row['case'] == case]
+        for row in case_rows:
+            for field in float_fields:
+                row[field] = float(row[field])
+        params = dict(
+            (k, v) for k, v in case_rows[0].items()
+            if k not in ['case', 'transform', 'x', 'y', 'lon', 'lat',
+                         'geographic_datum'])
+        geo_params = {
+            'projection': 'GEOGRAPHIC', 'a': params['a'], 'f': params['f'],
+            'datum': case_rows[0]['geographic_datum']}
+        transform = case_rows[0]['transform'] or None
+        x = np.array([row['x'] for row in case_rows])
+        y = np.array([row['y'] for row in case_rows])
+        lon = np.array([row['lon'] for row in case_rows])
+        lat = np.array([row['lat'] for row in case_rows])
+
+        # Projected to geographic, error converted to approximate meters
+        lon_calc, lat_calc = transform_points(
+            x, y, params, geo_params, transform)
+        geo_error = 6371000 * np.radians(np.hypot(
+            (lon_calc - lon) * np.cos(np.radians(lat)), lat_calc - lat))
+        # Geographic to projected
+        x_calc, y_calc = transform_points(
+            lon, lat, geo_params, params, transform)
+        proj_error = np.hypot(x_calc - x, y_calc - y) * params['meters_per_unit']
+        logging.info(
+            '  {:<32s} max error (m): to geographic {:.4f}  '
+            'to projected {:.4f}'.format(
+                case, geo_error.max(), proj_error.max()))
+        if geo_error.max() > tolerance or proj_error.max() > tolerance:
+            check_flag = False
+    return check_flag
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    logging.info('\nChecking NumPy coordinate transforms')
+    if not check_reference_table(os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            'projection_reference.csv')):
+        logging.error('\nERROR: Transforms do not match the reference table')
+        sys.exit(1)
@@ -0,0 +1,368 @@
+#--------------------------------
+# Name:         remap_functions.py
+# Purpose:      ASCII remap parsing and NumPy lookup table functions
+# Notes:        ArcGIS 10.2 Version
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+from collections import namedtuple
+import hashlib
+import logging
+
+import numpy as np
+
+
+# Single remap line
+# Direct remaps (i.e. "3001 : 2") have an upper value of None
+# Values are stored as the original strings so the files can be rewritten
+RemapEntry = namedtuple('RemapEntry', ['lower', 'upper', 'value', 'comment'])
+
+# Integer key spans up to this size are compiled to a dense lookup table
+# Larger spans fall back to a sorted key search
+lut_max_size = 2 ** 20
+
+# Compiled remap tables keyed by the MD5 hash of the remap file text
+_remap_table_cache = dict()
+
+
+def parse_remap_lines(remap_lines):
+    """Parse ASCII remap file lines
+
+    Both the ArcGIS 10.1 ("/*" descriptions) and 10.2 ("#" comment lines)
+    comment styles are accepted.
+
+    Args:
+        remap_lines (list): ASCII remap file lines
+
+    Returns:
+        tuple of the list of RemapEntry, the list of comment lines
+            (without the leading "#"), and a list of (line number, line)
+            for lines that could not be parsed
+    """
+    remap_entries = []
+    comment_lines = []
+    invalid_lines = []
+    for line_i, line in enumerate(remap_lines):
+        line = line.strip()
+        if not line:
+            continue
+        elif line.startswith('#'):
+            comment_lines.append(line[1:].strip())
+            continue
+
+        # Remove remap descriptions
+        if '/*' in line:
+            line, comment = line.split('/*', 1)
+            comment = comment.replace('*/', '').strip()
+        else:
+            comment = ''
+        line = line.split('#')[0].strip()
+
+        # Remap as a range if a min, max and value are all present
+        # Otherwise remap directly
+        line_split = line.split(':')
+        if len(line_split) != 2:
+            invalid_lines.append((line_i + 1, line))
+            continue
+        keys = line_split[0].split()
+        values = line_split[1].split()
+        if (len(keys) not in [1, 2] or len(values) != 1 or
+                not all(map(is_number, keys + values))):
+            invalid_lines.append((line_i + 1, line))
+            continue
+        if len(keys) == 1:
+            keys.append(None)
+        remap_entries.append(
+            RemapEntry(keys[0], keys[1], values[0], comment))
+    return remap_entries, comment_lines, invalid_lines
+
+
+def read_remap(remap_path):
+    """Read an ASCII remap file
+
+    Args:
+        remap_path (str): ASCII remap file path
+
+    Returns:
+        tuple of the remap file text and the parse_remap_lines() results
+    """
+    with open(remap_path) as remap_f:
+        remap_text = remap_f.read()
+    return (remap_text,) + parse_remap_lines(remap_text.splitlines())
+
+
+def validate_remap(remap_entries):
+    """Check that remap keys are valid, monotone, and non-overlapping
+
+    Entries must be listed in increasing key order.  Adjacent ranges may
+    share a boundary value (i.e. "0 23 : 0" and "23 68 : 45") but direct
+    keys can't be repeated.
+
+    Args:
+        remap_entries (list): RemapEntry
+
+    Returns:
+        list of error message strings (empty if the remap is valid)
+    """
+    errors = []
+    if not remap_entries:
+        errors.append('remap has no entries')
+    prev_entry, prev_upper = None, None
+    for entry in remap_entries:
+        lower = float(entry.lower)
+        upper = float(entry.upper) if entry.upper is not None else lower
+        entry_str = remap_entry_key(entry)
+        if lower > upper:
+            errors.append(
+                'range {} lower value is greater than the upper value'.format(
+                    entry_str))
+        if prev_entry is not None:
+            prev_str = remap_entry_key(prev_entry)
+            if lower < prev_upper:
+                errors.append('keys {} and {} are out of order or overlap'.format(
+                    prev_str, entry_str))
+            elif (lower == prev_upper and
+                  (entry.upper is None or prev_entry.upper is None)):
+                errors.append('keys {} and {} overlap'.format(
+                    prev_str, entry_str))
+        prev_entry, prev_upper = entry, upper
+    return errors
+
+
+def remap_entry_key(entry):
+    """Return the remap entry key string (i.e. "3001" or "0 23.0")"""
+    if entry.upper is None:
+        return entry.lower
+    return '{} {}'.format(entry.lower, entry.upper)
+
+
+def format_remap_arc10p2(remap_entries, comment_lines):
+    """Format remap entries and comments for ArcGIS 10.2
+
+    ArcGIS 10.2 doesn't support "/*" descriptions, so they are written
+    as "# key - description" comment lines after the remap values.
+    Comments are limited to 79 characters and there is no newline after
+    the last line (this causes an error in ArcGIS 10.2.2).
+
+    Args:
+        remap_entries (list): RemapEntry
+        comment_lines (list): comment strings (without the leading "#")
+
+    Returns:
+        str
+    """
+    output_lines = [
+        '{} : {}'.format(remap_entry_key(e), e.value) for e in remap_entries]
+    output_comments = list(comment_lines) + [
+        '{} - {}'.format(remap_entry_key(e), e.comment)
+        for e in remap_entries if e.comment]
+    output_lines.extend([
+        '# {}'.format(c).replace('California', 'CA')[:79]
+        for c in output_comments])
+    return '\n'.join(output_lines)
+
+
+class RemapTable(object):
+    """Compiled ASCII remap
+
+    Integer direct remaps (i.e. LANDFIRE codes) are compiled to a dense
+    lookup table indexed by (value - minimum key).  All other remaps are
+    compiled to ranges sorted by the upper value and applied with
+    np.searchsorted.  Values on the boundary between two ranges are assigned
+    to the lower range, the same as the ArcGIS Reclassify tools.
+    """
+
+    def __init__(self, remap_entries):
+        """"""
+        if not remap_entries:
+            raise ValueError('remap table has no entries')
+        lower_array = np.array(
+            [float(e.lower) for e in remap_entries], dtype=np.float64)
+        upper_array = np.array(
+            [float(e.upper) if e.upper is not None else float(e.lower)
+             for e in remap_entries], dtype=np.float64)
+        value_array = np.array(
+            [float(e.value) for e in remap_entries], dtype=np.float64)
+
+        # Output will be integer if all remap values are whole numbers
+        self.int_flag = bool(np.all(value_array == np.round(value_array)))
+        if self.int_flag:
+            value_array = value_array.astype(np.int64)
+
+        # Sort ranges by the upper value (then the lower value)
+        # A stable sort keeps the first of any duplicate keys first
+        sort_i = np.lexsort((lower_array, upper_array))
+        self.lower_array = lower_array[sort_i]
+        self.upper_array = upper_array[sort_i]
+        self.value_array = value_array[sort_i]
+
+        # Build a dense lookup table for integer direct remaps
+        self.lut_flag = False
+        if (np.all(lower_array == upper_array) and
+                np.all(lower_array == np.round(lower_array))):
+            key_array = lower_array.astype(np.int64)
+            self.lut_min = int(key_array.min())
+            lut_size = int(key_array.max()) - self.lut_min + 1
+            if lut_size <= lut_max_size:
+                self.lut_flag = True
+                self.lut_values = np.zeros(lut_size, dtype=value_array.dtype)
+                self.lut_mask = np.zeros(lut_size, dtype=np.bool)
+                # Assign in reverse so the first of any duplicate keys is used
+                self.lut_values[key_array[::-1] - self.lut_min] = (
+                    value_array[::-1])
+                self.lut_mask[key_array - self.lut_min] = True
+
+    def lookup(self, input_array):
+        """Remap an array
+
+        Args:
+            input_array (np.array): values to remap
+
+        Returns:
+            tuple of the remapped values and a mask of the remapped cells
+                (values of unmatched cells are undefined)
+        """
+        input_array = np.asarray(input_array)
+        if self.lut_flag:
+            # Float values (or NaN) only match if they are whole numbers
+            if input_array.dtype.kind == 'f':
+                with np.errstate(invalid='ignore'):
+                    int_mask = input_array == np.floor(input_array)
+                lut_i = np.where(int_mask, input_array, self.lut_min - 1)
+                lut_i = lut_i.astype(np.int64) - self.lut_min
+            else:
+                lut_i = input_array.astype(np.int64) - self.lut_min
+            range_mask = (lut_i >= 0) & (lut_i < len(self.lut_mask))
+            lut_i[~range_mask] = 0
+            match_mask = range_mask & self.lut_mask[lut_i]
+            output_array = self.lut_values[lut_i]
+        else:
+            # Find the first range with an upper value >= the input value
+            range_i = np.searchsorted(self.upper_array, input_array, 'left')
+            range_mask = range_i < len(self.upper_array)
+            range_i[~range_mask] = 0
+            with np.errstate(invalid='ignore'):
+                match_mask = range_mask & (
+                    input_array >= self.lower_array[range_i])
+            output_array = self.value_array[range_i]
+        return output_array, match_mask
+
+    def apply(self, input_array, nodata_value=None, missing_values='DATA'):
+        """Remap an array the same as ReclassByASCIIFile
+
+        Args:
+            input_array (np.array): values to remap
+            nodata_value: input nodata value (NaN is always nodata)
+            missing_values (str): 'DATA' to keep values that are not in the
+                remap or 'NODATA' to set them to nodata
+
+        Returns:
+            np.array of remapped values.  The array will be integer type if
+                all the remap values are whole numbers and there are no nodata
+                cells, otherwise it will be float type with nodata as NaN.
+        """
+        input_array = np.asarray(input_array)
+        output_array, match_mask = self.lookup(input_array)
+
+        nodata_mask = np.zeros(input_array.shape, dtype=np.bool)
+        if input_array.dtype.kind == 'f':
+            nodata_mask |= np.isnan(input_array)
+        if nodata_value is not None:
+            nodata_mask |= input_array == nodata_value
+        if missing_values.upper() == 'NODATA':
+            nodata_mask |= ~match_mask
+            keep_mask = None
+        else:
+            keep_mask = ~match_mask & ~nodata_mask
+
+        float_flag = (
+            not self.int_flag or np.any(nodata_mask) or
+            (keep_mask is not None and input_array.dtype.kind == 'f' and
+             np.any(keep_mask)))
+        if float_flag:
+            output_array = output_array.astype(np.float64)
+        if keep_mask is not None:
+            output_array[keep_mask] = input_array[keep_mask]
+        if float_flag:
+            output_array[nodata_mask] = np.nan
+        return output_array
+
+
+def read_remap_table(remap_path):
+    """Compile an ASCII remap file to a RemapTable
+
+    Compiled tables are cached by the hash of the file text so a remap file
+    is only parsed once even if it is used by several parameters.
+
+    Args:
+        remap_path (str): ASCII remap file path
+
+    Returns:
+        RemapTable
+    """
+    with open(remap_path) as remap_f:
+        remap_text = remap_f.read()
+    remap_hash = hashlib.md5(remap_text).hexdigest()
+    try:
+        return _remap_table_cache[remap_hash]
+    except KeyError:
+        pass
+
+    remap_entries, comment_lines, invalid_lines = parse_remap_lines(
+        remap_text.splitlines())
+    for line_i, line in invalid_lines:
+        logging.warning(
+            '  {} line {} could not be parsed and will be skipped:\n    {}'.format(
+                remap_path, line_i, line))
+    remap_table = RemapTable(remap_entries)
+    _remap_table_cache[remap_hash] = remap_table
+    logging.debug('  Compiled remap: {} ({})'.format(
+        remap_path, 'lookup table' if remap_table.lut_flag else 'ranges'))
+    return remap_table
+
+
+def remap_array(input_array, remap_path, nodata_value=None,
+                missing_values='DATA'):
+    """Remap an array using an ASCII remap file
+
+    Args:
+        input_array (np.array): values to remap
+        remap_path (str): ASCII remap file path
+        nodata_value: input nodata value (NaN is always nodata)
+        missing_values (str): 'DATA' or 'NODATA'
+
+    Returns:
+        np.array
+    """
+    return read_remap_table(remap_path).apply(
+        input_array, nodata_value, missing_values)
+
+
+def remap_coverage(remap_table, values, counts):
+    """Find the raster values that are not in a remap
+
+    Args:
+        remap_table (RemapTable): compiled remap
+        values (np.array): unique raster values
+        counts (np.array): number of cells with each value
+
+    Returns:
+        tuple of the missing values and the number of cells with each value
+    """
+    values = np.asarray(values)
+    counts = np.asarray(counts)
+    if not len(values):
+        return values, counts
+    match_mask = remap_table.lookup(values)[1]
+    return values[~match_mask], counts[~match_mask]
+
+
+def is_number(s):
+    """"""
+    try:
+        float(s)
+        return True
+    except ValueError:
+        return False
@@ -0,0 +1,362 @@
+#--------------------------------
+# Name:         report_functions.py
+# Purpose:      Stage timing and memory run report functions
+# Notes:        ArcGIS 10.2 Version
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+import atexit
+from collections import OrderedDict
+from contextlib import contextmanager
+import ctypes
+import datetime as dt
+import functools
+import json
+import logging
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+# Functions called with the RunReport when it is finished
+# Each function can return a dictionary of extra report items
+finish_hooks = []
+
+# Report of the current script run (see start_report())
+_active_report = None
+_atexit_flag = False
+
+
+class StageRecord(object):
+    """Timing, memory, and counts of one stage of a script run"""
+
+    def __init__(self, name, path=None, rows=None):
+        """"""
+        self.name = name
+        self.path = path if path is not None else name
+        self.rows = rows
+        self.bytes = None
+        self.status = 'running'
+        self.start_time = time.time()
+        self.wall_time = None
+        self.cpu_time = None
+        self.peak_memory = None
+        self.memory_increase = None
+        self._cpu_start = cpu_time()
+        self._peak_start = peak_memory()
+
+    def add_rows(self, rows):
+        """Add to the number of rows read or written by the stage"""
+        self.rows = (self.rows or 0) + int(rows)
+
+    def add_bytes(self, count):
+        """Add to the number of bytes written by the stage"""
+        self.bytes = (self.bytes or 0) + int(count)
+
+    def add_file(self, file_path):
+        """Add the size of an output file (or raster/shapefile) to the bytes"""
+        self.add_bytes(path_size(file_path))
+
+    def finish(self, status='complete'):
+        """"""
+        self.status = status
+        self.wall_time = time.time() - self.start_time
+        self.cpu_time = cpu_time() - self._cpu_start
+        self.peak_memory = peak_memory()
+        if self.peak_memory is not None and self._peak_start is not None:
+            self.memory_increase = self.peak_memory - self._peak_start
+
+    def to_dict(self):
+        """"""
+        return OrderedDict([
+            ('stage', self.path), ('status', self.status),
+            ('start_time', dt.datetime.fromtimestamp(
+                self.start_time).isoformat(' ')),
+            ('wall_time', self.wall_time), ('cpu_time', self.cpu_time),
+            ('peak_memory', self.peak_memory),
+            ('memory_increase', self.memory_increase),
+            ('rows', self.rows), ('bytes', self.bytes)])
+
+
+class RunReport(object):
+    """Stage timing and memory report of a script run
+
+    The report is written as JSON next to the script log file
+        (i.e. dem_parameters_report.json next to dem_parameters_log.txt).
+    """
+
+    def __init__(self, script_name, log_ws):
+        """"""
+        self.script_name = script_name
+        self.log_ws = log_ws
+        self.run = StageRecord(script_name)
+        self.stage_list = []
+        self._stage_stack = []
+
+    @property
+    def report_path(self):
+        """"""
+        return os.path.join(
+            self.log_ws, '{}_report.json'.format(self.script_name))
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """Time a stage of the run
+
+        Stages can be nested, the nested stage names are joined with "/".
+
+        Args:
+            name (str): stage name (i.e. 'project', 'zonal', 'cursor_write')
+            rows (int): number of rows read or written (can also be added
+                with StageRecord.add_rows())
+
+        Yields:
+            StageRecord
+        """
+        record = StageRecord(
+            name, '/'.join([s.name for s in self._stage_stack] + [name]), rows)
+        self._stage_stack.append(record)
+        self.stage_list.append(record)
+        try:
+            yield record
+        except BaseException:
+            record.finish('error')
+            raise
+        else:
+            record.finish()
+        finally:
+            self._stage_stack.remove(record)
+
+    def summary(self):
+        """Total the stages with the same name
+
+        Returns:
+            list of dict
+        """
+        summary_dict = OrderedDict()
+        for record in self.stage_list:
+            try:
+                stage_sum = summary_dict[record.path]
+            except KeyError:
+                stage_sum = OrderedDict([
+                    ('stage', record.path), ('calls', 0), ('wall_time', 0.0),
+                    ('cpu_time', 0.0), ('peak_memory', None),
+                    ('rows', None), ('bytes', None)])
+                summary_dict[record.path] = stage_sum
+            stage_sum['calls'] += 1
+            stage_sum['wall_time'] += record.wall_time or 0
+            stage_sum['cpu_time'] += record.cpu_time or 0
+            if record.peak_memory is not None:
+                stage_sum['peak_memory'] = max(
+                    stage_sum['peak_memory'] or 0, record.peak_memory)
+            for key in ['rows', 'bytes']:
+                if getattr(record, key) is not None:
+                    stage_sum[key] = (
+                        (stage_sum[key] or 0) + getattr(record, key))
+        return summary_dict.values()
+
+    def finish(self, status='complete'):
+        """Write the JSON report and log the summary table
+
+        Args:
+            status (str): run status
+
+        Returns:
+            str: JSON report path
+        """
+        # Close any stages that are still open (i.e. the script exited)
+        for record in self._stage_stack[::-1]:
+            record.finish('incomplete')
+        self._stage_stack = []
+        self.run.finish(status)
+
+        summary_list = self.summary()
+        report = OrderedDict([
+            ('script', self.script_name),
+            ('status', status),
+            ('start_time', self.run.to_dict()['start_time']),
+            ('wall_time', self.run.wall_time),
+            ('cpu_time', self.run.cpu_time),
+            ('peak_memory', self.run.peak_memory),
+            ('python', sys.version.split()[0]),
+            ('summary', summary_list),
+            ('stages', [record.to_dict() for record in self.stage_list])])
+
+        log_f = '  {:<32s} {:>6s} {:>10s} {:>10s} {:>10s} {:>10s} {:>12s}'
+        logging.info('\nRun Summary')
+        logging.info(log_f.format(
+            'Stage', 'Calls', 'Wall (s)', 'CPU (s)', 'Peak (MB)', 'Rows',
+            'Bytes'))
+        for stage_sum in summary_list + [OrderedDict([
+                ('stage', 'Total'), ('calls', 1),
+                ('wall_time', self.run.wall_time),
+                ('cpu_time', self.run.cpu_time),
+                ('peak_memory', self.run.peak_memory),
+                ('rows', None), ('bytes', None)])]:
+            logging.info(log_f.format(
+                stage_sum['stage'][:32], str(stage_sum['calls']),
+                '{:.2f}'.format(stage_sum['wall_time']),
+                '{:.2f}'.format(stage_sum['cpu_time']),
+                '{:.1f}'.format(stage_sum['peak_memory'] / 2.0 ** 20)
+                if stage_sum['peak_memory'] is not None else '-',
+                str(stage_sum['rows']) if stage_sum['rows'] is not None else '-',
+                str(stage_sum['bytes']) if stage_sum['bytes'] is not None else '-'))
+        for hook_func in finish_hooks:
+            report.update(hook_func(self) or {})
+
+        try:
+            with open(self.report_path, 'w') as report_f:
+                json.dump(report, report_f, indent=2)
+        except IOError as e:
+            logging.warning('\n  Run report could not be written\n  {}'.format(e))
+        logging.info('  Report: {}'.format(self.report_path))
+        return self.report_path
+
+
+def start_report(script_name, log_ws):
+    """Start the run report for a script
+
+    The report is finished when finish_report() is called or when the
+        script exits (i.e. sys.exit() after an error).
+
+    Args:
+        script_name (str): script name (i.e. 'dem_parameters')
+        log_ws (str): log folder
+
+    Returns:
+        RunReport
+    """
+    global _active_report, _atexit_flag
+    if _active_report is not None:
+        _active_report.finish('incomplete')
+    _active_report = RunReport(script_name, log_ws)
+    if not _atexit_flag:
+        atexit.register(_exit_report)
+        _atexit_flag = True
+    return _active_report
+
+
+def finish_report(status='complete'):
+    """Write and log the current run report (if there is one)
+
+    Returns:
+        str: JSON report path (or None)
+    """
+    global _active_report
+    if _active_report is None:
+        return None
+    run_report, _active_report = _active_report, None
+    return run_report.finish(status)
+
+
+def _exit_report():
+    """"""
+    finish_report('exit')
+
+
+@contextmanager
+def stage(name, rows=None):
+    """Time a stage of the current run
+
+    Stages are timed even if there is no run report so the StageRecord
+        can always be used, but they are only saved in a run report.
+
+    Args:
+        name (str): stage name
+        rows (int): number of rows read or written
+
+    Yields:
+        StageRecord
+    """
+    if _active_report is None:
+        record = StageRecord(name, rows=rows)
+        yield record
+        record.finish()
+    else:
+        with _active_report.stage(name, rows) as record:
+            yield record
+
+
+def timed(name):
+    """Decorator to time every call of a function as a stage"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def cpu_time():
+    """Return the user and system CPU time of this process (seconds)"""
+    return sum(os.times()[:2])
+
+
+def peak_memory():
+    """Return the peak resident memory of this process in bytes (or None)"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, Mac OS X reports bytes
+        return peak if sys.platform == 'darwin' else peak * 1024
+    elif os.name == 'nt':
+        try:
+            return _windows_peak_memory()
+        except (AttributeError, OSError):
+            return None
+    return None
+
+
+class _ProcessMemoryCounters(ctypes.Structure):
+    """Windows PROCESS_MEMORY_COUNTERS"""
+    _fields_ = [
+        ('cb', ctypes.c_ulong), ('PageFaultCount', ctypes.c_ulong),
+        ('PeakWorkingSetSize', ctypes.c_size_t),
+        ('WorkingSetSize', ctypes.c_size_t),
+        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+        ('QuotaPagedPoolUsage', ctypes.c_size_t),
+        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+        ('PagefileUsage', ctypes.c_size_t),
+        ('PeakPagefileUsage', ctypes.c_size_t)]
+
+
+def _windows_peak_memory():
+    """"""
+    counters = _ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(
+            ctypes.windll.kernel32.GetCurrentProcess(),
+            ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize
+
+
+def path_size(file_path):
+    """Return the size in bytes of a file, shapefile, or raster folder
+
+    Shapefiles include all the files with the same base name
+        (.shp, .shx, .dbf, .prj, etc.).
+    """
+    if os.path.isdir(file_path):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, dirs, files in os.walk(file_path) for name in files)
+    elif file_path.lower().endswith('.shp'):
+        file_ws, file_name = os.path.split(os.path.abspath(file_path))
+        base_name = os.path.splitext(file_name)[0].lower() + '.'
+        return sum(
+            os.path.getsize(os.path.join(file_ws, name))
+            for name in os.listdir(file_ws)
+            if name.lower().startswith(base_name))
+    elif os.path.isfile(file_path):
+        return os.path.getsize(file_path)
+    return 0
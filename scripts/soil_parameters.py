@@ -17,7 +17,12 @@ import sys
 import arcpy
 from arcpy import env
 
+import numpy as np
+
+import remap_functions as remap
+import report_functions as report
 import support_functions as support
+import zonal_functions as zonal
 
 
 def soil_parameters(config_path, overwrite_flag=False, debug_flag=False):
@@ -33,7 +38,7 @@ def soil_parameters(config_path, overwrite_flag=False, debug_flag=False):
     """
 
     # Initialize hru_parameters class
-    hru = support.HRUParameters(config_path)
+    hru = support.get_hru_parameters(config_path)
 
     # Open input parameter config file
     inputs_cfg = ConfigParser.ConfigParser()
@@ -52,6 +57,7 @@ def soil_parameters(config_path, overwrite_flag=False, debug_flag=False):
     log_console.setLevel(logging.DEBUG)
     log_console.setFormatter(logging.Formatter('%(message)s'))
     logging.getLogger('').addHandler(log_console)
+    report.start_report(log_file_name.replace('_log.txt', ''), hru.log_ws)
     logging.info('\nGSFLOW Soil Parameters')
 
     # Input parameters
@@ -69,6 +75,18 @@ def soil_parameters(config_path, overwrite_flag=False, debug_flag=False):
     clip_root_depth_flag = inputs_cfg.getboolean(
         'INPUTS', 'clip_root_depth_flag')
 
+    # Soil rasters are projected/clipped at the soil cellsize
+    soil_cs = inputs_cfg.getint('INPUTS', 'soil_cellsize')
+
+    # Root depth is calculated from the veg. type raster and remap
+    veg_type_cs = inputs_cfg.getint('INPUTS', 'veg_type_cellsize')
+    remap_ws = inputs_cfg.get('INPUTS', 'remap_folder')
+    root_depth_remap_name = inputs_cfg.get('INPUTS', 'root_depth_remap')
+    root_depth_remap_path = os.path.join(remap_ws, root_depth_remap_name)
+
+    # Maximum number of soil cells to process at once
+    soil_block_size = support.get_param('soil_block_size', 2 ** 22, inputs_cfg)
+
     # Input folders
     soil_temp_ws = os.path.join(hru.param_ws, 'soil_rasters')
     if not os.path.isdir(soil_temp_ws):
@@ -110,6 +128,15 @@ def soil_parameters(config_path, overwrite_flag=False, debug_flag=False):
     if clip_root_depth_flag and not arcpy.Exists(soil_depth_path):
         logging.error('\nERROR: Soil depth raster does not exist')
         sys.exit()
+    if soil_cs <= 0:
+        logging.error('\nERROR: Soil cellsize must be greater than 0')
+        sys.exit()
+    if soil_block_size <= 0:
+        logging.error('\nERROR: soil_block_size must be greater than 0')
+        sys.exit()
+    if not os.path.isfile(root_depth_remap_path):
+        logging.error('\nERROR: Root depth remap file does not exist')
+        sys.exit()
     # Check soil init ratios
     if moist_init_ratio < 0 or moist_init_ratio > 1:
         logging.error('\nERROR: Soil moist_init_ratio must be between 0 & 1')
@@ -132,19 +159,12 @@ def soil_parameters(config_path, overwrite_flag=False, debug_flag=False):
             '\nERROR: Try re-running dem_2_stream.py')
         sys.exit()
 
-    # Output paths
-    soil_type_path = os.path.join(soil_temp_ws, 'soil_type.img')
-    moist_max_path = os.path.join(soil_temp_ws, 'soil_moist_max.img')
-    rechr_max_path = os.path.join(soil_temp_ws, 'soil_rechr_max.img')
-    # ssr2gw_rate_path = os.path.join(soil_temp_ws, 'ssr2gw_rate.img')
-    # slowcoef_lin_path = os.path.join(soil_temp_ws, 'slowcoef_lin.img')
-
-    # Root depth is calculated by veg script
+    # Root depth is calculated from the veg. type raster
     veg_temp_ws = os.path.join(hru.param_ws, 'veg_rasters')
-    root_depth_path = os.path.join(veg_temp_ws, 'root_depth.img')
-    if not arcpy.Exists(root_depth_path):
+    veg_type_path = os.path.join(veg_temp_ws, 'veg_type.img')
+    if not arcpy.Exists(veg_type_path):
         logging.error(
-            '\nERROR: Root depth raster does not exists' +
+            '\nERROR: Vegetation type raster does not exists' +
             '\nERROR: Try re-running veg_parameters script\n')
         sys.exit()
 
@@ -181,202 +201,172 @@ def soil_parameters(config_path, overwrite_flag=False, debug_flag=False):
     support.add_field_func(hru.polygon_path, hru.fastcoef_sq_field, 'DOUBLE')
 
 
-    # Clip root depth to soil depth
-    if clip_root_depth_flag:
-        # This will clip root depth to soil depth
-        # Minimum of root depth and soil depth
-        logging.info('Clipping root depth to soil depth')
-        root_depth_obj = arcpy.sa.Con(
-           arcpy.sa.Raster(root_depth_path) < arcpy.sa.Raster(soil_depth_path),
-           arcpy.sa.Raster(root_depth_path), arcpy.sa.Raster(soil_depth_path))
-        root_depth_obj.save(root_depth_path)
-        del root_depth_obj
-
-    # Calculate maximum soil moisture
-    logging.info('\nCalculating soil {}'.format(hru.moist_max_field))
-    moist_max_obj = arcpy.sa.Raster(awc_path) * arcpy.sa.Raster(root_depth_path)
-    moist_max_obj.save(moist_max_path)
-    del moist_max_obj
-
-    # Calculate soil recharge zone maximum
-    logging.info('Calculating soil {}'.format(hru.rechr_max_field))
-    # Minimum of rooting depth and 18 (inches?)
-    rechr_max_obj = arcpy.sa.Float(
-        arcpy.sa.Con(
-            arcpy.sa.Raster(root_depth_path) < 18,
-            arcpy.sa.Raster(root_depth_path), 18))
-    rechr_max_obj *= arcpy.sa.Raster(awc_path)
-    rechr_max_obj.save(rechr_max_path)
-    del rechr_max_obj
-
-    #  Read in slope raster and convert to radians
-    # dem_slope_obj = math.pi *arcpy.sa.Raster(dem_slope_path) / 180
-    # porosity_obj = 0.475
-    #
-    #  Gravity drainage to groundwater reservoir linear coefficient
-    # logging.info('\nCalculating SSR2GW_RATE')
-    # logging.info('  Assuming slope is in degrees')
-    # logging.info('  Porosity is currently fixed at: {}'.format(
-    #    porosity_obj))
-    # ssr2gw_rate_obj = (
-    #   arcpy.sa.Raster(ksat_path) * porosity_obj * (1 - dem_slope_obj))
-    # ssr2gw_rate_obj.save(ssr2gw_rate_path)
-    # del ssr2gw_rate_obj
-    #
-    #  Gravity drainage to groundwater reservoir linear coefficient
-    # logging.info('\nCalculating SLOWCOEF_L')
-    # logging.info('  Assuming slope is in degrees')
-    # logging.info('  Porosity is currently fixed at: {}'.format(
-    # slowcoef_lin_obj = (
-    #   arcpy.sa.Raster(ksat_path) * math.sin(dem_slope_obj) /
-    #    (porosity_obj * hru_length_obj))
-    # slowcoef_lin_obj.save(slowcoef_lin_path)
-    # del slowcoef_lin_obj, hru_length_obj
-    # del dem_slope_obj, porosity_obj
-
-    # List of rasters, fields, and stats for zonal statistics
+    # Zonal statistics for each field
+    hru_rows, hru_cols = support.hru_grid_shape(hru)
     zs_soil_dict = dict()
-    zs_soil_dict[hru.awc_field] = [awc_path, 'MEAN']
-    zs_soil_dict[hru.clay_pct_field] = [clay_pct_path, 'MEAN']
-    zs_soil_dict[hru.sand_pct_field] = [sand_pct_path, 'MEAN']
-    # zs_soil_dict[hru.silt_pct_field] = [silt_pct_path, 'MEAN']
-    # if calc_ssr2gw_rate_flag or calc_slowcoef_flag:
-    zs_soil_dict[hru.ksat_field] = [ksat_path, 'MEAN']
+    zs_soil_fields = [
+        hru.awc_field, hru.clay_pct_field, hru.sand_pct_field,
+        hru.ksat_field, hru.moist_max_field, hru.rechr_max_field]
     if clip_root_depth_flag:
-        zs_soil_dict[hru.soil_depth_field] = [soil_depth_path, 'MEAN']
-        zs_soil_dict[hru.root_depth_field] = [root_depth_path, 'MEAN']
-    zs_soil_dict[hru.moist_max_field] = [moist_max_path, 'MEAN']
-    zs_soil_dict[hru.rechr_max_field] = [rechr_max_path, 'MEAN']
-    # zs_soil_dict[hru.ssr2gw_rate_field] = [ssr2gw_rate_path, 'MEAN']
-    # zs_soil_dict[hru.slowcoef_lin_field] = [slowcoef_lin_path, 'MEAN']
-
-    # Calculate zonal statistics
-    logging.info('\nCalculating zonal statistics')
-    support.zonal_stats_func(
-        zs_soil_dict, hru.polygon_path, hru.point_path, hru)
-
-
-    # Make a fishnet layer for calculating fields
-    hru_polygon_layer = "hru_polygon_layer"
-    arcpy.MakeFeatureLayer_management(
-        hru.polygon_path, hru_polygon_layer)
+        zs_soil_fields.extend([hru.soil_depth_field, hru.root_depth_field])
+    for zs_field in zs_soil_fields:
+        zs_soil_dict[zs_field] = zonal.ZonalStats(
+            hru_rows * hru_cols, 'MEAN')
+    root_depth_remap = remap.read_remap_table(root_depth_remap_path)
+
+    # Read the soil rasters over the fishnet extent in blocks of rows
+    # All of the soil grids are computed from the blocks
+    #   and added directly to the HRU zonal statistics
+    logging.info('\nCalculating soil zonal statistics')
+    soil_rows = int(round(hru.extent.height / soil_cs))
+    soil_cols = int(round(hru.extent.width / soil_cs))
+    block_rows = max(1, soil_block_size // soil_cols)
+    logging.debug('  Rows: {}  Cols: {}  Block rows: {}'.format(
+        soil_rows, soil_cols, block_rows))
+    with report.stage('zonal'):
+        for row_start in xrange(0, soil_rows, block_rows):
+            rows = min(block_rows, soil_rows - row_start)
+            logging.debug('  Rows: {}-{}'.format(row_start, row_start + rows))
+            block_y_max = hru.extent.YMax - row_start * soil_cs
+            zone_array = zonal.cell_zone_array(
+                row_start, rows, soil_cols, soil_cs, hru.cs,
+                hru_rows, hru_cols)
+            block_args = (
+                hru.extent.XMin, block_y_max, soil_cs, rows, soil_cols)
+            awc_array = support.raster_window_to_array(awc_path, *block_args)
+            zs_soil_dict[hru.awc_field].update(zone_array, awc_array)
+            zs_soil_dict[hru.clay_pct_field].update(
+                zone_array,
+                support.raster_window_to_array(clay_pct_path, *block_args))
+            zs_soil_dict[hru.sand_pct_field].update(
+                zone_array,
+                support.raster_window_to_array(sand_pct_path, *block_args))
+            zs_soil_dict[hru.ksat_field].update(
+                zone_array,
+                support.raster_window_to_array(ksat_path, *block_args))
+
+            # Root depth is sampled from the veg. type at the soil cellsize
+            root_depth_array = root_depth_remap.apply(
+                support.raster_window_resample(
+                    veg_type_path, veg_type_cs, hru.extent.XMin, block_y_max,
+                    soil_cs, rows, soil_cols))
+            root_nodata_mask = np.isnan(root_depth_array)
+
+            # Clip root depth to soil depth
+            if clip_root_depth_flag:
+                # Minimum of root depth and soil depth
+                soil_depth_array = support.raster_window_to_array(
+                    soil_depth_path, *block_args)
+                root_nodata_mask |= np.isnan(soil_depth_array)
+                with np.errstate(invalid='ignore'):
+                    root_depth_array = np.where(
+                        root_depth_array < soil_depth_array,
+                        root_depth_array, soil_depth_array)
+                root_depth_array[root_nodata_mask] = np.nan
+                zs_soil_dict[hru.soil_depth_field].update(
+                    zone_array, soil_depth_array)
+                zs_soil_dict[hru.root_depth_field].update(
+                    zone_array, root_depth_array)
+                del soil_depth_array
+
+            # Calculate maximum soil moisture
+            zs_soil_dict[hru.moist_max_field].update(
+                zone_array, awc_array * root_depth_array)
+
+            # Calculate soil recharge zone maximum
+            # Minimum of rooting depth and 18 (inches?)
+            with np.errstate(invalid='ignore'):
+                rechr_max_array = np.where(
+                    root_depth_array < 18, root_depth_array, 18.0)
+            rechr_max_array[root_nodata_mask] = np.nan
+            zs_soil_dict[hru.rechr_max_field].update(
+                zone_array, rechr_max_array * awc_array)
+            del awc_array, root_depth_array, rechr_max_array, root_nodata_mask
+            del zone_array
+
+    # Read the HRU columns needed for the derived parameters
+    # OID is read so the write back below can be checked against the order
+    fields = ['OID@', hru.row_field, hru.col_field, hru.type_in_field,
+              hru.dem_slope_rad_field]
+    hru_array = arcpy.da.TableToNumPyArray(hru.polygon_path, fields)
+    hru_oid_array = hru_array['OID@']
+    zone_i = (
+        (hru_array[hru.row_field].astype(np.int64) - 1) * hru_cols +
+        hru_array[hru.col_field].astype(np.int64) - 1)
+    active_mask = hru_array[hru.type_in_field] == 1
+    slope_rad_array = hru_array[hru.dem_slope_rad_field].astype(np.float64)
+    del hru_array
+    output_dict = dict([
+        (zs_field, zs_stats.result()[zone_i])
+        for zs_field, zs_stats in zs_soil_dict.items()])
+    del zs_soil_dict
 
     # Calculate SOIL_TYPE
     logging.info('\nCalculating {}'.format(hru.soil_type_field))
-    arcpy.SelectLayerByAttribute_management(
-        hru_polygon_layer, "NEW_SELECTION",
-        '"{}" = 1'.format(hru.type_in_field))
     if soil_pct_flag:
         soil_type_pct = (50, 40)
     else:
         soil_type_pct = (0.50, 0.40)
-    soil_type_cb = (
-        'def soil_type_func(clay, sand):\n' +
-        '    if sand > {}: return 1\n' +
-        '    elif clay > {}: return 3\n' +
-        '    else: return 2\n').format(*soil_type_pct)
-    arcpy.CalculateField_management(
-        hru_polygon_layer, hru.soil_type_field,
-        'soil_type_func(!{}!, !{}!)'.format(
-            hru.clay_pct_field, hru.sand_pct_field),
-        'PYTHON', soil_type_cb)
-    arcpy.SelectLayerByAttribute_management(
-        hru_polygon_layer, "SWITCH_SELECTION")
-    arcpy.CalculateField_management(
-        hru_polygon_layer, hru.soil_type_field, '0', 'PYTHON')
-
+    soil_type_array = np.full(len(zone_i), 2.0)
+    soil_type_array[output_dict[hru.clay_pct_field] > soil_type_pct[1]] = 3
+    soil_type_array[output_dict[hru.sand_pct_field] > soil_type_pct[0]] = 1
+    soil_type_array[~active_mask] = 0
+    output_dict[hru.soil_type_field] = soil_type_array
 
     # Calculate SOIL_MOIST_INIT & SOIL_RECHR_INIT from max values
-    arcpy.SelectLayerByAttribute_management(
-        hru_polygon_layer, "NEW_SELECTION",
-        '"{}" = 1 AND "{}" >= 0'.format(
-            hru.type_in_field, hru.moist_max_field))
     logging.info('\nCalculating {0} as {2} * {1}'.format(
         hru.moist_init_field, hru.moist_max_field, moist_init_ratio))
-    arcpy.CalculateField_management(
-        hru.polygon_path, hru.moist_init_field,
-        '!{}! * {}'.format(hru.moist_max_field, moist_init_ratio), 'PYTHON')
-    arcpy.SelectLayerByAttribute_management(
-        hru_polygon_layer, "SWITCH_SELECTION")
-    arcpy.CalculateField_management(
-        hru_polygon_layer, hru.moist_init_field, '0', 'PYTHON')
-    arcpy.CalculateField_management(
-        hru_polygon_layer, hru.moist_max_field, '0', 'PYTHON')
-
-
-    # Calculate SOIL_MOIST_INIT & SOIL_RECHR_INIT from max values
-    arcpy.SelectLayerByAttribute_management(
-        hru_polygon_layer, "NEW_SELECTION",
-        '"{}" = 1 AND "{}" >= 0'.format(
-            hru.type_in_field, hru.rechr_max_field))
+    moist_mask = active_mask & (output_dict[hru.moist_max_field] >= 0)
+    output_dict[hru.moist_max_field][~moist_mask] = 0
+    output_dict[hru.moist_init_field] = (
+        output_dict[hru.moist_max_field] * moist_init_ratio)
     logging.info('Calculating {0} as {2} * {1}'.format(
-        hru.rechr_init_field, hru.rechr_max_field, moist_init_ratio))
-    arcpy.CalculateField_management(
-        hru.polygon_path, hru.rechr_init_field,
-        '!{}! * {}'.format(hru.rechr_max_field, moist_init_ratio), 'PYTHON')
-    arcpy.SelectLayerByAttribute_management(
-        hru_polygon_layer, "SWITCH_SELECTION",
-        '"{}" != 1'.format(hru.type_in_field))
-    arcpy.CalculateField_management(
-        hru_polygon_layer, hru.rechr_init_field, '0', 'PYTHON')
-    arcpy.CalculateField_management(
-        hru_polygon_layer, hru.rechr_max_field, '0', 'PYTHON')
-
+        hru.rechr_init_field, hru.rechr_max_field, rechr_init_ratio))
+    rechr_mask = active_mask & (output_dict[hru.rechr_max_field] >= 0)
+    output_dict[hru.rechr_max_field][~rechr_mask] = 0
+    output_dict[hru.rechr_init_field] = (
+        output_dict[hru.rechr_max_field] * rechr_init_ratio)
 
     # Gravity drainage to groundwater reservoir linear coefficient
     # Default value is 0.1 (range 0-1)
     # Convert Ksat from um/s to in/day
-    # if calc_ssr2gw_rate_flag:
     logging.info('\nCalculating {}'.format(hru.ssr2gw_rate_field))
     logging.info('  {} must be in um/s'.format(hru.ksat_field))
     porosity_flt = 0.475
-    arcpy.SelectLayerByAttribute_management(
-        hru_polygon_layer, "NEW_SELECTION",
-        '"{}" = 1 AND "{}" >= 0'.format(hru.type_in_field, hru.ksat_field))
-    arcpy.CalculateField_management(
-        hru_polygon_layer, hru.ssr2gw_rate_field,
-        '!{}! * (3600 * 24 / (2.54 * 10000)) * (1 - !{}!) * {}'.format(
-            hru.ksat_field, hru.dem_slope_rad_field, porosity_flt),
-        'PYTHON')
-    arcpy.SelectLayerByAttribute_management(
-        hru_polygon_layer, "SWITCH_SELECTION")
-    arcpy.CalculateField_management(
-        hru_polygon_layer, hru.ssr2gw_rate_field, '0', 'PYTHON')
-
+    ksat_mask = active_mask & (output_dict[hru.ksat_field] >= 0)
+    output_dict[hru.ssr2gw_rate_field] = np.where(
+        ksat_mask,
+        output_dict[hru.ksat_field] * (3600 * 24 / (2.54 * 10000)) *
+        (1 - slope_rad_array) * porosity_flt, 0)
 
     # Default value is 0.015 (range 0-1)
     # Convert Ksat from um/s to m/day
-    # if calc_slowcoef_lin_flag:
     logging.info('Calculating {}'.format(hru.slowcoef_lin_field))
     logging.info('  {} must be in um/s'.format(hru.ksat_field))
-    arcpy.SelectLayerByAttribute_management(
-        hru_polygon_layer, "NEW_SELECTION",
-        '"{}" = 1 AND "{}" >= 0'.format(hru.type_in_field, hru.ksat_field))
-    # slowcoef_lin_cb = (
-    #    'def fd_len(fd, cs):\n' +
-    #    '    if fd in [1, 4, 16, 64]: return cs\n' +
-    #    '    elif fd in [2, 8, 32, 128]: return 1.414 * cs\n' +
-    #    '    else: return cs\n' +
-    #    'def slowcoef_lin(ksat, slope, porosity, fd, cs):\n' +
-    #    '    return (ksat * (3600 * 24 / 1000000) * math.sin(slope) / ' +
-    #    '(porosity * fd_len(fd, cs)))\n')
-    slowcoef_lin_cb = (
-        'def slowcoef_lin(ksat, slope, porosity, fd, cs):\n' +
-        '    return (ksat * 0.0864 * math.sin(slope) / (porosity * cs))\n')
-    arcpy.CalculateField_management(
-        hru_polygon_layer, hru.slowcoef_lin_field,
-        'slowcoef_lin(!{0}!, !{1}!, {2}, !{3}!, {4})'.format(
-            hru.ksat_field, hru.dem_slope_rad_field, porosity_flt,
-            hru.flow_dir_field, hru.cs),
-        'PYTHON', slowcoef_lin_cb)
-    arcpy.SelectLayerByAttribute_management(
-        hru_polygon_layer, "SWITCH_SELECTION")
-    arcpy.CalculateField_management(
-        hru_polygon_layer, hru.slowcoef_lin_field, '0', 'PYTHON')
-
-    # Cleanup
-    arcpy.Delete_management(hru_polygon_layer)
-    del hru_polygon_layer
+    output_dict[hru.slowcoef_lin_field] = np.where(
+        ksat_mask,
+        output_dict[hru.ksat_field] * 0.0864 * np.sin(slope_rad_array) /
+        (porosity_flt * hru.cs), 0)
+
+    # Write all of the soil fields in a single pass
+    logging.info('\nWriting soil parameters')
+    output_fields = sorted(output_dict.keys())
+    output_array = np.column_stack([output_dict[f] for f in output_fields])
+    del output_dict
+    with report.stage('cursor_write') as stage:
+        row_count = 0
+        with arcpy.da.UpdateCursor(
+                hru.polygon_path, ['OID@'] + output_fields) as u_cursor:
+            for i, row in enumerate(u_cursor):
+                if row[0] != hru_oid_array[i]:
+                    logging.error(
+                        '\nERROR: Fishnet cursor order changed while writing ' +
+                        'soil parameters\n')
+                    sys.exit()
+                u_cursor.updateRow([row[0]] + output_array[i].tolist())
+                row_count += 1
+        stage.add_rows(row_count)
+    del output_array
 
     #  Reset soils values for lake cells (HRU_TYPE == 2)
     #  Also reset for ocean cells (HRU_TYPE == 0 and DEM_ADJ == 0)
@@ -462,3 +452,4 @@ if __name__ == '__main__':
     soil_parameters(
         config_path=args.ini, overwrite_flag=args.overwrite,
         debug_flag=args.loglevel==logging.DEBUG)
+    report.finish_report()
@@ -11,12 +11,14 @@ import argparse
 import ConfigParser
 import datetime as dt
 import logging
+import multiprocessing
 import os
 import sys
 
 import arcpy
 from arcpy import env
 
+import report_functions as report
 import support_functions as support
 
 
@@ -33,7 +35,7 @@ def soil_raster_prep(config_path, overwrite_flag=False, debug_flag=False):
     """
 
     # Initialize hru_parameters class
-    hru = support.HRUParameters(config_path)
+    hru = support.get_hru_parameters(config_path)
 
     # Open input parameter config file
     inputs_cfg = ConfigParser.ConfigParser()
@@ -52,6 +54,7 @@ def soil_raster_prep(config_path, overwrite_flag=False, debug_flag=False):
     log_console.setLevel(logging.DEBUG)
     log_console.setFormatter(logging.Formatter('%(message)s'))
     logging.getLogger('').addHandler(log_console)
+    report.start_report(log_file_name.replace('_log.txt', ''), hru.log_ws)
     logging.info('\nPrepare GSFLOW Soil Rasters')
 
     soil_orig_ws  = inputs_cfg.get('INPUTS', 'soil_orig_folder')
@@ -64,6 +67,13 @@ def soil_raster_prep(config_path, overwrite_flag=False, debug_flag=False):
     fill_soil_nodata_flag = inputs_cfg.getboolean(
         'INPUTS', 'fill_soil_nodata_flag')
 
+    # Pyramids are not used by any of the other scripts
+    build_pyramids_flag = support.get_param(
+        'soil_pyramids_flag', False, inputs_cfg)
+
+    # Number of rasters to project at once (0 will use the CPU count)
+    soil_processes = support.get_param('soil_processes', 0, inputs_cfg)
+
 # Use Ksat to calculate ssr2gw_rate and slowcoef_lin
     # calc_ssr2gw_rate_flag = inputs_cfg.getboolean(
     #    'INPUTS', 'calc_ssr2gw_rate_flag')
@@ -92,7 +102,7 @@ def soil_raster_prep(config_path, overwrite_flag=False, debug_flag=False):
     # if calc_ssr2gw_rate_flag or calc_slowcoef_flag:
     ksat_orig_path = os.path.join(soil_orig_ws, ksat_name)
     if clip_root_depth_flag:
-        soil_depth_path = os.path.join(soil_orig_ws, soil_depth_name)
+        soil_depth_orig_path = os.path.join(soil_orig_ws, soil_depth_name)
 
     # Check that either the original or projected/clipped raster exists
     if not arcpy.Exists(awc_orig_path):
@@ -120,6 +130,9 @@ def soil_raster_prep(config_path, overwrite_flag=False, debug_flag=False):
     if soil_cs <= 0:
         logging.error('\nERROR: soil cellsize must be greater than 0')
         sys.exit()
+    if soil_processes < 0:
+        logging.error('\nERROR: soil_processes must be >= 0')
+        sys.exit()
     soil_proj_method_list = ['BILINEAR', 'CUBIC', 'NEAREST']
     if soil_proj_method.upper() not in soil_proj_method_list:
         logging.error('\nERROR: Soil projection method must be: {}'.format(
@@ -151,170 +164,132 @@ def soil_raster_prep(config_path, overwrite_flag=False, debug_flag=False):
     # Set ArcGIS environment variables
     arcpy.CheckOutExtension('Spatial')
     env.overwriteOutput = True
-    env.pyramid = 'PYRAMIDS -1'
-    # env.pyramid = 'PYRAMIDS 0'
+    if build_pyramids_flag:
+        env.pyramid = 'PYRAMIDS -1'
+    else:
+        env.pyramid = 'PYRAMIDS 0'
     env.workspace = soil_temp_ws
     env.scratchWorkspace = hru.scratch_ws
 
-    # Available Water Capacity (AWC)
-    logging.info('\nProjecting/clipping AWC raster')
-    soil_orig_sr = arcpy.sa.Raster(awc_orig_path).spatialReference
-    logging.debug('  AWC GCS:  {}'.format(
-        soil_orig_sr.GCS.name))
-    # Remove existing projected raster
-    if arcpy.Exists(awc_path):
-        arcpy.Delete_management(awc_path)
-    # Set preferred transforms
-    transform_str = support.transform_func(hru.sr, soil_orig_sr)
-    logging.debug('  Transform: {}'.format(transform_str))
-    logging.debug('  Projection method: NEAREST')
-    # Project soil raster
-    # DEADBEEF - Arc10.2 ProjectRaster does not honor extent
-    support.project_raster_func(
-        awc_orig_path, awc_path, hru.sr,
-        soil_proj_method, soil_cs, transform_str,
-        '{} {}'.format(hru.ref_x, hru.ref_y), soil_orig_sr, hru)
-    # env.extent = hru.extent
-    # arcpy.ProjectRaster_management(
-    #    awc_orig_path, awc_path, hru.sr,
-    #    soil_proj_method, soil_cs, transform_str,
-    #    '{} {}'.format(hru.ref_x, hru.ref_y),
-    #    soil_orig_sr)
-    # arcpy.ClearEnvironment('extent')
-
-    # Percent clay
-    logging.info('Projecting/clipping clay raster')
-    soil_orig_sr = arcpy.sa.Raster(clay_pct_orig_path).spatialReference
-    logging.debug('  Clay GCS: {}'.format(
-        soil_orig_sr.GCS.name))
-    # Remove existing projected raster
-    if arcpy.Exists(clay_pct_path):
-        arcpy.Delete_management(clay_pct_path)
-    # Set preferred transforms
-    transform_str = support.transform_func(hru.sr, soil_orig_sr)
-    logging.debug('  Transform: {}'.format(transform_str))
-    logging.debug('  Projection method: NEAREST')
-    # Project soil raster
-    # DEADBEEF - Arc10.2 ProjectRaster does not extent
-    support.project_raster_func(
-        clay_pct_orig_path, clay_pct_path, hru.sr,
-        soil_proj_method, soil_cs, transform_str,
-        '{} {}'.format(hru.ref_x, hru.ref_y), soil_orig_sr, hru)
-    # env.extent = hru.extent
-    # arcpy.ProjectRaster_management(
-    #    clay_pct_orig_path, clay_pct_path, hru.sr,
-    #    soil_proj_method, soil_cs, transform_str,
-    #    '{} {}'.format(hru.ref_x, hru.ref_y),
-    #    soil_orig_sr)
-    # arcpy.ClearEnvironment('extent')
-
-    # Percent sand
-    logging.info('Projecting/clipping sand raster')
-    soil_orig_sr = arcpy.sa.Raster(sand_pct_orig_path).spatialReference
-    logging.debug('  Sand GCS: {}'.format(
-        soil_orig_sr.GCS.name))
-    # Remove existing projected raster
-    if arcpy.Exists(sand_pct_path):
-        arcpy.Delete_management(sand_pct_path)
-    # Set preferred transforms
-    transform_str = support.transform_func(hru.sr, soil_orig_sr)
-    logging.debug('  Transform: {}'.format(transform_str))
-    logging.debug('  Projection method: NEAREST')
-    # Project soil raster
-    # DEADBEEF - Arc10.2 ProjectRaster does not honor extent
-    support.project_raster_func(
-        sand_pct_orig_path, sand_pct_path, hru.sr,
-        soil_proj_method, soil_cs, transform_str,
-        '{} {}'.format(hru.ref_x, hru.ref_y), soil_orig_sr, hru)
-    # env.extent = hru.extent
-    # arcpy.ProjectRaster_management(
-    #    sand_pct_orig_path, sand_pct_path, hru.sr,
-    #    soil_proj_method, soil_cs, transform_str,
-    #    '{} {}'.format(hru.ref_x, hru.ref_y),
-    #    soil_orig_sr)
-    # arcpy.ClearEnvironment('extent')
-
-    # Hydraulic conductivity
-    # if calc_ssr2gw_rate_flag or calc_slowcoef_flag:
-    logging.info('Projecting/clipping ksat raster')
-    ksat_orig_sr = arcpy.sa.Raster(ksat_orig_path).spatialReference
-    logging.debug('  Ksat GCS: {}'.format(
-        soil_orig_sr.GCS.name))
-    # Remove existing projected raster
-    if arcpy.Exists(ksat_path):
-        arcpy.Delete_management(ksat_path)
-    # Set preferred transforms
-    transform_str = support.transform_func(hru.sr, ksat_orig_sr)
-    logging.debug('  Transform: {}'.format(transform_str))
-    logging.debug('  Projection method: NEAREST')
-    # Project ksat raster
-    # DEADBEEF - Arc10.2 ProjectRaster does not honor extent
-    support.project_raster_func(
-        ksat_orig_path, ksat_path, hru.sr,
-        soil_proj_method, soil_cs, transform_str,
-        '{} {}'.format(hru.ref_x, hru.ref_y), soil_orig_sr, hru)
-    # env.extent = hru.extent
-    # arcpy.ProjectRaster_management(
-    #    ksat_orig_path, ksat_path, hru.sr,
-    #    soil_proj_method, soil_cs, transform_str,
-    #    '{} {}'.format(hru.ref_x, hru.ref_y),
-    #    soil_orig_sr)
-    # arcpy.ClearEnvironment('extent')
-
+    # Soil rasters to project/clip
+    soil_raster_list = [
+        ['AWC', awc_orig_path, awc_path],
+        ['Clay', clay_pct_orig_path, clay_pct_path],
+        ['Sand', sand_pct_orig_path, sand_pct_path],
+        # ['Silt', silt_orig_path, silt_pct_path],
+        ['Ksat', ksat_orig_path, ksat_path]]
     # Soil depth is only needed if clipping root depth
     if clip_root_depth_flag:
-        logging.info('\nProjecting/clipping depth raster')
-        soil_orig_sr = arcpy.sa.Raster(soil_depth_orig_path).spatialReference
-        logging.debug('  Depth GCS: {}'.format(
-            soil_orig_sr.GCS.name))
-        # Remove existing projected raster
-        if arcpy.Exists(soil_depth_path):
-            arcpy.Delete_management(soil_depth_path)
+        soil_raster_list.append(
+            ['Depth', soil_depth_orig_path, soil_depth_path])
+
+    # Compute the clip extent once for all soil rasters on the same grid
+    logging.info('\nComputing soil raster clip extents')
+    task_list = []
+    for soil_name, soil_orig_path, soil_path in soil_raster_list:
+        soil_orig_obj = arcpy.sa.Raster(soil_orig_path)
+        soil_orig_sr = soil_orig_obj.spatialReference
+        logging.debug('  {} GCS: {}'.format(
+            soil_name, soil_orig_sr.GCS.name))
+        # Projected extents are cached by project_hru_extent_func
+        proj_extent = support.project_hru_extent_func(
+            hru.extent, hru.cs, hru.sr, soil_orig_obj.extent,
+            soil_orig_obj.meanCellWidth, soil_orig_sr)
         # Set preferred transforms
         transform_str = support.transform_func(hru.sr, soil_orig_sr)
         logging.debug('  Transform: {}'.format(transform_str))
-        logging.debug('  Projection method: NEAREST')
-        # Project soil raster
-        # DEADBEEF - Arc10.2 ProjectRaster does not honor extent
-        support.project_raster_func(
-            soil_depth_orig_path, soil_depth_path, hru.sr,
-            soil_proj_method, soil_cs, transform_str,
-            '{} {}'.format(hru.ref_x, hru.ref_y), soil_orig_sr, hru)
-        # env.extent = hru.extent
-        # arcpy.ProjectRaster_management(
-        #    soil_depth_orig_path, soil_depth_path, hru.sr,
-        #    soil_proj_method, soil_cs, transform_str,
-        #    '{} {}'.format(hru.ref_x, hru.ref_y),
-        #    soil_orig_sr)
-        # arcpy.ClearEnvironment('extent')
 
-    # Clip root depth to soil depth
-    # if clip_root_depth_flag:
-    #    # This will clip root depth to soil depth
-    #    # Minimum of root depth and soil depth
-    #    logging.info('Clipping root depth to soil depth')
-    #    root_depth_obj = Con(
-    #       arcpy.sa.Raster(root_depth_path) <arcpy.sa.Raster(soil_depth_path),
-    #       arcpy.sa.Raster(root_depth_path),arcpy.sa.Raster(soil_depth_path))
-    #    root_depth_obj.save(root_depth_path)
-    #    del root_depth_obj
-
-    # Fill soil nodata values using nibble
+        # Remove existing projected raster
+        if arcpy.Exists(soil_path):
+            arcpy.Delete_management(soil_path)
+
+        # Spatial references and extents are passed as strings/tuples
+        #   so they can be sent to the worker processes
+        task_list.append([
+            soil_name, soil_orig_path, soil_path,
+            hru.sr.exportToString(), soil_proj_method, soil_cs,
+            transform_str, '{} {}'.format(hru.ref_x, hru.ref_y),
+            soil_orig_sr.exportToString(),
+            (proj_extent.XMin, proj_extent.YMin,
+             proj_extent.XMax, proj_extent.YMax),
+            fill_soil_nodata_flag, build_pyramids_flag])
+        del soil_orig_obj, soil_orig_sr, transform_str
+
+    # Project/clip (and fill) the soil rasters in separate processes
+    logging.info('\nProjecting/clipping soil rasters')
+    logging.debug('  Projection method: {}'.format(soil_proj_method))
     if fill_soil_nodata_flag:
-        logging.info('\nFilling soil nodata values using Nibble')
-        soil_raster_list = [
-            awc_path, clay_pct_path, sand_pct_path, ksat_path]
-        if clip_root_depth_flag:
-            soil_raster_list.append(soil_depth_path)
-        for soil_raster_path in soil_raster_list:
-            logging.info('  {}'.format(soil_raster_path))
+        logging.info('  Filling soil nodata values using Nibble')
+    if soil_processes == 0:
+        soil_processes = min(len(task_list), multiprocessing.cpu_count())
+    if soil_processes == 1:
+        results = map(soil_raster_project_worker, task_list)
+    else:
+        logging.debug('  Processes: {}'.format(soil_processes))
+        pool = multiprocessing.Pool(soil_processes)
+        try:
+            results = pool.map(soil_raster_project_worker, task_list)
+        finally:
+            pool.close()
+            pool.join()
+    for task, error in zip(task_list, results):
+        logging.info('  {}'.format(task[2]))
+        if error:
+            logging.error(
+                '\nERROR: {} raster could not be projected\n{}'.format(
+                    task[0], error))
+            sys.exit()
+
+
+def soil_raster_project_worker(task):
+    """Project, clip, and optionally fill a single soil raster
+
+    Negative (nodata) values are filled with Nibble before the projected
+    raster is written, so each output raster is only written once.
+
+    Args:
+        task (list): soil name, input path, output path, output spat. ref.
+            string, projection method, cellsize, transform, snap point,
+            input spat. ref. string, clip extent tuple, fill flag, and
+            build pyramids flag
+
+    Returns:
+        None if the raster was projected, otherwise the error message
+    """
+    (soil_name, soil_orig_path, soil_path, output_sr_str, proj_method,
+     soil_cs, transform_str, reg_point, input_sr_str, clip_extent,
+     fill_flag, pyramids_flag) = task
+    try:
+        arcpy.CheckOutExtension('Spatial')
+        env.overwriteOutput = True
+        env.pyramid = 'PYRAMIDS -1' if pyramids_flag else 'PYRAMIDS 0'
+        output_sr = arcpy.SpatialReference()
+        output_sr.loadFromString(output_sr_str)
+        input_sr = arcpy.SpatialReference()
+        input_sr.loadFromString(input_sr_str)
+
+        proj_path = os.path.join('in_memory', soil_name + '_proj')
+        support.project_clipped_raster_func(
+            soil_orig_path, proj_path, output_sr, proj_method, soil_cs,
+            transform_str, reg_point, input_sr, arcpy.Extent(*clip_extent),
+            os.path.join('in_memory', soil_name + '_clip'))
+
+        if fill_flag:
             # DEADBEEF - Check if there is any nodata to be filled first?
-            mask_obj = Int(1000 * SetNull(
-               arcpy.sa.Raster(soil_raster_path) < 0,arcpy.sa.Raster(soil_raster_path)))
-            input_obj = Con(IsNull(mask_obj), 0, mask_obj)
-            nibble_obj = 0.001 * Nibble(input_obj, mask_obj, 'ALL_VALUES')
-            nibble_obj.save(soil_raster_path)
-            arcpy.BuildPyramids_management(soil_raster_path)
+            proj_obj = arcpy.sa.Raster(proj_path)
+            mask_obj = arcpy.sa.Int(1000 * arcpy.sa.SetNull(
+                proj_obj < 0, proj_obj))
+            input_obj = arcpy.sa.Con(arcpy.sa.IsNull(mask_obj), 0, mask_obj)
+            nibble_obj = 0.001 * arcpy.sa.Nibble(
+                input_obj, mask_obj, 'ALL_VALUES')
+            nibble_obj.save(soil_path)
+            del proj_obj, mask_obj, input_obj, nibble_obj
+        else:
+            arcpy.CopyRaster_management(proj_path, soil_path)
+        arcpy.Delete_management(proj_path)
+    except Exception as e:
+        return str(e)
+    return None
 
 
 def arg_parse():
@@ -354,3 +329,4 @@ if __name__ == '__main__':
     soil_raster_prep(
         config_path=args.ini, overwrite_flag=args.overwrite,
         debug_flag=args.loglevel==logging.DEBUG)
+    report.finish_report()
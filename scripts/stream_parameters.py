@@ -8,9 +8,10 @@
 #--------------------------------
 
 import argparse
-from collections import defaultdict
+from collections import OrderedDict
 import ConfigParser
 import datetime as dt
+from itertools import izip
 import logging
 import math
 import os
@@ -22,6 +23,11 @@ from time import sleep
 import arcpy
 from arcpy import env
 
+import numpy as np
+
+import network_functions as network
+import polygon_functions as polygon
+import report_functions as report
 import support_functions as support
 
 
@@ -38,7 +44,7 @@ def stream_parameters(config_path, overwrite_flag=False, debug_flag=False):
     """
 
     # Initialize hru_parameters class
-    hru = support.HRUParameters(config_path)
+    hru = support.get_hru_parameters(config_path)
 
     # Open input parameter config file
     inputs_cfg = ConfigParser.ConfigParser()
@@ -57,6 +63,7 @@ def stream_parameters(config_path, overwrite_flag=False, debug_flag=False):
     log_console.setLevel(logging.DEBUG)
     log_console.setFormatter(logging.Formatter('%(message)s'))
     logging.getLogger('').addHandler(log_console)
+    report.start_report(log_file_name.replace('_log.txt', ''), hru.log_ws)
     logging.info('\nGSFLOW Stream Parameters')
 
     # CRT Parameters
@@ -79,6 +86,9 @@ def stream_parameters(config_path, overwrite_flag=False, debug_flag=False):
     crt_visflg = 1
     crt_ifill = 0
 
+    # Segment/subbasin network (used again in prms_template_fill)
+    network_path = os.path.join(hru.param_ws, network.network_name)
+
     # CRT Executable
     crt_exe_path = inputs_cfg.get('INPUTS', 'crt_exe_path')
     # crt_exe_name = 'CRT_1.1.1.exe'
@@ -90,7 +100,8 @@ def stream_parameters(config_path, overwrite_flag=False, debug_flag=False):
 
     # Parameters
     # lake_seg_offset = fields_cfg.getint('INPUTS', 'lake_seg_offset')
-    exit_seg = 0
+    # Segments that flow out of the model have an OUTSEG of 0
+    #   (network.exit_id)
 
     # Check input paths
     if not arcpy.Exists(hru.polygon_path):
@@ -196,9 +207,6 @@ def stream_parameters(config_path, overwrite_flag=False, debug_flag=False):
     subbasin_ascii = os.path.join(stream_temp_ws, a_fmt.format(subbasin_raster_name))
     segbasin_ascii = os.path.join(stream_temp_ws, a_fmt.format(segbasin_raster_name))
 
-    # Layers
-    hru_polygon_lyr = 'hru_polygon_lyr'
-
     # Set ArcGIS environment variables
     arcpy.CheckOutExtension('Spatial')
     env.overwriteOutput = True
@@ -239,262 +247,135 @@ def stream_parameters(config_path, overwrite_flag=False, debug_flag=False):
     #            row[1] = lake_seg_offset - iseg
     #        del irunbound, iseg
 
+    # Read the HRU values once (in FID order)
+    logging.info("\nReading HRU values")
+    hru_values = support.read_table_columns(hru.polygon_path, [
+        hru.type_field, hru.iseg_field, hru.irunbound_field,
+        hru.lake_id_field, hru.subbasin_field, hru.outflow_field,
+        hru.flow_dir_field, hru.row_field, hru.col_field, hru.id_field,
+        hru.dem_adj_field])
+    hru_type_array = hru_values[hru.type_field].astype(np.int64)
+    iseg_array = hru_values[hru.iseg_field].astype(np.int64)
+    irunbound_array = hru_values[hru.irunbound_field].astype(np.int64)
+    lake_id_array = hru_values[hru.lake_id_field].astype(np.int64)
+    subbasin_array = hru_values[hru.subbasin_field].astype(np.int64)
+    outflow_array = hru_values[hru.outflow_field].astype(np.int64)
+    flow_dir_array = hru_values[hru.flow_dir_field].astype(np.int64)
+    row_array = hru_values[hru.row_field].astype(np.int64)
+    col_array = hru_values[hru.col_field].astype(np.int64)
+    hru_id_array = hru_values[hru.id_field].astype(np.int64)
+    dem_adj_array = hru_values[hru.dem_adj_field].astype(np.float64)
+    del hru_values
+    # Active stream and lake cells (lake ISEG are negative)
+    stream_mask = (hru_type_array == 1) & (iseg_array != 0)
+
     # Calculate KRCH, IRCH, JRCH for stream segments
     logging.info("\nKRCH, IRCH, & JRCH for streams")
-    fields = [
-        hru.type_field, hru.iseg_field, hru.row_field, hru.col_field,
-        hru.krch_field, hru.irch_field, hru.jrch_field]
-    with arcpy.da.UpdateCursor(hru.polygon_path, fields) as update_c:
-        for row in update_c:
-            if (int(row[0]) == 1 and int(row[1]) > 0):
-                row[4], row[5], row[6] = 1, int(row[2]), int(row[3])
-            # DEADBEEF
-            # if (int(row[0]) == 1 or int(row[0]) == 3) and int(row[1]) > 0:
-            #     row[4], row[5], row[6] = 1, int(row[2]), int(row[3])
-            else:
-                row[4], row[5], row[6] = 0, 0, 0
-            update_c.updateRow(row)
+    # DEADBEEF
+    # Include HRU_TYPE 3 cells?
+    krch_mask = (hru_type_array == 1) & (iseg_array > 0)
+    krch_array = krch_mask.astype(np.int64)
+    support.write_table_columns(hru.polygon_path, OrderedDict([
+        (hru.krch_field, krch_array),
+        (hru.irch_field, np.where(krch_mask, row_array, 0)),
+        (hru.jrch_field, np.where(krch_mask, col_array, 0))]))
 
     # Get stream length for each cell
     logging.info("Stream length")
-    arcpy.MakeFeatureLayer_management(hru.polygon_path, hru_polygon_lyr)
-    arcpy.SelectLayerByAttribute_management(
-        hru_polygon_lyr, "NEW_SELECTION",
-        ' \"{}\" = 1 And "{}" != 0'.format(hru.type_field, hru.iseg_field))
-    length_path = os.path.join('in_memory', 'length')
-    arcpy.Intersect_analysis(
-        [hru_polygon_lyr, streams_path],
-        length_path, "ALL", "", "LINE")
-    arcpy.Delete_management(hru_polygon_lyr)
-    length_field = 'LENGTH'
-    arcpy.AddField_management(length_path, length_field, 'LONG')
-    arcpy.CalculateField_management(
-        length_path, length_field, '!shape.length@meters!', "PYTHON")
-    length_dict = defaultdict(int)
+    # The stream lines are walked through the fishnet grid and the length
+    #   of the line in each cell is summed (see polygon.line_cell_length)
+    stream_lines = []
+    with arcpy.da.SearchCursor(
+            streams_path, ['SHAPE@'], '', hru.sr) as s_cursor:
+        for geom, in s_cursor:
+            if geom is not None:
+                stream_lines.append(support.polyline_parts(geom))
+    hru_rows, hru_cols = support.hru_grid_shape(hru)
+    with report.stage('intersect'):
+        cell_length = polygon.line_cell_length(
+            stream_lines, hru.extent.XMin, hru.extent.YMax, hru.cs,
+            hru_rows, hru_cols)
+    del stream_lines
     # DEADBEEF - This probably needs a maximum limit
-    for row in arcpy.da.SearchCursor(
-            length_path, [hru.id_field, length_field]):
-        length_dict[int(row[0])] += int(row[1])
-    fields = [hru.type_field, hru.iseg_field, hru.rchlen_field, hru.id_field]
-    with arcpy.da.UpdateCursor(hru.polygon_path, fields) as update_c:
-        for row in update_c:
-            if (int(row[0]) == 1 and int(row[1]) != 0):
-                row[2] = length_dict[int(row[3])]
-            else:
-                row[2] = 0
-            update_c.updateRow(row)
-    del length_dict, length_field, fields, hru_polygon_lyr
-
-    # Get list of segments and downstream cell for each stream/lake cell
+    rchlen_array = np.zeros(len(hru_type_array), dtype=np.int64)
+    rchlen_array[stream_mask] = np.round(hru.sr.metersPerUnit * cell_length[
+        (row_array[stream_mask] - 1) * hru_cols + col_array[stream_mask] - 1])
+    support.write_table_columns(
+        hru.polygon_path, {hru.rchlen_field: rchlen_array})
+    del cell_length, rchlen_array
+
+    # Build the segment and subbasin network from the stream/lake cells
     # Downstream is calulated from flow direction
     # Use IRUNBOUND instead of ISEG, since ISEG will be zeroed for lakes
-    logging.info("Cell out-flow dictionary")
-    cell_dict = dict()
-    fields = [
-        hru.type_field, hru.krch_field, hru.lake_id_field, hru.iseg_field,
-        hru.irunbound_field, hru.subbasin_field, hru.dem_adj_field,
-        hru.flow_dir_field, hru.col_field, hru.row_field, hru.id_field]
-    for row in arcpy.da.SearchCursor(hru.polygon_path, fields):
-        # Skip inactive cells
-        if int(row[0]) == 0:
-            continue
-        # DEADBEEF
-        # Skip cells flowing to inactive water
-        # elif int(row[0]) == 3:
-        #    continue
-        # Skip if not lake and not stream
-        elif (int(row[1]) == 0 and int(row[2]) == 0):
-            continue
-        # Read in parameters
-        cell = (int(row[8]), int(row[9]))
-        # support.next_row_col(FLOW_DIR, CELL)
-        # HRU_ID, ISEG,  NEXT_CELL, DEM_ADJ, X, X, X
-        cell_dict[cell] = [
-            int(row[10]), int(row[4]),
-            support.next_row_col(int(row[7]), cell),
-            float(row[6]), 0, 0, 0]
-        del cell
-    # Build list of unique segments
-    iseg_list = sorted(list(set([v[1] for v in cell_dict.values()])))
-
-
-    # Calculate IREACH and OUTSEG
-    logging.info("Calculate IREACH and OUTSEG")
-    outseg_dict = dict()
-    for iseg in sorted(iseg_list):
-        logging.debug("    Segment: {}".format(iseg))
-        # Subset of cell_dict for current iseg
-        iseg_dict = dict(
-            [(k, v) for k, v in cell_dict.items() if v[1] == iseg])
-        # List of all cells in current iseg
-        iseg_cells = iseg_dict.keys()
-        # List of out_cells for all cells in current iseg
-        out_cells = [value[2] for value in iseg_dict.values()]
-        # Every iseg will (should?) have one out_cell
-        out_cell = list(set(out_cells) - set(iseg_cells))
-
-        # Process streams and lakes separately
-        # Streams
-        if iseg > 0:
-            # If there is more than one out_cell
-            #   there is a problem with the stream network
-            if len(out_cell) != 1:
-                logging.error(
-                    ('\nERROR: ISEG {} has more than one out put cell' +
-                     '\n  Out cells: {}' +
-                     '\n  Check for streams exiting then re-entering a lake' +
-                     '\n  Lake cell elevations may not be constant\n').format(
-                         iseg, out_cell))
-                sys.exit()
-            # If not output cell, assume edge of domain
-            try:
-                outseg = cell_dict[out_cell[0]][1]
-            except KeyError:
-                outseg = exit_seg
-
-            # Track sub-basin outseg
-            outseg_dict[iseg] = outseg
-            # Calculate reach number for each cell
-            reach_dict = dict()
-            start_cell = list(set(iseg_cells) - set(out_cells))[0]
-            for i in xrange(len(out_cells)):
-                # logging.debug("    Reach: {}  Cell: {}".format(i+1, start_cell))
-                reach_dict[start_cell] = i + 1
-                start_cell = iseg_dict[start_cell][2]
-            # For each cell in iseg, save outseg, reach, & maxreach
-            for iseg_cell in iseg_cells:
-                cell_dict[iseg_cell][4:] = [
-                    outseg, reach_dict[iseg_cell], len(iseg_cells)]
-            del reach_dict, start_cell, outseg
-        # Lakes
-        elif iseg < 0:
-            # For lake cells, there can be multiple outlets if all of them
-            #   are to inactive cells or out of the model
-            # Otherwise, like streams, there should only be one outcell per iseg
-            if len(out_cell) == 1:
-                try:
-                    outseg = cell_dict[out_cell[0]][1]
-                except KeyError:
-                    outseg = exit_seg
-            elif (len(out_cell) != 1 and
-                  all(x[0] not in cell_dict.keys() for x in out_cell)):
-                outseg = exit_seg
-                logging.debug(
-                    ('  All out cells are inactive, setting outseg ' +
-                     'to exit_seg {}').format(exit_seg))
-            else:
-                logging.error(
-                    ('\nERROR: ISEG {} has more than one out put cell' +
-                     '\n  Out cells: {}' +
-                     '\n  Check for streams exiting then re-entering a lake' +
-                     '\n  Lake cell elevations may not be constant\n').format(
-                         iseg, out_cell))
-            # Track sub-basin outseg
-            outseg_dict[iseg] = outseg
-            # For each lake segment cell, only save outseg
-            # All lake cells are routed directly to the outseg
-            for iseg_cell in iseg_cells:
-                cell_dict[iseg_cell][4:] = [outseg, 0, 0]
-            del outseg
-        del iseg_dict, iseg_cells, iseg
-        del out_cells, out_cell
+    # Skip inactive cells and cells that are not lake and not stream
+    # DEADBEEF
+    # Skip cells flowing to inactive water (HRU_TYPE 3)?
+    logging.info("Stream network")
+    with report.stage('stream_network'):
+        try:
+            stream_network = network.StreamNetwork.from_cells(
+                col_array, row_array, flow_dir_array, irunbound_array,
+                subbasin_array, (hru_type_array != 0) &
+                ((krch_array != 0) | (lake_id_array != 0)))
+            seg_graph = stream_network.seg_graph
+            pourseg_array = seg_graph.pour_ids()
+        except ValueError as e:
+            logging.error(
+                ('\nERROR: {}' +
+                 '\n  Check for streams exiting then re-entering a lake' +
+                 '\n  Lake cell elevations may not be constant\n').format(e))
+            sys.exit()
+        # Save the network for prms_template_fill
+        stream_network.save(network_path)
+    logging.debug('  Segments: {}  Subbasins: {}'.format(
+        seg_graph.count, stream_network.subbasin_graph.count))
 
     # Calculate stream elevation
     logging.info("Stream elevation (DEM_ADJ - 1 for now)")
-    fields = [
-        hru.type_field, hru.iseg_field, hru.dem_adj_field,
-        hru.strm_top_field]
-    with arcpy.da.UpdateCursor(hru.polygon_path, fields) as update_c:
-        for row in update_c:
-            if int(row[0]) == 1 and int(row[1]) != 0:
-                row[3] = float(row[2]) - 1
-            else:
-                row[3] = 0
-            update_c.updateRow(row)
+    support.write_table_columns(hru.polygon_path, {
+        hru.strm_top_field: np.where(stream_mask, dem_adj_array - 1, 0)})
 
     # Saving ireach and outseg
     logging.info("Save IREACH and OUTSEG")
-    fields = [
-        hru.type_field, hru.iseg_field, hru.col_field, hru.row_field,
-        hru.outseg_field, hru.reach_field, hru.maxreach_field]
-    with arcpy.da.UpdateCursor(hru.polygon_path, fields) as update_c:
-        for row in update_c:
-            # if (int(row[0]) > 0 and int(row[1]) > 0):
-            # DEADBEEF - I'm not sure why only iseg > 0 in above line
-            # DEADBEEF - This should set outseg for streams and lakes
-            if (int(row[0]) > 0 and int(row[1]) != 0):
-                row[4:] = cell_dict[(int(row[2]), int(row[3]))][4:]
-            else:
-                row[4:] = [0, 0, 0]
-            update_c.updateRow(row)
+    # if (int(row[0]) > 0 and int(row[1]) > 0):
+    # DEADBEEF - I'm not sure why only iseg > 0 in above line
+    # DEADBEEF - This should set outseg for streams and lakes
+    reach_mask = (hru_type_array > 0) & (iseg_array != 0)
+    reach_array = np.where(
+        reach_mask, stream_network.hru_values(stream_network.reach), 0)
+    support.write_table_columns(hru.polygon_path, OrderedDict([
+        (hru.outseg_field, np.where(
+            reach_mask, stream_network.hru_values(stream_network.outseg()),
+            0)),
+        (hru.reach_field, reach_array),
+        (hru.maxreach_field, np.where(
+            reach_mask, stream_network.hru_values(stream_network.maxreach),
+            0))]))
+    del reach_mask
 
     # Calculate IUPSEG for all segments flowing out of lakes
     logging.info("IUPSEG for streams flowing out of lakes")
-    upseg_dict = dict(
-        [(v, k) for k, v in outseg_dict.iteritems() if k < 0])
-    fields = [hru.type_field, hru.iseg_field, hru.iupseg_field]
-    with arcpy.da.UpdateCursor(hru.polygon_path, fields) as update_c:
-        for row in update_c:
-            if (int(row[0]) == 1 and int(row[1]) != 0 and
-                int(row[1]) in upseg_dict.keys()):
-                row[2] = upseg_dict[int(row[1])]
-            else:
-                row[2] = 0
-            update_c.updateRow(row)
-
-    # Build dictionary of which segments flow into each segment
-    # Used to calculate seg-basins (sub watersheds) for major streams
-    # Also save list of all segments that pour to exit
-    logging.info("Segment in/out-flow dictionary")
-    inseg_dict = defaultdict(list)
-    pourseg_dict = dict()
-    pourseg_list = []
-    for key, value in outseg_dict.iteritems():
-        if key == exit_seg:
-            continue
-            # inseg_dict[key].append(key)
-        elif value == exit_seg:
-            pourseg_list.append(key)
-            inseg_dict[key].append(key)
-        else:
-            inseg_dict[value].append(key)
-
-    # Update pourseg for each segment, working up from initial pourseg
-    # Pourseg is the final exit segment for each upstream segment
-    for pourseg in pourseg_list:
-        testseg_list = inseg_dict[pourseg]
-        while testseg_list:
-            testseg = testseg_list.pop()
-            pourseg_dict[testseg] = pourseg
-            if pourseg == testseg:
-                continue
-            testseg_list.extend(inseg_dict[testseg])
-        del testseg_list
+    support.write_table_columns(hru.polygon_path, {
+        hru.iupseg_field: np.where(
+            stream_mask,
+            seg_graph.lookup(stream_network.lake_upsegs(), iseg_array), 0)})
 
     # Calculate SEG_BASIN for all active cells
     # SEG_BASIN corresponds to the ISEG of the lowest segment
     logging.info("SEG_BASIN")
-    fields = [hru.type_field, hru.irunbound_field, hru.segbasin_field]
-    with arcpy.da.UpdateCursor(hru.polygon_path, fields) as update_c:
-        for row in update_c:
-            if int(row[0]) > 0 and int(row[1]) != 0:
-                row[2] = pourseg_dict[int(row[1])]
-            else:
-                row[2] = 0
-            update_c.updateRow(row)
+    support.write_table_columns(hru.polygon_path, {
+        hru.segbasin_field: np.where(
+            (hru_type_array > 0) & (irunbound_array != 0),
+            seg_graph.lookup(pourseg_array, irunbound_array), 0)})
+    del stream_network, seg_graph, pourseg_array
 
     # Set all lake iseg to 0
     logging.info("Lake ISEG")
-    update_rows = arcpy.UpdateCursor(hru.polygon_path)
-    for row in update_rows:
-        if int(row.getValue(hru.type_field)) != 2:
-            continue
-        iseg = int(row.getValue(hru.iseg_field))
-        if iseg < 0:
-            row.setValue(hru.iseg_field, 0)
-        update_rows.updateRow(row)
-        del row, iseg
-    del update_rows
+    lake_i = np.flatnonzero((hru_type_array == 2) & (iseg_array < 0))
+    iseg_array[lake_i] = 0
+    support.write_table_columns(
+        hru.polygon_path, {hru.iseg_field: iseg_array[lake_i]}, lake_i)
+    del lake_i
 
     # Set environment parameters
     env.extent = hru.extent
@@ -540,14 +421,13 @@ def stream_parameters(config_path, overwrite_flag=False, debug_flag=False):
     # Generate STREAM_CELLS.DAT file for CRT
     logging.info("  {}".format(
         os.path.basename(crt_stream_cells_path)))
-    stream_cells_list = []
-    fields = [
-        hru.type_field, hru.iseg_field, hru.reach_field,
-        hru.col_field, hru.row_field]
-    for row in arcpy.da.SearchCursor(hru.polygon_path, fields):
-        if int(row[0]) == 1 and int(row[1]) > 0:
-            stream_cells_list.append(
-                [int(row[4]), int(row[3]), int(row[1]), int(row[2]), 1])
+    stream_cells_mask = (hru_type_array == 1) & (iseg_array > 0)
+    stream_cells_list = [
+        [row, col, iseg, reach, 1] for row, col, iseg, reach in izip(
+            row_array[stream_cells_mask].tolist(),
+            col_array[stream_cells_mask].tolist(),
+            iseg_array[stream_cells_mask].tolist(),
+            reach_array[stream_cells_mask].tolist())]
     if stream_cells_list:
         with open(crt_stream_cells_path, 'w+') as f:
             f.write('{}    NREACH\n'.format(len(stream_cells_list)))
@@ -561,13 +441,9 @@ def stream_parameters(config_path, overwrite_flag=False, debug_flag=False):
     #   Outflow field is set in dem_2_streams
     logging.info("  {}".format(
         os.path.basename(crt_outflow_hru_path)))
-    outflow_hru_list = []
-    fields = [
-        hru.type_field, hru.outflow_field, hru.subbasin_field,
-        hru.row_field, hru.col_field]
-    for row in arcpy.da.SearchCursor(hru.polygon_path, fields):
-        if int(row[0]) != 0 and int(row[1]) == 1:
-            outflow_hru_list.append([int(row[3]), int(row[4])])
+    outflow_mask = (hru_type_array != 0) & (outflow_array == 1)
+    outflow_hru_list = zip(
+        row_array[outflow_mask].tolist(), col_array[outflow_mask].tolist())
     if outflow_hru_list:
         with open(crt_outflow_hru_path, 'w+') as f:
             f.write('{}    NUMOUTFLOWHRU\n'.format(
@@ -632,10 +508,13 @@ def stream_parameters(config_path, overwrite_flag=False, debug_flag=False):
 
     # Generate XY.DAT for CRT
     logging.info("  {}".format(os.path.basename(crt_xy_path)))
-    xy_list = [
-        map(int, row)
-        for row in sorted(arcpy.da.SearchCursor(
-            hru.polygon_path, [hru.id_field, hru.x_field, hru.y_field]))]
+    xy_values = support.read_table_columns(
+        hru.polygon_path, [hru.x_field, hru.y_field])
+    xy_list = zip(
+        hru_id_array.tolist(),
+        xy_values[hru.x_field].astype(np.int64).tolist(),
+        xy_values[hru.y_field].astype(np.int64).tolist())
+    del xy_values
     with open(crt_xy_path, 'w+') as f:
         for line in sorted(xy_list):
             f.write(' '.join(map(str, line)) + '\n')
@@ -644,7 +523,8 @@ def stream_parameters(config_path, overwrite_flag=False, debug_flag=False):
     # Run CRT
     logging.info('\nRunning CRT')
     os.chdir(crt_ws)
-    subprocess.check_call(crt_exe_name)
+    with report.stage('crt'):
+        subprocess.check_call(crt_exe_name)
     os.chdir(hru.param_ws)
 
     # Read in outputstat.txt to check for errors
@@ -710,3 +590,4 @@ if __name__ == '__main__':
     stream_parameters(
         config_path=args.ini, overwrite_flag=args.overwrite,
         debug_flag=args.loglevel==logging.DEBUG)
+    report.finish_report()
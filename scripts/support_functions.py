@@ -7,23 +7,50 @@
 # Python:       2.7
 #--------------------------------
 
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 import ConfigParser
+import hashlib
 import heapq
-import itertools
+import json
 import logging
 import math
-from operator import itemgetter
 import os
 import re
+import shutil
 import sys
-from time import sleep
 
 import numpy as np
 
 import arcpy
 from arcpy import env
 
+import column_functions as column
+import dbf_functions as dbf
+import fishnet_functions as fishnet
+import polygon_functions as polygon
+import projection_functions as proj
+import report_functions as report
+import trace_functions as trace
+
+
+# Set GSFLOW_ARCPY_TRACE to log the slowest and repeated arcpy calls
+#   in the run report (see trace_functions.py)
+if os.environ.get('GSFLOW_ARCPY_TRACE'):
+    trace.install(arcpy)
+
+# HRUParameters shared by the scripts run in the same process, keyed by
+#   the config file path (None if they aren't shared, see share_hru_parameters)
+_shared_hru_params = None
+
+# Field arrays read by read_table_columns, keyed by the table path
+# Each entry is the file_key of the table when it was read and a dictionary
+#   of the arrays keyed by upper case field name
+_table_columns_cache = dict()
+
+# Column table copies of the HRU fishnet fields, keyed by the fishnet path
+#   (see HRUParameters.column_table_flag and update_column_table)
+_column_table_paths = dict()
+
 
 class HRUParameters():
     """"""
@@ -100,6 +127,15 @@ class HRUParameters():
         if not os.path.isdir(self.param_ws):
             os.mkdir(self.param_ws)
 
+        # Keep a column table copy of the fishnet fields so they can be
+        #   read without parsing the shapefile (see update_column_table)
+        self.column_table_flag = get_param(
+            'column_table_flag', False, inputs_cfg)
+        self.column_ws = os.path.join(self.param_ws, column.hru_table_name)
+        if self.column_table_flag:
+            _column_table_paths[os.path.abspath(self.polygon_path)] = (
+                self.column_ws)
+
         # Log workspace
         self.log_ws = os.path.join(self.param_ws, 'logs')
         if not os.path.isdir(self.log_ws):
@@ -161,6 +197,10 @@ class HRUParameters():
         # set_ppt_zones_flag = inputs_cfg.getboolean('INPUTS', 'set_ppt_zones_flag')
         calc_layer_thickness_flag = inputs_cfg.getboolean(
             'INPUTS', 'calc_layer_thickness_flag')
+        # Keep the flags for building the field list
+        self.calc_flow_acc_dem_flag = calc_flow_acc_dem_flag
+        self.calc_topo_index_flag = calc_topo_index_flag
+        self.calc_layer_thickness_flag = calc_layer_thickness_flag
 
         # Read in all field names
         self.id_field = fields_cfg.get('FIELDS', 'id_field')
@@ -284,6 +324,35 @@ class HRUParameters():
             self.lay4_bottom_field = fields_cfg.get('FIELDS', 'lay4_bottom_field')
 
 
+def get_hru_parameters(config_path):
+    """Return the HRUParameters of a config file
+
+    If the HRUParameters are shared (i.e. by the in-process pipeline runner),
+        the config and field list files are only read and the fishnet is only
+        described once for all the scripts.
+    """
+    if _shared_hru_params is None:
+        return HRUParameters(config_path)
+    key = os.path.abspath(config_path)
+    try:
+        return _shared_hru_params[key]
+    except KeyError:
+        hru_param = HRUParameters(config_path)
+        _shared_hru_params[key] = hru_param
+        return hru_param
+
+
+def share_hru_parameters(share_flag=True):
+    """Share (or stop sharing) the HRUParameters between scripts
+
+    This also clears the shared HRUParameters, which must be done whenever
+        the fishnet geometry changes (i.e. after fishnet_generator).
+    """
+    global _shared_hru_params
+    _shared_hru_params = {} if share_flag else None
+    _table_columns_cache.clear()
+
+
 def next_row_col(flow_dir, cell):
     """"""
     i_next, j_next = cell
@@ -313,16 +382,482 @@ def field_stat_func(input_path, value_field, stat='MAXIMUM'):
         return float(sum(value_list)) / len(value_list)
 
 
+def hru_field_list(hru_param):
+    """Build the list of HRU parameter fields and types
+
+    Args:
+        hru_param (HRUParameters): HRU parameters
+
+    Returns:
+        list of (field name, field type) in the order they are added
+    """
+    field_list = [
+        # HRU/DEM Fields
+        (hru_param.fid_field, 'LONG'),
+        (hru_param.id_field, 'LONG'),
+        (hru_param.type_in_field, 'LONG'),
+        (hru_param.type_field, 'LONG'),
+        (hru_param.dem_mean_field, 'DOUBLE'),
+        (hru_param.dem_median_field, 'DOUBLE'),
+        (hru_param.dem_min_field, 'DOUBLE'),
+        (hru_param.dem_max_field, 'DOUBLE'),
+        (hru_param.dem_adj_field, 'DOUBLE')]
+    if hru_param.calc_flow_acc_dem_flag:
+        field_list.extend([
+            (hru_param.dem_flowacc_field, 'DOUBLE'),
+            (hru_param.dem_sum_field, 'DOUBLE'),
+            (hru_param.dem_count_field, 'DOUBLE')])
+    field_list.extend([
+        (hru_param.dem_sink8_field, 'DOUBLE'),
+        (hru_param.dem_sink4_field, 'DOUBLE'),
+        (hru_param.crt_elev_field, 'DOUBLE'),
+        (hru_param.crt_fill_field, 'DOUBLE'),
+        (hru_param.dem_aspect_field, 'LONG'),
+        (hru_param.dem_slope_deg_field, 'DOUBLE'),
+        (hru_param.dem_slope_rad_field, 'DOUBLE'),
+        (hru_param.dem_slope_pct_field, 'DOUBLE'),
+        (hru_param.dem_feet_field, 'DOUBLE'),
+        (hru_param.area_field, 'DOUBLE')])
+    if hru_param.calc_topo_index_flag:
+        field_list.append((hru_param.topo_index_field, 'LONG'))
+    field_list.extend([
+        (hru_param.row_field, 'LONG'),
+        (hru_param.col_field, 'LONG'),
+        (hru_param.x_field, 'LONG'),
+        (hru_param.y_field, 'LONG'),
+        (hru_param.lat_field, 'DOUBLE'),
+        (hru_param.lon_field, 'DOUBLE'),
+
+        # Lake fields
+        (hru_param.lake_id_field, 'LONG'),
+        (hru_param.lake_area_field, 'DOUBLE'),
+
+        # Stream fields
+        (hru_param.iseg_field, 'LONG'),
+        (hru_param.irunbound_field, 'LONG'),
+        (hru_param.flow_dir_field, 'LONG'),
+        (hru_param.krch_field, 'LONG'),
+        (hru_param.irch_field, 'LONG'),
+        (hru_param.jrch_field, 'LONG'),
+        (hru_param.reach_field, 'LONG'),
+        (hru_param.rchlen_field, 'LONG'),
+        (hru_param.maxreach_field, 'LONG'),
+        (hru_param.outseg_field, 'LONG'),
+        (hru_param.iupseg_field, 'LONG'),
+        (hru_param.subbasin_field, 'LONG'),
+        (hru_param.segbasin_field, 'LONG'),
+        (hru_param.outflow_field, 'LONG'),
+        (hru_param.strm_top_field, 'FLOAT'),
+        (hru_param.strm_slope_field, 'FLOAT'),
+
+        # PPT Zone fields
+        (hru_param.ppt_zone_id_field, 'SHORT'),
+
+        # DEM based
+        (hru_param.jh_tmax_field, 'FLOAT'),
+        (hru_param.jh_tmin_field, 'FLOAT'),
+        (hru_param.jh_coef_field, 'FLOAT'),
+        (hru_param.snarea_thresh_field, 'FLOAT'),
+
+        # Aspect based
+        (hru_param.tmax_adj_field, 'FLOAT'),
+        (hru_param.tmin_adj_field, 'FLOAT'),
+
+        # Vegetation fields
+        (hru_param.cov_type_field, 'SHORT'),
+        (hru_param.covden_sum_field, 'FLOAT'),
+        (hru_param.covden_win_field, 'FLOAT'),
+        (hru_param.rad_trncf_field, 'FLOAT'),
+        (hru_param.snow_intcp_field, 'FLOAT'),
+        (hru_param.srain_intcp_field, 'FLOAT'),
+        (hru_param.wrain_intcp_field, 'FLOAT'),
+
+        # Soil fields
+        (hru_param.awc_field, 'FLOAT'),
+        (hru_param.clay_pct_field, 'FLOAT'),
+        (hru_param.sand_pct_field, 'FLOAT'),
+        (hru_param.ksat_field, 'FLOAT'),
+        (hru_param.soil_depth_field, 'FLOAT'),
+        (hru_param.root_depth_field, 'FLOAT'),
+        (hru_param.soil_type_field, 'FLOAT'),
+        (hru_param.moist_init_field, 'FLOAT'),
+        (hru_param.moist_max_field, 'FLOAT'),
+        (hru_param.rechr_init_field, 'FLOAT'),
+        (hru_param.rechr_max_field, 'FLOAT'),
+        (hru_param.ssr2gw_rate_field, 'FLOAT'),
+        (hru_param.slowcoef_lin_field, 'FLOAT'),
+        (hru_param.slowcoef_sq_field, 'FLOAT'),
+        (hru_param.fastcoef_lin_field, 'FLOAT'),
+        (hru_param.fastcoef_sq_field, 'FLOAT'),
+
+        # Impervious fields
+        (hru_param.imperv_pct_field, 'FLOAT'),
+        (hru_param.carea_max_field, 'FLOAT')])
+
+    # PRISM mean monthly fields
+    month_list = ['{:02d}'.format(m) for m in range(1, 13)]
+    month_list.extend(['14'])
+    for prism_data_name in ['PPT', 'TMAX', 'TMIN']:
+        for month in month_list:
+            field_list.append(
+                ('{}_{}'.format(prism_data_name, month), 'FLOAT'))
+    # PRISM mean monthly PPT ratio fields
+    for month in month_list:
+        if month == '14':
+            continue
+        field_list.append(('PPT_RT_{}'.format(month), 'FLOAT'))
+
+    # Layer thickness and bottom fields
+    if hru_param.calc_layer_thickness_flag:
+        field_list.extend([
+            (hru_param.alluv_field, 'FLOAT'),
+            (hru_param.alluv_thick_field, 'FLOAT'),
+            (hru_param.lay1_thick_field, 'FLOAT'),
+            (hru_param.lay2_thick_field, 'FLOAT'),
+            (hru_param.lay3_thick_field, 'FLOAT'),
+            (hru_param.lay4_thick_field, 'FLOAT'),
+            (hru_param.lay1_bottom_field, 'FLOAT'),
+            (hru_param.lay2_bottom_field, 'FLOAT'),
+            (hru_param.lay3_bottom_field, 'FLOAT'),
+            (hru_param.lay4_bottom_field, 'FLOAT')])
+
+    # Remove duplicate field names (keep the first)
+    field_names = set()
+    unique_list = []
+    for field_name, field_type in field_list:
+        if field_name.upper() not in field_names:
+            field_names.add(field_name.upper())
+            unique_list.append((field_name, field_type))
+    return unique_list
+
+
 def add_field_func(hru_param_path, field_name, field_type='DOUBLE'):
     """"""
-    while not arcpy.ListFields(hru_param_path, field_name):
+    add_fields_func(hru_param_path, [(field_name, field_type)])
+
+
+def add_fields_func(hru_param_path, field_list):
+    """Add all missing fields to a table at once
+
+    The required fields are compared to the existing fields and only the
+        missing fields are added.  Shapefile tables are rewritten once
+        with all the new fields, otherwise AddFields is used if available.
+
+    Args:
+        hru_param_path (str): table or feature class path
+        field_list (list): required (field name, field type)
+
+    Returns:
+        list of the (field name, field type) that were added
+    """
+    def missing_fields():
+        field_names = set([
+            f.name.upper() for f in arcpy.ListFields(hru_param_path)])
+        return [
+            (name, field_type) for name, field_type in field_list
+            if name.upper() not in field_names]
+
+    add_list = missing_fields()
+    if not add_list:
+        return []
+    for field_name, field_type in add_list:
         logging.info('  Field: {}'.format(field_name))
+
+    with report.stage('add_fields') as stage:
+        if (hru_param_path.lower().endswith('.shp') and
+                all(t.upper() in dbf.dbf_field_types for n, t in add_list) and
+                arcpy.TestSchemaLock(hru_param_path)):
+            dbf_path = os.path.splitext(hru_param_path)[0] + '.dbf'
+            dbf.add_dbf_fields(dbf_path, add_list)
+            stage.add_file(dbf_path)
+        elif hasattr(arcpy.management, 'AddFields'):
+            arcpy.management.AddFields(
+                hru_param_path, [[n, t] for n, t in add_list])
+        else:
+            for field_name, field_type in add_list:
+                arcpy.AddField_management(
+                    hru_param_path, field_name, field_type)
+
+    failed_list = missing_fields()
+    if failed_list:
+        logging.error(
+            '\nERROR: Fields could not be added to {}\n  {}'.format(
+                hru_param_path, ', '.join([n for n, t in failed_list])))
+        sys.exit()
+    return add_list
+
+
+def read_table_columns(table_path, field_names):
+    """Read fields of a table as arrays (in OID order)
+
+    Shapefile tables are memory mapped and each field is parsed in bulk
+        (see dbf_functions.DBFTable), otherwise TableToNumPyArray is used.
+    Blank shapefile values are read as NaN.
+
+    Shapefile fields are kept in memory, so the scripts run in the same
+        process (i.e. by the pipeline runner) don't parse the HRU table again.
+        The kept fields are dropped whenever the table is written
+        (see file_key and write_table_columns).
+    If the fishnet has a current column table copy (see
+        update_column_table), the fields are read from the column table.
+
+    Args:
+        table_path (str): table or feature class path
+        field_names (list): field names ('OID@' or 'FID' for the object ID)
+
+    Returns:
+        OrderedDict of the value arrays keyed by field name
+    """
+    values = OrderedDict()
+    with report.stage('cursor_read') as stage:
+        column_table = current_column_table(table_path)
+        if column_table is not None:
+            column_names = set(f.upper() for f in column_table.field_names)
+        if (column_table is not None and
+                all(f.upper() in ['OID@', 'FID'] or f.upper() in column_names
+                    for f in field_names)):
+            # Match the dtypes of the parsed shapefile values
+            for field_name, column_array in column_table.read_columns(
+                    field_names).items():
+                if column_array.dtype.kind in 'iu':
+                    values[field_name] = np.array(column_array, np.int64)
+                else:
+                    values[field_name] = np.array(column_array, np.float64)
+            stage.add_rows(column_table.count)
+        elif table_path.lower().endswith('.shp'):
+            cache_key = os.path.abspath(table_path)
+            table_key = file_key(table_path)
+            try:
+                cache_table_key, cache_values = _table_columns_cache[
+                    cache_key]
+            except KeyError:
+                cache_table_key, cache_values = None, dict()
+            if table_key is None or cache_table_key != table_key:
+                cache_values = dict()
+                _table_columns_cache[cache_key] = (table_key, cache_values)
+            cache_names = [f.upper() for f in field_names]
+            if not all(f in cache_values for f in cache_names):
+                dbf_path = os.path.splitext(table_path)[0] + '.dbf'
+                with dbf.DBFTable(dbf_path) as dbf_table:
+                    for field_name in field_names:
+                        if field_name.upper() in cache_values:
+                            continue
+                        elif field_name.upper() in ['OID@', 'FID']:
+                            cache_values[field_name.upper()] = np.arange(
+                                dbf_table.count, dtype=np.int64)
+                        else:
+                            cache_values[field_name.upper()] = (
+                                dbf_table.read(field_name))
+            # Callers can modify the arrays in place
+            for field_name, cache_name in zip(field_names, cache_names):
+                values[field_name] = np.copy(cache_values[cache_name])
+            if field_names:
+                stage.add_rows(len(values[field_names[0]]))
+        else:
+            table_array = arcpy.da.TableToNumPyArray(table_path, field_names)
+            for field_name in field_names:
+                values[field_name] = table_array[field_name]
+            stage.add_rows(len(table_array))
+    return values
+
+
+def write_table_columns(table_path, values, record_i=None):
+    """Write value arrays to existing fields of a table
+
+    Shapefile tables are memory mapped and only the written fields are
+        changed in place (see dbf_functions.DBFTable), otherwise (or if the
+        shapefile is locked) the rows are updated with a cursor.
+    The values are also written to a current column table copy of the
+        fishnet, so it stays current (see update_column_table).
+
+    Args:
+        table_path (str): table or feature class path
+        values (dict): value arrays keyed by field name
+        record_i (np.array): OID order indices of the records to write
+            (default is all the records, in OID order)
+
+    Returns:
+        None
+    """
+    if not values:
+        return
+    field_names = list(values.keys())
+    _table_columns_cache.pop(os.path.abspath(table_path), None)
+    column_table = current_column_table(table_path)
+    with report.stage('cursor_write') as stage:
+        if (table_path.lower().endswith('.shp') and
+                arcpy.TestSchemaLock(table_path)):
+            dbf_path = os.path.splitext(table_path)[0] + '.dbf'
+            column_values = None
+            with dbf.DBFTable(dbf_path, 'r+') as dbf_table:
+                for field_name in field_names:
+                    dbf_table.field(field_name)
+                for field_name in field_names:
+                    dbf_table.write(
+                        field_name, values[field_name], record_i)
+                stage.add_rows(
+                    dbf_table.count if record_i is None else len(record_i))
+                # The column table gets the values as they were written
+                #   (rounded to the field decimals)
+                if column_table is not None:
+                    column_values = dict(
+                        (f, dbf_table.read(f)) for f in field_names)
+                    if record_i is not None:
+                        column_values = dict(
+                            (f, v[record_i])
+                            for f, v in column_values.items())
+            _write_column_table(
+                column_table, table_path, column_values, record_i)
+            return
+
+        value_lists = [np.asarray(values[f]).tolist() for f in field_names]
+        if record_i is not None:
+            # Position of each written record in the value arrays
+            record_pos = dict(
+                (record, pos)
+                for pos, record in enumerate(np.asarray(record_i).tolist()))
+        row_count = 0
+        with arcpy.da.UpdateCursor(table_path, field_names) as u_cursor:
+            for i, row in enumerate(u_cursor):
+                if record_i is None:
+                    pos = i
+                else:
+                    pos = record_pos.get(i)
+                    if pos is None:
+                        continue
+                u_cursor.updateRow([v[pos] for v in value_lists])
+                row_count += 1
+        stage.add_rows(row_count)
+    _write_column_table(column_table, table_path, values, record_i)
+
+
+def current_column_table(table_path):
+    """Return the column table copy of a fishnet if it is current
+
+    The copy is current if the fishnet file key (see file_key) matches the
+        key when the fields were copied, so it is also current for copies of
+        the fishnet that keep the modified time (i.e. the pipeline stages).
+
+    Args:
+        table_path (str): fishnet polygon shapefile path
+
+    Returns:
+        column_functions.ColumnTable, None if the fishnet doesn't have a
+            column table or it has changed since the fields were copied
+    """
+    try:
+        column_ws = _column_table_paths[os.path.abspath(table_path)]
+    except KeyError:
+        return None
+    if not column.is_column_table(column_ws):
+        return None
+    try:
+        column_table = column.ColumnTable(column_ws)
+    except ValueError:
+        return None
+    if not column_table.source_current(file_key(table_path)):
+        return None
+    return column_table
+
+
+def _write_column_table(column_table, table_path, values, record_i=None):
+    """Write the values written to a fishnet to its column table copy
+
+    Only the fishnet the fields were copied from is written through.  If a
+        field isn't in the column table or the values can't be stored, the
+        column table is left out of date (and isn't read).
+    """
+    if (column_table is None or
+            column_table.source_path != os.path.abspath(table_path)):
+        return
+    column_names = set(f.upper() for f in column_table.field_names)
+    if not all(f.upper() in column_names for f in values.keys()):
+        return
+    try:
+        column_table.write_columns(values, record_i)
+    except ValueError as e:
+        logging.debug('  Column table is out of date: {}'.format(e))
+        return
+    column_table.set_source(column_table.source_path, file_key(table_path))
+
+
+def update_column_table(hru_param, field_names=None):
+    """Copy the fishnet fields to the column table
+
+    Nothing is done if the column table isn't kept (column_table_flag).
+
+    Args:
+        hru_param (HRUParameters): HRU parameters
+        field_names (list): fields changed since the column table was last
+            current, default is to copy all the numeric fields again
+
+    Returns:
+        None
+    """
+    if not hru_param.column_table_flag:
+        return
+    polygon_path = os.path.abspath(hru_param.polygon_path)
+    dbf_path = os.path.splitext(polygon_path)[0] + '.dbf'
+    with report.stage('column_update') as stage:
+        if field_names is not None and column.is_column_table(
+                hru_param.column_ws):
+            with open(dbf_path, 'rb') as dbf_f:
+                dbf_fields = dbf.read_dbf_header(dbf_f)[3]
+            type_dict = dict(
+                (f.name.upper(), column.dbf_field_type(f))
+                for f in dbf_fields)
+            field_names = [
+                f for f in field_names if type_dict.get(f.upper())]
+            column_table = column.ColumnTable(hru_param.column_ws)
+            try:
+                column_table.add_fields([
+                    (f, type_dict[f.upper()]) for f in field_names])
+                column_table.write_columns(
+                    dbf.read_dbf_columns(dbf_path, field_names))
+            except ValueError as e:
+                logging.warning('  Column table was not updated: {}'.format(
+                    e))
+                column_table.set_source(polygon_path, None)
+                return
+            column_table.set_source(polygon_path, file_key(polygon_path))
+            stage.add_rows(column_table.count)
+            return
+
+        if current_column_table(polygon_path) is not None:
+            return
+
+        # The column table records are in HRU ID order,
+        #   so only fishnets in the same order can be copied
+        hru_rows, hru_cols = hru_grid_shape(hru_param)
         try:
-            arcpy.AddField_management(
-                hru_param_path, field_name, field_type)
-        except:
-            pass
-        sleep(0.5)
+            cell_values = dbf.read_dbf_columns(
+                dbf_path, [hru_param.row_field, hru_param.col_field])
+        except ValueError as e:
+            logging.warning('  Column table was not built: {}'.format(e))
+            return
+        cell_array = (
+            (cell_values[hru_param.row_field].astype(np.int64) - 1) *
+            hru_cols + cell_values[hru_param.col_field].astype(np.int64) - 1)
+        if not np.array_equal(
+                cell_array, np.arange(hru_rows * hru_cols, dtype=np.int64)):
+            logging.warning(
+                '  The fishnet records are not in HRU ID order, '
+                'the column table was not built')
+            return
+        if column.is_column_table(hru_param.column_ws):
+            shutil.rmtree(hru_param.column_ws)
+        try:
+            column_table = column.ColumnTable.from_shapefile(
+                hru_param.column_ws, polygon_path, hru_param.extent.XMin,
+                hru_param.extent.YMax, hru_param.cs, hru_rows, hru_cols,
+                hru_param.row_field, hru_param.col_field,
+                sr_wkt=hru_param.sr.exportToString().split(';')[0],
+                meters_per_unit=hru_param.sr.metersPerUnit)
+        except ValueError as e:
+            logging.warning('  Column table was not built: {}'.format(e))
+            return
+        column_table.set_source(polygon_path, file_key(polygon_path))
+        stage.add_rows(column_table.count)
 
 
 def transform_func(spat_ref_a, spat_ref_b):
@@ -338,6 +873,75 @@ def transform_func(spat_ref_a, spat_ref_b):
         # return '#'
 
 
+def spatial_reference_params(spat_ref):
+    """Get the NumPy projection parameters for a spatial reference
+
+    Args:
+        spat_ref (arcpy.SpatialReference): spatial reference
+
+    Returns:
+        dict of projection parameters (see projection_functions),
+            or None if the spatial reference is not supported
+    """
+    gcs = spat_ref.GCS
+    if (gcs.angularUnitName.upper() != 'DEGREE' or
+            gcs.primeMeridianName.upper() != 'GREENWICH'):
+        return None
+    # Some versions report the inverse flattening
+    flattening = float(gcs.flattening)
+    if flattening > 1:
+        flattening = 1.0 / flattening
+    params = {
+        'a': float(gcs.semiMajorAxis), 'f': flattening,
+        'datum': gcs.datumName}
+    if spat_ref.type == 'Geographic':
+        params['projection'] = 'GEOGRAPHIC'
+        return params
+    elif spat_ref.projectionName not in proj.projection_list:
+        return None
+    params.update({
+        'projection': spat_ref.projectionName,
+        'meters_per_unit': float(spat_ref.metersPerUnit),
+        'false_easting': float(spat_ref.falseEasting),
+        'false_northing': float(spat_ref.falseNorthing),
+        'central_meridian': float(spat_ref.centralMeridian),
+        'scale_factor': float(spat_ref.scaleFactor),
+        'latitude_of_origin': float(spat_ref.latitudeOfOrigin),
+        'standard_parallel_1': float(spat_ref.standardParallel1),
+        'standard_parallel_2': float(spat_ref.standardParallel2)})
+    return params
+
+
+def project_points_func(x, y, input_sr, output_sr):
+    """Project coordinate arrays with NumPy
+
+    The datum transformation is selected by transform_func().
+
+    Args:
+        x (np.array): input x coordinates
+        y (np.array): input y coordinates
+        input_sr (arcpy.SpatialReference): input spatial reference
+        output_sr (arcpy.SpatialReference): output spatial reference
+
+    Returns:
+        tuple of the output x and y arrays,
+            or None if either spatial reference or the transform
+            is not supported
+    """
+    input_params = spatial_reference_params(input_sr)
+    output_params = spatial_reference_params(output_sr)
+    if input_params is None or output_params is None:
+        return None
+    transform = transform_func(input_sr, output_sr)
+    if transform and transform not in proj.datum_transforms:
+        return None
+    elif (not transform and
+          input_params['datum'] != output_params['datum']):
+        return None
+    return proj.transform_points(
+        x, y, input_params, output_params, transform)
+
+
 def valid_raster_func(raster_path, raster_name, hru_param, cs=10):
     """This will check for matching spat. ref., snap point, and cellsize
 
@@ -381,22 +985,12 @@ def valid_raster_func(raster_path, raster_name, hru_param, cs=10):
         return True
 
 
-def zonal_stats_func(zs_dict, polygon_path, point_path, hru_param,
-                     nodata_value=-999, default_value=0):
-    """"""
-    for zs_field, (raster_path, zs_stat) in sorted(zs_dict.items()):
-        logging.info('  {}: {}'.format(zs_field, zs_stat))
-        logging.info('    {}'.format(raster_path))
-        # Check inputs
-        zs_stat_list = ['MEAN', 'MINIMUM', 'MAXIMUM', 'MEDIAN', 'MAJORITY', 'SUM']
-        zs_field_list = arcpy.ListFields(polygon_path, zs_field)
-        if zs_stat not in zs_stat_list:
-            sys.exit()
-        elif len(zs_field_list) == 0:
-            logging.error(
-                '\nERROR: Zonal stats field {} doesn\'t exist'.format(zs_field))
-            sys.exit()
+def zonal_stats_check(polygon_path, point_path, hru_param):
+    """Check the HRU polygons and centroids before calculating zonal stats
 
+    Returns:
+        int: number of HRU centroids
+    """
     # Check that the shapefiles have a spatial reference
     if arcpy.Describe(polygon_path).spatialReference.name == 'Unknown':
         logging.error(
@@ -430,6 +1024,54 @@ def zonal_stats_func(zs_dict, polygon_path, point_path, hru_param,
     #    logging.error(
     #        ('\nERROR: There are duplicate {} values\n').format(hru_param.fid_field))
     #    sys.exit()
+    return hru_param_count
+
+
+def file_key(file_path):
+    """Return the size and modified time of a file (or shapefile)
+
+    The key changes whenever the file is written, None if it doesn't exist
+        (i.e. in_memory or geodatabase feature classes).
+    """
+    if file_path.lower().endswith('.shp'):
+        path_list = [os.path.splitext(file_path)[0] + ext
+                     for ext in ['.shp', '.dbf']]
+    else:
+        path_list = [file_path]
+    try:
+        return tuple(
+            (os.path.getsize(path), os.path.getmtime(path))
+            for path in path_list)
+    except OSError:
+        return None
+
+
+def zonal_stats_func(zs_dict, polygon_path, point_path, hru_param,
+                     nodata_value=-999, default_value=0):
+    """"""
+    for zs_field, (raster_path, zs_stat) in sorted(zs_dict.items()):
+        logging.info('  {}: {}'.format(zs_field, zs_stat))
+        logging.info('    {}'.format(raster_path))
+        # Check inputs
+        zs_stat_list = ['MEAN', 'MINIMUM', 'MAXIMUM', 'MEDIAN', 'MAJORITY', 'SUM']
+        zs_field_list = arcpy.ListFields(polygon_path, zs_field)
+        if zs_stat not in zs_stat_list:
+            sys.exit()
+        elif len(zs_field_list) == 0:
+            logging.error(
+                '\nERROR: Zonal stats field {} doesn\'t exist'.format(zs_field))
+            sys.exit()
+
+    # The centroid checks are skipped if the centroids haven't changed since
+    #   they were last checked (i.e. by a previous script in the same process)
+    point_key = (polygon_path, point_path, file_key(point_path))
+    if getattr(hru_param, 'checked_point_key', None) == point_key:
+        hru_param_count = hru_param.checked_point_count
+    else:
+        hru_param_count = zonal_stats_check(polygon_path, point_path, hru_param)
+        if point_key[-1] is not None:
+            hru_param.checked_point_key = point_key
+            hru_param.checked_point_count = hru_param_count
 
     # Create memory objects
     point_subset_path = os.path.join('in_memory', 'point_subset')
@@ -468,9 +1110,10 @@ def zonal_stats_func(zs_dict, polygon_path, point_path, hru_param,
             # Calculate zonal statistics
             zs_table = os.path.join('in_memory', zs_name)
             # zs_table = os.path.join(env.scratchWorkspace, zs_name+'.dbf')
-            zs_obj = arcpy.sa.ZonalStatisticsAsTable(
-                hru_raster_path, 'Value', raster_path,
-                zs_table, 'DATA', zs_stat.upper())
+            with report.stage('zonal'):
+                zs_obj = arcpy.sa.ZonalStatisticsAsTable(
+                    hru_raster_path, 'Value', raster_path,
+                    zs_table, 'DATA', zs_stat.upper())
 
             # Read values from points
             logging.debug('    Reading values from zs table')
@@ -499,24 +1142,29 @@ def zonal_stats_func(zs_dict, polygon_path, point_path, hru_param,
         logging.info('    Writing values to polygons')
         zs_fields = sorted(zs_dict.keys())
         fields = zs_fields + [hru_param.fid_field]
-        with arcpy.da.UpdateCursor(polygon_path, fields, subset_str) as u_cursor:
-            for row in u_cursor:
-                # Create an empty dictionary if FID does not exist
-                # Missing FIDs did not have zonal stats calculated
-                row_dict = data_dict.get(int(row[-1]), None)
-                for i, zs_field in enumerate(zs_fields):
-                    # If stats were calculated for only some parameters,
-                    #   then set missing parameter value to nodata value (-999)
-                    if row_dict:
-                        try:
-                            row[i] = row_dict[zs_field]
-                        except KeyError:
-                            row[i] = nodata_value
-                    # Otherwise, if no stats were calculated,
-                    #   reset value to 0 (shapefile default)
-                    else:
-                        row[i] = default_value
-                u_cursor.updateRow(row)
+        with report.stage('cursor_write') as stage:
+            row_count = 0
+            with arcpy.da.UpdateCursor(
+                    polygon_path, fields, subset_str) as u_cursor:
+                for row in u_cursor:
+                    # Create an empty dictionary if FID does not exist
+                    # Missing FIDs did not have zonal stats calculated
+                    row_dict = data_dict.get(int(row[-1]), None)
+                    for i, zs_field in enumerate(zs_fields):
+                        # If stats were calculated for only some parameters,
+                        #   then set missing parameter value to nodata value (-999)
+                        if row_dict:
+                            try:
+                                row[i] = row_dict[zs_field]
+                            except KeyError:
+                                row[i] = nodata_value
+                        # Otherwise, if no stats were calculated,
+                        #   reset value to 0 (shapefile default)
+                        else:
+                            row[i] = default_value
+                    u_cursor.updateRow(row)
+                    row_count += 1
+            stage.add_rows(row_count)
 
         # Cleanup
         del data_dict
@@ -530,15 +1178,104 @@ def zonal_stats_func(zs_dict, polygon_path, point_path, hru_param,
     arcpy.ClearEnvironment('cellSize')
 
 
-def field_duplicate_check(table_path, field_name, n=None):
+class DuplicateCheck(object):
+    """Streaming check for duplicate values
+
+    Non-negative integers (i.e. FIDs) are flagged in a bitset with one bit
+        per value, so checking n sequential values needs n / 8 bytes.
+    All other values are reduced to 64-bit keys (the value for integers,
+        the bit pattern for floats, and an MD5 hash for everything else)
+        that are kept in a sorted array.  A hash collision would be reported
+        as a duplicate, but the chance is negligible (~n^2 / 2^64).
+    """
+    bitset_max = 2 ** 31
+
+    def __init__(self, max_value=0):
+        """"""
+        self.bitset = np.zeros(
+            min(int(max_value), self.bitset_max) // 8 + 1, dtype=np.uint8)
+        self.keys = np.array([], dtype=np.int64)
+
+    def update(self, values):
+        """Add a block of values
+
+        Args:
+            values (list): field values
+
+        Returns:
+            bool: True if any of the values are duplicates
+        """
+        values = np.asarray(values)
+        if not values.size:
+            return False
+        elif values.dtype.kind in 'biu':
+            values = values.astype(np.int64)
+            bit_mask = (values >= 0) & (values < self.bitset_max)
+            return (
+                self._update_bitset(values[bit_mask]) or
+                self._update_keys(values[~bit_mask]))
+        elif values.dtype.kind == 'f':
+            # Adding 0 converts -0.0 to 0.0
+            return self._update_keys(
+                (values.astype(np.float64) + 0.0).view(np.int64))
+        else:
+            return self._update_keys(np.fromstring(
+                b''.join(
+                    hashlib.md5(repr(v)).digest()[:8]
+                    for v in values.tolist()),
+                dtype=np.int64))
+
+    def _update_bitset(self, values):
+        """"""
+        if not values.size:
+            return False
+        values = np.sort(values)
+        if np.any(values[1:] == values[:-1]):
+            return True
+        byte_i = values >> 3
+        bits = np.left_shift(1, values & 7).astype(np.uint8)
+        if byte_i[-1] >= self.bitset.size:
+            self.bitset = np.concatenate([
+                self.bitset,
+                np.zeros(
+                    max(byte_i[-1] + 1, 2 * self.bitset.size) -
+                    self.bitset.size, dtype=np.uint8)])
+        if np.any(self.bitset[byte_i] & bits):
+            return True
+        # Values are unique so the bits in each byte can be summed
+        start_i = np.flatnonzero(np.concatenate(
+            [[True], byte_i[1:] != byte_i[:-1]]))
+        self.bitset[byte_i[start_i]] |= np.add.reduceat(bits, start_i)
+        return False
+
+    def _update_keys(self, keys):
+        """"""
+        if not keys.size:
+            return False
+        keys = np.sort(keys)
+        if np.any(keys[1:] == keys[:-1]):
+            return True
+        insert_i = np.searchsorted(self.keys, keys)
+        if self.keys.size and np.any(
+                self.keys[np.minimum(insert_i, self.keys.size - 1)] == keys):
+            return True
+        self.keys = np.insert(self.keys, insert_i, keys)
+        return False
+
+
+def field_duplicate_check(table_path, field_name, n=None, block_size=500000):
     """Check if there are duplicate values in a shapefile field
 
     For now assume table_path is actually a shapefile that can be read
         with arcpy.da.SearchCursor()
+    Values are read in blocks so memory use is bounded by the block size
+        and the DuplicateCheck bitset/key array, not the full value list.
 
     Args:
         table_path (str): File path of the table to search
         field_name (str): Field/column name to search
+        n (int): number of rows in the table
+        block_size (int): number of values checked at once
 
     Returns:
         bool: True if there are duplicate values in the field, False otherwise
@@ -549,148 +1286,26 @@ def field_duplicate_check(table_path, field_name, n=None):
 
     if n is None:
         n = int(arcpy.GetCount_management(table_path).getOutput(0))
-    n32_max = 3000000
     logging.debug('\n  Testing for duplicate values')
     logging.debug('    field:    {}'.format(field_name))
     logging.debug('    features: {}'.format(n))
-    logging.debug('    n32_max:  {}'.format(n32_max))
-    logging.debug('    2**32:    {}'.format(2 ** 32))
-    logging.debug('    maxsize:  {}'.format(sys.maxsize))
-
-    if sys.maxsize > 2**32 or n < n32_max:
-        logging.debug('    Reading values')
-        # If 64-bit or row count is low, read all values into memory
-        fid_list = [r[0] for r in arcpy.da.SearchCursor(table_path, [field_name])]
-        if len(fid_list) != len(set(fid_list)):
-            return True
-        else:
-            logging.debug('    No duplicates')
-            return False
-    elif field_obj.type in ['Integer', 'SmallInteger']:
-        # This approach will only work with integers
-        block_size = 500000
-        fid_ranges = []
-        for i, x in enumerate(xrange(0, n, block_size)):
-            logging.debug('    FIDS: {}-{}'.format(x, x + block_size))
-            subset_str = '"{0}" >= {1} AND "{0}" < {2}'.format(
-                arcpy.Describe(table_path).OIDFieldName, x, x + block_size)
-
-            # Don't sort here since it gets sorted in group_ranges()
-            fid_list = [r[0] for r in arcpy.da.SearchCursor(
-                table_path, [field_name], subset_str)]
-
-            # Return True if there are duplicates in a subset
-            if len(fid_list) != len(set(fid_list)):
-                return True
-
-            # Group consecutive values into ranges
-            fid_new_ranges = list(group_ranges(fid_list))
-
-            # Check if any of the new ranges overlap each other
-            # Skip for now since subset duplicates were checked above
-            # if ranges_overlap(fid_new_ranges):
-            #    return True
-
-            # Check if any of the new ranges overlap the existing ranges
-            if ranges_overlap(fid_ranges + fid_new_ranges):
-                return True
-
-            # Merge subset ranges into main range list
-            fid_ranges = list(merge_ranges(fid_ranges + fid_new_ranges))
-            del fid_new_ranges
-
-        logging.debug('    FID ranges: {}'.format(fid_ranges))
-        logging.debug('    No duplicates')
-        return False
-    else:
-        # For now, assume there are not duplicates if the values can't
-        #   all be read in
-        logging.debug(
-            '    Assuming no duplicates since field type is not integer, \n' +
-            '      table contains more than {} rows, and 32-bit Python is \n' +
-            '      limited to 2 GB of memory.')
-        return False
-    # DEADBEEF - I'm not sure this will actually work on a really large table
-    # else:
-    #    duplicate_flag = False
-    #    fid_prev = None
-    #    cursor = arcpy.SearchCursor(
-    #        table_path, fields=field_name, sort_fields=field_name+' A')
-    #    for row in cursor:
-    #        fid = row.getValue(field_name)
-    #        if fid == fid_prev and fid_prev is not None:
-    #            duplicate_flag = True
-    #            break
-    #        else:
-    #            fid_prev = fid
-    #    del cursor, row
-    #    logging.debug('    No duplicates')
-    #    return duplicate_flag
-
-
-def group_ranges(input_list):
-    """Group
-
-    Copied from:
-    http://stackoverflow.com/questions/2154249/identify-groups-of-continuous-numbers-in-a-list
-
-    Args:
-        input_list (list): list of numbers to group into ranges
-
-    Yields
-         tuple: pairs (min, max)
-    """
-    for k, g in itertools.groupby(enumerate(sorted(input_list)), lambda (i, x): i-x):
-        group = map(itemgetter(1), g)
-        yield group[0], group[-1]
-
-
-def merge_ranges(ranges):
-    """Merge overlapping and adjacent integer ranges
-
-    Yield the merged ranges in order
-    The argument must be an iterable of pairs (start, stop).
-
-    Copied from:
-    http://codereview.stackexchange.com/questions/21307/consolidate-list-of-ranges-that-overlap
-
-    >>> list(merge_ranges([(5,7), (3,5), (-1,3)]))
-    [(-1, 7)]
-    >>> list(merge_ranges([(5,6), (3,4), (1,2)]))
-    [(1, 2), (3, 4), (5, 6)]
-    >>> list(merge_ranges([]))
-    []
-
-    Args:
-        ranges (list): Iterable of pairs (min, max)
-
-    Yields:
-        tuple: pairs (min, max)
-    """
-    ranges = iter(sorted(ranges))
-    current_start, current_stop = next(ranges)
-    for start, stop in ranges:
-        if start > (current_stop + 1):
-            # Gap between segments: output current segment and start a new one.
-            yield current_start, current_stop
-            current_start, current_stop = start, stop
-        else:
-            # Segments adjacent or overlapping: merge.
-            current_stop = max(current_stop, stop)
-    yield current_start, current_stop
-
 
-def ranges_overlap(ranges):
-    """Test if ranges overlap
-
-    Args:
-        ranges (list): Iterable of pairs (min, max)
-    Returns:
-         bool: True if ranges overlap each other, False otherwise
-    """
-    for r1, r2 in itertools.combinations(ranges, 2):
-        if r1[1] > r2[0] and r1[0] < r2[1]:
-            return True
+    # Size the bitset for sequential integer IDs
+    if field_obj.type in ['OID', 'Integer', 'SmallInteger']:
+        duplicate_check = DuplicateCheck(n)
+    else:
+        duplicate_check = DuplicateCheck()
+    value_list = []
+    with arcpy.da.SearchCursor(table_path, [field_name]) as s_cursor:
+        for row in s_cursor:
+            value_list.append(row[0])
+            if len(value_list) >= block_size:
+                if duplicate_check.update(value_list):
+                    return True
+                value_list = []
+    if duplicate_check.update(value_list):
+        return True
+    logging.debug('    No duplicates')
     return False
 
 
@@ -880,9 +1495,33 @@ def get_prism_data_name():
     return data_name
 
 
+# Projected HRU extents keyed by the inputs to project_hru_extent_func
+_project_extent_cache = dict()
+
+# Number of segments each edge of the HRU extent is split into when projecting
+# This doesn't need to scale with the number of cells since the projection
+#   distortion along an edge is smooth
+extent_edge_steps = 64
+
+
 def project_hru_extent_func(hru_extent, hru_cs, hru_sr,
                             target_extent, target_cs, target_sr):
-    """"""
+    """Project the HRU extent to the target spatial reference and snap
+
+    Results are cached so the same extent is only projected once for each
+        spatial reference, snap point, and cellsize.
+
+    Args:
+        hru_extent (arcpy.Extent): fishnet extent
+        hru_cs (float): fishnet cellsize
+        hru_sr (arcpy.SpatialReference): fishnet spatial reference
+        target_extent (arcpy.Extent): target raster extent (for the snap point)
+        target_cs (float): target raster cellsize
+        target_sr (arcpy.SpatialReference): target raster spatial reference
+
+    Returns:
+        arcpy.Extent
+    """
     logging.debug('  Projecting extent')
     logging.debug('  HRU Extent:   {}'.format(extent_string(hru_extent)))
     logging.debug('  HRU cellsize: {}'.format(hru_cs))
@@ -891,6 +1530,18 @@ def project_hru_extent_func(hru_extent, hru_cs, hru_sr,
     logging.debug('  Target cellsize: {}'.format(target_cs))
     logging.debug('  Target spatref:  {}'.format(target_sr.name))
 
+    cache_key = (
+        extent_string(hru_extent), float(hru_cs), hru_sr.exportToString(),
+        target_sr.exportToString(),
+        (target_extent.XMin, target_extent.YMin), float(target_cs))
+    try:
+        projected_extent = arcpy.Extent(*_project_extent_cache[cache_key])
+        logging.debug('  Using cached extent:\n  {}'.format(
+            extent_string(projected_extent)))
+        return projected_extent
+    except KeyError:
+        pass
+
     # DEADBEEF - Arc10.2 ProjectRaster does not honor extent
     # Project the HRU extent to the raster spatial reference
     hru_corners = [
@@ -901,18 +1552,28 @@ def project_hru_extent_func(hru_extent, hru_cs, hru_sr,
         [hru_extent.XMin, hru_extent.YMax]]
 
     # Add points between corners
+    # Use one point per HRU cell, up to extent_edge_steps points per edge
     hru_points = []
     for point_a, point_b in zip(hru_corners[:-1], hru_corners[1:]):
         steps = float(max(
             abs(point_b[0] - point_a[0]),
             abs(point_b[1] - point_a[1]))) / hru_cs
+        steps = max(1, min(int(math.ceil(steps)), extent_edge_steps))
         for x, y in zip(np.linspace(point_a[0], point_b[0], steps + 1),
                         np.linspace(point_a[1], point_b[1], steps + 1)):
             hru_points.append(arcpy.Point(x,y))
 
     # Project all points to output spatial reference and get projected extent
+    # Use the NumPy transforms if both spatial references are supported
     transform = transform_func(hru_sr, target_sr)
-    if transform:
+    projected_xy = project_points_func(
+        np.array([p.X for p in hru_points]),
+        np.array([p.Y for p in hru_points]), hru_sr, target_sr)
+    if projected_xy is not None:
+        projected_extent = arcpy.Extent(
+            float(projected_xy[0].min()), float(projected_xy[1].min()),
+            float(projected_xy[0].max()), float(projected_xy[1].max()))
+    elif transform:
         projected_extent = arcpy.Polygon(
             arcpy.Array(hru_points), hru_sr).projectAs(
                 target_sr, transform).extent
@@ -935,6 +1596,9 @@ def project_hru_extent_func(hru_extent, hru_cs, hru_sr,
     #     projected_extent, 4 * max(target_cs, hru_cs))
     logging.debug('  Buffered Extent::\n  {}'.format(
         extent_string(projected_extent)))
+    _project_extent_cache[cache_key] = (
+        projected_extent.XMin, projected_extent.YMin,
+        projected_extent.XMax, projected_extent.YMax)
     return projected_extent
 
 
@@ -961,17 +1625,33 @@ def project_raster_func(input_raster, output_raster, output_sr,
         hru_param.extent, hru_param.cs, output_sr,
         input_extent, input_cs, input_sr)
 
+    project_clipped_raster_func(
+        input_raster, output_raster, output_sr, proj_method, output_cs,
+        transform_str, reg_point, input_sr, proj_extent)
+
+
+def project_clipped_raster_func(input_raster, output_raster, output_sr,
+                                proj_method, output_cs, transform_str,
+                                reg_point, input_sr, clip_extent,
+                                clip_path=os.path.join('in_memory', 'clip_raster')):
+    """Clip a raster to an extent (in the input spatial reference) and project
+
+    This is the second half of project_raster_func() for when the clip
+        extent has already been computed (i.e. with project_hru_extent_func)
+    """
     # clip_path = output_raster.replace('.img', '_clip.img')
-    clip_path = os.path.join('in_memory', 'clip_raster')
-    env.extent = proj_extent
-    arcpy.Clip_management(
-        input_raster, ' '.join(str(proj_extent).split()[:4]), clip_path)
-    arcpy.ClearEnvironment('extent')
+    with report.stage('clip'):
+        env.extent = clip_extent
+        arcpy.Clip_management(
+            input_raster, ' '.join(str(clip_extent).split()[:4]), clip_path)
+        arcpy.ClearEnvironment('extent')
 
     # Then project the clipped raster
-    arcpy.ProjectRaster_management(
-        clip_path, output_raster, output_sr, proj_method.upper(), output_cs,
-        transform_str, reg_point, input_sr)
+    with report.stage('project') as stage:
+        arcpy.ProjectRaster_management(
+            clip_path, output_raster, output_sr, proj_method.upper(),
+            output_cs, transform_str, reg_point, input_sr)
+        stage.add_file(output_raster)
 
     # Cleanup
     arcpy.Delete_management(clip_path)
@@ -985,10 +1665,11 @@ def cell_area_func(hru_param_path, area_field):
 
 def zone_by_area_func(zone_path, zone_field, zone_value, hru_param_path,
                       hru_param, hru_area_field='HRU_AREA',
-                      zone_area_field=None, area_pct=50):
+                      zone_area_field=None, area_pct=50, zone_overlap=None):
     """Flag cells that are inside a feature based on an area weighting
 
     Set values that are in zone, but don't reset values that are out of zone
+    If a cell is in more than one zone, the last zone (by OID) is used.
 
     Args:
         zone_path (str):
@@ -996,87 +1677,98 @@ def zone_by_area_func(zone_path, zone_field, zone_value, hru_param_path,
         zone_value (int):
         hru_param_path (str):
         hru_param: class:`HRUParameters`
-        hru_area_field (str):
-        zone_area_field (str):
-        area_pct ():
+        hru_area_field (str): not used, the cell area is the cellsize squared
+        zone_area_field (str): field for the zone area (acres) in each cell
+        area_pct (): minimum percent of the cell area in the zone
+        zone_overlap (tuple): zone_overlap_func() results for zone_path
+            (computed if not set)
 
     Returns:
         None
     """
-    zone_value_field = 'ZONE_VALUE'
-    int_area_field = 'INT_AREA'
-    int_pct_field = 'INT_PCT'
-
-    # Need to set zone value into a field before intersect
+    if zone_overlap is None:
+        zone_overlap = zone_overlap_func(zone_path, hru_param)
+    cell_array, zone_oid_array, area_array = zone_overlap
+
+    # Vectorized area percent threshold
+    area_mask = (100 * area_array / hru_param.cs ** 2) >= area_pct
+    cell_array = cell_array[area_mask]
+    zone_oid_array = zone_oid_array[area_mask]
+    area_array = area_array[area_mask]
+    if not len(cell_array):
+        return
+
+    # Get the zone values
     # If zone_value is FID, add 1 so that only non-lake cells are 0
-    arcpy.AddField_management(zone_path, zone_value_field, 'LONG')
-    arcpy.AddField_management(zone_path, int_area_field, 'DOUBLE')
-    arcpy.AddField_management(zone_path, int_pct_field, 'DOUBLE')
     if zone_value == arcpy.Describe(zone_path).OIDFieldName:
-        arcpy.CalculateField_management(
-            zone_path, zone_value_field,
-            '!{}! + 1'.format(zone_value), 'PYTHON')
-
-    # If zone value is an INT, save it into a field first
+        value_array = zone_oid_array + 1
     elif type(zone_value) is int:
-        # zone_value = int(zone_value)
-        arcpy.CalculateField_management(
-            zone_path, zone_value_field, zone_value, 'PYTHON')
-    # Use zone_value field directly
+        value_array = np.full(len(zone_oid_array), zone_value)
     else:
-        # zone_value_field = zone_value
-        arcpy.CalculateField_management(
-            zone_path, zone_value_field,
-            '!{}!'.format(zone_value), 'PYTHON')
-
-    # Calculate area of HRU cell if necessary
-    # if not arcpy.ListFields(zone_path, area_field):
-    #    arcpy.AddField_management(zone_path, area_field, 'DOUBLE')
-    #    cell_area_func(zone_path, area_field)
-
-    # Intersect the zone layer with the fishnet
-    # zone_int_path = os.path.join('in_memory', 'hru_lakes')
-    zone_int_path = zone_path.replace('.shp', '_intersect.shp')
-    arcpy.Intersect_analysis(
-        (hru_param_path, zone_path), zone_int_path)
-
-    # Calculate using cell_area_func to force units to match
-    cell_area_func(zone_int_path, int_area_field)
-
-    n = int(arcpy.GetCount_management(zone_int_path).getOutput(0))
-    block_size = 200000
-    for i, x in enumerate(range(0, n, block_size)):
-        logging.debug('    FIDS: {}-{}'.format(x, x + block_size))
-        subset_str = '"{0}" >= {1} AND "{0}" < {2}'.format(
-            hru_param.fid_field, x, x + block_size)
-            # arcpy.Describe(zone_int_path).OIDFieldName, x, x + block_size)
-
-        # Read in FID of selected cells
-        hru_cell_dict = dict()
-        fields = [
-            hru_param.fid_field, hru_area_field,
-            int_area_field, zone_value_field]
-        with arcpy.da.SearchCursor(zone_int_path, fields, subset_str) as s_cursor:
-            for row in s_cursor:
-                if (100 * float(row[2]) / float(row[1])) >= area_pct:
-                    hru_cell_dict[int(row[0])] = [float(row[3]), float(row[2])]
-
-        # Set value of selected HRU cells
-        fields = [hru_param.fid_field, zone_field]
-        if zone_area_field:
-            fields.append(zone_area_field)
-        with arcpy.da.UpdateCursor(hru_param_path, fields, subset_str) as u_cursor:
-            for row in u_cursor:
-                # Remove items to speed up subsequent searches
-                try:
-                    if len(fields) == 3:
-                        row[1], row[2] = hru_cell_dict.pop(int(row[0]))
-                    elif len(fields) == 2:
-                        row[1] = hru_cell_dict.pop(int(row[0]))
-                    u_cursor.updateRow(row)
-                except KeyError:
-                    pass
-        del hru_cell_dict
+        zone_value_dict = dict(
+            [row for row in arcpy.da.SearchCursor(
+                zone_path, ['OID@', zone_value])])
+        value_array = np.array([zone_value_dict[oid] for oid in zone_oid_array])
+
+    # Keep the last zone for each cell
+    cell_last_i = len(cell_array) - 1 - np.unique(
+        cell_array[::-1], return_index=True)[1]
+    hru_rows, hru_cols = hru_grid_shape(hru_param)
+    cell_mask = np.zeros(hru_rows * hru_cols, dtype=np.bool)
+    cell_mask[cell_array[cell_last_i]] = True
+    cell_value = np.zeros(hru_rows * hru_cols, dtype=value_array.dtype)
+    cell_value[cell_array[cell_last_i]] = value_array[cell_last_i]
+    # Convert the zone area to acres
+    cell_area = np.zeros(hru_rows * hru_cols, dtype=np.float64)
+    cell_area[cell_array[cell_last_i]] = (
+        area_array[cell_last_i] * hru_param.sr.metersPerUnit ** 2 /
+        fishnet.sq_meters_per_acre)
+
+    # Set value of selected HRU cells
+    hru_values = read_table_columns(
+        hru_param_path, [hru_param.row_field, hru_param.col_field])
+    record_cell = (
+        (hru_values[hru_param.row_field].astype(np.int64) - 1) * hru_cols +
+        hru_values[hru_param.col_field].astype(np.int64) - 1)
+    record_i = np.flatnonzero(cell_mask[record_cell])
+    zone_values = OrderedDict([
+        (zone_field, cell_value[record_cell[record_i]])])
+    if zone_area_field:
+        zone_values[zone_area_field] = cell_area[record_cell[record_i]]
+    write_table_columns(hru_param_path, zone_values, record_i)
+
+
+def zone_overlap_func(zone_path, hru_param):
+    """Compute the area of each zone polygon in each HRU cell
+
+    Each polygon is only clipped against the cells in its bounding box.
+    The results can be shared by zone_by_area_func calls for the same zones.
+
+    Args:
+        zone_path (str): zone polygon feature class path
+        hru_param: class:`HRUParameters`
+
+    Returns:
+        tuple of the cell index ((ROW - 1) * columns + (COL - 1)),
+            zone OID, and overlap area (in HRU units squared) arrays
+    """
+    logging.debug('\nzone_overlap_func')
+    logging.debug('  {}'.format(zone_path))
+    hru_rows, hru_cols = hru_grid_shape(hru_param)
+    oid_list, rings_list = [], []
+    with arcpy.da.SearchCursor(
+            zone_path, ['OID@', 'SHAPE@'], '', hru_param.sr) as s_cursor:
+        for oid, geom in s_cursor:
+            if geom is None:
+                continue
+            oid_list.append(oid)
+            rings_list.append(polygon_rings(geom))
+    cell_array, zone_i_array, area_array = polygon.zone_cell_overlap(
+        rings_list, hru_param.extent.XMin, hru_param.extent.YMax,
+        hru_param.cs, hru_rows, hru_cols)
+    return (
+        cell_array, np.array(oid_list, dtype=np.int64)[zone_i_array],
+        area_array)
 
 
 def zone_by_centroid_func(zone_path, zone_field, zone_value,
@@ -1098,70 +1790,101 @@ def zone_by_centroid_func(zone_path, zone_field, zone_value,
     """
     logging.debug('\nzone_by_centroid_func')
     logging.debug('  {}'.format(zone_path))
-    # Need to set zone value into a field before intersect
-    # If zone_value is FID, add 1 so that only zone cells are 0
-    zone_value_field = 'ZONE_VALUE'
-    arcpy.AddField_management(zone_path, zone_value_field, 'LONG')
-    if zone_value == arcpy.Describe(zone_path).OIDFieldName:
-        arcpy.CalculateField_management(
-            zone_path, zone_value_field,
-            '!{}! + 1'.format(zone_value), 'PYTHON')
-    # Save zone value into a field first
+
+    # Read the zone polygons in the HRU spatial reference
+    zone_list = read_zone_polygons(zone_path, zone_value, hru_param.sr)
+
+    # Assign the zone values to all HRU centroids at once
+    point_array = arcpy.da.FeatureClassToNumPyArray(
+        hru_point_path, [hru_param.fid_field, 'SHAPE@X', 'SHAPE@Y'])
+    zone_array, zone_mask = polygon.zone_by_point(
+        point_array['SHAPE@X'], point_array['SHAPE@Y'], zone_list)
+    logging.debug('  Cells in zone: {}'.format(int(zone_mask.sum())))
+    if not np.any(zone_mask):
+        return
+
+    # Look up zone values by FID
+    hru_fid_array = point_array[hru_param.fid_field].astype(np.int64)
+    fid_zone_array = np.zeros(hru_fid_array.max() + 1, dtype=np.float64)
+    fid_zone_mask = np.zeros(hru_fid_array.max() + 1, dtype=np.bool)
+    fid_zone_array[hru_fid_array[zone_mask]] = zone_array[zone_mask]
+    fid_zone_mask[hru_fid_array[zone_mask]] = True
+    del point_array, zone_array, zone_mask
+
+    # Set value of selected HRU cells
+    fid_array = read_table_columns(
+        hru_param_path, [hru_param.fid_field])[hru_param.fid_field]
+    fid_array = fid_array.astype(np.int64)
+    record_i = np.flatnonzero(fid_array < len(fid_zone_mask))
+    record_i = record_i[fid_zone_mask[fid_array[record_i]]]
+    write_table_columns(
+        hru_param_path, {zone_field: fid_zone_array[fid_array[record_i]]},
+        record_i)
+
+
+def read_zone_polygons(zone_path, zone_value, output_sr):
+    """Read zone polygon rings and values
+
+    If zone_value is the OID field, 1 is added so that only cells outside
+        the zones are 0.
+
+    Args:
+        zone_path (str): zone polygon feature class path
+        zone_value: zone value (int) or zone value field name
+        output_sr (arcpy.SpatialReference): spatial reference of the rings
+
+    Returns:
+        list of (rings, zone value) in OID order
+    """
+    oid_field = arcpy.Describe(zone_path).OIDFieldName
+    if zone_value == oid_field:
+        fields = ['OID@', 'SHAPE@']
+        value_func = lambda row: row[0] + 1
     elif type(zone_value) is int:
-        arcpy.CalculateField_management(
-            zone_path, zone_value_field, zone_value, 'PYTHON')
-        # DEADBEEF
-        # Use zone_value field directly
-        # zone_value = int(zone_value)
+        fields = ['OID@', 'SHAPE@']
+        value_func = lambda row: zone_value
     else:
-        arcpy.CalculateField_management(
-            zone_path, zone_value_field,
-            '!{}!'.format(zone_value), 'PYTHON')
-        # DEADBEEF
-        # Use zone_value field directly
-        # zone_value_field = zone_value
-
-    # Intersect the zone layer with the fishnet
-    # zone_int_path = os.path.join('in_memory', 'hru_ppt_zones')
-    zone_int_path = zone_path.replace('.shp', '_intersect.shp')
-    arcpy.Intersect_analysis(
-        (hru_point_path, zone_path), zone_int_path)
-
-    # DEADBEEF - Why do I make a layer and select all features?
-    zone_int_layer = 'zone_int_layer'
-    arcpy.MakeFeatureLayer_management(zone_int_path, zone_int_layer)
-    arcpy.SelectLayerByAttribute_management(zone_int_layer, 'CLEAR_SELECTION')
-    arcpy.SelectLayerByAttribute_management(zone_int_layer, 'SWITCH_SELECTION')
-
-    n = int(arcpy.GetCount_management(zone_int_layer).getOutput(0))
-    block_size = 200000
-    for i, x in enumerate(range(0, n, block_size)):
-        logging.debug('    FIDS: {}-{}'.format(x, x + block_size))
-        subset_str = '"{0}" >= {1} AND "{0}" < {2}'.format(
-            hru_param.fid_field, x, x + block_size)
-            # arcpy.Describe(zone_int_layer).OIDFieldName, x, x + block_size)
-
-        # Read in FID of selected cells
-        hru_point_dict = dict()
-        fields = (hru_param.fid_field, zone_value_field)
-        with arcpy.da.SearchCursor(zone_int_layer, fields, subset_str) as s_cursor:
-            for row in s_cursor:
-                hru_point_dict[int(row[0])] = row[1]
-
-        # Set value of selected HRU cells
-        fields = (hru_param.fid_field, zone_field)
-        with arcpy.da.UpdateCursor(hru_param_path, fields, subset_str) as u_cursor:
-            for row in u_cursor:
-                # Remove items to speed up subsequent searches
-                try:
-                    row[1] = hru_point_dict.pop(int(row[0]))
-                    u_cursor.updateRow(row)
-                except KeyError:
-                    pass
-        del hru_point_dict
+        fields = ['OID@', 'SHAPE@', zone_value]
+        value_func = lambda row: row[2]
+    zone_list = []
+    with arcpy.da.SearchCursor(
+            zone_path, fields, '', output_sr, sql_clause=(
+                None, 'ORDER BY {}'.format(oid_field))) as s_cursor:
+        for row in s_cursor:
+            if row[1] is None:
+                continue
+            zone_list.append((polygon_rings(row[1]), value_func(row)))
+    return zone_list
 
-    # Cleanup
-    arcpy.Delete_management(zone_int_layer)
+
+def polygon_rings(polygon_geom):
+    """Return the rings of a polygon as arrays of vertices
+
+    Interior rings are separated from the exterior ring by None in each
+        geometry part.
+    """
+    rings = []
+    for part in polygon_geom:
+        ring = []
+        for pnt in part:
+            if pnt is None:
+                if ring:
+                    rings.append(np.array(ring, dtype=np.float64))
+                ring = []
+            else:
+                ring.append((pnt.X, pnt.Y))
+        if ring:
+            rings.append(np.array(ring, dtype=np.float64))
+    return rings
+
+
+def polyline_parts(polyline_geom):
+    """Return the parts of a polyline as arrays of vertices"""
+    return [
+        np.array(
+            [(pnt.X, pnt.Y) for pnt in part if pnt is not None],
+            dtype=np.float64)
+        for part in polyline_geom]
 
 
 def jensen_haise_func(hru_param_path, jh_coef_field, dem_feet_field,
@@ -1367,6 +2090,132 @@ def raster_obj_to_array(input_obj, mask_extent=None, return_nodata=False):
         return output_array
 
 
+def raster_window_to_array(input_raster, x_min, y_max, cs, rows, cols):
+    """Read a window of a raster as a float array
+
+    Cells outside the raster are returned as nodata.
+    The raster must have the same cellsize and snap point as the window.
+
+    Args:
+        input_raster: raster path or raster object
+        x_min (float): window left edge
+        y_max (float): window top edge
+        cs (float): window cellsize
+        rows (int): window rows
+        cols (int): window columns
+
+    Returns:
+        np.array of float64 values with nodata set to NaN
+    """
+    try:
+        input_obj = arcpy.sa.Raster(input_raster)
+    except:
+        input_obj = input_raster
+    input_nodata = input_obj.noDataValue
+    output_array = arcpy.RasterToNumPyArray(
+        input_obj, arcpy.Point(x_min, y_max - rows * cs), cols, rows,
+        input_nodata).astype(np.float64)
+    if input_nodata is not None:
+        output_array[output_array == input_nodata] = np.nan
+    return output_array
+
+
+def raster_window_resample(input_raster, input_cs, x_min, y_max, cs,
+                           rows, cols):
+    """Read a window of a raster at a different cellsize
+
+    Values are sampled at the window cell centers (nearest neighbor),
+        the same as ArcGIS map algebra with rasters of different cellsizes.
+    The raster must be snapped to the window upper left corner.
+
+    Args:
+        input_raster: raster path or raster object
+        input_cs (float): raster cellsize
+        x_min (float): window left edge
+        y_max (float): window top edge
+        cs (float): window cellsize
+        rows (int): window rows
+        cols (int): window columns
+
+    Returns:
+        np.array of float64 values with nodata set to NaN
+    """
+    if input_cs == cs:
+        return raster_window_to_array(
+            input_raster, x_min, y_max, cs, rows, cols)
+    input_rows = np.floor(
+        (np.arange(rows) + 0.5) * cs / input_cs).astype(np.int64)
+    input_cols = np.floor(
+        (np.arange(cols) + 0.5) * cs / input_cs).astype(np.int64)
+    input_array = raster_window_to_array(
+        input_raster, x_min, y_max, input_cs,
+        int(input_rows[-1]) + 1, int(input_cols[-1]) + 1)
+    return input_array[input_rows[:, np.newaxis], input_cols[np.newaxis, :]]
+
+
+def raster_value_counts(input_raster, x_min, y_max, cs, rows, cols,
+                        block_size=2 ** 22, cache_path=None, cache_key=None):
+    """Count the unique values in a window of a raster
+
+    The window is read in blocks of rows so the full window is never in
+    memory.  If a cache path is set, the counts are saved as JSON and reused
+    on later runs as long as the cache key has not changed.
+
+    Args:
+        input_raster: raster path or raster object
+        x_min (float): window left edge
+        y_max (float): window top edge
+        cs (float): window cellsize
+        rows (int): window rows
+        cols (int): window columns
+        block_size (int): maximum number of cells to read at once
+        cache_path (str): JSON file path for caching the counts
+        cache_key: JSON serializable value identifying the raster and window
+
+    Returns:
+        tuple of the sorted unique values and the number of cells with
+            each value (nodata cells are not counted)
+    """
+    if cache_path and os.path.isfile(cache_path):
+        try:
+            with open(cache_path, 'r') as cache_f:
+                cache_dict = json.load(cache_f)
+            if cache_dict['key'] == cache_key:
+                logging.debug('  Using cached values: {}'.format(cache_path))
+                return (np.array(cache_dict['values']),
+                        np.array(cache_dict['counts'], dtype=np.int64))
+        except (ValueError, KeyError):
+            pass
+
+    count_dict = defaultdict(int)
+    block_rows = max(1, block_size // cols)
+    for row_start in xrange(0, rows, block_rows):
+        block_array = raster_window_to_array(
+            input_raster, x_min, y_max - row_start * cs, cs,
+            min(block_rows, rows - row_start), cols)
+        values, counts = np.unique(
+            block_array[~np.isnan(block_array)], return_counts=True)
+        for value, count in zip(values.tolist(), counts.tolist()):
+            count_dict[value] += count
+        del block_array
+    values = sorted(count_dict.keys())
+    counts = [count_dict[v] for v in values]
+
+    if cache_path:
+        with open(cache_path, 'w') as cache_f:
+            json.dump(
+                {'key': cache_key, 'values': values, 'counts': counts},
+                cache_f)
+    return np.array(values), np.array(counts, dtype=np.int64)
+
+
+def hru_grid_shape(hru_param):
+    """Return the number of fishnet rows and columns"""
+    return (
+        int(round(hru_param.extent.height / hru_param.cs)),
+        int(round(hru_param.extent.width / hru_param.cs)))
+
+
 def array_to_raster(input_array, output_path, pnt, cs, mask_array=None):
     """"""
     output_array = np.copy(input_array)
@@ -0,0 +1,262 @@
+#--------------------------------
+# Name:         terrain_functions.py
+# Purpose:      NumPy depression fill and D8 flow functions
+# Notes:        ArcGIS 10.2 Version
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+import math
+
+import numpy as np
+
+
+# D8 flow direction codes and (row, col) offsets (the same as ArcGIS)
+d8_codes = np.array([1, 2, 4, 8, 16, 32, 64, 128], dtype=np.uint8)
+d8_offsets = [
+    (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1)]
+
+# Number of elevation levels the depression fill frontier is processed in
+fill_levels = 16
+
+
+def _padded(input_array):
+    """Flatten an array with a one cell NaN border
+
+    Every data cell then has 8 neighbors and the neighbor of flat index i
+        in direction k is i + offsets[k].
+
+    Returns:
+        tuple of the flat padded float64 array and the neighbor offsets
+    """
+    rows, cols = input_array.shape
+    padded = np.full((rows + 2, cols + 2), np.nan)
+    padded[1:-1, 1:-1] = input_array
+    offsets = np.array(
+        [dr * (cols + 2) + dc for dr, dc in d8_offsets], dtype=np.int64)
+    return padded.ravel(), offsets
+
+
+def _unpadded(padded, rows, cols):
+    """"""
+    return padded.reshape(rows + 2, cols + 2)[1:-1, 1:-1].copy()
+
+
+def _unique(cell_i, scratch):
+    """Remove duplicate cell indices without sorting
+
+    The position of each index is written to a scratch array (the size of
+        the padded array) and only the indices that read back their own
+        position are kept.
+    """
+    position = np.arange(len(cell_i))
+    scratch[cell_i] = position
+    return cell_i[scratch[cell_i] == position]
+
+
+def _neighbors(cell_i, offsets, scratch):
+    """Return the unique 8 neighbors of a set of padded cells"""
+    return _unique((cell_i[:, np.newaxis] + offsets).ravel(), scratch)
+
+
+def fill_depressions(dem_array):
+    """Fill the depressions of a DEM to flat surfaces (the same as Fill)
+
+    This is the Planchon-Darboux fill computed over a frontier instead of
+        full raster sweeps.  The water surface starts at the elevation of the
+        cells on the raster edge or next to nodata (which are never filled)
+        and at infinity everywhere else.  The surface of the neighbors of
+        every cell that was lowered is then lowered to the greater of their
+        elevation and their lowest neighboring surface until nothing changes.
+        The frontier cells are processed in elevation levels (lowest first),
+        otherwise most cells are first reached from a higher edge and have
+        to be lowered again later.
+
+    Args:
+        dem_array (np.array): elevations (NaN for nodata)
+
+    Returns:
+        np.array of float64 filled elevations
+    """
+    rows, cols = dem_array.shape
+    dem, offsets = _padded(dem_array)
+    data_mask = ~np.isnan(dem)
+    data_i = np.flatnonzero(data_mask)
+    edge_mask = np.zeros(dem.shape, dtype=np.bool)
+    for offset in offsets:
+        edge_mask[data_i] |= ~data_mask[data_i + offset]
+    if not len(data_i):
+        return np.array(dem_array, dtype=np.float64)
+    levels = np.unique(np.percentile(
+        dem[data_i], np.linspace(0, 100, fill_levels + 1)[1:]))
+    levels[-1] = np.inf
+    del data_i
+
+    # Nodata cells are never the lowest neighbor
+    fill = np.where(edge_mask, dem, np.inf)
+    update_mask = data_mask & ~edge_mask
+    scratch = np.empty(dem.shape, dtype=np.int64)
+    pending_i = np.flatnonzero(edge_mask)
+    for level in levels:
+        while True:
+            level_mask = fill[pending_i] <= level
+            active_i = pending_i[level_mask]
+            if not len(active_i):
+                break
+            pending_i = pending_i[~level_mask]
+            cell_i = _neighbors(active_i, offsets, scratch)
+            cell_i = cell_i[update_mask[cell_i]]
+            spill = fill[cell_i + offsets[0]]
+            for offset in offsets[1:]:
+                np.minimum(spill, fill[cell_i + offset], out=spill)
+            spill = np.maximum(dem[cell_i], spill)
+            lower_mask = spill < fill[cell_i]
+            fill[cell_i[lower_mask]] = spill[lower_mask]
+            pending_i = _unique(
+                np.concatenate([pending_i, cell_i[lower_mask]]), scratch)
+    fill[~data_mask] = np.nan
+    return _unpadded(fill, rows, cols)
+
+
+def flow_direction(dem_array, force_edge_flag=True):
+    """Compute D8 flow directions (the same codes as FlowDirection)
+
+    Each cell flows to the neighbor with the steepest drop (diagonal drops
+        are divided by the square root of 2).  Cells without a lower neighbor
+        flow into an adjacent nodata cell if they have one.  Cells in flat
+        areas flow towards the flat outlet, one cell at a time out from the
+        cells that already have a direction.  Cells that still don't have a
+        direction (sinks) are set to 0.
+
+    Args:
+        dem_array (np.array): filled elevations (NaN for nodata)
+        force_edge_flag (bool): if True, cells on the raster edge always flow
+            outward (the same as the FlowDirection force_flow option)
+
+    Returns:
+        np.array of float64 flow direction codes (NaN for nodata)
+    """
+    rows, cols = dem_array.shape
+    dem, offsets = _padded(dem_array)
+    data_mask = ~np.isnan(dem)
+    data_i = np.flatnonzero(data_mask)
+    cell_dem = dem[data_i]
+
+    # Steepest drop (ties go to the first direction)
+    max_drop = np.full(len(data_i), -np.inf)
+    flow_code = np.zeros(len(data_i), dtype=np.uint8)
+    nodata_code = np.zeros(len(data_i), dtype=np.uint8)
+    for code, (dr, dc), offset in zip(d8_codes, d8_offsets, offsets):
+        neighbor_dem = dem[data_i + offset]
+        neighbor_nodata = np.isnan(neighbor_dem)
+        nodata_code[(nodata_code == 0) & neighbor_nodata] = code
+        drop = cell_dem - neighbor_dem
+        if dr and dc:
+            drop /= math.sqrt(2)
+        drop[neighbor_nodata] = -np.inf
+        drop_mask = drop > max_drop
+        max_drop[drop_mask] = drop[drop_mask]
+        flow_code[drop_mask] = code
+    flow_code[max_drop <= 0] = 0
+    outlet_mask = (max_drop <= 0) & (nodata_code > 0)
+    flow_code[outlet_mask] = nodata_code[outlet_mask]
+
+    if force_edge_flag:
+        row_i = data_i // (cols + 2) - 1
+        col_i = data_i % (cols + 2) - 1
+        for edge_mask, code in [
+                (row_i == 0, 64), (row_i == rows - 1, 4),
+                (col_i == 0, 16), (col_i == cols - 1, 1),
+                ((row_i == 0) & (col_i == 0), 32),
+                ((row_i == 0) & (col_i == cols - 1), 128),
+                ((row_i == rows - 1) & (col_i == 0), 8),
+                ((row_i == rows - 1) & (col_i == cols - 1), 2)]:
+            flow_code[edge_mask] = code
+
+    flow_dir = np.zeros(dem.shape, dtype=np.uint8)
+    flow_dir[data_i] = flow_code
+    flat_mask = np.zeros(dem.shape, dtype=np.bool)
+    flat_mask[data_i[(flow_code == 0) & (max_drop == 0)]] = True
+    del data_i, cell_dem, max_drop, flow_code, nodata_code
+
+    # Resolve flats out from the cells that already drain
+    scratch = np.empty(dem.shape, dtype=np.int64)
+    cell_i = np.flatnonzero(flat_mask)
+    while len(cell_i):
+        new_code = np.zeros(len(cell_i), dtype=np.uint8)
+        for code, offset in zip(d8_codes, offsets):
+            neighbor_i = cell_i + offset
+            drain_mask = (
+                (new_code == 0) & ~flat_mask[neighbor_i] &
+                (dem[neighbor_i] == dem[cell_i]))
+            new_code[drain_mask] = code
+        drain_i = cell_i[new_code > 0]
+        if not len(drain_i):
+            break
+        flow_dir[drain_i] = new_code[new_code > 0]
+        flat_mask[drain_i] = False
+        cell_i = _neighbors(drain_i, offsets, scratch)
+        cell_i = cell_i[flat_mask[cell_i]]
+
+    output_array = _unpadded(flow_dir, rows, cols).astype(np.float64)
+    output_array[np.isnan(dem_array)] = np.nan
+    return output_array
+
+
+def flow_accumulation(flow_dir_array, weight_array=None):
+    """Accumulate the flow of each cell (the same as FlowAccumulation)
+
+    The value of each cell is the number (or weight) of all the cells that
+        flow into it, not including itself.  Cells are processed one
+        "generation" at a time, starting from the cells that nothing flows
+        into, and each cell is passed downstream once all of the cells that
+        flow into it have been added.
+
+    Args:
+        flow_dir_array (np.array): D8 flow direction codes (NaN for nodata)
+        weight_array (np.array): cell weights (NaN is 0), default is 1
+
+    Returns:
+        np.array of float64 accumulated flow (NaN for nodata)
+    """
+    rows, cols = flow_dir_array.shape
+    data_mask = ~np.isnan(flow_dir_array).ravel()
+    flow_code = np.where(
+        data_mask, flow_dir_array.ravel(), 0).astype(np.int64)
+    if weight_array is None:
+        weight = data_mask.astype(np.float64)
+    else:
+        weight = np.where(
+            data_mask, np.nan_to_num(np.ravel(weight_array)), 0)
+
+    # Downstream cell (-1 if the cell flows out of the raster or into nodata)
+    down_i = np.full(rows * cols, -1, dtype=np.int64)
+    for code, (dr, dc) in zip(d8_codes, d8_offsets):
+        cell_i = np.flatnonzero(flow_code == code)
+        row_i = cell_i // cols + dr
+        col_i = cell_i % cols + dc
+        valid_mask = (
+            (row_i >= 0) & (row_i < rows) & (col_i >= 0) & (col_i < cols))
+        cell_i = cell_i[valid_mask]
+        neighbor_i = row_i[valid_mask] * cols + col_i[valid_mask]
+        valid_mask = data_mask[neighbor_i]
+        down_i[cell_i[valid_mask]] = neighbor_i[valid_mask]
+
+    upstream_count = np.bincount(down_i[down_i >= 0], minlength=rows * cols)
+    acc = np.zeros(rows * cols, dtype=np.float64)
+    cell_i = np.flatnonzero(data_mask & (upstream_count == 0))
+    while len(cell_i):
+        cell_down_i = down_i[cell_i]
+        down_mask = cell_down_i >= 0
+        cell_i, cell_down_i = cell_i[down_mask], cell_down_i[down_mask]
+        if not len(cell_i):
+            break
+        unique_i, inverse_i, count = np.unique(
+            cell_down_i, return_inverse=True, return_counts=True)
+        acc[unique_i] += np.bincount(
+            inverse_i, weights=acc[cell_i] + weight[cell_i])
+        upstream_count[unique_i] -= count
+        cell_i = unique_i[upstream_count[unique_i] == 0]
+    acc[~data_mask] = np.nan
+    return acc.reshape(rows, cols)
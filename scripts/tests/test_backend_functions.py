@@ -0,0 +1,124 @@
+#--------------------------------
+# Name:         test_backend_functions.py
+# Purpose:      NumPy geoprocessing backend tests
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import backend_functions as backend
+import terrain_functions as terrain
+
+
+class NumpyBackendTest(unittest.TestCase):
+    """"""
+
+    def setUp(self):
+        """"""
+        self.temp_ws = tempfile.mkdtemp()
+        self.gp = backend.get_backend('numpy')
+
+    def tearDown(self):
+        """"""
+        shutil.rmtree(self.temp_ws)
+
+    def raster_path(self, name):
+        """"""
+        return os.path.join(self.temp_ws, name + self.gp.raster_ext)
+
+    def test_raster_round_trip(self):
+        """"""
+        grid = backend.Grid(1000.0, 2000.0, 10.0, 3, 4)
+        input_array = np.arange(12, dtype=np.float64).reshape(3, 4)
+        input_array[1, 2] = np.nan
+        raster_path = self.raster_path('test')
+        self.gp.write_raster(input_array, raster_path, grid)
+        self.assertEqual(self.gp.raster_grid(raster_path), grid)
+        np.testing.assert_array_equal(
+            self.gp.read_raster(raster_path, grid), input_array)
+        # Window snapped to the raster cells
+        window_grid = backend.snap_window(grid, (1011, 1981, 1029, 1999))
+        self.assertEqual(
+            window_grid, backend.Grid(1010.0, 2000.0, 10.0, 2, 2))
+        np.testing.assert_array_equal(
+            self.gp.read_window(raster_path, window_grid),
+            input_array[0:2, 1:3])
+
+    def test_terrain(self):
+        """The backend steps match the terrain functions"""
+        grid = backend.Grid(0.0, 200.0, 10.0, 20, 30)
+        dem_array = np.random.RandomState(0).uniform(0, 100, (20, 30))
+        dem_path = self.raster_path('dem')
+        self.gp.write_raster(dem_array, dem_path, grid)
+        dem_array = self.gp.read_raster(dem_path, grid)
+        fill_path = self.raster_path('fill')
+        flow_dir_path = self.raster_path('flow_dir')
+        flow_acc_path = self.raster_path('flow_acc')
+        self.gp.fill(dem_path, fill_path)
+        self.gp.flow_direction(fill_path, flow_dir_path)
+        self.gp.flow_accumulation(flow_dir_path, flow_acc_path)
+
+        fill_array = terrain.fill_depressions(dem_array)
+        np.testing.assert_array_equal(
+            self.gp.read_raster(fill_path, grid), fill_array)
+        flow_dir = terrain.flow_direction(fill_array.astype(np.float32))
+        np.testing.assert_array_equal(
+            self.gp.read_raster(flow_dir_path, grid), flow_dir)
+        np.testing.assert_array_equal(
+            self.gp.read_raster(flow_acc_path, grid),
+            terrain.flow_accumulation(flow_dir))
+
+    def test_zonal_stats(self):
+        """Each raster cell is assigned to the HRU containing its center"""
+        hru_grid = backend.Grid(0.0, 60.0, 20.0, 3, 4)
+        # Raster cells are a quarter of an HRU cell, with a partial last row
+        raster_grid = backend.Grid(0.0, 60.0, 5.0, 11, 16)
+        value_array = np.random.RandomState(0).uniform(
+            0, 100, (raster_grid.rows, raster_grid.cols))
+        value_array[0:4, 0:4] = np.nan
+        value_array[4, 4] = np.nan
+        raster_path = self.raster_path('value')
+        self.gp.write_raster(value_array, raster_path, raster_grid)
+        value_array = self.gp.read_raster(raster_path, raster_grid)
+
+        mean_array = np.full(hru_grid.rows * hru_grid.cols, np.nan)
+        max_array = np.full(hru_grid.rows * hru_grid.cols, np.nan)
+        for hru_row in xrange(hru_grid.rows):
+            for hru_col in xrange(hru_grid.cols):
+                values = value_array[
+                    hru_row * 4:(hru_row + 1) * 4,
+                    hru_col * 4:(hru_col + 1) * 4]
+                values = values[~np.isnan(values)]
+                if len(values):
+                    mean_array[hru_row * hru_grid.cols + hru_col] = np.mean(
+                        values)
+                    max_array[hru_row * hru_grid.cols + hru_col] = np.max(
+                        values)
+        # HRUs with only nodata cells
+        mean_array[np.isnan(mean_array)] = -999
+        max_array[np.isnan(max_array)] = -999
+
+        np.testing.assert_allclose(
+            self.gp.zonal_stats(raster_path, hru_grid, 'MEAN'), mean_array)
+        np.testing.assert_array_equal(
+            self.gp.zonal_stats(raster_path, hru_grid, 'MAXIMUM'),
+            max_array)
+
+    def test_get_backend(self):
+        """"""
+        self.assertEqual(backend.get_backend('NumPy').name, 'numpy')
+        self.assertRaises(ValueError, backend.get_backend, 'gdal')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+#--------------------------------
+# Name:         test_dbf_functions.py
+# Purpose:      dBASE table function tests
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import dbf_functions as dbf
+
+
+class DBFWriteTest(unittest.TestCase):
+    """"""
+
+    def setUp(self):
+        """Write a table with a SHORT, LONG, and DOUBLE field"""
+        self.temp_ws = tempfile.mkdtemp()
+        self.dbf_path = os.path.join(self.temp_ws, 'test.dbf')
+        dbf_fields = [
+            dbf.dbf_field('SHORT', 'SHORT'), dbf.dbf_field('LONG', 'LONG'),
+            dbf.dbf_field('DOUBLE', 'DOUBLE')]
+        with open(self.dbf_path, 'wb') as dbf_f:
+            dbf_f.write(dbf.dbf_header(dbf_fields, 3))
+            dbf_f.write(dbf.dbf_records(dbf_fields, {
+                'SHORT': np.array([1, 2, 3]), 'LONG': np.array([4, 5, 6]),
+                'DOUBLE': np.array([0.5, 1.5, 2.5])}, 3).tostring())
+            dbf_f.write(b'\x1A')
+
+    def tearDown(self):
+        """"""
+        shutil.rmtree(self.temp_ws)
+
+    def write(self, field_name, value_array):
+        """"""
+        with dbf.DBFTable(self.dbf_path, 'r+') as dbf_table:
+            dbf_table.write(field_name, value_array)
+
+    def read(self, field_name):
+        """"""
+        return dbf.read_dbf_columns(self.dbf_path, [field_name])[field_name]
+
+    def test_values_that_fit(self):
+        """"""
+        self.write('SHORT', np.array([-999, 9999, 0]))
+        self.write('LONG', np.array([-99999999, 999999999, 0]))
+        np.testing.assert_array_equal(self.read('SHORT'), [-999, 9999, 0])
+        np.testing.assert_array_equal(
+            self.read('LONG'), [-99999999, 999999999, 0])
+
+    def test_short_overflow(self):
+        """-9999 doesn't fit in N(4,0) and must not be written as -999"""
+        with self.assertRaises(ValueError):
+            self.write('SHORT', np.array([1, -9999, 3]))
+        np.testing.assert_array_equal(self.read('SHORT'), [1, 2, 3])
+
+    def test_long_overflow(self):
+        """1234567890 doesn't fit in N(9,0)"""
+        with self.assertRaises(ValueError):
+            self.write('LONG', np.array([1234567890, 5, 6]))
+        with self.assertRaises(ValueError):
+            self.write('LONG', np.array([1234567890.0, 5, 6]))
+        np.testing.assert_array_equal(self.read('LONG'), [4, 5, 6])
+
+    def test_nan_integer(self):
+        """NaN, infinite, and masked values are written as blanks"""
+        self.write('LONG', np.array([np.nan, np.inf, 6]))
+        self.write('SHORT', np.ma.masked_array([1, 2, 3], [0, 1, 0]))
+        np.testing.assert_array_equal(self.read('LONG'), [np.nan, np.nan, 6])
+        np.testing.assert_array_equal(self.read('SHORT'), [1, np.nan, 3])
+        with dbf.DBFTable(self.dbf_path) as dbf_table:
+            self.assertEqual(dbf_table.view('LONG')[0], b' ' * 9)
+
+    def test_nan_float(self):
+        """"""
+        self.write('DOUBLE', np.array([np.nan, -np.inf, 2.25]))
+        np.testing.assert_array_equal(
+            self.read('DOUBLE'), [np.nan, np.nan, 2.25])
+
+
+if __name__ == '__main__':
+    unittest.main()
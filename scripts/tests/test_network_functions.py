@@ -0,0 +1,145 @@
+#--------------------------------
+# Name:         test_network_functions.py
+# Purpose:      Stream segment and subbasin routing graph tests
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import network_functions as network
+
+
+class StreamNetworkTest(unittest.TestCase):
+    """3 row x 4 column HRU grid (HRUs in row order)
+
+    Segment 1 runs east along the first row into segment 2, which runs
+        south down the last column and out of the grid.  Lake -1 is below
+        the first cell of segment 1 and flows north into it.  Subbasin 1 is
+        the first two columns and subbasin 2 is the last two.
+    """
+
+    def setUp(self):
+        """"""
+        self.temp_ws = tempfile.mkdtemp()
+        self.col_array = np.tile(np.arange(1, 5), 3)
+        self.row_array = np.repeat(np.arange(1, 4), 4)
+        self.flow_dir_array = np.array([
+            1, 1, 1, 4,
+            64, 1, 1, 4,
+            1, 1, 1, 4])
+        self.seg_array = np.array([
+            1, 1, 1, 2,
+            -1, 0, 0, 2,
+            0, 0, 0, 2])
+        self.subbasin_array = np.array([
+            1, 1, 2, 2,
+            1, 1, 2, 2,
+            1, 1, 2, 2])
+
+    def tearDown(self):
+        """"""
+        shutil.rmtree(self.temp_ws)
+
+    def from_cells(self):
+        """"""
+        return network.StreamNetwork.from_cells(
+            self.col_array, self.row_array, self.flow_dir_array,
+            self.seg_array, self.subbasin_array, self.seg_array != 0)
+
+    def test_network(self):
+        """"""
+        stream_network = self.from_cells()
+        np.testing.assert_array_equal(
+            stream_network.cell_i, [0, 1, 2, 3, 4, 7, 11])
+        np.testing.assert_array_equal(
+            stream_network.down_i, [1, 2, 3, 5, 0, 6, -1])
+        np.testing.assert_array_equal(
+            stream_network.reach, [1, 2, 3, 1, 0, 2, 3])
+        np.testing.assert_array_equal(
+            stream_network.maxreach, [3, 3, 3, 3, 0, 3, 3])
+
+        seg_graph = stream_network.seg_graph
+        np.testing.assert_array_equal(seg_graph.ids, [-1, 1, 2])
+        np.testing.assert_array_equal(seg_graph.down_ids, [1, 2, 0])
+        np.testing.assert_array_equal(
+            seg_graph.topological_order(), [0, 1, 2])
+        np.testing.assert_array_equal(seg_graph.pour_ids(), [2, 2, 2])
+        np.testing.assert_array_equal(seg_graph.upstream_ids(2), [1])
+        np.testing.assert_array_equal(
+            stream_network.outseg(), [2, 2, 2, 0, 1, 0, 0])
+        np.testing.assert_array_equal(
+            stream_network.lake_upsegs(), [0, -1, 0])
+        np.testing.assert_array_equal(
+            stream_network.hru_values(stream_network.reach),
+            [1, 2, 3, 1, 0, 0, 0, 2, 0, 0, 0, 3])
+
+        # Subbasin 1 flows into subbasin 2 along the first row
+        subbasin_graph = stream_network.subbasin_graph
+        np.testing.assert_array_equal(subbasin_graph.ids, [1, 2])
+        np.testing.assert_array_equal(subbasin_graph.down_ids, [2, 0])
+
+    def test_two_out_cells(self):
+        """A stream segment that leaves the network twice is an error"""
+        # The second cell of segment 1 flows south out of the network
+        self.flow_dir_array[1] = 4
+        self.assertRaises(ValueError, self.from_cells)
+
+    def test_lake_exit(self):
+        """A lake whose out cells all leave the network flows to the exit"""
+        # Two lake cells that flow south out of the network
+        self.seg_array[4:6] = -1
+        self.flow_dir_array[4:6] = 4
+        stream_network = self.from_cells()
+        seg_graph = stream_network.seg_graph
+        np.testing.assert_array_equal(seg_graph.ids, [-1, 1, 2])
+        self.assertEqual(seg_graph.downstream_id(-1), network.exit_id)
+        np.testing.assert_array_equal(
+            stream_network.lake_upsegs(), [0, 0, 0])
+
+    def test_lake_ambiguous(self):
+        """A lake with an out cell in the network must only have one"""
+        self.seg_array[4:6] = -1
+        self.flow_dir_array[5] = 4
+        self.assertRaises(ValueError, self.from_cells)
+
+    def test_round_trip(self):
+        """"""
+        network_path = os.path.join(self.temp_ws, network.network_name)
+        self.from_cells().save(network_path)
+        stream_network = network.StreamNetwork.load(network_path)
+        for name in network.network_arrays:
+            np.testing.assert_array_equal(
+                getattr(stream_network, name),
+                getattr(self.from_cells(), name))
+        np.testing.assert_array_equal(
+            stream_network.seg_graph.down_ids, [1, 2, 0])
+
+        cell_mask = self.seg_array != 0
+        self.assertTrue(stream_network.is_current(
+            self.col_array, self.row_array, self.flow_dir_array,
+            self.seg_array, self.subbasin_array, cell_mask))
+        # A flow direction change in a network cell
+        self.flow_dir_array[0] = 2
+        self.assertFalse(stream_network.is_current(
+            self.col_array, self.row_array, self.flow_dir_array,
+            self.seg_array, self.subbasin_array, cell_mask))
+        self.flow_dir_array[0] = 1
+        # A new network cell
+        self.seg_array[5] = -1
+        self.assertFalse(stream_network.is_current(
+            self.col_array, self.row_array, self.flow_dir_array,
+            self.seg_array, self.subbasin_array, self.seg_array != 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,265 @@
+#--------------------------------
+# Name:         test_polygon_functions.py
+# Purpose:      NumPy polygon zone function tests
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+import math
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import polygon_functions as polygon
+
+
+def random_ring(seed, x_center, y_center, radius, count=12):
+    """Return a closed star shaped ring (clockwise)"""
+    random = np.random.RandomState(seed)
+    angle = np.sort(random.uniform(0, 2 * math.pi, count))[::-1]
+    r = radius * random.uniform(0.3, 1, count)
+    ring = np.column_stack([
+        x_center + r * np.cos(angle), y_center + r * np.sin(angle)])
+    return np.vstack([ring, ring[:1]])
+
+
+def points_in_rings_reference(x, y, rings):
+    """Point in polygon crossing test of one point at a time"""
+    inside = []
+    for px, py in zip(x, y):
+        inside_flag = False
+        for ring in rings:
+            for (x1, y1), (x2, y2) in zip(ring[:-1], ring[1:]):
+                if ((y1 > py) != (y2 > py) and
+                        px < x1 + (py - y1) * (x2 - x1) / (y2 - y1)):
+                    inside_flag = not inside_flag
+        inside.append(inside_flag)
+    return np.array(inside)
+
+
+def clip_ring(ring, x_min, y_min, x_max, y_max):
+    """Clip a ring to a rectangle (Sutherland-Hodgman)"""
+    points = [tuple(point) for point in ring[:-1]]
+    # Axis (0 for x, 1 for y), bound, and side (1 keeps values >= bound)
+    for axis, bound, side in [
+            (0, x_min, 1), (0, x_max, -1), (1, y_min, 1), (1, y_max, -1)]:
+        input_points, points = points, []
+        for i, q in enumerate(input_points):
+            p = input_points[i - 1]
+            p_inside = side * (p[axis] - bound) >= 0
+            q_inside = side * (q[axis] - bound) >= 0
+            if p_inside != q_inside:
+                t = (bound - p[axis]) / (q[axis] - p[axis])
+                points.append(tuple(
+                    p[j] + t * (q[j] - p[j]) if j != axis else bound
+                    for j in xrange(2)))
+            if q_inside:
+                points.append(q)
+    return points
+
+
+def signed_area(points):
+    """Shoelace area (positive for counterclockwise points)"""
+    return 0.5 * sum(
+        points[i - 1][0] * points[i][1] - points[i][0] * points[i - 1][1]
+        for i in xrange(len(points)))
+
+
+def polygon_cell_area_reference(rings, x_min, y_max, cs, rows, cols):
+    """Clip the polygon to every cell"""
+    area = np.zeros(rows * cols)
+    for row in xrange(rows):
+        for col in xrange(cols):
+            for ring in rings:
+                area[row * cols + col] += signed_area(clip_ring(
+                    ring, x_min + col * cs, y_max - (row + 1) * cs,
+                    x_min + (col + 1) * cs, y_max - row * cs))
+    return np.abs(area)
+
+
+def grid_pieces_reference(gx1, gy1, gx2, gy2):
+    """Split each segment at the grid lines one segment at a time"""
+    piece_list = []
+    for segment_i, (x1, y1, x2, y2) in enumerate(zip(gx1, gy1, gx2, gy2)):
+        t_list = [0.0, 1.0]
+        for g1, g2 in [(x1, x2), (y1, y2)]:
+            if g1 == g2:
+                continue
+            for line in xrange(
+                    int(math.floor(min(g1, g2))) + 1,
+                    int(math.ceil(max(g1, g2)))):
+                t_list.append((line - g1) / (g2 - g1))
+        t_list = sorted(set(t_list))
+        piece_list.extend(
+            (segment_i, ta, tb) for ta, tb in zip(t_list[:-1], t_list[1:]))
+    return piece_list
+
+
+class PointsInRingsTest(unittest.TestCase):
+    """"""
+
+    def test_hole(self):
+        """Points in a hole are outside"""
+        rings = [
+            np.array([[0, 0], [0, 4], [4, 4], [4, 0], [0, 0]], np.float64),
+            np.array([[1, 1], [3, 1], [3, 3], [1, 3], [1, 1]], np.float64)]
+        inside = polygon.points_in_rings(
+            [0.5, 2, 3.5, 5, 2], [0.5, 2, 2, 2, -1], rings)
+        np.testing.assert_array_equal(
+            inside, [True, False, True, False, False])
+
+    def test_reference(self):
+        """"""
+        rings = [random_ring(0, 0, 0, 10), random_ring(1, 25, 0, 10)]
+        random = np.random.RandomState(2)
+        x = random.uniform(-12, 37, 2000)
+        y = random.uniform(-12, 12, 2000)
+        np.testing.assert_array_equal(
+            polygon.points_in_rings(x, y, rings),
+            points_in_rings_reference(x, y, rings))
+
+
+class GridPiecesTest(unittest.TestCase):
+    """"""
+
+    def test_diagonal(self):
+        """A diagonal through cell corners is split at each corner"""
+        segment_i, ta, tb = polygon.grid_pieces(
+            np.array([0.0]), np.array([0.0]),
+            np.array([3.0]), np.array([3.0]))
+        piece_mask = tb > ta
+        np.testing.assert_array_equal(segment_i[piece_mask], [0, 0, 0])
+        np.testing.assert_allclose(ta[piece_mask], [0, 1. / 3, 2. / 3])
+        np.testing.assert_allclose(tb[piece_mask], [1. / 3, 2. / 3, 1])
+
+    def test_reference(self):
+        """"""
+        random = np.random.RandomState(0)
+        gx1, gy1, gx2, gy2 = random.uniform(-3, 8, (4, 50))
+        # Vertical, horizontal, and zero length segments
+        gx2[0], gy2[1], gx2[2], gy2[2] = gx1[0], gy1[1], gx1[2], gy1[2]
+        segment_i, ta, tb = polygon.grid_pieces(gx1, gy1, gx2, gy2)
+        piece_mask = tb > ta
+        reference = grid_pieces_reference(gx1, gy1, gx2, gy2)
+        np.testing.assert_array_equal(
+            segment_i[piece_mask], [piece[0] for piece in reference])
+        np.testing.assert_allclose(
+            ta[piece_mask], [piece[1] for piece in reference])
+        np.testing.assert_allclose(
+            tb[piece_mask], [piece[2] for piece in reference])
+
+        # Each piece is inside a single cell
+        t_mid = 0.5 * (ta + tb)[piece_mask]
+        segment_i = segment_i[piece_mask]
+        for g1, g2 in [(gx1, gx2), (gy1, gy2)]:
+            ga = g1[segment_i] + ta[piece_mask] * (g2 - g1)[segment_i]
+            gb = g1[segment_i] + tb[piece_mask] * (g2 - g1)[segment_i]
+            g_mid = np.floor(g1[segment_i] + t_mid * (g2 - g1)[segment_i])
+            self.assertTrue(np.all(np.minimum(ga, gb) >= g_mid - 1E-9))
+            self.assertTrue(np.all(np.maximum(ga, gb) <= g_mid + 1 + 1E-9))
+
+
+class PolygonCellAreaTest(unittest.TestCase):
+    """"""
+
+    def cell_area_array(self, rings, x_min, y_max, cs, rows, cols):
+        """Return the polygon_cell_area() areas for every cell"""
+        cell_i, cell_area = polygon.polygon_cell_area(
+            rings, x_min, y_max, cs, rows, cols)
+        area = np.zeros(rows * cols)
+        area[cell_i] = cell_area
+        return area
+
+    def test_triangle(self):
+        """"""
+        # Triangle with two sides along grid lines and one through corners
+        rings = [np.array(
+            [[0, 0], [0, 20], [20, 0], [0, 0]], dtype=np.float64)]
+        np.testing.assert_allclose(
+            self.cell_area_array(rings, 0, 20, 10, 2, 2),
+            [50, 0, 100, 50])
+        # Triangle that doesn't line up with the grid
+        rings = [np.array(
+            [[5, 5], [5, 25], [25, 5], [5, 5]], dtype=np.float64)]
+        np.testing.assert_allclose(
+            self.cell_area_array(rings, 0, 30, 10, 3, 3),
+            [12.5, 0, 0, 50, 50, 0, 25, 50, 12.5])
+
+    def test_outside_grid(self):
+        """Only the part of the polygon inside the grid is returned"""
+        rings = [np.array(
+            [[-5, -5], [-5, 5], [5, 5], [5, -5], [-5, -5]],
+            dtype=np.float64)]
+        np.testing.assert_allclose(
+            self.cell_area_array(rings, 0, 10, 10, 1, 1), [25])
+
+    def test_reference(self):
+        """"""
+        # Counterclockwise hole (the hole edges aren't on grid lines)
+        rings = [random_ring(0, 22, 18, 15), np.array(
+            [[19, 15], [23, 15], [23, 19], [19, 19], [19, 15]],
+            dtype=np.float64)]
+        np.testing.assert_allclose(
+            self.cell_area_array(rings, 0, 40, 4, 10, 12),
+            polygon_cell_area_reference(rings, 0, 40, 4, 10, 12),
+            atol=1E-9)
+
+
+class LineCellLengthTest(unittest.TestCase):
+    """3 x 3 grid of 10 unit cells with the upper left corner at (0, 30)"""
+
+    def line_cell_length(self, lines_list):
+        """"""
+        return polygon.line_cell_length(lines_list, 0, 30, 10, 3, 3)
+
+    def test_diagonal(self):
+        """A diagonal through the cell corners is split between 3 cells"""
+        line = np.array([[0, 0], [30, 30]], dtype=np.float64)
+        cell_length = np.zeros(9)
+        cell_length[[2, 4, 6]] = 10 * math.sqrt(2)
+        np.testing.assert_allclose(
+            self.line_cell_length([[line]]), cell_length)
+        np.testing.assert_allclose(
+            self.line_cell_length([[line[::-1]]]), cell_length)
+
+    def test_grid_line(self):
+        """Lines along a grid line are added to the cell right or below"""
+        cell_length = np.zeros(9)
+        cell_length[[3, 4, 5]] = 10
+        np.testing.assert_allclose(
+            self.line_cell_length(
+                [[np.array([[0, 20], [30, 20]], dtype=np.float64)]]),
+            cell_length)
+        np.testing.assert_allclose(
+            self.line_cell_length(
+                [[np.array([[30, 20], [0, 20]], dtype=np.float64)]]),
+            cell_length)
+
+        cell_length = np.zeros(9)
+        cell_length[[1, 4, 7]] = 10
+        np.testing.assert_allclose(
+            self.line_cell_length(
+                [[np.array([[10, 0], [10, 30]], dtype=np.float64)]]),
+            cell_length)
+        np.testing.assert_allclose(
+            self.line_cell_length(
+                [[np.array([[10, 30], [10, 0]], dtype=np.float64)]]),
+            cell_length)
+
+    def test_multipart(self):
+        """"""
+        parts = [
+            np.array([[5, 25], [5, 15], [15, 15]], dtype=np.float64),
+            np.array([[25, 5], [25, 15]], dtype=np.float64)]
+        np.testing.assert_allclose(
+            self.line_cell_length([parts]),
+            [5, 0, 0, 10, 5, 5, 0, 0, 5])
+
+
+if __name__ == '__main__':
+    unittest.main()
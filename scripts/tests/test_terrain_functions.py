@@ -0,0 +1,239 @@
+#--------------------------------
+# Name:         test_terrain_functions.py
+# Purpose:      NumPy depression fill and D8 flow function tests
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+import heapq
+import math
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(
+    0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import terrain_functions as terrain
+
+
+def neighbor_cells(row, col, rows, cols):
+    """Return the (code, row, col) of the neighbors inside the raster"""
+    for code, (dr, dc) in zip(terrain.d8_codes, terrain.d8_offsets):
+        if 0 <= row + dr < rows and 0 <= col + dc < cols:
+            yield int(code), row + dr, col + dc
+
+
+def fill_reference(dem_array):
+    """Priority flood fill from the edge and nodata cells"""
+    rows, cols = dem_array.shape
+    fill_array = np.array(dem_array, dtype=np.float64)
+    done = np.isnan(dem_array)
+    queue = []
+    for row in xrange(rows):
+        for col in xrange(cols):
+            if done[row, col]:
+                continue
+            edge_flag = (
+                row in [0, rows - 1] or col in [0, cols - 1] or
+                any(np.isnan(dem_array[r, c])
+                    for code, r, c in neighbor_cells(row, col, rows, cols)))
+            if edge_flag:
+                heapq.heappush(queue, (fill_array[row, col], row, col))
+                done[row, col] = True
+    while queue:
+        elev, row, col = heapq.heappop(queue)
+        for code, r, c in neighbor_cells(row, col, rows, cols):
+            if not done[r, c]:
+                fill_array[r, c] = max(fill_array[r, c], elev)
+                heapq.heappush(queue, (fill_array[r, c], r, c))
+                done[r, c] = True
+    return fill_array
+
+
+def flow_direction_reference(dem_array):
+    """Steepest drop D8 flow direction of a DEM without flats or nodata
+
+    Edge cells flow outward (force_edge_flag=True).
+    """
+    rows, cols = dem_array.shape
+    flow_dir = np.zeros((rows, cols))
+    for row in xrange(rows):
+        for col in xrange(cols):
+            max_drop, max_code = 0, 0
+            for code, r, c in neighbor_cells(row, col, rows, cols):
+                drop = dem_array[row, col] - dem_array[r, c]
+                if r != row and c != col:
+                    drop /= math.sqrt(2)
+                if drop > max_drop:
+                    max_drop, max_code = drop, code
+            flow_dir[row, col] = max_code
+    flow_dir[0, :] = 64
+    flow_dir[-1, :] = 4
+    flow_dir[:, 0] = 16
+    flow_dir[:, -1] = 1
+    flow_dir[0, 0], flow_dir[0, -1] = 32, 128
+    flow_dir[-1, 0], flow_dir[-1, -1] = 8, 2
+    return flow_dir
+
+
+def flow_accumulation_reference(flow_dir_array):
+    """Count the cells upstream of each cell by following every flow path"""
+    rows, cols = flow_dir_array.shape
+    offsets = dict(zip(terrain.d8_codes, terrain.d8_offsets))
+    acc = np.zeros((rows, cols))
+    for row in xrange(rows):
+        for col in xrange(cols):
+            r, c = row, col
+            for i in xrange(rows * cols):
+                dr, dc = offsets[int(flow_dir_array[r, c])]
+                r, c = r + dr, c + dc
+                if not (0 <= r < rows and 0 <= c < cols):
+                    break
+                acc[r, c] += 1
+    return acc
+
+
+class FillTest(unittest.TestCase):
+    """"""
+
+    def test_pit(self):
+        """A single cell pit is filled to its lowest neighbor"""
+        dem_array = np.array([
+            [10, 10, 7, 10, 10],
+            [10, 9, 9, 9, 10],
+            [10, 9, 2, 9, 10],
+            [10, 9, 9, 9, 10],
+            [10, 10, 10, 10, 10]], dtype=np.float64)
+        fill_array = dem_array.copy()
+        fill_array[2, 2] = 9
+        np.testing.assert_array_equal(
+            terrain.fill_depressions(dem_array), fill_array)
+
+    def test_depression(self):
+        """A depression is filled to the outlet on its rim"""
+        dem_array = np.array([
+            [10, 10, 10, 10, 10],
+            [10, 3, 4, 2, 10],
+            [10, 5, 1, 3, 6],
+            [10, 10, 10, 10, 10]], dtype=np.float64)
+        fill_array = np.array([
+            [10, 10, 10, 10, 10],
+            [10, 6, 6, 6, 10],
+            [10, 6, 6, 6, 6],
+            [10, 10, 10, 10, 10]], dtype=np.float64)
+        np.testing.assert_array_equal(
+            terrain.fill_depressions(dem_array), fill_array)
+
+    def test_nodata(self):
+        """Cells next to nodata are outlets and nodata stays nodata"""
+        dem_array = np.array([
+            [10, 10, 10, 10],
+            [10, 2, 1, np.nan],
+            [10, 10, 10, 10]])
+        fill_array = terrain.fill_depressions(dem_array)
+        np.testing.assert_array_equal(fill_array, dem_array)
+
+    def test_reference(self):
+        """"""
+        dem_array = np.random.RandomState(0).uniform(0, 100, (20, 30))
+        dem_array[5:8, 10:12] = np.nan
+        np.testing.assert_array_equal(
+            terrain.fill_depressions(dem_array), fill_reference(dem_array))
+
+
+class FlowDirectionTest(unittest.TestCase):
+    """"""
+
+    def test_ramp(self):
+        """Interior cells of a ramp flow down the ramp"""
+        row_i, col_i = np.mgrid[0:5, 0:6].astype(np.float64)
+        flow_dir = terrain.flow_direction(100 - col_i)
+        np.testing.assert_array_equal(flow_dir[1:-1, 1:-1], 1)
+        np.testing.assert_array_equal(
+            terrain.flow_direction(100 - col_i, False), 1)
+        flow_dir = terrain.flow_direction(100 - row_i - col_i)
+        np.testing.assert_array_equal(flow_dir[1:-1, 1:-1], 2)
+
+    def test_edges(self):
+        """Edge cells flow outward when forced"""
+        row_i, col_i = np.mgrid[0:4, 0:5].astype(np.float64)
+        flow_dir = terrain.flow_direction(100 - col_i)
+        np.testing.assert_array_equal(flow_dir[0, 1:-1], 64)
+        np.testing.assert_array_equal(flow_dir[-1, 1:-1], 4)
+        np.testing.assert_array_equal(flow_dir[1:-1, 0], 16)
+        np.testing.assert_array_equal(flow_dir[1:-1, -1], 1)
+        self.assertEqual(
+            [flow_dir[0, 0], flow_dir[0, -1],
+             flow_dir[-1, 0], flow_dir[-1, -1]],
+            [32, 128, 8, 2])
+
+    def test_flat(self):
+        """Flat cells flow towards the cell that drains the flat"""
+        dem_array = np.array([
+            [10, 10, 10, 10, 10],
+            [10, 5, 5, 5, 4],
+            [10, 10, 10, 10, 10]], dtype=np.float64)
+        flow_dir = terrain.flow_direction(dem_array)
+        np.testing.assert_array_equal(flow_dir[1, 1:4], 1)
+
+    def test_nodata(self):
+        """"""
+        dem_array = np.array([
+            [10, 10, 10],
+            [10, 5, np.nan],
+            [10, 10, 10]])
+        flow_dir = terrain.flow_direction(dem_array)
+        self.assertEqual(flow_dir[1, 1], 1)
+        self.assertTrue(np.isnan(flow_dir[1, 2]))
+
+    def test_reference(self):
+        """"""
+        dem_array = np.random.RandomState(1).uniform(0, 100, (20, 30))
+        np.testing.assert_array_equal(
+            terrain.flow_direction(dem_array),
+            flow_direction_reference(dem_array))
+
+
+class FlowAccumulationTest(unittest.TestCase):
+    """"""
+
+    def test_known_grid(self):
+        """Cells flow east into the last column, which flows south"""
+        flow_dir = np.array([
+            [1, 1, 4],
+            [1, 1, 4],
+            [1, 1, 4]], dtype=np.float64)
+        np.testing.assert_array_equal(
+            terrain.flow_accumulation(flow_dir),
+            [[0, 1, 2], [0, 1, 5], [0, 1, 8]])
+
+    def test_weight(self):
+        """"""
+        flow_dir = np.array([[1, 1, 1]], dtype=np.float64)
+        np.testing.assert_array_equal(
+            terrain.flow_accumulation(
+                flow_dir, np.array([[2, np.nan, 3]])),
+            [[0, 2, 2]])
+
+    def test_nodata(self):
+        """Nodata cells stop the flow"""
+        flow_dir = np.array([[1, 1, np.nan, 1, 1]])
+        acc = terrain.flow_accumulation(flow_dir)
+        np.testing.assert_array_equal(acc[0, [0, 1, 3, 4]], [0, 1, 0, 1])
+        self.assertTrue(np.isnan(acc[0, 2]))
+
+    def test_reference(self):
+        """"""
+        dem_array = terrain.fill_depressions(
+            np.random.RandomState(2).uniform(0, 100, (20, 30)))
+        flow_dir = terrain.flow_direction(dem_array)
+        np.testing.assert_array_equal(
+            terrain.flow_accumulation(flow_dir),
+            flow_accumulation_reference(flow_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,276 @@
+#--------------------------------
+# Name:         trace_functions.py
+# Purpose:      Opt-in tracing of arcpy tool and cursor calls
+# Notes:        ArcGIS 10.2 Version
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+from collections import defaultdict
+import functools
+import inspect
+import logging
+import os
+import time
+
+import report_functions as report
+
+
+# arcpy namespaces that are traced
+trace_modules = [
+    '', 'da', 'sa', 'management', 'analysis', 'conversion', 'cartography']
+
+# Cursor functions, the rows and the time spent iterating and updating
+#   are added to the call
+cursor_names = ['SearchCursor', 'UpdateCursor', 'InsertCursor']
+
+# Maximum length of each argument in the call summaries
+max_arg_length = 60
+
+# Traced calls (since the last report)
+_call_list = []
+_installed_flag = False
+
+
+class CallRecord(object):
+    """One traced arcpy call"""
+    __slots__ = ['name', 'key', 'args', 'caller', 'time', 'rows']
+
+    def __init__(self, name, args, kwargs, caller):
+        """"""
+        self.name = name
+        # Identical calls have the same name and the same full arguments
+        self.key = '{}({})'.format(name, ', '.join(
+            [_arg_str(a) for a in args] +
+            ['{}={}'.format(k, _arg_str(v)) for k, v in sorted(kwargs.items())]))
+        self.args = ', '.join(
+            [_short_str(_arg_str(a)) for a in args] +
+            ['{}={}'.format(k, _short_str(_arg_str(v)))
+             for k, v in sorted(kwargs.items())])
+        self.caller = caller
+        self.time = 0.0
+        self.rows = None
+
+
+class _TracedCursor(object):
+    """Cursor proxy that adds the iteration and update time to the call"""
+
+    def __init__(self, cursor, record):
+        """"""
+        self._cursor = cursor
+        self._record = record
+        self._record.rows = 0
+        self._iter = None
+
+    def __getattr__(self, name):
+        """"""
+        attr = getattr(self._cursor, name)
+        if name not in ['updateRow', 'insertRow', 'deleteRow']:
+            return attr
+
+        def timed_row_func(*args, **kwargs):
+            start = time.time()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                self._record.time += time.time() - start
+        return timed_row_func
+
+    def __enter__(self):
+        """"""
+        if hasattr(self._cursor, '__enter__'):
+            self._cursor.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """"""
+        if hasattr(self._cursor, '__exit__'):
+            return self._cursor.__exit__(exc_type, exc_value, traceback)
+
+    def __iter__(self):
+        """"""
+        return self
+
+    def next(self):
+        """"""
+        if self._iter is None:
+            self._iter = iter(self._cursor)
+        start = time.time()
+        try:
+            row = next(self._iter)
+        finally:
+            self._record.time += time.time() - start
+        self._record.rows += 1
+        return row
+    __next__ = next
+
+
+def _arg_str(value):
+    """"""
+    if isinstance(value, basestring):
+        return repr(value)
+    elif isinstance(value, (list, tuple)):
+        return '[{}]'.format(', '.join(_arg_str(v) for v in value))
+    try:
+        # Rasters and extents print as their path and coordinates
+        return str(value)
+    except Exception:
+        return repr(value)
+
+
+def _short_str(value_str):
+    """"""
+    if len(value_str) <= max_arg_length:
+        return value_str
+    return value_str[:max_arg_length - 3] + '...'
+
+
+def _caller():
+    """Return the file, line, and function of the first non-trace frame"""
+    frame = inspect.currentframe()
+    try:
+        while (frame is not None and
+               frame.f_globals.get('__name__') == __name__):
+            frame = frame.f_back
+        if frame is None:
+            return ''
+        return '{}:{} {}'.format(
+            os.path.basename(frame.f_code.co_filename), frame.f_lineno,
+            frame.f_code.co_name)
+    finally:
+        del frame
+
+
+def _trace_func(name, func):
+    """Wrap an arcpy function so every call is recorded"""
+    cursor_flag = name.split('.')[-1] in cursor_names
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        record = CallRecord(name, args, kwargs, _caller())
+        _call_list.append(record)
+        start = time.time()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            record.time += time.time() - start
+        if cursor_flag:
+            return _TracedCursor(result, record)
+        return result
+    wrapper._traced_flag = True
+    return wrapper
+
+
+def install(arcpy_module):
+    """Trace all of the arcpy tool, function, and cursor calls
+
+    The functions are replaced in the arcpy namespaces, so calls made
+        through "arcpy.<name>" anywhere in the scripts are traced.
+    Classes (i.e. arcpy.sa.Raster and arcpy.Extent) are not traced.
+
+    Args:
+        arcpy_module (module): arcpy
+
+    Returns:
+        int: number of traced functions
+    """
+    global _installed_flag
+    if _installed_flag:
+        return 0
+    func_count = 0
+    for module_name in trace_modules:
+        module = arcpy_module
+        if module_name:
+            module = getattr(arcpy_module, module_name, None)
+            if module is None:
+                continue
+        for attr_name in dir(module):
+            if attr_name.startswith('_'):
+                continue
+            attr = getattr(module, attr_name)
+            if getattr(attr, '_traced_flag', False):
+                continue
+            if not (inspect.isfunction(attr) or inspect.isbuiltin(attr) or
+                    (attr_name in cursor_names and callable(attr))):
+                continue
+            setattr(module, attr_name, _trace_func(
+                '.'.join(filter(None, ['arcpy', module_name, attr_name])),
+                attr))
+            func_count += 1
+    _installed_flag = True
+    report.finish_hooks.append(_report_hook)
+    logging.debug('  Tracing {} arcpy functions'.format(func_count))
+    return func_count
+
+
+def summary(call_list=None, top_n=20):
+    """Summarize the traced calls
+
+    Args:
+        call_list (list): CallRecord (default is all the traced calls)
+        top_n (int): number of hot and duplicated calls to return
+
+    Returns:
+        dict with the call count, total time, the top_n calls (grouped by
+            name and caller) with the most time, and the top_n identical
+            calls that were made more than once
+    """
+    if call_list is None:
+        call_list = _call_list
+    hot_dict = defaultdict(lambda: {'calls': 0, 'time': 0.0, 'rows': None})
+    dup_dict = defaultdict(lambda: {'calls': 0, 'time': 0.0, 'callers': set()})
+    for record in call_list:
+        hot = hot_dict[(record.name, record.caller)]
+        hot['calls'] += 1
+        hot['time'] += record.time
+        if record.rows is not None:
+            hot['rows'] = (hot['rows'] or 0) + record.rows
+        dup = dup_dict[record.key]
+        dup['name'] = record.name
+        dup['args'] = record.args
+        dup['calls'] += 1
+        dup['time'] += record.time
+        dup['callers'].add(record.caller)
+
+    hot_list = [
+        dict(name=name, caller=caller, **hot_values)
+        for (name, caller), hot_values in hot_dict.items()]
+    hot_list.sort(key=lambda h: h['time'], reverse=True)
+    dup_list = [
+        dict(dup_values, callers=sorted(dup_values['callers']))
+        for dup_values in dup_dict.values() if dup_values['calls'] > 1]
+    dup_list.sort(key=lambda d: (d['calls'], d['time']), reverse=True)
+    return {
+        'calls': len(call_list),
+        'time': sum(record.time for record in call_list),
+        'hot_calls': hot_list[:top_n],
+        'duplicate_calls': dup_list[:top_n]}
+
+
+def log_summary(trace_summary):
+    """Log the hot and duplicated call tables"""
+    logging.info('\narcpy Trace: {} calls, {:.2f} s'.format(
+        trace_summary['calls'], trace_summary['time']))
+    log_f = '  {:>8s} {:>6s} {:>10s}  {:<40s} {}'
+    logging.info(log_f.format('Time (s)', 'Calls', 'Rows', 'Call', 'Caller'))
+    for hot in trace_summary['hot_calls']:
+        logging.info(log_f.format(
+            '{:.2f}'.format(hot['time']), str(hot['calls']),
+            str(hot['rows']) if hot['rows'] is not None else '-',
+            hot['name'], hot['caller']))
+    if not trace_summary['duplicate_calls']:
+        return
+    logging.info('\n  Identical calls made more than once')
+    for dup in trace_summary['duplicate_calls']:
+        logging.info('  {:>6d}x {:.2f} s  {}({})'.format(
+            dup['calls'], dup['time'], dup['name'], dup['args']))
+        logging.info('            {}'.format(', '.join(dup['callers'][:3])))
+
+
+def _report_hook(run_report):
+    """Add the traced calls since the last report to the run report"""
+    trace_summary = summary(list(_call_list))
+    del _call_list[:]
+    log_summary(trace_summary)
+    return {'arcpy_trace': trace_summary}
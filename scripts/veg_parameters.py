@@ -17,7 +17,12 @@ import sys
 import arcpy
 from arcpy import env
 
+import numpy as np
+
+import remap_functions as remap
+import report_functions as report
 import support_functions as support
+import zonal_functions as zonal
 
 
 def veg_parameters(config_path, overwrite_flag=False, debug_flag=False):
@@ -33,7 +38,7 @@ def veg_parameters(config_path, overwrite_flag=False, debug_flag=False):
     """
 
     # Initialize hru_parameters class
-    hru = support.HRUParameters(config_path)
+    hru = support.get_hru_parameters(config_path)
 
     # Open input parameter config file
     inputs_cfg = ConfigParser.ConfigParser()
@@ -52,6 +57,7 @@ def veg_parameters(config_path, overwrite_flag=False, debug_flag=False):
     log_console.setLevel(logging.DEBUG)
     log_console.setFormatter(logging.Formatter('%(message)s'))
     logging.getLogger('').addHandler(log_console)
+    report.start_report(log_file_name.replace('_log.txt', ''), hru.log_ws)
     logging.info('\nGSFLOW Vegetation Parameters')
 
     # Landfire Vegetation Type
@@ -182,6 +188,18 @@ def veg_parameters(config_path, overwrite_flag=False, debug_flag=False):
     if veg_cover_cs <= 0:
         logging.error('\nERROR: Veg. cover cellsize must be greater than 0')
         sys.exit()
+    # Veg. type and cover are read together so they must have the same cellsize
+    if veg_cover_cs != veg_type_cs:
+        logging.warning(
+            '\nWARNING: Veg. cover will be projected to the veg. type ' +
+            'cellsize ({})'.format(veg_type_cs))
+        veg_cover_cs = veg_type_cs
+
+    # Maximum number of veg. cells to process at once
+    veg_block_size = support.get_param('veg_block_size', 2 ** 22, inputs_cfg)
+    if veg_block_size <= 0:
+        logging.error('\nERROR: veg_block_size must be greater than 0')
+        sys.exit()
 
     # Build output folders if necesssary
     veg_temp_ws = os.path.join(hru.param_ws, 'veg_rasters')
@@ -190,14 +208,6 @@ def veg_parameters(config_path, overwrite_flag=False, debug_flag=False):
     # Output paths
     veg_cover_path = os.path.join(veg_temp_ws, 'veg_cover.img')
     veg_type_path = os.path.join(veg_temp_ws, 'veg_type.img')
-    cov_type_path = os.path.join(veg_temp_ws, 'cov_type.img')
-    covden_sum_path = os.path.join(veg_temp_ws, 'covden_sum.img')
-    covden_win_path = os.path.join(veg_temp_ws, 'covden_win.img')
-    snow_intcp_path = os.path.join(veg_temp_ws, 'snow_intcp.img')
-    wrain_intcp_path = os.path.join(veg_temp_ws, 'wrain_intcp.img')
-    srain_intcp_path = os.path.join(veg_temp_ws, 'srain_intcp.img')
-    root_depth_path = os.path.join(veg_temp_ws, 'root_depth.img')
-    rad_trncf_path = os.path.join(veg_temp_ws, 'rad_trncf.img')
 
     # Set ArcGIS environment variables
     arcpy.CheckOutExtension('Spatial')
@@ -219,17 +229,6 @@ def veg_parameters(config_path, overwrite_flag=False, debug_flag=False):
     support.add_field_func(hru.polygon_path, hru.root_depth_field, 'DOUBLE')
 
 
-    # Check that remaps have all necessary values
-    logging.info('\nChecking remap tables against all raster cells')
-    logging.info('  (i.e. even those outside the study area)')
-    check_remap_keys(cov_type_remap_path, veg_type_orig_path)
-    check_remap_keys(covden_sum_remap_path, veg_cover_orig_path)
-    #check_remap_keys(snow_intcp_remap_path, veg_type_orig_path)
-    #check_remap_keys(srain_intcp_remap_path, veg_type_orig_path)
-    #check_remap_keys(wrain_intcp_remap_path, veg_type_orig_path)
-    check_remap_keys(root_depth_remap_path, veg_type_orig_path)
-
-
     # Assume all vegetation rasters will need to be rebuilt
     # Check veg cover and veg type rasters
     # This will check for matching spat. ref., snap point, and cellsize
@@ -295,157 +294,191 @@ def veg_parameters(config_path, overwrite_flag=False, debug_flag=False):
     del transform_str, veg_type_orig_sr, veg_type_obj
 
 
-    # Reclassifying vegetation cover type
-    logging.info('\nCalculating COV_TYPE')
-    logging.debug('  Reclassifying: {}'.format(cov_type_remap_path))
-    cov_type_obj = arcpy.sa.ReclassByASCIIFile(
-        veg_type_path, cov_type_remap_path)
-    cov_type_obj.save(cov_type_path)
-    del cov_type_obj
-
-    # Summer cover density
-    logging.info('Calculating COVDEN_SUM')
-    logging.debug('  Reclassifying: {}'.format(covden_sum_remap_path))
-    covden_sum_obj = arcpy.sa.ReclassByASCIIFile(
-        veg_cover_path, covden_sum_remap_path)
-    covden_sum_obj *= 0.01
-    covden_sum_obj.save(covden_sum_path)
-    del covden_sum_obj
-
-    # Winter cover density
-    logging.info('Calculating COVDEN_WIN')
-    logging.debug('  Reclassifying: {}'.format(covden_win_remap_path))
-    covden_win_obj = arcpy.sa.ReclassByASCIIFile(
-        cov_type_path, covden_win_remap_path)
-    covden_win_obj *= 0.01
-    covden_win_obj *= arcpy.sa.Raster(covden_sum_path)
-    covden_win_obj.save(covden_win_path)
-    del covden_win_obj
-
-    # Snow interception storage capacity
-    logging.info('Calculating SNOW_INTCP')
-    logging.debug('  Reclassifying: {}'.format(snow_intcp_remap_path))
-    snow_intcp_obj = arcpy.sa.ReclassByASCIIFile(
-        cov_type_path, snow_intcp_remap_path)
-    snow_intcp_obj *= snow_intcp_remap_factor
-    snow_intcp_obj.save(snow_intcp_path)
-    del snow_intcp_obj
-
-    # Winter rain interception storage capacity
-    logging.info('Calculating WRAIN_INTCP')
-    logging.debug('  Reclassifying: {}'.format(wrain_intcp_remap_path))
-    wrain_intcp_obj = arcpy.sa.ReclassByASCIIFile(
-        cov_type_path, wrain_intcp_remap_path)
-    wrain_intcp_obj *= wrain_intcp_remap_factor
-    wrain_intcp_obj.save(wrain_intcp_path)
-    del wrain_intcp_obj
-
-    # Summer rain interception storage capacity
-    logging.info('Calculating SRAIN_INTCP')
-    logging.debug('  Reclassifying: {}'.format(srain_intcp_remap_path))
-    srain_intcp_obj = arcpy.sa.ReclassByASCIIFile(
-        cov_type_path, srain_intcp_remap_path)
-    srain_intcp_obj *= srain_intcp_remap_factor                           
-    srain_intcp_obj.save(srain_intcp_path)
-    del srain_intcp_obj
-
-    # Root depth
-    logging.info('Calculating ROOT_DEPTH')
-    logging.debug('  Reclassifying: {}'.format(root_depth_remap_path))
-    root_depth_obj = arcpy.sa.ReclassByASCIIFile(
-        veg_type_path, root_depth_remap_path)
-    root_depth_obj.save(root_depth_path)
-    del root_depth_obj
-
-    # Short-wave radiation transmission coefficent
-    logging.info('Calculating {}'.format(hru.rad_trncf_field))
-    rad_trncf_obj = 0.9917 * arcpy.sa.Exp(
-        -2.7557 * arcpy.sa.Raster(covden_win_path))
-    rad_trncf_obj.save(rad_trncf_path)
-    del rad_trncf_obj
-
-
-    # List of rasters, fields, and stats for zonal statistics
+    # Check that remaps have all necessary values
+    # Only the cells in the projected/clipped fishnet window are checked
+    # The unique value counts are cached in the veg_rasters folder
+    logging.info('\nChecking remap tables against the raster cells')
+    logging.info('  (only the cells in the study area fishnet window)')
+    veg_rows = int(round(hru.extent.height / veg_type_cs))
+    veg_cols = int(round(hru.extent.width / veg_type_cs))
+    veg_type_counts_path = os.path.join(veg_temp_ws, 'veg_type_counts.json')
+    veg_cover_counts_path = os.path.join(veg_temp_ws, 'veg_cover_counts.json')
+    if overwrite_flag:
+        for counts_path in [veg_type_counts_path, veg_cover_counts_path]:
+            if os.path.isfile(counts_path):
+                os.remove(counts_path)
+    veg_type_values, veg_type_counts = support.raster_value_counts(
+        veg_type_path, hru.extent.XMin, hru.extent.YMax, veg_type_cs,
+        veg_rows, veg_cols, veg_block_size,
+        veg_type_counts_path, raster_cache_key(
+            veg_type_orig_path, veg_type_field, veg_type_cs, hru))
+    veg_cover_values, veg_cover_counts = support.raster_value_counts(
+        veg_cover_path, hru.extent.XMin, hru.extent.YMax, veg_type_cs,
+        veg_rows, veg_cols, veg_block_size,
+        veg_cover_counts_path, raster_cache_key(
+            veg_cover_orig_path, 'VALUE', veg_type_cs, hru))
+    check_remap_keys(
+        cov_type_remap_path, veg_type_path, veg_type_values,
+        veg_type_counts, veg_type_cs * hru.sr.metersPerUnit)
+    check_remap_keys(
+        covden_sum_remap_path, veg_cover_path, veg_cover_values,
+        veg_cover_counts, veg_type_cs * hru.sr.metersPerUnit)
+    check_remap_keys(
+        root_depth_remap_path, veg_type_path, veg_type_values,
+        veg_type_counts, veg_type_cs * hru.sr.metersPerUnit)
+    del veg_type_values, veg_type_counts, veg_cover_values, veg_cover_counts
+
+    # Compile the remaps once for all blocks
+    cov_type_remap = remap.read_remap_table(cov_type_remap_path)
+    covden_sum_remap = remap.read_remap_table(covden_sum_remap_path)
+    covden_win_remap = remap.read_remap_table(covden_win_remap_path)
+    snow_intcp_remap = remap.read_remap_table(snow_intcp_remap_path)
+    wrain_intcp_remap = remap.read_remap_table(wrain_intcp_remap_path)
+    srain_intcp_remap = remap.read_remap_table(srain_intcp_remap_path)
+    root_depth_remap = remap.read_remap_table(root_depth_remap_path)
+
+    # Zonal statistics for each field
+    hru_rows, hru_cols = support.hru_grid_shape(hru)
     zs_veg_dict = dict()
-    zs_veg_dict[hru.cov_type_field] = [cov_type_path, 'MAJORITY']
-    zs_veg_dict[hru.covden_sum_field] = [covden_sum_path, 'MEAN']
-    zs_veg_dict[hru.covden_win_field] = [covden_win_path, 'MEAN']
-    zs_veg_dict[hru.snow_intcp_field] = [snow_intcp_path, 'MEAN']
-    zs_veg_dict[hru.srain_intcp_field] = [srain_intcp_path, 'MEAN']
-    zs_veg_dict[hru.wrain_intcp_field] = [wrain_intcp_path, 'MEAN']
-    zs_veg_dict[hru.root_depth_field] = [root_depth_path, 'MEAN']
-    zs_veg_dict[hru.rad_trncf_field] = [rad_trncf_path, 'MEAN']
-
-
-    # Calculate zonal statistics
-    logging.info('\nCalculating vegetation zonal statistics')
-    support.zonal_stats_func(
-        zs_veg_dict, hru.polygon_path, hru.point_path, hru)
-
-
-    # Short-wave radiation transmission coefficient
-    # logging.info('\nCalculating {}'.format(hru.rad_trncf_field))
-    # arcpy.CalculateField_management(
-    #    hru.polygon_path, hru.rad_trncf_field,
-    #    '0.9917 * math.exp(-2.7557 * !{}!)'.format(hru.covden_win_field),
-    #    'PYTHON')
-
-
-    # Clear COV_TYPE values for lake cells (HRU_TYPE == 2)
-    if True:
-        logging.info('\nClearing lake nodata vegetation parameters')
-        # logging.info(
-        #     '\nClearing vegetation parameters for lake and inactive cells')
-        hru_polygon_layer = "hru_polygon_layer"
-        arcpy.MakeFeatureLayer_management(
-            hru.polygon_path, hru_polygon_layer)
-        arcpy.SelectLayerByAttribute_management(
-            hru_polygon_layer, "NEW_SELECTION",
-            '"{0}" = 2 OR ("{0}" = 0 AND "{1}" = 0)'.format(
-                hru.type_in_field, hru.dem_adj_field))
-        arcpy.CalculateField_management(
-            hru_polygon_layer, hru.cov_type_field, 0, 'PYTHON')
-        arcpy.CalculateField_management(
-            hru_polygon_layer, hru.covden_sum_field, 0, 'PYTHON')
-        arcpy.CalculateField_management(
-            hru_polygon_layer, hru.covden_win_field, 0, 'PYTHON')
-        arcpy.CalculateField_management(
-            hru_polygon_layer, hru.snow_intcp_field, 0, 'PYTHON')
-        arcpy.CalculateField_management(
-            hru_polygon_layer, hru.srain_intcp_field, 0, 'PYTHON')
-        arcpy.CalculateField_management(
-            hru_polygon_layer, hru.wrain_intcp_field, 0, 'PYTHON')
-        arcpy.CalculateField_management(
-            hru_polygon_layer, hru.rad_trncf_field, 0, 'PYTHON')
-        arcpy.Delete_management(hru_polygon_layer)
-        del hru_polygon_layer
-
-
-def get_remap_keys(remap_path):
-    """"""
-    with open(remap_path) as remap_f:
-        lines = remap_f.readlines()
-    remap_f.close()
-    return [int(l.split(':')[0].strip()) for l in lines if l and '#' not in l]
+    zs_veg_dict[hru.cov_type_field] = zonal.ZonalStats(
+        hru_rows * hru_cols, 'MAJORITY')
+    for zs_field in [hru.covden_sum_field, hru.covden_win_field,
+                     hru.snow_intcp_field, hru.srain_intcp_field,
+                     hru.wrain_intcp_field, hru.root_depth_field,
+                     hru.rad_trncf_field]:
+        zs_veg_dict[zs_field] = zonal.ZonalStats(
+            hru_rows * hru_cols, 'MEAN')
+
+    # Read veg type and veg cover over the fishnet extent in blocks of rows
+    # All of the vegetation parameters are computed from the two blocks
+    #   and added directly to the HRU zonal statistics
+    logging.info('\nCalculating vegetation parameters')
+    block_rows = max(1, veg_block_size // veg_cols)
+    logging.debug('  Rows: {}  Cols: {}  Block rows: {}'.format(
+        veg_rows, veg_cols, block_rows))
+    with report.stage('zonal'):
+        for row_start in xrange(0, veg_rows, block_rows):
+            rows = min(block_rows, veg_rows - row_start)
+            logging.debug('  Rows: {}-{}'.format(row_start, row_start + rows))
+            block_y_max = hru.extent.YMax - row_start * veg_type_cs
+            veg_type_array = support.raster_window_to_array(
+                veg_type_path, hru.extent.XMin, block_y_max, veg_type_cs,
+                rows, veg_cols)
+            veg_cover_array = support.raster_window_to_array(
+                veg_cover_path, hru.extent.XMin, block_y_max, veg_type_cs,
+                rows, veg_cols)
+            zone_array = zonal.cell_zone_array(
+                row_start, rows, veg_cols, veg_type_cs, hru.cs,
+                hru_rows, hru_cols)
+
+            # Reclassifying vegetation cover type
+            cov_type_array = cov_type_remap.apply(veg_type_array)
+            # Summer cover density
+            covden_sum_array = 0.01 * covden_sum_remap.apply(veg_cover_array)
+            # Winter cover density
+            covden_win_array = (
+                0.01 * covden_win_remap.apply(cov_type_array) *
+                covden_sum_array)
+            # Short-wave radiation transmission coefficent
+            rad_trncf_array = 0.9917 * np.exp(-2.7557 * covden_win_array)
+            zs_veg_dict[hru.cov_type_field].update(zone_array, cov_type_array)
+            zs_veg_dict[hru.covden_sum_field].update(
+                zone_array, covden_sum_array)
+            zs_veg_dict[hru.covden_win_field].update(
+                zone_array, covden_win_array)
+            zs_veg_dict[hru.rad_trncf_field].update(
+                zone_array, rad_trncf_array)
+            del covden_sum_array, covden_win_array, rad_trncf_array
+
+            # Snow, winter rain, and summer rain interception storage capacity
+            zs_veg_dict[hru.snow_intcp_field].update(
+                zone_array,
+                snow_intcp_remap_factor *
+                snow_intcp_remap.apply(cov_type_array))
+            zs_veg_dict[hru.wrain_intcp_field].update(
+                zone_array,
+                wrain_intcp_remap_factor *
+                wrain_intcp_remap.apply(cov_type_array))
+            zs_veg_dict[hru.srain_intcp_field].update(
+                zone_array,
+                srain_intcp_remap_factor *
+                srain_intcp_remap.apply(cov_type_array))
+            # Root depth
+            zs_veg_dict[hru.root_depth_field].update(
+                zone_array, root_depth_remap.apply(veg_type_array))
+            del veg_type_array, veg_cover_array, cov_type_array, zone_array
+
+    # Clear vegetation values for lake cells (HRU_TYPE == 2)
+    #   and inactive cells outside the DEM
+    # Root depth is not cleared
+    logging.info('\nWriting vegetation parameters')
+    logging.info('  Clearing lake nodata vegetation parameters')
+    clear_fields = [
+        hru.cov_type_field, hru.covden_sum_field, hru.covden_win_field,
+        hru.snow_intcp_field, hru.srain_intcp_field, hru.wrain_intcp_field,
+        hru.rad_trncf_field]
+    zs_fields = sorted(zs_veg_dict.keys())
+    zs_array = np.column_stack(
+        [zs_veg_dict[f].result() for f in zs_fields])
+    clear_mask = np.array([f in clear_fields for f in zs_fields])
+    fields = [hru.row_field, hru.col_field, hru.type_in_field,
+              hru.dem_adj_field] + zs_fields
+    with report.stage('cursor_write') as stage:
+        row_count = 0
+        with arcpy.da.UpdateCursor(hru.polygon_path, fields) as u_cursor:
+            for row in u_cursor:
+                zone_i = (int(row[0]) - 1) * hru_cols + int(row[1]) - 1
+                zs_values = zs_array[zone_i]
+                if row[2] == 2 or (row[2] == 0 and row[3] == 0):
+                    zs_values = np.where(clear_mask, 0, zs_values)
+                u_cursor.updateRow(row[:4] + zs_values.tolist())
+                row_count += 1
+        stage.add_rows(row_count)
+    del zs_veg_dict, zs_array
+
+
+def raster_cache_key(raster_path, raster_field, cs, hru_param):
+    """Identify a raster and the fishnet window it was projected/clipped to"""
+    try:
+        raster_stat = [
+            os.path.getmtime(raster_path), os.path.getsize(raster_path)]
+    except OSError:
+        raster_stat = None
+    return [
+        os.path.abspath(raster_path), raster_stat, raster_field, cs,
+        support.extent_string(hru_param.extent), hru_param.sr.name]
 
 
-def get_raster_values(raster_path):
-    """"""
-    return [
-        int(row[0])
-        for row in arcpy.da.SearchCursor(raster_path, ['Value'])]
+def check_remap_keys(remap_path, raster_path, values, counts, cs_meters):
+    """Report raster values that are not in a remap
 
+    Args:
+        remap_path (str): ASCII remap file path
+        raster_path (str): raster path (for logging)
+        values (np.array): unique raster values
+        counts (np.array): number of cells with each value
+        cs_meters (float): raster cellsize in meters
 
-def check_remap_keys(remap_path, raster_path):
-    """"""
+    Returns:
+        None
+    """
     logging.info('  {} - {}'.format(
         os.path.basename(remap_path), os.path.basename(raster_path)))
-    remap_keys = get_remap_keys(remap_path)
-    raster_values = get_raster_values(raster_path)
-    missing_keys = sorted(list(set(raster_values) - set(remap_keys)))
-    for key in missing_keys:
+    missing_values, missing_counts = remap.remap_coverage(
+        remap.read_remap_table(remap_path), values, counts)
+    if not len(missing_values):
+        return
+    total_count = float(counts.sum())
+    # Report the missing values with the largest area first
+    for i in np.argsort(-missing_counts, kind='mergesort'):
         logging.warning(
-            '    Raster value {} is not in the remap table'.format(key))
+            ('    Raster value {} is not in the remap table ' +
+             '({} cells, {:.1f} acres, {:.2f}%)').format(
+                int(missing_values[i]), missing_counts[i],
+                missing_counts[i] * cs_meters ** 2 / 4046.8564224,
+                100 * missing_counts[i] / total_count))
+    logging.warning('    Total: {:.2f}% of the raster cells'.format(
+        100 * missing_counts.sum() / total_count))
 
 
 def arg_parse():
@@ -485,3 +518,4 @@ if __name__ == '__main__':
     veg_parameters(
         config_path=args.ini, overwrite_flag=args.overwrite,
         debug_flag=args.loglevel==logging.DEBUG)
+    report.finish_report()
@@ -0,0 +1,159 @@
+#--------------------------------
+# Name:         zonal_functions.py
+# Purpose:      NumPy HRU zonal statistics functions
+# Notes:        ArcGIS 10.2 Version
+# Author:       agent
+# Created       2026-10-18
+# Python:       2.7
+#--------------------------------
+
+import numpy as np
+
+
+def cell_zone_array(row_start, rows, cols, cs, zone_cs, zone_rows, zone_cols):
+    """Compute the zone (HRU) index of each cell in a block of rows
+
+    The cell grid and the zone grid must share the same upper left corner.
+    Cells are assigned to the zone containing the cell center, the same as
+        converting the HRU centroids to a raster for zonal statistics.
+    The zone index is (HRU row - 1) * HRU columns + (HRU column - 1).
+
+    Args:
+        row_start (int): first row of the block in the cell grid
+        rows (int): number of rows in the block
+        cols (int): number of columns in the cell grid
+        cs (float): cell grid cellsize
+        zone_cs (float): zone grid (HRU) cellsize
+        zone_rows (int): number of rows in the zone grid
+        zone_cols (int): number of columns in the zone grid
+
+    Returns:
+        np.array of the zone index (-1 for cells outside the zone grid)
+    """
+    zone_row = np.floor(
+        (np.arange(row_start, row_start + rows) + 0.5) * cs /
+        zone_cs).astype(np.int64)
+    zone_col = np.floor(
+        (np.arange(cols) + 0.5) * cs / zone_cs).astype(np.int64)
+    zone_array = zone_row[:, np.newaxis] * zone_cols + zone_col[np.newaxis, :]
+    zone_array[
+        (zone_row >= zone_rows)[:, np.newaxis] |
+        (zone_col >= zone_cols)[np.newaxis, :]] = -1
+    return zone_array
+
+
+class ZonalStats(object):
+    """Accumulate zonal statistics from blocks of zone and value arrays
+
+    NaN values are treated as nodata.  Zones that only have nodata cells are
+    set to nodata_value and zones without any cells are set to default_value,
+    the same as zonal_stats_func().
+    """
+    stat_list = ['MEAN', 'MINIMUM', 'MAXIMUM', 'SUM', 'MAJORITY']
+
+    def __init__(self, zone_count, stat='MEAN'):
+        """"""
+        self.zone_count = zone_count
+        self.stat = stat.upper()
+        if self.stat not in self.stat_list:
+            raise ValueError('unsupported zonal statistic: {}'.format(stat))
+        self.cell_count = np.zeros(zone_count, dtype=np.int64)
+        self.data_count = np.zeros(zone_count, dtype=np.int64)
+        if self.stat in ['MEAN', 'SUM']:
+            self.value_sum = np.zeros(zone_count, dtype=np.float64)
+        elif self.stat == 'MINIMUM':
+            self.value = np.full(zone_count, np.inf)
+        elif self.stat == 'MAXIMUM':
+            self.value = np.full(zone_count, -np.inf)
+        elif self.stat == 'MAJORITY':
+            # Cell counts per zone for each value
+            self.value_counts = dict()
+
+    def update(self, zone_array, value_array):
+        """Add a block of cells
+
+        Args:
+            zone_array (np.array): zone index of each cell (-1 for no zone)
+            value_array (np.array): cell values (NaN for nodata)
+
+        Returns:
+            None
+        """
+        zone_array = np.ravel(zone_array)
+        value_array = np.ravel(value_array).astype(np.float64)
+        zone_mask = zone_array >= 0
+        self.cell_count += np.bincount(
+            zone_array[zone_mask], minlength=self.zone_count)
+        data_mask = zone_mask & ~np.isnan(value_array)
+        if not np.any(data_mask):
+            return
+        zone_array = zone_array[data_mask]
+        value_array = value_array[data_mask]
+        self.data_count += np.bincount(zone_array, minlength=self.zone_count)
+
+        if self.stat in ['MEAN', 'SUM']:
+            self.value_sum += np.bincount(
+                zone_array, weights=value_array, minlength=self.zone_count)
+        elif self.stat in ['MINIMUM', 'MAXIMUM']:
+            # Sort by zone then value and take the first/last value per zone
+            sort_i = np.lexsort((value_array, zone_array))
+            zone_sort = zone_array[sort_i]
+            value_sort = value_array[sort_i]
+            if self.stat == 'MINIMUM':
+                first_mask = np.ones(len(zone_sort), dtype=np.bool)
+                first_mask[1:] = zone_sort[1:] != zone_sort[:-1]
+                zone_i = zone_sort[first_mask]
+                self.value[zone_i] = np.minimum(
+                    self.value[zone_i], value_sort[first_mask])
+            else:
+                last_mask = np.ones(len(zone_sort), dtype=np.bool)
+                last_mask[:-1] = zone_sort[1:] != zone_sort[:-1]
+                zone_i = zone_sort[last_mask]
+                self.value[zone_i] = np.maximum(
+                    self.value[zone_i], value_sort[last_mask])
+        elif self.stat == 'MAJORITY':
+            # Count each unique zone/value pair
+            unique_values, value_i = np.unique(
+                value_array, return_inverse=True)
+            pair_array, pair_count = np.unique(
+                zone_array * len(unique_values) + value_i,
+                return_counts=True)
+            pair_zone = pair_array // len(unique_values)
+            pair_value_i = pair_array % len(unique_values)
+            for i, value in enumerate(unique_values):
+                value_mask = pair_value_i == i
+                try:
+                    value_counts = self.value_counts[value]
+                except KeyError:
+                    value_counts = np.zeros(self.zone_count, dtype=np.int64)
+                    self.value_counts[value] = value_counts
+                value_counts[pair_zone[value_mask]] += pair_count[value_mask]
+
+    def result(self, nodata_value=-999, default_value=0):
+        """Return the zonal statistic for each zone
+
+        Args:
+            nodata_value: value for zones with only nodata cells
+            default_value: value for zones without any cells
+
+        Returns:
+            np.array
+        """
+        output_array = np.full(self.zone_count, default_value, np.float64)
+        output_array[self.cell_count > 0] = nodata_value
+        data_mask = self.data_count > 0
+        if self.stat == 'MEAN':
+            output_array[data_mask] = (
+                self.value_sum[data_mask] / self.data_count[data_mask])
+        elif self.stat == 'SUM':
+            output_array[data_mask] = self.value_sum[data_mask]
+        elif self.stat in ['MINIMUM', 'MAXIMUM']:
+            output_array[data_mask] = self.value[data_mask]
+        elif self.stat == 'MAJORITY' and self.value_counts:
+            # Ties are assigned to the lowest value
+            values = sorted(self.value_counts.keys())
+            count_array = np.column_stack(
+                [self.value_counts[v] for v in values])
+            output_array[data_mask] = np.array(values)[
+                np.argmax(count_array, axis=1)][data_mask]
+        return output_array